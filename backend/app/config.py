@@ -5,6 +5,52 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Perfiles del pool de conexiones por entorno (APP_ENV).
+# Cualquier valor puede sobrescribirse con su variable DB_* correspondiente.
+DB_POOL_PROFILES = {
+    "development": {
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_timeout_ms": 0,
+        "echo": True,
+    },
+    "test": {
+        "pool_size": 5,
+        "max_overflow": 0,
+        "pool_timeout": 10,
+        "pool_recycle": 1800,
+        "pool_pre_ping": False,
+        "statement_timeout_ms": 0,
+        "echo": False,
+    },
+    "staging": {
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_timeout": 15,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_timeout_ms": 30000,
+        "echo": False,
+    },
+    "production": {
+        "pool_size": 10,
+        "max_overflow": 10,
+        "pool_timeout": 10,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_timeout_ms": 15000,
+        "echo": False,
+    },
+}
+
+def _optional_env(name: str) -> Optional[str]:
+    """Valor de una variable de entorno, o None si no está definida o está vacía"""
+    value = os.getenv(name)
+    return value if value not in (None, "") else None
+
 class Settings(BaseSettings):
     # Configuración SMTP (legacy - mantener por compatibilidad)
     smtp_host: str = os.getenv("SMTP_HOST", "smtp.gmail.com")
@@ -34,10 +80,115 @@ class Settings(BaseSettings):
     db_user: str = os.getenv("DB_USER", "username")
     db_password: str = os.getenv("DB_PASSWORD", "password")
     
+    # Réplica de solo lectura (opcional). Sin valor, las lecturas van al primario
+    database_replica_url: str = os.getenv("DATABASE_REPLICA_URL", "")
+    replica_max_lag_seconds: float = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))  # por encima se lee del primario
+    replica_lag_check_interval: float = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "10"))  # segundos entre mediciones
+    
+    # Entorno de ejecución: development, test, staging o production
+    app_env: str = os.getenv("APP_ENV", "development")
+    
+    # Pool de conexiones (sin valor = el del perfil de APP_ENV)
+    db_pool_size: Optional[int] = _optional_env("DB_POOL_SIZE")
+    db_max_overflow: Optional[int] = _optional_env("DB_MAX_OVERFLOW")
+    db_pool_timeout: Optional[int] = _optional_env("DB_POOL_TIMEOUT")  # segundos esperando una conexión libre
+    db_pool_recycle: Optional[int] = _optional_env("DB_POOL_RECYCLE")  # segundos
+    db_pool_pre_ping: Optional[bool] = _optional_env("DB_POOL_PRE_PING")
+    db_statement_timeout_ms: Optional[int] = _optional_env("DB_STATEMENT_TIMEOUT_MS")  # 0 = sin límite
+    db_echo: Optional[bool] = _optional_env("DB_ECHO")
+    
+    # Procesos de uvicorn/gunicorn y límite de conexiones del servidor (para el reporte del pool)
+    web_concurrency: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    db_max_connections: int = int(os.getenv("DB_MAX_CONNECTIONS", "100"))
+    
     # Firebase
     firebase_credentials_path: str = os.getenv("FIREBASE_CREDENTIALS_PATH", "firebase-credentials.json")
     firebase_api_key: str = os.getenv("FIREBASE_API_KEY", "")  # API Key para verificar contraseñas
     
+    # Verificación de tokens: "firebase" (Firebase Admin SDK) o "local" (claves de firma en disco)
+    firebase_verification_mode: str = os.getenv("FIREBASE_VERIFICATION_MODE", "firebase")
+    firebase_project_id: str = os.getenv("FIREBASE_PROJECT_ID", "bytedental-6701e")
+    firebase_token_issuer: str = os.getenv("FIREBASE_TOKEN_ISSUER", "")  # Por defecto https://securetoken.google.com/<project_id>
+    firebase_signing_keys_path: str = os.getenv("FIREBASE_SIGNING_KEYS_PATH", "firebase_local_keys")
+    firebase_signing_keys_refresh: int = int(os.getenv("FIREBASE_SIGNING_KEYS_REFRESH", "300"))  # segundos
+    
+    # Caché de tokens verificados
+    token_cache_enabled: bool = os.getenv("TOKEN_CACHE_ENABLED", "True").lower() == "true"
+    token_cache_max_size: int = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "1024"))
+    token_cache_max_ttl: int = int(os.getenv("TOKEN_CACHE_MAX_TTL", "300"))  # segundos
+    
+    # Caché de rol/email de usuarios para la atribución de auditoría
+    user_attribution_cache_enabled: bool = os.getenv("USER_ATTRIBUTION_CACHE_ENABLED", "True").lower() == "true"
+    user_attribution_cache_max_size: int = int(os.getenv("USER_ATTRIBUTION_CACHE_MAX_SIZE", "1024"))
+    user_attribution_cache_ttl: int = int(os.getenv("USER_ATTRIBUTION_CACHE_TTL", "300"))  # segundos
+    
+    # Métricas de consultas SQL por petición (headers X-DB-Query-Count / X-DB-Time-Ms)
+    query_metrics_enabled: bool = os.getenv("QUERY_METRICS_ENABLED", "True").lower() == "true"
+    query_budget: int = int(os.getenv("QUERY_BUDGET", "25"))  # consultas por petición antes de advertir
+    query_repeat_threshold: int = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))  # repeticiones de una sentencia (posible N+1)
+    
+    # Búsqueda de personas con índices de trigramas/texto completo (init-scripts/12-person-search.sql)
+    person_search_index_enabled: bool = os.getenv("PERSON_SEARCH_INDEX_ENABLED", "True").lower() == "true"
+    
+    # Totales de los listados paginados (envelope=true)
+    count_cache_max_size: int = int(os.getenv("COUNT_CACHE_MAX_SIZE", "512"))
+    count_cache_ttl: int = int(os.getenv("COUNT_CACHE_TTL", "60"))  # segundos
+    count_estimate_min_rows: int = int(os.getenv("COUNT_ESTIMATE_MIN_ROWS", "100000"))  # sin filtros: estimar por encima de este tamaño
+    
+    # Dashboard: responder desde el agregado diario de tratamientos (treatment_daily_rollups)
+    dashboard_use_rollups: bool = os.getenv("DASHBOARD_USE_ROLLUPS", "True").lower() == "true"
+    # Caché de resultados del dashboard: memory (por worker; las escrituras no invalidan a los demás workers
+    # hasta el TTL), sqlite (archivo compartido por los workers) o none
+    dashboard_cache_backend: str = os.getenv("DASHBOARD_CACHE_BACKEND", "memory").lower()
+    dashboard_cache_path: str = os.getenv("DASHBOARD_CACHE_PATH", "/tmp/bytedental_dashboard_cache.sqlite3")
+    dashboard_cache_max_size: int = int(os.getenv("DASHBOARD_CACHE_MAX_SIZE", "256"))
+    dashboard_cache_ttl: int = int(os.getenv("DASHBOARD_CACHE_TTL", "60"))  # segundos
+    # /dashboard/summary: tiempo máximo de cada widget antes de reportarlo como fallido (segundos)
+    dashboard_widget_timeout: float = float(os.getenv("DASHBOARD_WIDGET_TIMEOUT", "10"))
+    
+    # Autocompletado de pacientes: índice de prefijos en memoria, reconstruido cada N segundos
+    patient_autocomplete_rebuild_seconds: int = int(os.getenv("PATIENT_AUTOCOMPLETE_REBUILD_SECONDS", "300"))
+    
+    # Instantáneas mensuales de actividad: cada cuántos segundos se crean las del mes nuevo y se cierran las terminadas
+    monthly_snapshot_check_seconds: int = int(os.getenv("MONTHLY_SNAPSHOT_CHECK_SECONDS", "900"))
+    
+    # Modo de auditoría: dual (la aplicación escribe en audits y los triggers en db_audit_log)
+    # o unified (los triggers de init-scripts/optional/10-unified-audit.sql escriben los cambios de datos en audits)
+    audit_mode: str = os.getenv("AUDIT_MODE", "dual").lower()
+    
+    # Escritura de auditoría en lotes (hilo en segundo plano)
+    audit_writer_enabled: bool = os.getenv("AUDIT_WRITER_ENABLED", "True").lower() == "true"
+    audit_batch_size: int = int(os.getenv("AUDIT_BATCH_SIZE", "100"))
+    audit_flush_interval: float = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))  # segundos
+    audit_queue_max_size: int = int(os.getenv("AUDIT_QUEUE_MAX_SIZE", "10000"))  # llena = escritura síncrona
+    audit_spool_path: str = os.getenv("AUDIT_SPOOL_PATH", "audit_spool.jsonl")  # respaldo si falla la inserción
+    
+    # Particiones mensuales de auditoría (solo PostgreSQL con la tabla particionada)
+    audit_partition_months_ahead: int = int(os.getenv("AUDIT_PARTITION_MONTHS_AHEAD", "3"))  # meses futuros a crear
+    audit_partition_retention_months: int = int(os.getenv("AUDIT_PARTITION_RETENTION_MONTHS", "0"))  # 0 = no desconectar
+    
+    # Archivo en frío de la auditoría antigua (archivos JSONL comprimidos por bloques)
+    audit_archive_dir: str = os.getenv("AUDIT_ARCHIVE_DIR", "audit_archive")
+    audit_archive_after_days: int = int(os.getenv("AUDIT_ARCHIVE_AFTER_DAYS", "730"))  # antigüedad para archivar
+    audit_archive_block_rows: int = int(os.getenv("AUDIT_ARCHIVE_BLOCK_ROWS", "5000"))  # filas por bloque comprimido
+    
+    def db_pool_config(self) -> dict:
+        """
+        Configuración efectiva del pool: perfil de APP_ENV más las variables DB_* definidas
+        """
+        config = dict(DB_POOL_PROFILES.get(self.app_env, DB_POOL_PROFILES["development"]))
+        overrides = {
+            "pool_size": self.db_pool_size,
+            "max_overflow": self.db_max_overflow,
+            "pool_timeout": self.db_pool_timeout,
+            "pool_recycle": self.db_pool_recycle,
+            "pool_pre_ping": self.db_pool_pre_ping,
+            "statement_timeout_ms": self.db_statement_timeout_ms,
+            "echo": self.db_echo,
+        }
+        config.update({key: value for key, value in overrides.items() if value is not None})
+        return config
+    
     class Config:
         env_file = ".env"
 
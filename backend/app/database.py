@@ -1,9 +1,61 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import logging
+import threading
+import time
+from typing import AsyncIterator, Optional
+from fastapi import Depends
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Drivers asíncronos equivalentes a los síncronos de DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url(database_url: str) -> str:
+    """Convertir DATABASE_URL a su equivalente con driver asíncrono (asyncpg / aiosqlite)"""
+    url = make_url(database_url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)).render_as_string(hide_password=False)
+
+def build_engine_options(database_url: str, pool_config: dict, async_driver: bool = False) -> dict:
+    """
+    Construir los argumentos de create_engine a partir de la configuración del pool
+
+    SQLite (tests) no usa QueuePool, así que solo recibe echo y pre-ping.
+    Con asyncpg el statement_timeout se envía como server_settings.
+    """
+    url = make_url(database_url)
+    options = {
+        "echo": pool_config["echo"],
+        "pool_pre_ping": pool_config["pool_pre_ping"],
+    }
+    if url.get_backend_name() == "sqlite":
+        return options
+
+    options.update(
+        pool_size=pool_config["pool_size"],
+        max_overflow=pool_config["max_overflow"],
+        pool_timeout=pool_config["pool_timeout"],
+        pool_recycle=pool_config["pool_recycle"],
+    )
+    if url.get_backend_name() == "postgresql" and pool_config["statement_timeout_ms"]:
+        statement_timeout = int(pool_config["statement_timeout_ms"])
+        if async_driver:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(statement_timeout)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    return options
+
+# Configuración efectiva del pool según el entorno
+pool_config = settings.db_pool_config()
+
 # Crear engine de SQLAlchemy
-engine = create_engine(settings.database_url, echo=True)
+engine = create_engine(settings.database_url, **build_engine_options(settings.database_url, pool_config))
 
 # Crear SessionLocal para manejar sesiones de base de datos
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -18,3 +70,200 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Réplica de solo lectura (opcional) para dashboard, reportes, auditoría y listados
+replica_engine = (
+    create_engine(settings.database_replica_url, **build_engine_options(settings.database_replica_url, pool_config))
+    if settings.database_replica_url else None
+)
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine) if replica_engine else None
+
+# Retraso de la réplica en segundos (0 si ya reprodujo todo el WAL recibido)
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+def measure_replica_lag(connection) -> float:
+    """Medir el retraso de replicación sobre una conexión a la réplica"""
+    if connection.dialect.name != "postgresql":
+        return 0.0
+    return float(connection.execute(REPLICA_LAG_SQL).scalar() or 0)
+
+class ReplicaLagGuard:
+    """
+    Decide si la réplica puede atender lecturas
+
+    La medición se reutiliza durante check_interval segundos para no añadir una
+    consulta por petición. Si la réplica no responde o su retraso supera
+    max_lag, las lecturas vuelven al primario hasta la siguiente medición.
+    """
+
+    def __init__(self, max_lag: float, check_interval: float):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.last_lag: Optional[float] = None
+        self.healthy = False
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def needs_check(self) -> bool:
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval
+
+    def record(self, lag: Optional[float]) -> bool:
+        """Registrar una medición (None = réplica no disponible)"""
+        healthy = lag is not None and lag <= self.max_lag
+        if healthy != self.healthy:
+            if healthy:
+                logger.info(f"Réplica disponible para lecturas (retraso {lag:.1f}s)")
+            elif lag is None:
+                logger.warning("Réplica no disponible: las lecturas se envían al primario")
+            else:
+                logger.warning(f"Retraso de la réplica {lag:.1f}s > {self.max_lag}s: las lecturas se envían al primario")
+        self.last_lag = lag
+        self.healthy = healthy
+        self._checked_at = time.monotonic()
+        return healthy
+
+    def check(self, replica: Engine) -> bool:
+        """Indicar si se puede leer de la réplica (midiendo el retraso si toca)"""
+        if self.needs_check():
+            with self._lock:
+                if self.needs_check():
+                    try:
+                        with replica.connect() as connection:
+                            lag = measure_replica_lag(connection)
+                    except Exception as e:
+                        logger.warning(f"Error midiendo el retraso de la réplica: {e}")
+                        lag = None
+                    self.record(lag)
+        return self.healthy
+
+    async def check_async(self, replica: AsyncEngine) -> bool:
+        """Versión asíncrona de check"""
+        if self.needs_check():
+            # Reservar la medición para que las corrutinas concurrentes no la repitan
+            self._checked_at = time.monotonic()
+            try:
+                async with replica.connect() as connection:
+                    lag = await connection.run_sync(measure_replica_lag)
+            except Exception as e:
+                logger.warning(f"Error midiendo el retraso de la réplica: {e}")
+                lag = None
+            self.record(lag)
+        return self.healthy
+
+replica_guard = ReplicaLagGuard(settings.replica_max_lag_seconds, settings.replica_lag_check_interval)
+
+# Dependencia para endpoints de solo lectura
+def get_read_db(primary: Session = Depends(get_db)):
+    """
+    Sesión de lectura: la réplica si está configurada y al día; en otro caso
+    la misma sesión del primario que usa el resto de la petición
+    """
+    if replica_engine is None or not replica_guard.check(replica_engine):
+        yield primary
+        return
+    db = ReplicaSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_session_factory():
+    """
+    Fábrica de sesiones de lectura para trabajos que sobreviven a la petición
+    (p. ej. respuestas en streaming): la réplica si está al día, o el primario
+    """
+    if replica_engine is not None and replica_guard.check(replica_engine):
+        return ReplicaSessionLocal
+    return SessionLocal
+
+# Engines asíncronos (asyncpg) para las rutas de dashboard y reportes.
+# Se crean bajo demanda para que las rutas CRUD no dependan del driver asíncrono.
+_async_engines: dict = {}
+_async_sessionmakers: dict = {}
+
+def _get_async_engine(database_url: str) -> AsyncEngine:
+    if database_url not in _async_engines:
+        async_engine = create_async_engine(
+            get_async_database_url(database_url),
+            **build_engine_options(database_url, pool_config, async_driver=True)
+        )
+        _async_engines[database_url] = async_engine
+        _async_sessionmakers[database_url] = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+    return _async_engines[database_url]
+
+def get_async_engine() -> AsyncEngine:
+    """Obtener (creando si hace falta) el engine asíncrono del primario"""
+    return _get_async_engine(settings.database_url)
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    """Fábrica de sesiones asíncronas del primario"""
+    get_async_engine()
+    return _async_sessionmakers[settings.database_url]
+
+# Dependencia para obtener una sesión asíncrona de base de datos
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+async def get_async_read_sessionmaker() -> async_sessionmaker:
+    """
+    Fábrica de sesiones asíncronas de solo lectura (réplica con respaldo en el primario)
+
+    También sirve como dependencia para endpoints que abren varias sesiones
+    concurrentes (una AsyncSession no admite consultas en paralelo).
+    """
+    session_factory = get_async_sessionmaker()
+    if settings.database_replica_url:
+        replica = _get_async_engine(settings.database_replica_url)
+        if await replica_guard.check_async(replica):
+            session_factory = _async_sessionmakers[settings.database_replica_url]
+    return session_factory
+
+# Dependencia asíncrona para endpoints de solo lectura (réplica con respaldo en el primario)
+async def get_async_read_db() -> AsyncIterator[AsyncSession]:
+    session_factory = await get_async_read_sessionmaker()
+    async with session_factory() as db:
+        yield db
+
+async def dispose_async_engine() -> None:
+    """Cerrar las conexiones de los engines asíncronos (al apagar la aplicación)"""
+    for async_engine in list(_async_engines.values()):
+        await async_engine.dispose()
+    _async_engines.clear()
+    _async_sessionmakers.clear()
+
+def log_pool_configuration() -> dict:
+    """
+    Registrar en el log la configuración efectiva del pool (se llama al arrancar)
+
+    Advierte si workers × (pool_size + max_overflow) supera el límite de
+    conexiones del servidor de base de datos.
+    """
+    report = {
+        "app_env": settings.app_env,
+        "backend": engine.url.get_backend_name(),
+        "pool_class": type(engine.pool).__name__,
+        "workers": settings.web_concurrency,
+        "read_replica": replica_engine is not None,
+        **pool_config,
+    }
+    logger.info(
+        "Pool de base de datos: " + ", ".join(f"{key}={value}" for key, value in report.items())
+    )
+
+    if report["backend"] != "sqlite":
+        max_per_worker = pool_config["pool_size"] + pool_config["max_overflow"]
+        total = max_per_worker * settings.web_concurrency
+        report["max_connections_total"] = total
+        if total > settings.db_max_connections:
+            logger.warning(
+                f"El pool puede abrir hasta {total} conexiones ({settings.web_concurrency} workers × {max_per_worker}) "
+                f"y el servidor admite {settings.db_max_connections}. Reduzca DB_POOL_SIZE/DB_MAX_OVERFLOW."
+            )
+    if pool_config["echo"] and settings.app_env == "production":
+        logger.warning("DB_ECHO está activo en producción: cada sentencia SQL se registra en el log")
+
+    return report
@@ -0,0 +1,188 @@
+"""
+Contexto de auditoría en la sesión de base de datos (AUDIT_MODE=unified)
+
+En modo unificado los triggers de init-scripts/optional/10-unified-audit.sql
+escriben el evento de auditoría de cada INSERT/UPDATE/DELETE. Para que el
+evento lleve el usuario, rol, email e IP de la petición, el principal se
+guarda en ``Session.info`` y, al comenzar cada transacción, se publica con
+``set_config(..., true)`` (válido solo dentro de esa transacción) junto con
+``application_name``.
+
+Los triggers se ejecutan en el commit y toman el tipo de evento de
+``bytedental.event_types`` (``declare_event_type``); así se conservan
+DEACTIVATE, REACTIVATE, CREACION_HISTORIA_CLINICA... en lugar de
+CREATE/UPDATE/DELETE. Los servicios que registran el evento después del
+commit deben declararlo antes.
+
+El modo unificado solo se activa si los triggers están instalados y la base
+de datos tiene ``bytedental.audit_mode = 'unified'`` (PostgreSQL); en otro
+caso la aplicación sigue en modo dual.
+"""
+import json
+import logging
+from typing import Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from .principal import Principal
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_KEY = "audit_principal"
+EVENT_TYPES_KEY = "audit_event_types"
+
+SET_AUDIT_CONTEXT = text(
+    "SELECT set_config('bytedental.user_id', :uid, true), "
+    "set_config('bytedental.user_role', :role, true), "
+    "set_config('bytedental.user_email', :email, true), "
+    "set_config('bytedental.source_ip', :ip, true), "
+    "set_config('application_name', :application_name, true)"
+)
+SET_EVENT_TYPES = text("SELECT set_config('bytedental.event_types', :event_types, true)")
+
+# Estado de la base de datos: función instalada, triggers que la usan y modo de la base de datos
+DATABASE_AUDIT_STATE = text(
+    "SELECT to_regproc('audit_unified_trigger_function') IS NOT NULL, "
+    "(SELECT COUNT(*) FROM pg_trigger t JOIN pg_proc p ON p.oid = t.tgfoid "
+    "WHERE p.proname = 'audit_unified_trigger_function' AND NOT t.tgisinternal), "
+    "COALESCE(current_setting('bytedental.audit_mode', true), '')"
+)
+
+# Tablas con trigger unificado (como tipo de registro de la aplicación) y tipos de
+# evento de la aplicación que corresponden a un INSERT/UPDATE/DELETE en ellas
+TRIGGER_RECORD_TYPES = frozenset({
+    "users", "roles", "persons", "patients", "guardians", "dental_services", "clinical_histories", "treatments",
+})
+DATA_CHANGE_EVENT_TYPES = frozenset({
+    "CREATE", "UPDATE", "DELETE", "ACTIVATE", "DEACTIVATE", "REACTIVATE", "AUTO_UPDATE", "AUTO_UNASSIGN_GUARDIAN",
+    "AUTO_DEACTIVATE", "AUTO_REACTIVATE", "CREACION_HISTORIA_CLINICA",
+})
+
+# Modo efectivo tras comprobar la base de datos en el arranque (ver configure_audit_mode)
+_unified_active = False
+
+
+def unified_audit_active() -> bool:
+    """Indicar si los triggers registran los cambios de datos (modo unificado activo)"""
+    return _unified_active
+
+
+def _database_audit_state(engine: Engine) -> Tuple[bool, int, str]:
+    """(función unificada instalada, triggers que la usan, bytedental.audit_mode de la base de datos)"""
+    with engine.connect() as connection:
+        installed, triggers, database_mode = connection.execute(DATABASE_AUDIT_STATE).one()
+    return bool(installed), int(triggers or 0), database_mode or ""
+
+
+def configure_audit_mode(engine: Engine) -> str:
+    """
+    Resolver el modo de auditoría efectivo al arrancar
+
+    AUDIT_MODE=unified solo se activa en PostgreSQL con los triggers de
+    audit_unified_trigger_function instalados y bytedental.audit_mode =
+    'unified' en la base de datos; si falta algo, se sigue en modo dual para
+    no perder eventos. En modo dual avisa si encuentra los triggers
+    unificados (eventos duplicados o db_audit_log sin filas nuevas).
+
+    Returns:
+        "unified" o "dual"
+    """
+    global _unified_active
+    _unified_active = False
+    if engine.dialect.name != "postgresql":
+        if settings.audit_mode == "unified":
+            logger.warning("AUDIT_MODE=unified requiere PostgreSQL; se usa el modo dual")
+        return "dual"
+
+    installed, triggers, database_mode = _database_audit_state(engine)
+
+    if settings.audit_mode != "unified":
+        if triggers and database_mode == "unified":
+            logger.error(
+                f"AUDIT_MODE=dual con {triggers} triggers de auditoría unificada activos: cada cambio de datos "
+                "se registra dos veces en audits. Usar AUDIT_MODE=unified o volver al modo dual "
+                "(ver init-scripts/optional/10-unified-audit.sql)"
+            )
+        elif triggers:
+            logger.warning(
+                f"AUDIT_MODE=dual con {triggers} triggers de auditoría unificada instalados (inactivos): "
+                "sus tablas no escriben en db_audit_log. Ejecutar de nuevo init-scripts/02-audit-triggers.sql"
+            )
+        return "dual"
+
+    if not installed or not triggers:
+        logger.error("AUDIT_MODE=unified sin init-scripts/optional/10-unified-audit.sql aplicado; se usa el modo dual")
+        return "dual"
+    if database_mode != "unified":
+        logger.error(
+            "AUDIT_MODE=unified pero la base de datos no tiene bytedental.audit_mode = 'unified' "
+            "(los triggers no escribirían); se usa el modo dual"
+        )
+        return "dual"
+
+    _unified_active = True
+    logger.info("Auditoría en modo unificado: los triggers registran los cambios de datos")
+    return "unified"
+
+
+def captured_by_trigger(event_type: str, record_type: str) -> bool:
+    """Indicar si el evento ya lo registra el trigger (y la aplicación no debe duplicarlo)"""
+    return _unified_active and event_type in DATA_CHANGE_EVENT_TYPES and record_type in TRIGGER_RECORD_TYPES
+
+
+def declare_event_type(db: Session, event_type: str, record_type: str, record_id) -> None:
+    """
+    Indicar a los triggers el tipo de evento de la aplicación para un registro, SIN commit
+
+    Sin declaración el trigger usa CREATE/UPDATE/DELETE. Como el trigger se
+    ejecuta en el commit, hay que llamarla antes del commit del cambio (los
+    registrar_* lo hacen solos si se llaman antes). Vale hasta el fin de la
+    transacción.
+    """
+    if not captured_by_trigger(event_type, record_type):
+        return
+    event_types = db.info.setdefault(EVENT_TYPES_KEY, {})
+    event_types[f"{record_type}:{record_id}"] = event_type
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(SET_EVENT_TYPES, {"event_types": json.dumps(event_types)})
+
+
+def _context_params(principal: Principal) -> dict:
+    return {
+        "uid": principal.uid,
+        "role": principal.role or "",
+        "email": principal.email or "",
+        "ip": principal.ip or "",
+        # application_name admite hasta 63 caracteres
+        "application_name": f"bytedental:{principal.uid}"[:63],
+    }
+
+
+def bind_audit_context(db: Session, principal: Optional[Principal]) -> None:
+    """
+    Asociar el principal de la petición a la sesión para los triggers de auditoría
+
+    Si la sesión ya tiene una transacción abierta (p. ej. la consulta del
+    usuario autenticado), el contexto se publica en ella de inmediato.
+    """
+    if not _unified_active or principal is None:
+        return
+    db.info[PRINCIPAL_KEY] = principal
+    if db.in_transaction():
+        db.execute(SET_AUDIT_CONTEXT, _context_params(principal))
+
+
+@event.listens_for(Session, "after_begin")
+def _publish_audit_context(session, transaction, connection):
+    principal = session.info.get(PRINCIPAL_KEY)
+    if principal is not None and connection.dialect.name == "postgresql":
+        connection.execute(SET_AUDIT_CONTEXT, _context_params(principal))
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _clear_event_types(session):
+    session.info.pop(EVENT_TYPES_KEY, None)
@@ -11,6 +11,8 @@ from ..database import get_db
 from ..models.user_models import User
 from ..models.rol_models import Role
 from ..services.firebase_service import FirebaseService
+from .principal import Principal, get_request_ip
+from .audit_session import bind_audit_context
 
 logger = logging.getLogger(__name__)
 
@@ -55,29 +57,42 @@ class RolePermissions:
 def get_current_user_from_header(request: Request, db: Session = Depends(get_db)) -> Optional[User]:
     """
     Obtener usuario actual desde el header Authorization
+    
+    El resultado se guarda en ``request.state`` junto con el principal de la
+    petición, de modo que el token se verifica y el usuario se consulta una
+    sola vez aunque varias dependencias lo soliciten.
     """
+    if hasattr(request.state, "current_user"):
+        return request.state.current_user
+    
     try:
+        user = None
+        
         # Obtener token del header Authorization
         authorization = request.headers.get("Authorization")
-        if not authorization or not authorization.startswith("Bearer "):
-            return None
-        
-        token = authorization.split("Bearer ")[1]
-        
-        # Verificar token con Firebase
-        decoded_token = FirebaseService.verify_token(token)
-        if not decoded_token:
-            return None
-        
-        firebase_uid = decoded_token.get("uid")
-        if not firebase_uid:
-            return None
+        if authorization and authorization.startswith("Bearer "):
+            token = authorization.split("Bearer ")[1]
+            
+            # Verificar token con Firebase
+            decoded_token = FirebaseService.verify_token(token)
+            firebase_uid = decoded_token.get("uid") if decoded_token else None
+            
+            if firebase_uid:
+                # Buscar usuario en la base de datos
+                user = db.query(User).join(Role).filter(
+                    User.uid == firebase_uid,
+                    User.is_active == True
+                ).first()
         
-        # Buscar usuario en la base de datos
-        user = db.query(User).join(Role).filter(
-            User.uid == firebase_uid,
-            User.is_active == True
-        ).first()
+        request.state.current_user = user
+        request.state.principal = Principal(
+            uid=str(user.uid),
+            role=str(user.role.name) if user.role else None,
+            email=str(user.email) if user.email else None,
+            ip=get_request_ip(request)
+        ) if user else None
+        # En modo de auditoría unificado, los triggers toman el usuario de la sesión
+        bind_audit_context(db, request.state.principal)
         
         return user
         
@@ -85,6 +100,16 @@ def get_current_user_from_header(request: Request, db: Session = Depends(get_db)
         logger.error(f"Error obteniendo usuario actual: {e}")
         return None
 
+def get_request_principal(request: Request, db: Session = Depends(get_db)) -> Optional[Principal]:
+    """
+    Obtener el principal (uid, rol, email, IP) de la petición actual
+    
+    Returns:
+        Principal del usuario autenticado o None si no hay usuario
+    """
+    get_current_user_from_header(request, db)
+    return getattr(request.state, "principal", None)
+
 async def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
     """
     Dependency para obtener el usuario actual autenticado
@@ -191,20 +216,16 @@ async def require_dental_service_write(request: Request, db: Session = Depends(g
     """Require permissions to write dental services (only ADMIN)"""
     return await require_roles(RolePermissions.DENTAL_SERVICE_WRITE)(request, db)
 
-def get_user_context(request: Request, db: Session = Depends(get_db)) -> tuple[Optional[int], str]:
+def get_user_context(request: Request, db: Session = Depends(get_db)) -> tuple[Optional[str], str]:
     """
     Obtener contexto del usuario actual para auditoría
     Retorna (user_id, user_ip)
     """
     try:
-        # Obtener IP del request
-        user_ip = request.client.host if request.client else "unknown"
-        
-        # Intentar obtener usuario actual
-        user = get_current_user_from_header(request, db)
-        user_id = user.id if user else None
-        
-        return user_id, user_ip
+        principal = get_request_principal(request, db)
+        if principal:
+            return principal.uid, principal.ip
+        return None, get_request_ip(request)
         
     except Exception as e:
         logger.error(f"Error obteniendo contexto de usuario: {e}")
@@ -0,0 +1,64 @@
+"""
+Principal autenticado de la petición
+
+Agrupa los datos del usuario que necesitan los servicios y la auditoría
+(uid, rol, email e IP) para resolverlos una sola vez por petición.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Request
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Usuario autenticado que origina la petición"""
+    uid: str
+    role: Optional[str]
+    email: Optional[str]
+    ip: str = "unknown"
+
+    @classmethod
+    def resolve(
+        cls,
+        db,
+        user_id: Optional[str] = None,
+        principal: Optional["Principal"] = None,
+        ip: Optional[str] = None
+    ) -> "Principal":
+        """
+        Resolver el principal con el que opera un servicio
+
+        Reutiliza el principal de la petición si existe (ya trae rol y email);
+        si solo se recibe user_id, consulta rol y email para auditoría.
+        Sin usuario autenticado no se permite operar.
+        """
+        if principal:
+            return principal
+        if not user_id:
+            raise ValueError("No se puede realizar operaciones sin usuario autenticado")
+
+        # Import diferido: auditoria_service importa este módulo
+        from ..services.auditoria_service import AuditoriaService
+        role, email = AuditoriaService._obtener_datos_usuario(db, user_id)
+        return cls(uid=user_id, role=role, email=email, ip=ip or "unknown")
+
+
+def get_request_ip(request: Request) -> str:
+    """
+    Extraer la IP del cliente de la request
+
+    Usa la IP de la conexión y, si no está disponible, los headers de proxy.
+    """
+    user_ip = None
+    if hasattr(request, 'client') and request.client:
+        user_ip = request.client.host
+
+    if not user_ip and hasattr(request, 'headers'):
+        user_ip = (
+            request.headers.get('X-Forwarded-For', '').split(',')[0].strip() or
+            request.headers.get('X-Real-IP') or
+            request.headers.get('CF-Connecting-IP')
+        )
+
+    return user_ip or "unknown"
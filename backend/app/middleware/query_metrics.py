@@ -0,0 +1,102 @@
+"""
+Métricas de consultas SQL por petición
+
+Cuenta las sentencias ejecutadas y el tiempo total en base de datos de cada
+petición mediante los eventos before/after_cursor_execute de SQLAlchemy, los
+devuelve en los headers X-DB-Query-Count y X-DB-Time-Ms y advierte cuando una
+ruta supera el presupuesto de consultas o repite la misma sentencia muchas
+veces (patrón N+1).
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Consultas ejecutadas durante una petición (o un bloque track_queries)"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0  # segundos
+        self.statements: Counter = Counter()
+
+    @property
+    def total_time_ms(self) -> float:
+        return round(self.total_time * 1000, 2)
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.total_time += elapsed
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Sentencias ejecutadas al menos `threshold` veces (candidatas a N+1)"""
+        return [(statement, times) for statement, times in self.statements.most_common() if times >= threshold]
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    stats.record(statement, time.perf_counter() - start_times.pop())
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Contar las consultas ejecutadas dentro del bloque (tests y scripts)"""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def report_query_stats(route: str, stats: QueryStats) -> None:
+    """Advertir si la petición superó el presupuesto de consultas o repitió sentencias"""
+    if stats.count > settings.query_budget:
+        logger.warning(
+            f"{route}: {stats.count} consultas SQL ({stats.total_time_ms} ms), "
+            f"presupuesto {settings.query_budget}"
+        )
+    for statement, times in stats.repeated(settings.query_repeat_threshold):
+        summary = " ".join(statement.split())[:200]
+        logger.warning(f"{route}: posible N+1, sentencia ejecutada {times} veces: {summary}")
+
+
+class QueryMetricsMiddleware(BaseHTTPMiddleware):
+    """Adjuntar el número de consultas y el tiempo en base de datos a cada respuesta"""
+
+    async def dispatch(self, request: Request, call_next):
+        with track_queries() as stats:
+            response = await call_next(request)
+
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = str(stats.total_time_ms)
+        report_query_stats(f"{request.method} {request.url.path}", stats)
+        return response
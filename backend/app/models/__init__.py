@@ -9,7 +9,12 @@ from .patient_models import Patient
 from .guardian_models import Guardian, PatientRelationshipEnum
 from .otp_models import OTPRequest
 from .email_models import EmailRequest, EmailResponse, EmailType
-from .auditoria_models import Audit
+from .auditoria_models import Audit, AuditSegmentSeal, AuditEventCounter
+from .dental_service_models import DentalService
+from .clinical_history_models import ClinicalHistory
+from .treatment_models import Treatment
+from .dashboard_rollup_models import TreatmentDailyPatient, TreatmentDailyRollup
+from .report_models import MonthlyActivityReport
 
 __all__ = [
     "Base",
@@ -24,5 +29,13 @@ __all__ = [
     "EmailRequest",
     "EmailResponse", 
     "EmailType",
-    "Audit"
+    "Audit",
+    "AuditSegmentSeal",
+    "AuditEventCounter",
+    "DentalService",
+    "ClinicalHistory",
+    "Treatment",
+    "TreatmentDailyRollup",
+    "TreatmentDailyPatient",
+    "MonthlyActivityReport"
 ]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, JSON
+from sqlalchemy import Column, String, Text, DateTime, Date, Integer, SmallInteger, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -16,8 +16,47 @@ class Audit(Base):
     affected_record_type = Column(String(50), nullable=False)  # Tipo de tabla/entidad afectada
     change_details = Column(JSON, nullable=True)  # Detalles de los cambios en formato JSON
     integrity_hash = Column(String(64), nullable=False)  # Hash para verificar integridad
-    event_timestamp = Column(DateTime(timezone=True), nullable=False)  # Timestamp con zona horaria
+    hash_version = Column(SmallInteger, nullable=True)  # 2 = hash del contenido completo; NULL = hash antiguo
+    # Parte de la clave primaria: la tabla está particionada por mes sobre esta columna
+    # (init-scripts/08-audit-partitioning.sql)
+    event_timestamp = Column(DateTime(timezone=True), primary_key=True, nullable=False)  # Timestamp con zona horaria
     source_ip = Column(String(45), nullable=True)  # IP desde donde se originó la acción (soporte IPv6)
     
+    # Índices compuestos para la paginación por cursor (event_timestamp desc, id desc)
+    # por rango de fechas, por usuario y por registro afectado
+    __table_args__ = (
+        Index("idx_audits_timestamp_id", "event_timestamp", "id"),
+        Index("idx_audits_user_timestamp_id", "user_id", "event_timestamp", "id"),
+        Index("idx_audits_record_timestamp_id", "affected_record_id", "event_timestamp", "id"),
+    )
+    
     def __repr__(self):
         return f"<Audit(id={self.id}, event={self.event_type}, user={self.user_id})>"
+
+
+class AuditSegmentSeal(Base):
+    """Sello de un día (UTC) de auditoría: raíz Merkle encadenada con el sello anterior"""
+    __tablename__ = "audit_segment_seals"
+    
+    segment_day = Column(Date, primary_key=True)
+    row_count = Column(Integer, nullable=False)
+    merkle_root = Column(String(64), nullable=False)
+    previous_chain_hash = Column(String(64), nullable=False)
+    chain_hash = Column(String(64), nullable=False)
+    sealed_at = Column(DateTime(timezone=True), nullable=False)
+    
+    def __repr__(self):
+        return f"<AuditSegmentSeal(day={self.segment_day}, rows={self.row_count})>"
+
+
+class AuditEventCounter(Base):
+    """Contador incremental de eventos de auditoría por dimensión, clave y día (UTC)"""
+    __tablename__ = "audit_event_counters"
+    
+    dimension = Column(String(20), primary_key=True)  # event_type, record_type, user o record
+    key = Column(String(200), primary_key=True)  # valor de la dimensión (record = "tipo:id")
+    day = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<AuditEventCounter({self.dimension}={self.key}, day={self.day}, count={self.count})>"
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Date, Integer, String
+from app.database import Base
+
+class TreatmentDailyRollup(Base):
+    """Tratamientos por día, doctor y servicio odontológico (agregado incremental del dashboard)"""
+    __tablename__ = "treatment_daily_rollups"
+
+    day = Column(Date, primary_key=True)
+    doctor_id = Column(String(128), primary_key=True)
+    dental_service_id = Column(Integer, primary_key=True)  # 0 = tratamiento sin servicio
+    treatment_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<TreatmentDailyRollup(day={self.day}, doctor={self.doctor_id}, service={self.dental_service_id}, count={self.treatment_count})>"
+
+
+class TreatmentDailyPatient(Base):
+    """Pacientes atendidos por día, doctor y servicio odontológico (una fila por paciente)"""
+    __tablename__ = "treatment_daily_patients"
+
+    day = Column(Date, primary_key=True)
+    doctor_id = Column(String(128), primary_key=True)
+    dental_service_id = Column(Integer, primary_key=True)  # 0 = tratamiento sin servicio
+    patient_id = Column(Integer, primary_key=True)
+
+    def __repr__(self):
+        return f"<TreatmentDailyPatient(day={self.day}, doctor={self.doctor_id}, service={self.dental_service_id}, patient={self.patient_id})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Numeric, JSON, UniqueConstraint, func
 from app.database import Base
 
 class ActivityReport(Base):
@@ -11,10 +11,18 @@ class ActivityReport(Base):
     notes = Column(Text, nullable=True)
 
 class MonthlyActivityReport(Base):
+    """Instantánea mensual de actividad (congelada al cerrar el mes)"""
     __tablename__ = "monthly_activity_reports"
+    __table_args__ = (
+        UniqueConstraint("year", "month", name="uq_monthly_activity_reports_year_month"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    month = Column(String(20), nullable=False)
+    month = Column(String(20), nullable=False)  # Mes con dos dígitos ("01".."12")
     year = Column(Integer, nullable=False)
     total_activities = Column(Integer, nullable=False)
-    total_revenue = Column(Integer, nullable=False)
\ No newline at end of file
+    total_revenue = Column(Numeric(14, 2), nullable=False)
+    # Resumen por procedimiento: [{"procedure_name", "patient_count", "revenue"}]
+    procedures = Column(JSON, nullable=False, default=list)
+    is_closed = Column(Boolean, nullable=False, default=False)  # Mes cerrado: no se vuelve a calcular
+    refreshed_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -1,9 +1,16 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class Treatment(Base):
     __tablename__ = "treatments"
+    __table_args__ = (
+        # Dashboard: rangos de fechas con filtro de doctor/procedimiento (init-scripts/15-treatment-date-index.sql)
+        Index(
+            "idx_treatments_date_doctor_service", "treatment_date", "doctor_id", "dental_service_id",
+            postgresql_include=["clinical_history_id"]
+        ),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     clinical_history_id = Column(Integer, ForeignKey("clinical_histories.id", ondelete="CASCADE"), nullable=False)
@@ -15,4 +22,6 @@ class Treatment(Base):
 
     # Relaciones
     dental_service = relationship("DentalService", back_populates="treatments")
-    clinical_history = relationship("ClinicalHistory", back_populates="treatments")
\ No newline at end of file
+    clinical_history = relationship("ClinicalHistory", back_populates="treatments")
+    # doctor_id no tiene FK (los usuarios viven en Firebase + tabla users): relación solo de lectura
+    doctor = relationship("User", primaryjoin="foreign(Treatment.doctor_id) == User.uid", viewonly=True)
\ No newline at end of file
@@ -1,20 +1,117 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Callable, Dict, Iterator, List, Optional
 from pydantic import BaseModel
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
+from functools import partial
+from itertools import islice
 
-from ..database import get_db
+from ..config import settings
+from ..database import get_read_db, get_read_session_factory
 from ..models.auditoria_models import Audit
 from ..models.user_models import User
 from ..middleware.auth_middleware import get_current_auditor_user
 from ..services.auditoria_service import AuditoriaService
+from ..services.audit_export_service import EXPORT_FORMATS, stream_audit_export
+from ..services import audit_stats_service
+from ..utils.audit_context import get_principal
+from ..utils.keyset_pagination import decode_cursor, encode_cursor, paginate_keyset
 
 # Zona horaria de Colombia (UTC-5)
 COLOMBIA_TZ = timezone(timedelta(hours=-5))
 
 router = APIRouter(prefix="/auditoria", tags=["auditoria"])
 
+PAGINACION_DESCRIPCION = "offset (skip/limit, por defecto) o cursor (continúa desde el header X-Next-Cursor)"
+CURSOR_DESCRIPCION = "Cursor de la página siguiente devuelto en el header X-Next-Cursor"
+# Ids de eventos archivados comprobados contra la tabla en cada consulta
+LOTE_IDS_ARCHIVO = 500
+
+def _clave_orden(evento):
+    """Clave (timestamp UTC, id) para ordenar eventos de la tabla y del archivo juntos"""
+    timestamp = evento.event_timestamp
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp, evento.id
+
+def _archivados_fuera_de_tabla(db, archivados: Iterator[Audit], necesarios: int) -> List[Audit]:
+    """
+    Primeros eventos archivados que ya no están en la tabla
+
+    Mientras el archivador ha escrito un mes pero aún no ha borrado sus filas,
+    un evento está en ambos sitios; se comprueba contra la tabla por id (y no
+    solo contra la página actual) para que no aparezca en dos páginas.
+    """
+    archivados = iter(archivados)
+    resultado: List[Audit] = []
+    while len(resultado) < necesarios:
+        lote = list(islice(archivados, min(necesarios, LOTE_IDS_ARCHIVO)))
+        if not lote:
+            break
+        en_tabla = {
+            audit_id for (audit_id,) in db.query(Audit.id).filter(Audit.id.in_([evento.id for evento in lote]))
+        }
+        resultado.extend(evento for evento in lote if evento.id not in en_tabla)
+    return resultado[:necesarios]
+
+def combinar_con_archivo(query, response: Response, skip: int, limit: int, paginacion: str, cursor: Optional[str], leer_archivados: Callable[..., Iterator[Audit]]):
+    """
+    Paginar la unión de los eventos de la tabla y los del archivo en frío
+
+    Se piden a la tabla solo las filas necesarias para la página y se mezclan
+    con las archivadas en el mismo orden (timestamp desc, id desc). El archivo
+    se lee bajo demanda (``leer_archivados(antes_de=...)``) y se deja de leer
+    al tener las filas necesarias. Si un evento está en ambos sitios,
+    prevalece el de la tabla.
+    """
+    antes_de = None
+    if paginacion == "cursor" or cursor:
+        if cursor:
+            ultimo_timestamp, ultimo_id = decode_cursor(cursor)
+            if ultimo_timestamp.tzinfo is None:
+                ultimo_timestamp = ultimo_timestamp.replace(tzinfo=timezone.utc)
+            antes_de = (ultimo_timestamp, ultimo_id)
+        calientes, _ = paginate_keyset(query, Audit.event_timestamp, Audit.id, limit + 1, cursor)
+        necesarios = limit + 1
+    else:
+        calientes = query.order_by(Audit.event_timestamp.desc(), Audit.id.desc()).limit(skip + limit).all()
+        necesarios = skip + limit
+
+    archivados = _archivados_fuera_de_tabla(query.session, leer_archivados(antes_de=antes_de), necesarios)
+    eventos = sorted(calientes + archivados, key=_clave_orden, reverse=True)[:necesarios]
+
+    if paginacion == "cursor" or cursor:
+        if len(eventos) > limit:
+            eventos = eventos[:limit]
+            response.headers["X-Next-Cursor"] = encode_cursor(eventos[-1].event_timestamp, eventos[-1].id)
+        return eventos
+    return eventos[skip:]
+
+def paginar_eventos(query, response: Response, skip: int, limit: int, paginacion: str, cursor: Optional[str], leer_archivados: Optional[Callable[..., Iterator[Audit]]] = None):
+    """
+    Paginar eventos ordenados del más reciente al más antiguo
+
+    En modo cursor cada página continúa desde la última fila de la anterior
+    (event_timestamp, id), sin recorrer las filas ya vistas; el cursor de la
+    siguiente página se devuelve en el header X-Next-Cursor. Si se pasa un
+    lector del archivo en frío, sus eventos se mezclan con los de la tabla.
+    """
+    if leer_archivados:
+        eventos = combinar_con_archivo(query, response, skip, limit, paginacion, cursor, leer_archivados)
+    elif paginacion == "cursor" or cursor:
+        eventos, next_cursor = paginate_keyset(query, Audit.event_timestamp, Audit.id, limit, cursor)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+    else:
+        eventos = query.order_by(Audit.event_timestamp.desc(), Audit.id.desc()).offset(skip).limit(limit).all()
+
+    # Agregar timestamp en hora de Colombia a la respuesta
+    for evento in eventos:
+        evento.event_timestamp_colombia = AuditoriaService.convertir_a_hora_colombia(evento.event_timestamp)
+
+    return eventos
+
 # Schemas de Pydantic
 class AuditResponse(BaseModel):
     id: str
@@ -57,6 +154,26 @@ class PersonAuditTrailResponse(EntityAuditTrailResponse):
     """Respuesta específica para auditoría de personas"""
     pass
 
+class AuditCountItem(BaseModel):
+    """Total de eventos de una clave (usuario, tipo, etc.)"""
+    key: str
+    count: int
+
+class AuditDailyCount(BaseModel):
+    """Total de eventos de un día (UTC)"""
+    day: date
+    count: int
+
+class AuditStatsResponse(BaseModel):
+    """Estadísticas de auditoría a partir de los contadores incrementales"""
+    fecha_inicio: date
+    fecha_fin: date
+    total: int
+    por_tipo_evento: Dict[str, int]
+    por_entidad: Dict[str, int]
+    usuarios_mas_activos: List[AuditCountItem]
+    por_dia: List[AuditDailyCount]
+
 class DentalServiceAuditTrailResponse(EntityAuditTrailResponse):
     """Respuesta específica para auditoría de servicios dentales"""
     service_name: str
@@ -65,14 +182,17 @@ class DentalServiceAuditTrailResponse(EntityAuditTrailResponse):
 
 @router.get("/", response_model=List[AuditResponse])
 def get_eventos_auditoria(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    paginacion: str = Query("offset", regex="^(offset|cursor)$", description=PAGINACION_DESCRIPCION),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPCION),
     user_id: Optional[str] = Query(None),
     event_type: Optional[str] = Query(None),  # Filtrar por tipo de evento
     affected_record_type: Optional[str] = Query(None),  # Filtrar por tipo de entidad afectada
     fecha_inicio: Optional[datetime] = Query(None, description="Fecha de inicio (YYYY-MM-DD HH:MM:SS). Si no se especifica zona horaria, se asume Colombia"),
     fecha_fin: Optional[datetime] = Query(None, description="Fecha de fin (YYYY-MM-DD HH:MM:SS). Si no se especifica zona horaria, se asume Colombia"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_auditor_user)
 ):
     """
@@ -81,6 +201,8 @@ def get_eventos_auditoria(
     Args:
         skip: Número de registros a omitir
         limit: Máximo número de registros a retornar
+        paginacion: "offset" (skip/limit) o "cursor" (keyset, ver header X-Next-Cursor)
+        cursor: Cursor de la página siguiente (implica paginacion=cursor)
         user_id: Filtrar por usuario que realizó la acción
         event_type: Filtrar por tipo de evento (CREATE, UPDATE, DELETE, etc.)
         affected_record_type: Filtrar por tipo de entidad afectada
@@ -109,19 +231,66 @@ def get_eventos_auditoria(
         fecha_fin_utc = fecha_fin.astimezone(timezone.utc)
         query = query.filter(Audit.event_timestamp <= fecha_fin_utc)
 
-    # Ordenar por timestamp descendente (más recientes primero)
-    eventos = query.order_by(Audit.event_timestamp.desc()).offset(skip).limit(limit).all()
+    return paginar_eventos(query, response, skip, limit, paginacion, cursor)
 
-    # Agregar timestamp en hora de Colombia a la respuesta
-    for evento in eventos:
-        evento.event_timestamp_colombia = AuditoriaService.convertir_a_hora_colombia(evento.event_timestamp)
+@router.get("/export")
+def exportar_eventos_auditoria(
+    formato: str = Query("ndjson", regex="^(ndjson|csv)$", description="ndjson (una línea JSON por evento) o csv"),
+    gzip: bool = Query(False, description="Comprimir el archivo con gzip"),
+    incluir_archivados: bool = Query(False, description="Incluir los eventos del archivo en frío"),
+    user_id: Optional[str] = Query(None),
+    event_type: Optional[str] = Query(None),
+    affected_record_type: Optional[str] = Query(None),
+    fecha_inicio: Optional[datetime] = Query(None, description="Fecha de inicio (YYYY-MM-DD HH:MM:SS). Si no se especifica zona horaria, se asume Colombia"),
+    fecha_fin: Optional[datetime] = Query(None, description="Fecha de fin (YYYY-MM-DD HH:MM:SS). Si no se especifica zona horaria, se asume Colombia"),
+    current_user: User = Depends(get_current_auditor_user)
+):
+    """
+    Exportar eventos de auditoría en streaming - Solo AUDITORES
+    
+    Acepta los mismos filtros que el listado general y devuelve todos los
+    eventos en orden cronológico en un único archivo, sin límite de filas.
+    
+    Args:
+        formato: "ndjson" o "csv"
+        gzip: Comprimir la descarga (.gz)
+        incluir_archivados: Incluir eventos ya movidos al archivo en frío
+        user_id, event_type, affected_record_type: Filtros opcionales
+        fecha_inicio, fecha_fin: Rango de fechas opcional
+    """
+    if fecha_inicio and fecha_inicio.tzinfo is None:
+        fecha_inicio = fecha_inicio.replace(tzinfo=COLOMBIA_TZ)
+    if fecha_fin and fecha_fin.tzinfo is None:
+        fecha_fin = fecha_fin.replace(tzinfo=COLOMBIA_TZ)
 
-    return eventos
+    filtros = {
+        "user_id": user_id,
+        "event_type": event_type,
+        "affected_record_type": affected_record_type,
+        "fecha_inicio": fecha_inicio.astimezone(timezone.utc) if fecha_inicio else None,
+        "fecha_fin": fecha_fin.astimezone(timezone.utc) if fecha_fin else None,
+    }
+    contenido = stream_audit_export(
+        get_read_session_factory(),
+        filtros,
+        formato=formato,
+        comprimir=gzip,
+        archive_dir=settings.audit_archive_dir if incluir_archivados else None
+    )
+
+    nombre = f"auditoria_{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}.{formato}"
+    if gzip:
+        nombre += ".gz"
+    return StreamingResponse(
+        contenido,
+        media_type="application/gzip" if gzip else EXPORT_FORMATS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'}
+    )
 
 @router.get("/{evento_id}", response_model=AuditResponse)
 def get_evento_auditoria(
     evento_id: str, 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_auditor_user)
 ):
     """Obtener un evento de auditoría específico por ID - Solo AUDITORES"""
@@ -142,11 +311,14 @@ def get_evento_auditoria(
 @router.get("/usuario/{usuario_id}", response_model=List[AuditResponse])
 def get_eventos_por_usuario(
     usuario_id: str,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    paginacion: str = Query("offset", regex="^(offset|cursor)$", description=PAGINACION_DESCRIPCION),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPCION),
     fecha_inicio: Optional[datetime] = Query(None, description="Fecha de inicio (YYYY-MM-DD HH:MM:SS). Si no se especifica zona horaria, se asume Colombia"),
     fecha_fin: Optional[datetime] = Query(None, description="Fecha de fin (YYYY-MM-DD HH:MM:SS). Si no se especifica zona horaria, se asume Colombia"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_auditor_user)
 ):
     """Obtener todos los eventos de auditoría de un usuario específico - Solo AUDITORES"""
@@ -166,22 +338,19 @@ def get_eventos_por_usuario(
         fecha_fin_utc = fecha_fin.astimezone(timezone.utc)
         query = query.filter(Audit.event_timestamp <= fecha_fin_utc)
     
-    eventos = query.order_by(Audit.event_timestamp.desc()).offset(skip).limit(limit).all()
-    
-    # Agregar timestamp en hora de Colombia
-    for evento in eventos:
-        evento.event_timestamp_colombia = AuditoriaService.convertir_a_hora_colombia(evento.event_timestamp)
-    
-    return eventos
+    return paginar_eventos(query, response, skip, limit, paginacion, cursor)
 
 @router.get("/registro/{registro_id}", response_model=List[AuditResponse])
 def get_eventos_por_registro(
     registro_id: str,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    paginacion: str = Query("offset", regex="^(offset|cursor)$", description=PAGINACION_DESCRIPCION),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPCION),
     fecha_inicio: Optional[datetime] = Query(None, description="Fecha de inicio (YYYY-MM-DD HH:MM:SS). Si no se especifica zona horaria, se asume Colombia"),
     fecha_fin: Optional[datetime] = Query(None, description="Fecha de fin (YYYY-MM-DD HH:MM:SS). Si no se especifica zona horaria, se asume Colombia"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_auditor_user)
 ):
     """Obtener todos los eventos de auditoría de un registro específico - Solo AUDITORES"""
@@ -201,54 +370,91 @@ def get_eventos_por_registro(
         fecha_fin_utc = fecha_fin.astimezone(timezone.utc)
         query = query.filter(Audit.event_timestamp <= fecha_fin_utc)
     
-    eventos = query.order_by(Audit.event_timestamp.desc()).offset(skip).limit(limit).all()
-    
-    # Agregar timestamp en hora de Colombia
-    for evento in eventos:
-        evento.event_timestamp_colombia = AuditoriaService.convertir_a_hora_colombia(evento.event_timestamp)
-    
-    return eventos
+    return paginar_eventos(query, response, skip, limit, paginacion, cursor)
 
 @router.get("/tipos-evento/", response_model=List[str])
 def get_tipos_evento(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_auditor_user)
 ):
     """Obtener todos los tipos de evento únicos registrados - Solo AUDITORES"""
     
-    tipos = db.query(Audit.event_type).distinct().all()
-    return [tipo[0] for tipo in tipos]
+    # Desde los contadores de auditoría (sin DISTINCT sobre toda la tabla audits)
+    return audit_stats_service.distinct_keys(db, "event_type")
 
 @router.get("/entidades-afectadas/", response_model=List[str])
 def get_entidades_afectadas(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_auditor_user)
 ):
     """Obtener todos los tipos de entidades afectadas únicos - Solo AUDITORES"""
     
-    entidades = db.query(Audit.affected_record_type).distinct().all()
-    return [entidad[0] for entidad in entidades]
+    return audit_stats_service.distinct_keys(db, "record_type")
+
+@router.get("/estadisticas/", response_model=AuditStatsResponse)
+def get_estadisticas_auditoria(
+    fecha_inicio: Optional[date] = Query(None, description="Primer día (YYYY-MM-DD, UTC). Por defecto hace 30 días"),
+    fecha_fin: Optional[date] = Query(None, description="Último día (YYYY-MM-DD, UTC). Por defecto hoy"),
+    top_usuarios: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_auditor_user)
+):
+    """
+    Obtener totales de eventos por tipo, entidad, usuario y día - Solo AUDITORES
+    
+    Se calculan a partir de los contadores incrementales de auditoría, sin
+    recorrer la tabla de eventos.
+    """
+    fecha_fin = fecha_fin or datetime.now(timezone.utc).date()
+    fecha_inicio = fecha_inicio or fecha_fin - timedelta(days=30)
+    if fecha_inicio > fecha_fin:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha de inicio debe ser menor o igual que la fecha de fin"
+        )
+    
+    por_dia = audit_stats_service.daily_totals(db, fecha_inicio, fecha_fin)
+    return AuditStatsResponse(
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_fin,
+        total=sum(dia["count"] for dia in por_dia),
+        por_tipo_evento={
+            fila["key"]: fila["count"] for fila in audit_stats_service.totals_by(db, "event_type", fecha_inicio, fecha_fin)
+        },
+        por_entidad={
+            fila["key"]: fila["count"] for fila in audit_stats_service.totals_by(db, "record_type", fecha_inicio, fecha_fin)
+        },
+        usuarios_mas_activos=audit_stats_service.totals_by(db, "user", fecha_inicio, fecha_fin, limit=top_usuarios),
+        por_dia=por_dia
+    )
 
 @router.get("/rango-fechas/", response_model=List[AuditResponse])
 def get_eventos_por_rango_fechas(
+    response: Response,
     fecha_inicio: datetime = Query(..., description="Fecha de inicio (YYYY-MM-DD HH:MM:SS). Si no se especifica zona horaria, se asume Colombia"),
     fecha_fin: datetime = Query(..., description="Fecha de fin (YYYY-MM-DD HH:MM:SS). Si no se especifica zona horaria, se asume Colombia"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    paginacion: str = Query("offset", regex="^(offset|cursor)$", description=PAGINACION_DESCRIPCION),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPCION),
     event_type: Optional[str] = Query(None),
     user_id: Optional[str] = Query(None),
     affected_record_type: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_auditor_user)
 ):
     """
     Obtener eventos de auditoría en un rango de fechas específico - Solo AUDITORES
     
+    Incluye los eventos ya movidos al archivo en frío.
+    
     Args:
         fecha_inicio: Fecha de inicio del rango (obligatoria)
         fecha_fin: Fecha de fin del rango (obligatoria)
         skip: Número de registros a omitir
         limit: Máximo número de registros a retornar
+        paginacion: "offset" (skip/limit) o "cursor" (keyset, ver header X-Next-Cursor)
+        cursor: Cursor de la página siguiente (implica paginacion=cursor)
         event_type: Filtrar por tipo de evento
         user_id: Filtrar por usuario
         affected_record_type: Filtrar por tipo de entidad afectada
@@ -286,13 +492,12 @@ def get_eventos_por_rango_fechas(
     if affected_record_type:
         query = query.filter(Audit.affected_record_type == affected_record_type)
     
-    eventos = query.order_by(Audit.event_timestamp.desc()).offset(skip).limit(limit).all()
-    
-    # Agregar timestamp en hora de Colombia
-    for evento in eventos:
-        evento.event_timestamp_colombia = AuditoriaService.convertir_a_hora_colombia(evento.event_timestamp)
+    # Los eventos antiguos pueden estar en el archivo en frío (audit_archive_service)
+    leer_archivados = partial(
+        AuditoriaService.obtener_eventos_archivados, fecha_inicio_utc, fecha_fin_utc, event_type, user_id, affected_record_type
+    )
     
-    return eventos
+    return paginar_eventos(query, response, skip, limit, paginacion, cursor, leer_archivados)
 
 # =============================================================================
 # ENDPOINTS CENTRALIZADOS DE AUDITORÍA POR ENTIDAD
@@ -301,9 +506,10 @@ def get_eventos_por_rango_fechas(
 @router.get("/patients/{patient_id}", response_model=PatientAuditTrailResponse)
 def get_patient_audit_trail(
     patient_id: int,
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_auditor_user)
 ):
     """Obtener historial de auditoría de un paciente específico - Solo AUDITORES"""
@@ -312,7 +518,8 @@ def get_patient_audit_trail(
     auditoria_service = AuditoriaService()
     
     # Verificar que el paciente existe
-    patient_service = get_patient_service(db)
+    principal = get_principal(request, db)
+    patient_service = get_patient_service(db, principal=principal)
     patient = patient_service.get_patient_by_id(patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Paciente no encontrado")
@@ -344,9 +551,10 @@ def get_patient_audit_trail(
 @router.get("/guardians/{guardian_id}", response_model=GuardianAuditTrailResponse)
 def get_guardian_audit_trail(
     guardian_id: int,
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_auditor_user)
 ):
     """Obtener historial de auditoría de un guardian específico - Solo AUDITORES"""
@@ -355,7 +563,8 @@ def get_guardian_audit_trail(
     auditoria_service = AuditoriaService()
     
     # Verificar que el guardian existe
-    guardian_service = get_guardian_service(db)
+    principal = get_principal(request, db)
+    guardian_service = get_guardian_service(db, principal=principal)
     guardian = guardian_service.get_guardian_by_id(guardian_id)
     if not guardian:
         raise HTTPException(status_code=404, detail="Guardian no encontrado")
@@ -387,9 +596,10 @@ def get_guardian_audit_trail(
 @router.get("/persons/{person_id}", response_model=PersonAuditTrailResponse)
 def get_person_audit_trail(
     person_id: int,
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_auditor_user)
 ):
     """Obtener historial de auditoría de una persona específica - Solo AUDITORES"""
@@ -398,7 +608,8 @@ def get_person_audit_trail(
     auditoria_service = AuditoriaService()
     
     # Verificar que la persona existe
-    person_service = get_person_service(db)
+    principal = get_principal(request, db)
+    person_service = get_person_service(db, principal=principal)
     person = person_service.get_person_by_id(person_id)
     if not person:
         raise HTTPException(status_code=404, detail="Persona no encontrada")
@@ -430,9 +641,10 @@ def get_person_audit_trail(
 @router.get("/dental-services/{service_id}", response_model=DentalServiceAuditTrailResponse)
 def get_dental_service_audit_trail(
     service_id: int,
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_auditor_user)
 ):
     """Obtener historial de auditoría de un servicio odontológico específico - Solo AUDITORES"""
@@ -441,7 +653,8 @@ def get_dental_service_audit_trail(
     auditoria_service = AuditoriaService()
     
     # Verificar que el servicio odontológico existe
-    dental_service_service = get_dental_service_service(db)
+    principal = get_principal(request, db)
+    dental_service_service = get_dental_service_service(db, principal=principal)
     dental_service = dental_service_service.get_dental_service(service_id)
     if not dental_service:
         raise HTTPException(status_code=404, detail="Servicio odontológico no encontrado")
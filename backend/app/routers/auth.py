@@ -7,6 +7,8 @@ import logging
 from ..database import get_db
 from ..models.user_models import User
 from ..services.auditoria_service import AuditoriaService
+from ..services.firebase_service import FirebaseService
+from ..middleware.auth_middleware import get_current_admin_user
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
@@ -333,3 +335,17 @@ async def check_lock_status(email: str, db: Session = Depends(get_db)):
             "is_locked": False,
             "message": "OK"
         }
+
+@router.get("/token-cache/stats")
+async def get_token_cache_stats(current_user: User = Depends(get_current_admin_user)):
+    """
+    Obtener los contadores de la caché de tokens verificados - Solo ADMINISTRADORES
+    """
+    return FirebaseService.get_token_cache_stats()
+
+@router.get("/user-attribution-cache/stats")
+async def get_user_attribution_cache_stats(current_user: User = Depends(get_current_admin_user)):
+    """
+    Obtener los contadores de la caché de rol/email de usuarios (auditoría) - Solo ADMINISTRADORES
+    """
+    return AuditoriaService.get_user_attribution_cache_stats()
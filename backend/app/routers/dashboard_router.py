@@ -3,14 +3,17 @@ Router para el dashboard del sistema odontológico
 Solo accesible para usuarios con rol de administrador
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import date, datetime
 import logging
 
-from ..database import get_db
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from ..database import get_async_read_db, get_async_read_sessionmaker
 from ..services.dashboard_service import DashboardService
+from ..services.dashboard_cache import dashboard_cache
 from ..middleware.auth_middleware import get_current_admin_user
 from ..models.user_models import User
 
@@ -132,12 +135,151 @@ class TreatmentsPerMonthResponse(BaseModel):
         }
 
 
+class WidgetStatus(BaseModel):
+    """Resultado de un widget dentro del resumen"""
+    ok: bool
+    error: Optional[str] = None
+    elapsed_ms: float
+
+
+class DashboardSummaryResponse(BaseModel):
+    """Respuesta con todos los widgets del dashboard (None si el widget falló)"""
+    active_patients: Optional[ActivePatientsResponse] = None
+    employees: Optional[EmployeesByRoleResponse] = None
+    procedures_distribution: Optional[ProceduresDistributionResponse] = None
+    procedures_by_doctor: Optional[ProceduresByDoctorResponse] = None
+    treatments_per_month: Optional[TreatmentsPerMonthResponse] = None
+    status: Dict[str, WidgetStatus]
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "active_patients": {"total_active_patients": 200, "active_patients_period": 84},
+                "employees": {"total_general": 12, "detail_by_role": [{"role": "Doctor", "total": 6}]},
+                "procedures_distribution": None,
+                "procedures_by_doctor": {"procedures_by_doctor": [{"doctor": "Carlos López", "total_procedures": 45, "percentage": 100.0}]},
+                "treatments_per_month": {"treatments_per_month": [{"month": "2025-01", "total_treatments": 18}]},
+                "status": {
+                    "active_patients": {"ok": True, "error": None, "elapsed_ms": 12.4},
+                    "employees": {"ok": True, "error": None, "elapsed_ms": 3.1},
+                    "procedures_distribution": {"ok": False, "error": "Tiempo de espera agotado (10.0 s)", "elapsed_ms": 10001.2},
+                    "procedures_by_doctor": {"ok": True, "error": None, "elapsed_ms": 8.7},
+                    "treatments_per_month": {"ok": True, "error": None, "elapsed_ms": 9.9}
+                }
+            }
+        }
+
+
+def validate_date_filters(start_date: Optional[date], end_date: Optional[date]) -> None:
+    """Validar el rango de fechas de los filtros del dashboard"""
+    today = datetime.now().date()
+    
+    if start_date and start_date > today:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"La fecha de inicio no puede ser mayor a la fecha actual ({today})"
+        )
+    
+    if end_date and end_date > today:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"La fecha de fin no puede ser mayor a la fecha actual ({today})"
+        )
+    
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha de inicio no puede ser mayor a la fecha de fin"
+        )
+
+
+def validate_year(year: Optional[int]) -> None:
+    """Validar el año del gráfico de tratamientos por mes"""
+    if year is None:
+        return
+    current_year = datetime.now().year
+    if year > current_year:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"El año {year} no puede ser mayor al año actual ({current_year})"
+        )
+    if year < 2000:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"El año {year} no es válido. Debe ser mayor o igual a 2000"
+        )
+
+
+@router.get("/summary", response_model=DashboardSummaryResponse)
+async def get_dashboard_summary(
+    start_date: Optional[date] = Query(None, description="Fecha de inicio (YYYY-MM-DD) para pacientes activos y procedimientos"),
+    end_date: Optional[date] = Query(None, description="Fecha de fin (YYYY-MM-DD) para pacientes activos y procedimientos"),
+    doctor_id: Optional[str] = Query(None, description="UID del doctor para filtrar"),
+    procedure_id: Optional[int] = Query(None, description="ID del procedimiento dental para filtrar"),
+    year: Optional[int] = Query(None, description="Año del gráfico de tratamientos por mes (YYYY), por defecto últimos 12 meses"),
+    role: Optional[str] = Query(None, description="Filtrar empleados por rol específico"),
+    is_active: Optional[bool] = Query(True, description="Filtrar empleados por estado activo/inactivo"),
+    session_factory: async_sessionmaker = Depends(get_async_read_sessionmaker),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Obtiene todos los widgets del dashboard en una sola petición
+    
+    **Requiere rol de administrador**
+    
+    Equivale a llamar a /active-patients, /employees, /distribution-procedures,
+    /procedures-doctor y /treatments-per-month con los mismos filtros, pero con
+    una sola autenticación. Las cinco consultas se ejecutan en paralelo, cada
+    una con su propia conexión del pool.
+    
+    Si un widget falla (o supera el tiempo máximo), los demás se devuelven
+    igualmente: el widget fallido queda en null y su error en **status**.
+    
+    Returns:
+        - Un campo por widget con la misma forma que su endpoint individual
+        - status: resultado, error y duración de cada widget
+    """
+    validate_date_filters(start_date, end_date)
+    validate_year(year)
+    if role and role not in VALID_ROLES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Rol inválido '{role}'. Los roles válidos son: {', '.join(VALID_ROLES)}"
+        )
+    
+    results = await DashboardService.get_dashboard_summary_async(
+        session_factory,
+        start_date=start_date,
+        end_date=end_date,
+        doctor_id=doctor_id,
+        procedure_id=procedure_id,
+        year=year,
+        role=role,
+        is_active=is_active
+    )
+    
+    def widget_data(name: str, build):
+        return build(results[name]["data"]) if results[name]["ok"] else None
+    
+    return DashboardSummaryResponse(
+        active_patients=widget_data("active_patients", lambda data: ActivePatientsResponse(**data)),
+        employees=widget_data("employees", lambda data: EmployeesByRoleResponse(**data)),
+        procedures_distribution=widget_data("procedures_distribution", lambda data: ProceduresDistributionResponse(**data)),
+        procedures_by_doctor=widget_data("procedures_by_doctor", lambda data: ProceduresByDoctorResponse(procedures_by_doctor=data)),
+        treatments_per_month=widget_data("treatments_per_month", lambda data: TreatmentsPerMonthResponse(treatments_per_month=data)),
+        status={
+            name: WidgetStatus(ok=result["ok"], error=result["error"], elapsed_ms=result["elapsed_ms"])
+            for name, result in results.items()
+        }
+    )
+
+
 @router.get("/active-patients", response_model=ActivePatientsResponse)
 async def get_active_patients(
     start_date: Optional[date] = Query(None, description="Fecha de inicio para filtrar pacientes activos (YYYY-MM-DD)"),
     end_date: Optional[date] = Query(None, description="Fecha de fin para filtrar pacientes activos (YYYY-MM-DD)"),
     doctor_id: Optional[str] = Query(None, description="UID del doctor para filtrar pacientes atendidos"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -164,27 +306,9 @@ async def get_active_patients(
         # logger.info(f"Usuario admin {current_user.email} solicitando estadísticas de pacientes activos")
         
         # Validar fechas
-        today = datetime.now().date()
-        
-        if start_date and start_date > today:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"La fecha de inicio no puede ser mayor a la fecha actual ({today})"
-            )
-        
-        if end_date and end_date > today:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"La fecha de fin no puede ser mayor a la fecha actual ({today})"
-            )
+        validate_date_filters(start_date, end_date)
         
-        if start_date and end_date and start_date > end_date:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="La fecha de inicio no puede ser mayor a la fecha de fin"
-            )
-        
-        stats = DashboardService.get_active_patients_stats(
+        stats = await DashboardService.get_active_patients_stats_async(
             db, 
             start_date=start_date,
             end_date=end_date,
@@ -210,7 +334,7 @@ async def get_active_patients(
 async def get_employees_by_role(
     role: Optional[str] = Query(None, description="Filtrar por rol específico (Doctor, Asistente, Administrator, Auditor)"),
     is_active: Optional[bool] = Query(True, description="Filtrar por estado activo/inactivo (true/false)"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -236,7 +360,7 @@ async def get_employees_by_role(
                 detail=f"Rol inválido '{role}'. Los roles válidos son: {', '.join(VALID_ROLES)}"
             )
         
-        stats = DashboardService.get_employees_by_role_stats(
+        stats = await DashboardService.get_employees_by_role_stats_async(
             db,
             role=role,
             is_active=is_active
@@ -261,7 +385,7 @@ async def get_procedures_distribution(
     end_date: Optional[date] = Query(None, description="Fecha de fin para filtrar procedimientos (YYYY-MM-DD)"),
     doctor_id: Optional[str] = Query(None, description="UID del doctor para filtrar procedimientos"),
     procedure_id: Optional[int] = Query(None, description="ID del procedimiento dental específico"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -292,27 +416,9 @@ async def get_procedures_distribution(
         # logger.info(f"Usuario admin {current_user.email} solicitando distribución de procedimientos")
         
         # Validar fechas
-        today = datetime.now().date()
+        validate_date_filters(start_date, end_date)
         
-        if start_date and start_date > today:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"La fecha de inicio no puede ser mayor a la fecha actual ({today})"
-            )
-        
-        if end_date and end_date > today:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"La fecha de fin no puede ser mayor a la fecha actual ({today})"
-            )
-        
-        if start_date and end_date and start_date > end_date:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="La fecha de inicio no puede ser mayor a la fecha de fin"
-            )
-        
-        stats = DashboardService.get_procedures_distribution(
+        stats = await DashboardService.get_procedures_distribution_async(
             db,
             start_date=start_date,
             end_date=end_date,
@@ -340,7 +446,7 @@ async def get_procedures_by_doctor(
     start_date: Optional[date] = Query(None, description="Fecha de inicio para contar procedimientos (YYYY-MM-DD)"),
     end_date: Optional[date] = Query(None, description="Fecha de fin para contar procedimientos (YYYY-MM-DD)"),
     procedure_id: Optional[int] = Query(None, description="ID del procedimiento dental para filtrar"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -373,27 +479,9 @@ async def get_procedures_by_doctor(
         # logger.info(f"Usuario admin {current_user.email} solicitando procedimientos por doctor")
         
         # Validar fechas
-        today = datetime.now().date()
+        validate_date_filters(start_date, end_date)
         
-        if start_date and start_date > today:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"La fecha de inicio no puede ser mayor a la fecha actual ({today})"
-            )
-        
-        if end_date and end_date > today:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"La fecha de fin no puede ser mayor a la fecha actual ({today})"
-            )
-        
-        if start_date and end_date and start_date > end_date:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="La fecha de inicio no puede ser mayor a la fecha de fin"
-            )
-        
-        procedures_data = DashboardService.get_procedures_by_doctor(
+        procedures_data = await DashboardService.get_procedures_by_doctor_async(
             db,
             start_date=start_date,
             end_date=end_date,
@@ -419,7 +507,7 @@ async def get_treatments_per_month(
     year: Optional[int] = Query(None, description="Año específico para filtrar (YYYY), por defecto últimos 12 meses"),
     doctor_id: Optional[str] = Query(None, description="UID del doctor para filtrar tratamientos"),
     procedure_id: Optional[int] = Query(None, description="ID del procedimiento dental para filtrar"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -447,23 +535,9 @@ async def get_treatments_per_month(
         # logger.info(f"Usuario admin {current_user.email} solicitando tratamientos por mes")
         
         # Validar que el año no sea mayor al actual
-        if year is not None:
-            current_year = datetime.now().year
-            
-            if year > current_year:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"El año {year} no puede ser mayor al año actual ({current_year})"
-                )
-            
-            # Validación adicional: año mínimo razonable (ej: 2000)
-            if year < 2000:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"El año {year} no es válido. Debe ser mayor o igual a 2000"
-                )
+        validate_year(year)
         
-        treatments_data = DashboardService.get_treatments_per_month(
+        treatments_data = await DashboardService.get_treatments_per_month_async(
             db,
             year=year,
             doctor_id=doctor_id,
@@ -482,3 +556,11 @@ async def get_treatments_per_month(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error obteniendo tratamientos por mes: {str(e)}"
         )
+
+
+@router.get("/cache/stats")
+async def get_dashboard_cache_stats(current_user: User = Depends(get_current_admin_user)):
+    """
+    Obtener los contadores de la caché de resultados del dashboard - Solo ADMINISTRADORES
+    """
+    return dashboard_cache.stats()
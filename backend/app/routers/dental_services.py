@@ -3,15 +3,16 @@ Router para servicios odontológicos con autenticación y autorización
 """
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
 
 from app.database import get_db
 from app.services.dental_service import get_dental_service_service
-from app.utils.audit_context import get_user_context
+from app.utils.audit_context import get_principal
 from app.middleware.auth_middleware import (
     require_dental_service_read,  # Solo ADMIN y ASSISTANT pueden leer
     require_dental_service_write,  # Solo ADMIN puede crear/actualizar/eliminar
 )
+from app.schemas.pagination_schema import Page
 from app.schemas.dental_service_schema import (
     DentalServiceCreate,
     DentalServiceUpdate,
@@ -37,8 +38,8 @@ def create_dental_service(
     current_user = Depends(require_dental_service_write)  # Solo ADMIN
 ):
     """Crear un nuevo servicio odontológico (Solo ADMIN)"""
-    user_id, user_ip = get_user_context(request, db)
-    service = get_dental_service_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_dental_service_service(db, principal=principal)
     
     try:
         return service.create_dental_service(service_data)
@@ -48,7 +49,7 @@ def create_dental_service(
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
 
-@router.get("/", response_model=List[DentalServiceResponse])
+@router.get("/", response_model=Union[List[DentalServiceResponse], Page[DentalServiceResponse]])
 def get_dental_services(
     request: Request,
     skip: int = Query(0, ge=0, description="Número de registros a omitir"),
@@ -57,6 +58,7 @@ def get_dental_services(
     search: Optional[str] = Query(None, description="Buscar por nombre o descripción"),
     min_price: Optional[float] = Query(None, ge=0, description="Precio mínimo"),
     max_price: Optional[float] = Query(None, ge=0, description="Precio máximo"),
+    envelope: bool = Query(False, description="Devolver {items, total, total_is_estimate} en lugar de la lista"),
     db: Session = Depends(get_db),
     current_user = Depends(require_dental_service_read)  # Solo ADMIN y ASSISTANT
 ):
@@ -66,12 +68,13 @@ def get_dental_services(
     - search: Buscar por nombre o descripción
     - min_price/max_price: Filtrar por rango de precios
     - skip/limit: Paginación
+    - envelope: incluir el total de registros
     """
-    user_id, user_ip = get_user_context(request, db)
-    service = get_dental_service_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_dental_service_service(db, principal=principal)
     
     try:
-        return service.get_dental_services(
+        dental_services = service.get_dental_services(
             skip=skip, 
             limit=limit, 
             is_active=is_active, 
@@ -79,6 +82,22 @@ def get_dental_services(
             min_price=min_price,
             max_price=max_price
         )
+        if not envelope:
+            return dental_services
+        
+        total, total_is_estimate = service.count_dental_services(
+            is_active=is_active,
+            search=search,
+            min_price=min_price,
+            max_price=max_price
+        )
+        return {
+            "items": dental_services,
+            "total": total,
+            "total_is_estimate": total_is_estimate,
+            "skip": skip,
+            "limit": limit
+        }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -92,8 +111,8 @@ def get_dental_service(
     current_user = Depends(require_dental_service_read)  # Solo ADMIN y ASSISTANT
 ):
     """Obtener un servicio odontológico por ID"""
-    user_id, user_ip = get_user_context(request, db)
-    service = get_dental_service_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_dental_service_service(db, principal=principal)
     
     try:
         return service.get_dental_service(service_id)
@@ -112,8 +131,8 @@ def update_dental_service(
     current_user = Depends(require_dental_service_write)  # Solo ADMIN
 ):
     """Actualizar un servicio odontológico (Solo ADMIN)"""
-    user_id, user_ip = get_user_context(request, db)
-    service = get_dental_service_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_dental_service_service(db, principal=principal)
     
     try:
         return service.update_dental_service(service_id, service_data)
@@ -134,8 +153,8 @@ def change_service_status(
     current_user = Depends(require_dental_service_write)  # Solo ADMIN
 ):
     """Cambiar el estado de un servicio odontológico (Solo ADMIN)"""
-    user_id, user_ip = get_user_context(request, db)
-    service = get_dental_service_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_dental_service_service(db, principal=principal)
     
     try:
         return service.change_service_status(service_id, status_data)
@@ -153,8 +172,8 @@ def delete_dental_service(
     current_user = Depends(require_dental_service_write)  # Solo ADMIN
 ):
     """Eliminar un servicio odontológico (soft delete - Solo ADMIN)"""
-    user_id, user_ip = get_user_context(request, db)
-    service = get_dental_service_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_dental_service_service(db, principal=principal)
     
     try:
         return service.delete_dental_service(service_id)
@@ -1,14 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.database import get_db
+from typing import List, Optional, Union
+from app.database import get_db, get_read_db
 from app.services.guardian_service import get_guardian_service
 from app.models.guardian_models import PatientRelationshipEnum
-from app.utils.audit_context import get_user_context
+from app.utils.audit_context import get_principal
 from app.middleware.auth_middleware import (
     require_guardian_read, 
     require_guardian_write
 )
+from app.schemas.pagination_schema import Page
 from app.schemas.guardian_schema import (
     GuardianCreate, 
     GuardianUpdate, 
@@ -30,8 +31,8 @@ def create_guardian(
     current_user = Depends(require_guardian_write)  # Solo ASSISTANT
 ):
     """Crear un nuevo guardian (incluye crear la persona)"""
-    user_id, user_ip = get_user_context(request, db)
-    service = get_guardian_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_guardian_service(db, principal=principal)
     
     try:
         return service.create_guardian(guardian_data)
@@ -40,35 +41,49 @@ def create_guardian(
     except Exception as e:
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
-@router.get("/", response_model=List[GuardianResponse])
+@router.get("/", response_model=Union[List[GuardianResponse], Page[GuardianResponse]])
 def get_guardians(
+    request: Request,
     skip: int = Query(0, ge=0, description="Número de registros a omitir"),
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros"),
     active_only: bool = Query(True, description="Solo guardianes activos"),
     search: Optional[str] = Query(None, description="Buscar en nombre, apellido, documento o email"),
     relationship: Optional[PatientRelationshipEnum] = Query(None, description="Filtrar por tipo de relación"),
-    db: Session = Depends(get_db),
+    envelope: bool = Query(False, description="Devolver {items, total, total_is_estimate} en lugar de la lista"),
+    db: Session = Depends(get_read_db),
     current_user = Depends(require_guardian_read)  # ASSISTANT y DENTIST
 ):
     """Obtener lista de guardianes con filtros"""
-    service = get_guardian_service(db)
-    return service.get_guardians(
+    principal = get_principal(request, db)
+    service = get_guardian_service(db, principal=principal)
+    guardians = service.get_guardians(
         skip=skip, 
         limit=limit,
         active_only=active_only,
         search=search,
         relationship=relationship
     )
+    if not envelope:
+        return guardians
+    
+    total, total_is_estimate = service.count_guardians(
+        active_only=active_only,
+        search=search,
+        relationship=relationship
+    )
+    return {"items": guardians, "total": total, "total_is_estimate": total_is_estimate, "skip": skip, "limit": limit}
 
 @router.get("/{guardian_id}", response_model=GuardianWithPatients)
 def get_guardian(
     guardian_id: int,
+    request: Request,
     include_all: bool = Query(True, description="Incluir información completa (persona y pacientes)"),
     db: Session = Depends(get_db),
     current_user = Depends(require_guardian_read)  # ASSISTANT y DENTIST
 ):
     """Obtener guardian por ID"""
-    service = get_guardian_service(db)
+    principal = get_principal(request, db)
+    service = get_guardian_service(db, principal=principal)
     guardian = service.get_guardian_by_id(guardian_id, include_all=include_all)
     if not guardian:
         raise HTTPException(status_code=404, detail="Guardian no encontrado")
@@ -83,8 +98,8 @@ def update_guardian(
     current_user = Depends(require_guardian_write)  # Solo ASSISTANT
 ):
     """Actualizar guardian (puede incluir datos de persona)"""
-    user_id, user_ip = get_user_context(request, db)
-    service = get_guardian_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_guardian_service(db, principal=principal)
     
     try:
         updated_guardian = service.update_guardian(guardian_id, guardian_data)
@@ -106,8 +121,8 @@ def delete_guardian(
     current_user = Depends(require_guardian_write)  # Solo ASSISTANT
 ):
     """Eliminar guardian (eliminación lógica - soft delete)"""
-    user_id, user_ip = get_user_context(request, db)
-    service = get_guardian_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_guardian_service(db, principal=principal)
     
     try:
         success = service.delete_guardian(guardian_id)
@@ -130,8 +145,8 @@ def activate_guardian(
     current_user = Depends(require_guardian_write)  # Solo ASSISTANT
 ):
     """Reactivar guardian (activar un guardian previamente desactivado)"""
-    user_id, user_ip = get_user_context(request, db)
-    service = get_guardian_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_guardian_service(db, principal=principal)
     
     try:
         success = service.activate_guardian(guardian_id)
@@ -1,20 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
 import re
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.services.patient_service import get_patient_service
-from app.utils.audit_context import get_user_context
+from app.services.patient_prefix_index import patient_prefix_index
+from app.utils.audit_context import get_principal
 from app.middleware.auth_middleware import (
     require_patient_read, 
     require_patient_write
 )
+from app.schemas.pagination_schema import Page
 from app.schemas.patient_schema import (
     PatientCreate, 
     PatientUpdate, 
     PatientResponse, 
     PatientWithGuardian,
-    PatientStatusChange
+    PatientStatusChange,
+    PatientAutocompleteItem
 )
 
 router = APIRouter(
@@ -31,8 +34,8 @@ def create_patient(
     current_user = Depends(require_patient_write)  # Solo ASSISTANT
 ):
     """Crear un nuevo paciente (incluye crear la persona)"""
-    user_id, user_ip = get_user_context(request, db)
-    service = get_patient_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_patient_service(db, principal=principal)
     
     try:
         return service.create_patient(patient_data)
@@ -81,28 +84,29 @@ def create_patient(
                 detail=f"Error interno del servidor. Por favor contacte al administrador. Detalle: {error_message[:200]}"
             )
 
-@router.get("/", response_model=List[PatientWithGuardian])
+@router.get("/", response_model=Union[List[PatientWithGuardian], Page[PatientWithGuardian]])
 def get_patients(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     _current_user = Depends(require_patient_read),  # ASSISTANT y DENTIST
     skip: int = Query(0, ge=0, description="Número de registros a omitir"),
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros"),
     active_only: bool = Query(True, description="Solo pacientes activos"),
     search: Optional[str] = Query(None, min_length=1, max_length=100, description="Buscar en nombre, apellido, documento o email"),
     requires_guardian: Optional[bool] = Query(None, description="Filtrar por requerimiento de guardian"),
-    has_guardian: Optional[bool] = Query(None, description="Filtrar por tener guardian asignado")
+    has_guardian: Optional[bool] = Query(None, description="Filtrar por tener guardian asignado"),
+    envelope: bool = Query(False, description="Devolver {items, total, total_is_estimate} en lugar de la lista")
 ):
     """Obtener lista de pacientes con filtros"""
-    user_id, user_ip = get_user_context(request, db)
-    service = get_patient_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_patient_service(db, principal=principal)
     
     # Sanitizar búsqueda si se proporciona
     if search:
         # Remover caracteres especiales que podrían ser problemáticos
         search = re.sub(r'[<>"\';\\]', '', search.strip())
     
-    return service.get_patients(
+    patients = service.get_patients(
         skip=skip, 
         limit=limit, 
         active_only=active_only, 
@@ -110,6 +114,36 @@ def get_patients(
         requires_guardian=requires_guardian,
         has_guardian=has_guardian
     )
+    if not envelope:
+        return patients
+    
+    total, total_is_estimate = service.count_patients(
+        active_only=active_only,
+        search=search,
+        requires_guardian=requires_guardian,
+        has_guardian=has_guardian
+    )
+    return {"items": patients, "total": total, "total_is_estimate": total_is_estimate, "skip": skip, "limit": limit}
+
+@router.get("/autocomplete", response_model=List[PatientAutocompleteItem])
+def autocomplete_patients(
+    db: Session = Depends(get_read_db),
+    _current_user = Depends(require_patient_read),  # ASSISTANT y DENTIST
+    q: str = Query(..., min_length=1, max_length=50, description="Primeros caracteres del documento o de un apellido"),
+    limit: int = Query(10, ge=1, le=50, description="Número máximo de sugerencias"),
+    active_only: bool = Query(True, description="Solo pacientes activos")
+):
+    """Sugerencias de pacientes por prefijo de documento o apellido (índice en memoria)"""
+    patient_prefix_index.ensure_fresh(db)
+    return [
+        PatientAutocompleteItem(
+            id=entry.patient_id,
+            document_type=entry.document_type,
+            document_number=entry.document_number,
+            display_name=entry.display_name
+        )
+        for entry in patient_prefix_index.search(q, limit=limit, active_only=active_only)
+    ]
 
 @router.get("/{patient_id}", response_model=PatientWithGuardian)
 def get_patient(
@@ -120,8 +154,8 @@ def get_patient(
     include_guardian: bool = Query(True, description="Incluir información del guardian")
 ):
     """Obtener paciente por ID"""
-    user_id, user_ip = get_user_context(request, db)
-    service = get_patient_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_patient_service(db, principal=principal)
     patient = service.get_patient_by_id(patient_id, include_person=True, include_guardian=include_guardian)
     
     if not patient:
@@ -152,8 +186,8 @@ def get_patient_by_document(
     if not re.match(r'^[A-Za-z0-9\-\.]+$', document_number):
         raise HTTPException(status_code=400, detail="Número de documento contiene caracteres no válidos")
     
-    user_id, user_ip = get_user_context(request, db)
-    service = get_patient_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_patient_service(db, principal=principal)
     patient = service.get_patient_by_document(document_number)
     
     if not patient:
@@ -170,8 +204,8 @@ def update_patient(
     current_user = Depends(require_patient_write)  # Solo ASSISTANT
 ):
     """Actualizar paciente (puede incluir datos de persona)"""
-    user_id, user_ip = get_user_context(request, db)
-    service = get_patient_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_patient_service(db, principal=principal)
     
     try:
         updated_patient = service.update_patient(patient_id, patient_data)
@@ -197,8 +231,8 @@ def delete_patient(
     current_user = Depends(require_patient_write)  # Solo ASSISTANT
 ):
     """Eliminar paciente (eliminación lógica - soft delete)"""
-    user_id, user_ip = get_user_context(request, db)
-    service = get_patient_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_patient_service(db, principal=principal)
     
     try:
         # Usar el método change_patient_status con motivo estándar
@@ -239,8 +273,8 @@ def assign_guardian_to_patient(
     - El paciente debe ser menor de 18 años o mayor de 64 años
     - El paciente debe requerir guardián según su perfil
     """
-    user_id, user_ip = get_user_context(request, db)
-    service = get_patient_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_patient_service(db, principal=principal)
     
     try:
         success = service.assign_guardian(patient_id, guardian_id)
@@ -262,8 +296,8 @@ def unassign_guardian_from_patient(
     current_user = Depends(require_patient_write)  # Solo ASSISTANT
 ):
     """Desasignar el guardian de un paciente"""
-    user_id, user_ip = get_user_context(request, db)
-    service = get_patient_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_patient_service(db, principal=principal)
     
     try:
         success = service.unassign_guardian(patient_id)
@@ -286,8 +320,8 @@ def change_patient_status(
     current_user = Depends(require_patient_write)  # Solo ASSISTANT
 ):
     """Cambiar el estado de un paciente (activo/inactivo) con validación de motivo"""
-    user_id, user_ip = get_user_context(request, db)
-    service = get_patient_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_patient_service(db, principal=principal)
     
     try:
         result = service.change_patient_status(
@@ -324,8 +358,8 @@ def update_guardian_requirements_by_age(
     - Entre 18-64 años: NO requieren guardián (desasignación automática)
     - Mayores de 64 años: REQUIEREN guardián
     """
-    user_id, user_ip = get_user_context(request, db)
-    service = get_patient_service(db, user_id, user_ip)
+    principal = get_principal(request, db)
+    service = get_patient_service(db, principal=principal)
     
     try:
         result = service.update_guardian_requirements_by_age()
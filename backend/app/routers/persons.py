@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.database import get_db
+from typing import List, Optional, Union
+from app.database import get_db, get_read_db
 from app.services.person_service import get_person_service
+from app.utils.audit_context import get_principal
 from app.models.person_models import DocumentTypeEnum
+from app.schemas.pagination_schema import Page
 from app.schemas.person_schema import (
     PersonCreate, 
     PersonUpdate, 
@@ -19,10 +21,12 @@ router = APIRouter(
 @router.post("/", response_model=PersonResponse, status_code=201)
 def create_person(
     person_data: PersonCreate,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Crear una nueva persona"""
-    service = get_person_service(db)
+    principal = get_principal(request, db)
+    service = get_person_service(db, principal=principal)
     
     try:
         return service.create_person(person_data)
@@ -35,19 +39,22 @@ def create_person(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
-@router.get("/", response_model=List[PersonResponse])
+@router.get("/", response_model=Union[List[PersonResponse], Page[PersonResponse]])
 def get_persons(
+    request: Request,
     skip: int = Query(0, ge=0, description="Número de registros a omitir"),
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros"),
     search: Optional[str] = Query(None, description="Buscar en nombre, apellido, documento o email"),
     document_type: Optional[DocumentTypeEnum] = Query(None, description="Filtrar por tipo de documento"),
     min_age: Optional[int] = Query(None, ge=0, description="Edad mínima"),
     max_age: Optional[int] = Query(None, le=150, description="Edad máxima"),
-    db: Session = Depends(get_db)
+    envelope: bool = Query(False, description="Devolver {items, total, total_is_estimate} en lugar de la lista"),
+    db: Session = Depends(get_read_db)
 ):
     """Obtener lista de personas con filtros"""
-    service = get_person_service(db)
-    return service.get_persons(
+    principal = get_principal(request, db)
+    service = get_person_service(db, principal=principal)
+    persons = service.get_persons(
         skip=skip, 
         limit=limit,
         search=search,
@@ -55,14 +62,26 @@ def get_persons(
         min_age=min_age,
         max_age=max_age
     )
+    if not envelope:
+        return persons
+    
+    total, total_is_estimate = service.count_persons(
+        search=search,
+        document_type=document_type,
+        min_age=min_age,
+        max_age=max_age
+    )
+    return {"items": persons, "total": total, "total_is_estimate": total_is_estimate, "skip": skip, "limit": limit}
 
 @router.get("/{person_id}", response_model=PersonResponse)
 def get_person(
     person_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Obtener persona por ID"""
-    service = get_person_service(db)
+    principal = get_principal(request, db)
+    service = get_person_service(db, principal=principal)
     person = service.get_person_by_id(person_id)
     
     if not person:
@@ -73,10 +92,12 @@ def get_person(
 @router.get("/{person_id}/age")
 def get_person_age(
     person_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Obtener edad actual de una persona y determinar si requiere guardian"""
-    service = get_person_service(db)
+    principal = get_principal(request, db)
+    service = get_person_service(db, principal=principal)
     person = service.get_person_by_id(person_id)
     
     if not person:
@@ -101,10 +122,12 @@ def get_person_age(
 def update_person(
     person_id: int,
     person_data: PersonUpdate,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Actualizar persona"""
-    service = get_person_service(db)
+    principal = get_principal(request, db)
+    service = get_person_service(db, principal=principal)
     
     try:
         updated_person = service.update_person(person_id, person_data)
@@ -2,15 +2,16 @@
 from fastapi import (
     APIRouter, Depends, Request, Response, HTTPException, status, Query
 )
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timezone
 import logging
 from pydantic import Field
 
-from app.database import get_db
+from app.database import get_async_read_db
 from app.schemas.report_schema import (
-    ActivityReportFilters, MonthlyReportFilters,
-    ActivityReport, MonthlyReport
+    ActivityReportFilters, MonthlyReportFilters, YearlyReportFilters,
+    ActivityReport, MonthlyReport, YearlyReport
 )
 from app.services.report_service import ReportService
 from app.utils.pdf_generator import generate_activity_pdf, generate_monthly_pdf
@@ -172,7 +173,7 @@ async def get_activities_report(
         regex="^(json|pdf)$",
         description="Formato de salida del reporte (json/pdf)"
     ),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_admin: User = Depends(require_admin)
 ):
     """
@@ -182,7 +183,7 @@ async def get_activities_report(
         filters (ActivityReportFilters): Filtros de fecha para el reporte
         response (Response): Objeto response de FastAPI
         format (str): Formato de salida (json/pdf)
-        db (Session): Sesión de base de datos
+        db (AsyncSession): Sesión asíncrona de base de datos
         current_admin (User): Usuario administrador autenticado
     
     Returns:
@@ -206,8 +207,8 @@ async def get_activities_report(
         
         # Generate report data
         admin_full_name = f"{current_admin.first_name} {current_admin.last_name}"
-        service = ReportService(db)
-        report_data = service.generate_activity_report(
+        report_data = await ReportService.generate_activity_report_async(
+            db,
             filters.start_date,
             filters.end_date,
             generated_by=admin_full_name
@@ -215,7 +216,8 @@ async def get_activities_report(
 
         # Return PDF if requested
         if format.lower() == "pdf":
-            pdf_bytes = generate_activity_pdf(report_data)
+            # La generación del PDF es CPU-bound: se ejecuta fuera del event loop
+            pdf_bytes = await run_in_threadpool(generate_activity_pdf, report_data)
             filename = f"actividades_{filters.start_date.strftime('%Y%m%d')}_{filters.end_date.strftime('%Y%m%d')}.pdf"
             response.headers["Content-Disposition"] = f"attachment; filename={filename}"
             logger.info(f"Reporte PDF generado exitosamente: {filename}")
@@ -290,7 +292,7 @@ async def get_monthly_report(
         regex="^(json|pdf)$",
         description="Formato de salida del reporte (json/pdf)"
     ),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_admin: User = Depends(require_admin)
 ):
     """
@@ -301,7 +303,7 @@ async def get_monthly_report(
         filters (MonthlyReportFilters): Filtros para el reporte mensual
         response (Response): Objeto response de FastAPI
         format (str): Formato de salida (json/pdf)
-        db (Session): Sesión de base de datos
+        db (AsyncSession): Sesión asíncrona de base de datos
         current_admin (User): Usuario administrador autenticado
     
     Returns:
@@ -320,15 +322,15 @@ async def get_monthly_report(
         
         # Generate report data
         admin_full_name = f"{current_admin.first_name} {current_admin.last_name}"
-        service = ReportService(db)
-        report_data = service.generate_monthly_report(
+        report_data = await ReportService.generate_monthly_report_async(
+            db,
             report_date,
             generated_by=admin_full_name
         )
 
         # Return PDF if requested
         if format.lower() == "pdf":
-            pdf_bytes = generate_monthly_pdf(report_data)
+            pdf_bytes = await run_in_threadpool(generate_monthly_pdf, report_data)
             filename = f"reporte_mensual_{report_date.strftime('%Y%m')}.pdf"
             response.headers["Content-Disposition"] = f"attachment; filename={filename}"
             logger.info(f"Reporte PDF generado exitosamente: {filename}")
@@ -348,4 +350,67 @@ async def get_monthly_report(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error interno al generar el reporte mensual"
-        )
\ No newline at end of file
+        )
+
+
+@router.post(
+    "/yearly",
+    response_model=YearlyReport,
+    summary="Generar resumen anual",
+    description="""
+    Genera el resumen anual de actividades odontológicas: total de actividades
+    e ingresos de cada mes del año (hasta el mes en curso).
+    
+    Se lee de las instantáneas mensuales; los meses cerrados no se recalculan.
+    
+    Se requieren permisos de administrador.
+    """,
+    responses={
+        200: {
+            "description": "Reporte generado exitosamente",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "generated_by": "Admin User",
+                        "year": 2025,
+                        "months": [
+                            {
+                                "month": 1,
+                                "total_activities": 15,
+                                "total_revenue": "750000.00",
+                                "is_closed": True
+                            }
+                        ],
+                        "total_activities": 15,
+                        "total_revenue": "750000.00"
+                    }
+                }
+            }
+        }
+    }
+)
+async def get_yearly_report(
+    filters: YearlyReportFilters,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_admin: User = Depends(require_admin)
+):
+    """
+    Endpoint para generar el resumen anual.
+    
+    Args:
+        filters (YearlyReportFilters): Año del reporte (por defecto el actual)
+        db (AsyncSession): Sesión asíncrona de base de datos
+        current_admin (User): Usuario administrador autenticado
+    
+    Returns:
+        YearlyReport: Actividades e ingresos por mes
+    """
+    year = filters.year or datetime.now().year
+    if year > datetime.now().year:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El año no puede ser futuro"
+        )
+    
+    admin_full_name = f"{current_admin.first_name} {current_admin.last_name}"
+    return await ReportService.generate_yearly_report_async(db, year, generated_by=admin_full_name)
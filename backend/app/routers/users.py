@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 from pydantic import BaseModel, EmailStr, field_validator
 from datetime import date
 import secrets
@@ -12,7 +12,10 @@ from ..models.rol_models import Role
 from ..services.firebase_service import FirebaseService
 from ..services.auditoria_service import AuditoriaService
 from ..services.email_service import EmailService
-from ..middleware.auth_middleware import get_current_admin_user, get_current_user
+from ..services.count_cache import count_total
+from ..schemas.pagination_schema import Page
+from ..middleware.auth_middleware import get_current_admin_user, get_current_user, get_request_principal
+from ..middleware.audit_session import declare_event_type
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -249,7 +252,8 @@ async def create_user(
             usuario_admin_id=str(current_user.uid),
             usuario_creado_id=firebase_uid,
             datos_usuario=user_to_dict(db_user),
-            ip_origen=ip_cliente
+            ip_origen=ip_cliente,
+            principal=get_request_principal(request, db)
         )
         
         # Enviar email con credenciales temporales
@@ -298,11 +302,12 @@ async def create_user(
                 detail=f"Error al crear usuario: {error_message}"
             )
 
-@router.get("/", response_model=List[UserResponse])
+@router.get("/", response_model=Union[List[UserResponse], Page[UserResponse]])
 def get_users(
     skip: int = 0, 
     limit: int = 100, 
     include_inactive: bool = False,
+    envelope: bool = False,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
@@ -313,6 +318,7 @@ def get_users(
         skip: Número de registros a saltar
         limit: Límite de registros a retornar
         include_inactive: Si incluir usuarios inactivos (por defecto False)
+        envelope: Devolver {items, total, total_is_estimate} en lugar de la lista
     """
     query = db.query(User).join(Role)
     
@@ -321,8 +327,14 @@ def get_users(
         query = query.filter(User.is_active == True)
     
     users = query.offset(skip).limit(limit).all()
+    items = [UserResponse(**user_to_dict(user)) for user in users]
+    if not envelope:
+        return items
     
-    return [UserResponse(**user_to_dict(user)) for user in users]
+    total, total_is_estimate = count_total(
+        db, query, ("users", "roles"), {"is_active": None if include_inactive else True}
+    )
+    return {"items": items, "total": total, "total_is_estimate": total_is_estimate, "skip": skip, "limit": limit}
 
 @router.get("/me", response_model=UserResponse)
 def get_current_user_info(
@@ -425,6 +437,13 @@ def update_user(
         db.commit()
         db.refresh(user)
         
+        # El rol o el email pueden haber cambiado: descartar la atribución en caché
+        AuditoriaService.invalidar_datos_usuario(user_uid)
+        
+        # Un usuario desactivado no debe seguir autenticándose con tokens en caché
+        if user_data.is_active is False:
+            FirebaseService.revoke_cached_tokens(user_uid)
+        
         # Registrar en auditoría
         ip_cliente = get_client_ip(request)
         AuditoriaService.registrar_actualizacion_usuario(
@@ -433,7 +452,8 @@ def update_user(
             usuario_actualizado_id=user_uid,
             datos_anteriores=datos_anteriores,
             datos_nuevos=user_to_dict(user),
-            ip_origen=ip_cliente
+            ip_origen=ip_cliente,
+            principal=get_request_principal(request, db)
         )
         
         # Obtener el rol actualizado
@@ -478,9 +498,15 @@ def delete_user(
     try:
         # Desactivar usuario en la base de datos (soft delete)
         setattr(user, 'is_active', False)
+        # El evento se registra después del commit: en modo unificado el trigger necesita su tipo antes
+        declare_event_type(db, "DEACTIVATE", "users", user_uid)
         db.commit()
         db.refresh(user)
         
+        # Invalidar los tokens y la atribución de auditoría del usuario que estén en caché
+        FirebaseService.revoke_cached_tokens(user_uid)
+        AuditoriaService.invalidar_datos_usuario(user_uid)
+        
         # Registrar en auditoría
         ip_cliente = get_client_ip(request)
         AuditoriaService.registrar_desactivacion_usuario(
@@ -488,7 +514,8 @@ def delete_user(
             usuario_admin_id=str(current_user.uid),
             usuario_desactivado_id=user_uid,
             datos_usuario=datos_usuario,
-            ip_origen=ip_cliente
+            ip_origen=ip_cliente,
+            principal=get_request_principal(request, db)
         )
         
         return {"message": "Usuario desactivado exitosamente", "user_uid": user_uid, "is_active": False}
@@ -528,8 +555,11 @@ def activate_user(
     try:
         # Reactivar usuario en la base de datos
         setattr(user, 'is_active', True)
+        # El evento se registra después del commit: en modo unificado el trigger necesita su tipo antes
+        declare_event_type(db, "ACTIVATE", "users", user_uid)
         db.commit()
         db.refresh(user)
+        AuditoriaService.invalidar_datos_usuario(user_uid)
         
         # Registrar en auditoría
         ip_cliente = get_client_ip(request)
@@ -46,6 +46,7 @@ class ClinicalHistoryCreateResponse(BaseModel):
 
 class PaginatedResponse(BaseModel):
     total: int
+    total_is_estimate: bool = False
     page: int
     limit: int
     results: List[ClinicalHistoryResponse]
@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field
+from typing import Generic, List, TypeVar
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    """Página de resultados con el total de registros (listados con envelope=true)"""
+    items: List[T]
+    total: int = Field(..., description="Total de registros que cumplen los filtros")
+    total_is_estimate: bool = Field(False, description="El total es una estimación de las estadísticas del planificador")
+    skip: int
+    limit: int
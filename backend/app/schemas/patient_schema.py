@@ -54,6 +54,13 @@ class PatientUpdate(BaseModel):
     # NOTE: Disabled complex validators temporarily to fix Pydantic v2 compatibility
     # These validations are now handled in the service layer
 
+class PatientAutocompleteItem(BaseModel):
+    """Schema reducido para el autocompletado de pacientes"""
+    id: int
+    document_type: Optional[str] = None
+    document_number: str
+    display_name: str
+
 class PatientStatusChange(BaseModel):
     """Schema para cambiar el estado de un paciente"""
     is_active: bool = Field(..., description="True para activar, False para desactivar")
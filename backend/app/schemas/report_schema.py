@@ -10,6 +10,9 @@ class ActivityReportFilters(BaseModel):
 class MonthlyReportFilters(BaseModel):
     report_date: Optional[datetime] = None  
 
+class YearlyReportFilters(BaseModel):
+    year: Optional[int] = None
+
 class TreatmentActivityDetail(BaseModel):
     treatment_date: datetime
     patient_name: str
@@ -28,6 +31,7 @@ class ActivityReport(BaseModel):
 class ProcedureSummary(BaseModel):
     procedure_name: str
     patient_count: int
+    revenue: Decimal = Decimal("0")
 
 class MonthlyReport(BaseModel):
     generated_by: str
@@ -37,3 +41,17 @@ class MonthlyReport(BaseModel):
     end_date: datetime
     procedures: List[ProcedureSummary]
     total_patients: int
+    total_revenue: Decimal = Decimal("0")
+
+class MonthSummary(BaseModel):
+    month: int
+    total_activities: int
+    total_revenue: Decimal
+    is_closed: bool
+
+class YearlyReport(BaseModel):
+    generated_by: str
+    year: int
+    months: List[MonthSummary]
+    total_activities: int
+    total_revenue: Decimal
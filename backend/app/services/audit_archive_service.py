@@ -0,0 +1,412 @@
+"""
+Archivo en frío de la auditoría antigua
+
+Los eventos de audits y db_audit_log con más de AUDIT_ARCHIVE_AFTER_DAYS días
+se mueven a archivos comprimidos de solo escritura en AUDIT_ARCHIVE_DIR:
+
+- Un archivo por tabla, mes (UTC) y ejecución: ``<tabla>_<AAAAMM>_<ejecución>.jsonl.gz``.
+- El archivo es una secuencia de bloques gzip independientes de hasta
+  AUDIT_ARCHIVE_BLOCK_ROWS filas JSONL, ordenadas por (timestamp, id).
+- Junto a cada archivo, un manifiesto ``.manifest.json`` con el rango de
+  fechas, el número de filas, el SHA-256 y el índice de bloques (posición,
+  longitud y rango de fechas), de modo que una consulta por fechas solo
+  descomprime los bloques que se solapan.
+
+Las filas se borran de la tabla en la misma transacción en la que se confirma
+el archivo; si el proceso se interrumpe entre ambos pasos puede quedar una
+fila en los dos sitios, y la lectura da prioridad a la tabla.
+"""
+import gzip
+import hashlib
+import heapq
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, inspect, text
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.auditoria_models import Audit
+from .audit_partition_service import add_months
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_SUFFIX = ".manifest.json"
+
+AUDIT_COLUMNS = (
+    "id", "user_id", "user_role", "user_email", "event_type", "event_description", "affected_record_id",
+    "affected_record_type", "change_details", "integrity_hash", "hash_version", "event_timestamp", "source_ip",
+)
+DB_AUDIT_LOG_COLUMNS = (
+    "id", "table_name", "operation", "record_id", "old_values", "new_values", "changed_by", "changed_at", "session_info",
+)
+
+# Tabla archivable -> (columnas, columna de fecha)
+ARCHIVED_TABLES = {
+    "audits": (AUDIT_COLUMNS, "event_timestamp"),
+    "db_audit_log": (DB_AUDIT_LOG_COLUMNS, "changed_at"),
+}
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _month_start(value: datetime) -> date:
+    return _as_utc(value).date().replace(day=1)
+
+
+def _month_bounds(month: date):
+    start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    following = add_months(month, 1)
+    return start, datetime(following.year, following.month, 1, tzinfo=timezone.utc)
+
+
+def _serialize_row(row: Dict[str, Any], timestamp_column: str) -> Dict[str, Any]:
+    row = dict(row)
+    row[timestamp_column] = _as_utc(row[timestamp_column]).isoformat()
+    for key, value in row.items():
+        # db_audit_log guarda JSONB; en algunos drivers llega como texto
+        if isinstance(value, (bytes, bytearray)):
+            row[key] = value.decode("utf-8")
+    return row
+
+
+def _deserialize_row(row: Dict[str, Any], timestamp_column: str) -> Dict[str, Any]:
+    row[timestamp_column] = datetime.fromisoformat(row[timestamp_column])
+    return row
+
+
+def _fsync_write(path: str, data: bytes) -> None:
+    with open(path, "wb") as output:
+        output.write(data)
+        output.flush()
+        os.fsync(output.fileno())
+
+
+def write_archive(
+    archive_dir: str,
+    table: str,
+    month: date,
+    rows: List[Dict[str, Any]],
+    block_rows: int
+) -> Dict[str, Any]:
+    """
+    Escribir un archivo comprimido por bloques y su manifiesto (a temporales)
+
+    Returns:
+        Manifiesto; el llamador confirma con ``publish_archive`` o descarta con ``discard_archive``
+    """
+    _, timestamp_column = ARCHIVED_TABLES[table]
+    run = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    file_name = f"{table}_{month.strftime('%Y%m')}_{run}.jsonl.gz"
+    os.makedirs(archive_dir, exist_ok=True)
+
+    data = bytearray()
+    blocks = []
+    for offset in range(0, len(rows), block_rows):
+        block = rows[offset:offset + block_rows]
+        payload = "".join(
+            json.dumps(_serialize_row(row, timestamp_column), default=str, ensure_ascii=False) + "\n"
+            for row in block
+        )
+        compressed = gzip.compress(payload.encode("utf-8"))
+        blocks.append({
+            "offset": len(data),
+            "length": len(compressed),
+            "rows": len(block),
+            "min_timestamp": _as_utc(block[0][timestamp_column]).isoformat(),
+            "max_timestamp": _as_utc(block[-1][timestamp_column]).isoformat(),
+        })
+        data.extend(compressed)
+
+    manifest = {
+        "table": table,
+        "file": file_name,
+        "month": month.strftime("%Y-%m"),
+        "rows": len(rows),
+        "min_timestamp": blocks[0]["min_timestamp"],
+        "max_timestamp": blocks[-1]["max_timestamp"],
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "blocks": blocks,
+    }
+    path = os.path.join(archive_dir, file_name)
+    _fsync_write(path + ".tmp", bytes(data))
+    _fsync_write(path + MANIFEST_SUFFIX + ".tmp", json.dumps(manifest, indent=2).encode("utf-8"))
+    return manifest
+
+
+def publish_archive(archive_dir: str, manifest: Dict[str, Any]) -> None:
+    """Hacer visible el archivo (primero los datos, después el manifiesto)"""
+    path = os.path.join(archive_dir, manifest["file"])
+    os.replace(path + ".tmp", path)
+    os.replace(path + MANIFEST_SUFFIX + ".tmp", path + MANIFEST_SUFFIX)
+
+
+def discard_archive(archive_dir: str, manifest: Dict[str, Any]) -> None:
+    path = os.path.join(archive_dir, manifest["file"])
+    for leftover in (path + ".tmp", path + MANIFEST_SUFFIX + ".tmp", path, path + MANIFEST_SUFFIX):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+
+
+def _table_rows(db: Session, table: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    columns, timestamp_column = ARCHIVED_TABLES[table]
+    if table == "audits":
+        query = db.query(*[getattr(Audit, column) for column in columns])\
+            .filter(Audit.event_timestamp >= start, Audit.event_timestamp < end)\
+            .order_by(Audit.event_timestamp, Audit.id)
+        return [dict(row._mapping) for row in query.yield_per(5000)]
+
+    result = db.execute(
+        text(
+            f"SELECT {', '.join(columns)} FROM {table} "
+            f"WHERE {timestamp_column} >= :start AND {timestamp_column} < :end "
+            f"ORDER BY {timestamp_column}, id"
+        ),
+        {"start": start, "end": end}
+    )
+    return [dict(row._mapping) for row in result]
+
+
+def _delete_rows(db: Session, table: str, start: datetime, end: datetime) -> int:
+    if table == "audits":
+        return db.query(Audit)\
+            .filter(Audit.event_timestamp >= start, Audit.event_timestamp < end)\
+            .delete(synchronize_session=False)
+
+    _, timestamp_column = ARCHIVED_TABLES[table]
+    return db.execute(
+        text(f"DELETE FROM {table} WHERE {timestamp_column} >= :start AND {timestamp_column} < :end"),
+        {"start": start, "end": end}
+    ).rowcount
+
+
+def _oldest_timestamp(db: Session, table: str, cutoff: datetime) -> Optional[datetime]:
+    if table == "audits":
+        return db.query(func.min(Audit.event_timestamp)).filter(Audit.event_timestamp < cutoff).scalar()
+
+    _, timestamp_column = ARCHIVED_TABLES[table]
+    return db.execute(
+        text(f"SELECT MIN({timestamp_column}) FROM {table} WHERE {timestamp_column} < :cutoff"),
+        {"cutoff": cutoff}
+    ).scalar()
+
+
+def archive_old_events(
+    db: Session,
+    older_than_days: Optional[int] = None,
+    archive_dir: Optional[str] = None,
+    block_rows: Optional[int] = None,
+    now: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """
+    Mover a archivos comprimidos los eventos anteriores al límite de antigüedad
+
+    Se procesa un mes (UTC) por vez y por tabla: se escribe el archivo, se
+    borran las filas y se confirma; si el número de filas borradas no coincide
+    con el archivado se deshace ese mes.
+
+    Returns:
+        Manifiestos de los archivos creados
+    """
+    older_than_days = settings.audit_archive_after_days if older_than_days is None else older_than_days
+    archive_dir = archive_dir or settings.audit_archive_dir
+    block_rows = block_rows or settings.audit_archive_block_rows
+    cutoff = _as_utc(now or datetime.now(timezone.utc)) - timedelta(days=older_than_days)
+
+    existing_tables = set(inspect(db.get_bind()).get_table_names())
+    created = []
+    for table in ARCHIVED_TABLES:
+        if table not in existing_tables:
+            continue
+        oldest = _oldest_timestamp(db, table, cutoff)
+        if oldest is None:
+            continue
+
+        month = _month_start(oldest)
+        while _month_bounds(month)[0] < cutoff:
+            start, end = _month_bounds(month)
+            end = min(end, cutoff)
+            rows = _table_rows(db, table, start, end)
+            if rows:
+                manifest = write_archive(archive_dir, table, month, rows, block_rows)
+                try:
+                    if db.get_bind().dialect.name == "postgresql":
+                        # Que el trigger de audits no copie a db_audit_log las filas archivadas
+                        db.execute(text("SELECT set_config('bytedental.archiving', 'on', true)"))
+                    deleted = _delete_rows(db, table, start, end)
+                    if deleted != len(rows):
+                        raise RuntimeError(
+                            f"{table} {month:%Y-%m}: se archivaron {len(rows)} filas pero se borrarían {deleted}"
+                        )
+                    publish_archive(archive_dir, manifest)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    discard_archive(archive_dir, manifest)
+                    raise
+                created.append(manifest)
+                logger.info(f"Archivadas {len(rows)} filas de {table} ({month:%Y-%m}) en {manifest['file']}")
+            month = add_months(month, 1)
+    return created
+
+
+# Manifiestos ya leídos: ruta -> (mtime_ns, manifiesto). Los manifiestos publicados
+# no cambian; el mtime detecta si se reemplazó el archivo
+_manifest_cache: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+_manifest_cache_lock = threading.Lock()
+
+
+def _read_manifest(path: str) -> Dict[str, Any]:
+    mtime = os.stat(path).st_mtime_ns
+    with _manifest_cache_lock:
+        cached = _manifest_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+    with _manifest_cache_lock:
+        _manifest_cache[path] = (mtime, manifest)
+    return manifest
+
+
+def load_manifests(archive_dir: str, table: str) -> List[Dict[str, Any]]:
+    """Manifiestos publicados de una tabla, ordenados por fecha"""
+    if not archive_dir or not os.path.isdir(archive_dir):
+        return []
+    manifests = []
+    for name in os.listdir(archive_dir):
+        if name.startswith(f"{table}_") and name.endswith(MANIFEST_SUFFIX):
+            manifests.append(_read_manifest(os.path.join(archive_dir, name)))
+    return sorted(manifests, key=lambda manifest: manifest["min_timestamp"])
+
+
+def _overlaps(item: Dict[str, Any], start: Optional[datetime], end: Optional[datetime]) -> bool:
+    return (end is None or datetime.fromisoformat(item["min_timestamp"]) <= end) and \
+        (start is None or datetime.fromisoformat(item["max_timestamp"]) >= start)
+
+
+def _read_block(archive, block: Dict[str, Any], timestamp_column: str) -> List[Dict[str, Any]]:
+    archive.seek(block["offset"])
+    payload = gzip.decompress(archive.read(block["length"])).decode("utf-8")
+    return [_deserialize_row(json.loads(line), timestamp_column) for line in payload.splitlines()]
+
+
+def _iter_manifest(
+    archive_dir: str,
+    manifest: Dict[str, Any],
+    timestamp_column: str,
+    start: Optional[datetime],
+    end: Optional[datetime]
+) -> Iterator[Dict[str, Any]]:
+    with open(os.path.join(archive_dir, manifest["file"]), "rb") as archive:
+        for block in manifest["blocks"]:
+            if not _overlaps(block, start, end):
+                continue
+            rows = sorted(
+                _read_block(archive, block, timestamp_column),
+                key=lambda row: (row[timestamp_column], row["id"])
+            )
+            for row in rows:
+                if (start is None or row[timestamp_column] >= start) and (end is None or row[timestamp_column] <= end):
+                    yield row
+
+
+def iter_archived_rows(
+    archive_dir: str,
+    table: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Filas archivadas con timestamp en [start, end], en orden (timestamp, id)
+
+    Solo se leen y descomprimen los bloques cuyo rango se solapa con el pedido.
+    """
+    _, timestamp_column = ARCHIVED_TABLES[table]
+    start = _as_utc(start) if start else None
+    end = _as_utc(end) if end else None
+
+    manifests = [manifest for manifest in load_manifests(archive_dir, table) if _overlaps(manifest, start, end)]
+    # Igual que en iter_archived_rows_desc: los archivos cuyos rangos se solapan
+    # se mezclan manteniendo el orden; los demás se leen uno tras otro
+    groups: List[List[Dict[str, Any]]] = []
+    for manifest in manifests:
+        if groups and manifest["min_timestamp"] <= max(item["max_timestamp"] for item in groups[-1]):
+            groups[-1].append(manifest)
+        else:
+            groups.append([manifest])
+    for group in groups:
+        streams = [_iter_manifest(archive_dir, manifest, timestamp_column, start, end) for manifest in group]
+        yield from heapq.merge(*streams, key=lambda row: (row[timestamp_column], row["id"]))
+
+
+def _iter_manifest_desc(
+    archive_dir: str,
+    manifest: Dict[str, Any],
+    timestamp_column: str,
+    start: Optional[datetime],
+    end: Optional[datetime]
+) -> Iterator[Dict[str, Any]]:
+    with open(os.path.join(archive_dir, manifest["file"]), "rb") as archive:
+        for block in reversed(manifest["blocks"]):
+            if not _overlaps(block, start, end):
+                continue
+            rows = sorted(
+                _read_block(archive, block, timestamp_column),
+                key=lambda row: (row[timestamp_column], row["id"]),
+                reverse=True
+            )
+            for row in rows:
+                if (start is None or row[timestamp_column] >= start) and (end is None or row[timestamp_column] <= end):
+                    yield row
+
+
+def iter_archived_rows_desc(
+    archive_dir: str,
+    table: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Filas archivadas con timestamp en [start, end], del más reciente al más antiguo
+
+    Perezoso: cada bloque se descomprime cuando se llega a él, así que quien
+    solo necesita las primeras N filas no lee el resto del rango.
+    """
+    _, timestamp_column = ARCHIVED_TABLES[table]
+    start = _as_utc(start) if start else None
+    end = _as_utc(end) if end else None
+
+    manifests = sorted(
+        (manifest for manifest in load_manifests(archive_dir, table) if _overlaps(manifest, start, end)),
+        key=lambda manifest: manifest["max_timestamp"],
+        reverse=True
+    )
+    # Los archivos cuyos rangos se solapan (ejecuciones del mismo mes) se mezclan
+    # manteniendo el orden; los demás se leen uno tras otro
+    groups: List[List[Dict[str, Any]]] = []
+    for manifest in manifests:
+        if groups and manifest["max_timestamp"] >= min(item["min_timestamp"] for item in groups[-1]):
+            groups[-1].append(manifest)
+        else:
+            groups.append([manifest])
+    for group in groups:
+        streams = [_iter_manifest_desc(archive_dir, manifest, timestamp_column, start, end) for manifest in group]
+        yield from heapq.merge(*streams, key=lambda row: (row[timestamp_column], row["id"]), reverse=True)
+
+
+def archived_coverage(archive_dir: str, table: str = "audits") -> Optional[datetime]:
+    """Último timestamp archivado de la tabla (None si no hay archivos)"""
+    manifests = load_manifests(archive_dir, table)
+    if not manifests:
+        return None
+    return max(datetime.fromisoformat(manifest["max_timestamp"]) for manifest in manifests)
@@ -0,0 +1,164 @@
+"""
+Exportación de la auditoría en streaming (NDJSON o CSV, opcionalmente gzip)
+
+Las filas se leen con un cursor del servidor (stream_results + yield_per) y se
+escriben por bloques, así que la memoria no depende del tamaño del rango. La
+generación abre su propia sesión: la respuesta se sigue enviando después de
+que la petición haya liberado sus dependencias.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..models.auditoria_models import Audit
+from .audit_archive_service import iter_archived_rows
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+EXPORT_COLUMNS = (
+    "id", "user_id", "user_role", "user_email", "event_type", "event_description", "affected_record_id",
+    "affected_record_type", "change_details", "integrity_hash", "event_timestamp", "source_ip",
+)
+
+# Filas por lote leído de la base de datos y tamaño aproximado de cada bloque enviado
+YIELD_PER = 2000
+CHUNK_SIZE = 64 * 1024
+
+
+def build_export_query(
+    db: Session,
+    user_id: Optional[str] = None,
+    event_type: Optional[str] = None,
+    affected_record_type: Optional[str] = None,
+    fecha_inicio: Optional[datetime] = None,
+    fecha_fin: Optional[datetime] = None
+):
+    """Consulta de columnas (sin entidades ORM) con los filtros del listado de auditoría"""
+    query = db.query(*[getattr(Audit, column) for column in EXPORT_COLUMNS])
+    if user_id:
+        query = query.filter(Audit.user_id == user_id)
+    if event_type:
+        query = query.filter(Audit.event_type == event_type)
+    if affected_record_type:
+        query = query.filter(Audit.affected_record_type == affected_record_type)
+    if fecha_inicio:
+        query = query.filter(Audit.event_timestamp >= fecha_inicio)
+    if fecha_fin:
+        query = query.filter(Audit.event_timestamp <= fecha_fin)
+    return query
+
+
+def _archived_rows(archive_dir: str, filters: Dict[str, Any], before: Optional[datetime]) -> Iterator[Dict[str, Any]]:
+    """Filas archivadas que cumplen los filtros y son anteriores a la primera fila de la tabla"""
+    if before is not None and before.tzinfo is None:
+        before = before.replace(tzinfo=timezone.utc)
+    for row in iter_archived_rows(archive_dir, "audits", filters.get("fecha_inicio"), filters.get("fecha_fin")):
+        if before is not None and row["event_timestamp"] >= before:
+            return
+        if any(filters.get(key) and row[key] != filters[key] for key in ("user_id", "event_type", "affected_record_type")):
+            continue
+        yield {column: row.get(column) for column in EXPORT_COLUMNS}
+
+
+def iter_export_rows(
+    session_factory: Callable[[], Session],
+    filters: Dict[str, Any],
+    archive_dir: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Filas a exportar en orden cronológico (event_timestamp, id)
+
+    Con archive_dir, primero se emiten las filas del archivo en frío anteriores
+    a la primera fila de la tabla dentro del rango.
+    """
+    db = session_factory()
+    try:
+        query = build_export_query(db, **filters)
+        if archive_dir:
+            first_timestamp = query.with_entities(func.min(Audit.event_timestamp)).scalar()
+            yield from _archived_rows(archive_dir, filters, first_timestamp)
+
+        stream = query.order_by(Audit.event_timestamp, Audit.id)\
+            .execution_options(stream_results=True, yield_per=YIELD_PER)
+        for row in stream:
+            yield dict(row._mapping)
+    finally:
+        db.close()
+
+
+def _timestamp(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.isoformat()
+
+
+def _ndjson_lines(rows: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    for row in rows:
+        row["event_timestamp"] = _timestamp(row["event_timestamp"])
+        yield json.dumps(row, default=str, ensure_ascii=False) + "\n"
+
+
+def _csv_lines(rows: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        row["event_timestamp"] = _timestamp(row["event_timestamp"])
+        if row["change_details"] is not None:
+            row["change_details"] = json.dumps(row["change_details"], default=str, ensure_ascii=False)
+        writer.writerow([row[column] for column in EXPORT_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # El encabezado sale aunque no haya filas
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_audit_export(
+    session_factory: Callable[[], Session],
+    filters: Dict[str, Any],
+    formato: str = "ndjson",
+    comprimir: bool = False,
+    archive_dir: Optional[str] = None
+) -> Iterator[bytes]:
+    """
+    Generar el contenido de la exportación en bloques de ~CHUNK_SIZE bytes
+
+    Args:
+        session_factory: fábrica de sesiones (la generación abre y cierra la suya)
+        filters: user_id, event_type, affected_record_type, fecha_inicio, fecha_fin (UTC)
+        formato: "ndjson" o "csv"
+        comprimir: gzip del flujo completo
+        archive_dir: incluir también los eventos del archivo en frío
+    """
+    lines = (_csv_lines if formato == "csv" else _ndjson_lines)(iter_export_rows(session_factory, filters, archive_dir))
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if comprimir else None
+
+    pending = []
+    pending_size = 0
+    for line in lines:
+        pending.append(line)
+        pending_size += len(line)
+        if pending_size >= CHUNK_SIZE:
+            data = "".join(pending).encode("utf-8")
+            pending, pending_size = [], 0
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+
+    data = "".join(pending).encode("utf-8")
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
@@ -0,0 +1,337 @@
+"""
+Integridad de la auditoría: hash por fila, sellos por segmento y verificación en paralelo
+
+- Hash de fila (versión 2): SHA-256 sobre el contenido canónico del evento,
+  incluidos change_details y el timestamp en UTC.
+- Sello por segmento (un día UTC): raíz Merkle de los hashes de contenido de
+  las filas del día, encadenada con el sello anterior
+  (chain_hash = SHA-256(chain_hash anterior, día, filas, raíz)). Borrar,
+  insertar o modificar filas de un día sellado cambia su raíz; borrar un sello
+  rompe la cadena.
+- Verificación: cada segmento se comprueba de forma independiente, en un
+  pool de procesos que lee su propio día de la base de datos (y del archivo
+  en frío, si el día ya se archivó).
+"""
+import hashlib
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session
+
+from ..models.auditoria_models import Audit, AuditSegmentSeal
+from .audit_archive_service import iter_archived_rows
+
+logger = logging.getLogger(__name__)
+
+HASH_VERSION = 2
+GENESIS_CHAIN_HASH = "0" * 64
+
+# Columnas que cubre el hash de contenido (todas salvo el propio hash y su versión)
+CANONICAL_FIELDS = (
+    "id", "user_id", "user_role", "user_email", "event_type", "event_description",
+    "affected_record_id", "affected_record_type", "change_details", "source_ip", "event_timestamp",
+)
+
+
+def canonical_timestamp(value: datetime) -> str:
+    """Timestamp en UTC con microsegundos (los valores sin zona horaria se asumen UTC)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def compute_row_hash(evento: Dict[str, Any]) -> str:
+    """Hash de contenido (versión 2) de un evento dado como dict de columnas"""
+    payload = {field: evento.get(field) for field in CANONICAL_FIELDS}
+    payload["event_timestamp"] = canonical_timestamp(payload["event_timestamp"])
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def merkle_root(leaves: Iterable[str]) -> str:
+    """Raíz Merkle (SHA-256) de una lista de hashes hexadecimales"""
+    level = [bytes.fromhex(leaf) for leaf in leaves]
+    if not level:
+        return hashlib.sha256(b"").hexdigest()
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def chain_hash(previous_chain_hash: str, segment_day: date, row_count: int, root: str) -> str:
+    data = f"{previous_chain_hash}:{segment_day.isoformat()}:{row_count}:{root}"
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _day_bounds(segment_day: date):
+    start = datetime.combine(segment_day, time.min, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def _row_values(row: Audit) -> Dict[str, Any]:
+    values = {field: getattr(row, field) for field in CANONICAL_FIELDS}
+    values["integrity_hash"] = row.integrity_hash
+    values["hash_version"] = row.hash_version
+    return values
+
+
+def _segment_rows(db: Session, segment_day: date, archive_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Filas del día en la tabla y en el archivo en frío, en orden (timestamp, id)"""
+    start, end = _day_bounds(segment_day)
+    rows = {
+        row.id: _row_values(row)
+        for row in db.query(Audit).filter(Audit.event_timestamp >= start, Audit.event_timestamp < end)
+    }
+    if archive_dir:
+        for archived in iter_archived_rows(archive_dir, "audits", start, end):
+            if archived["event_timestamp"] < end:
+                rows.setdefault(archived["id"], archived)
+    return sorted(rows.values(), key=lambda row: (canonical_timestamp(row["event_timestamp"]), row["id"]))
+
+
+def check_segment(
+    db: Session,
+    segment_day: date,
+    seal: Optional[Dict[str, Any]] = None,
+    archive_dir: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Verificar un segmento (día UTC)
+
+    Compara el hash de cada fila versión 2 con su contenido y, si el día está
+    sellado, la raíz Merkle y el número de filas con el sello.
+    """
+    rows = _segment_rows(db, segment_day, archive_dir)
+    leaves = []
+    first_tampered_id = None
+    tampered_rows = 0
+    legacy_rows = 0
+    for row in rows:
+        leaf = compute_row_hash(row)
+        leaves.append(leaf)
+        if row["hash_version"] == HASH_VERSION:
+            if leaf != row["integrity_hash"]:
+                tampered_rows += 1
+                first_tampered_id = first_tampered_id or row["id"]
+        else:
+            legacy_rows += 1
+
+    root = merkle_root(leaves)
+    result = {
+        "segment_day": segment_day.isoformat(),
+        "rows": len(rows),
+        "legacy_rows": legacy_rows,
+        "tampered_rows": tampered_rows,
+        "first_tampered_id": first_tampered_id,
+        "sealed": seal is not None,
+        "seal_matches": None,
+    }
+    if seal is not None:
+        result["seal_matches"] = root == seal["merkle_root"] and len(rows) == seal["row_count"]
+        result["sealed_rows"] = seal["row_count"]
+    result["ok"] = tampered_rows == 0 and result["seal_matches"] is not False
+    return result
+
+
+# Engine por proceso del pool (se crea en el primer segmento que atiende cada worker)
+_worker_engines: Dict[str, Any] = {}
+
+
+def _check_segment_worker(
+    database_url: str,
+    segment_day: date,
+    seal: Optional[Dict[str, Any]],
+    archive_dir: Optional[str]
+) -> Dict[str, Any]:
+    engine = _worker_engines.get(database_url)
+    if engine is None:
+        engine = _worker_engines[database_url] = create_engine(database_url, pool_size=1, max_overflow=0)
+    with Session(engine) as db:
+        return check_segment(db, segment_day, seal, archive_dir)
+
+
+def _seal_to_dict(seal: AuditSegmentSeal) -> Dict[str, Any]:
+    return {
+        "segment_day": seal.segment_day,
+        "row_count": seal.row_count,
+        "merkle_root": seal.merkle_root,
+        "previous_chain_hash": seal.previous_chain_hash,
+        "chain_hash": seal.chain_hash,
+    }
+
+
+def _utc_day(value: datetime) -> date:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).date()
+
+
+def last_sealed_day(db: Session) -> Optional[date]:
+    """Último día (UTC) sellado, o None si no hay sellos"""
+    return db.query(func.max(AuditSegmentSeal.segment_day)).scalar()
+
+
+def move_out_of_sealed_days(db: Session, eventos: List[Dict[str, Any]]) -> int:
+    """
+    Registrar con la hora actual los eventos cuyo día ya está sellado (modifica los dicts)
+
+    Un evento tardío (reinsertado desde el respaldo o escrito después de
+    sellar su día) cambiaría la raíz Merkle del sello y la verificación
+    fallaría. Se mueve al día en curso, que nunca está sellado; el instante
+    original queda en change_details["registro_tardio"] y el hash se
+    recalcula.
+
+    Returns:
+        Número de eventos movidos
+    """
+    sealed_until = last_sealed_day(db)
+    if sealed_until is None:
+        return 0
+    moved = 0
+    for evento in eventos:
+        if _utc_day(evento["event_timestamp"]) > sealed_until:
+            continue
+        details = evento.get("change_details")
+        if not isinstance(details, dict):
+            details = {} if details is None else {"valor": details}
+        evento["change_details"] = {
+            **details,
+            "registro_tardio": {"event_timestamp_original": canonical_timestamp(evento["event_timestamp"])},
+        }
+        evento["event_timestamp"] = datetime.now(timezone.utc)
+        if evento.get("hash_version") == HASH_VERSION:
+            evento["integrity_hash"] = compute_row_hash(evento)
+        moved += 1
+    if moved:
+        logger.warning(f"{moved} eventos de auditoría con fecha de un día ya sellado se registran con la hora actual")
+    return moved
+
+
+def seal_pending_segments(
+    db: Session,
+    until_day: Optional[date] = None,
+    archive_dir: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Sellar los días cerrados que aún no tienen sello
+
+    Args:
+        until_day: último día (UTC) a sellar; por defecto ayer
+        archive_dir: directorio del archivo en frío, si hay días ya archivados
+
+    Returns:
+        Lista de sellos creados
+    """
+    until_day = until_day or (datetime.now(timezone.utc).date() - timedelta(days=1))
+    last_seal = db.query(AuditSegmentSeal).order_by(AuditSegmentSeal.segment_day.desc()).first()
+
+    if last_seal:
+        day = last_seal.segment_day + timedelta(days=1)
+        previous = last_seal.chain_hash
+    else:
+        first_timestamp = db.query(func.min(Audit.event_timestamp)).scalar()
+        if first_timestamp is None:
+            return []
+        day = _utc_day(first_timestamp)
+        previous = GENESIS_CHAIN_HASH
+
+    created = []
+    while day <= until_day:
+        rows = _segment_rows(db, day, archive_dir)
+        if rows:
+            root = merkle_root(compute_row_hash(row) for row in rows)
+            seal = AuditSegmentSeal(
+                segment_day=day,
+                row_count=len(rows),
+                merkle_root=root,
+                previous_chain_hash=previous,
+                chain_hash=chain_hash(previous, day, len(rows), root),
+                sealed_at=datetime.now(timezone.utc)
+            )
+            db.add(seal)
+            previous = seal.chain_hash
+            created.append(_seal_to_dict(seal))
+        day += timedelta(days=1)
+
+    db.commit()
+    if created:
+        logger.info(f"Sellados {len(created)} segmentos de auditoría hasta {until_day}")
+    return created
+
+
+def verify_seal_chain(seals: List[Dict[str, Any]]) -> Optional[str]:
+    """Comprobar el encadenamiento de los sellos; devuelve el primer día roto o None"""
+    previous = GENESIS_CHAIN_HASH
+    for seal in seals:
+        expected = chain_hash(previous, seal["segment_day"], seal["row_count"], seal["merkle_root"])
+        if seal["previous_chain_hash"] != previous or seal["chain_hash"] != expected:
+            return seal["segment_day"].isoformat()
+        previous = seal["chain_hash"]
+    return None
+
+
+def verify_audit_integrity(
+    db: Session,
+    database_url: Optional[str] = None,
+    workers: int = 1,
+    start_day: Optional[date] = None,
+    end_day: Optional[date] = None,
+    archive_dir: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Verificar la auditoría completa (o un rango de días)
+
+    Con workers > 1 y database_url, cada segmento se verifica en un proceso
+    del pool con su propia conexión. Con archive_dir, las filas ya archivadas
+    de cada día se verifican junto con las de la tabla.
+
+    Returns:
+        Resumen con la primera fila o segmento alterado (en orden cronológico)
+    """
+    seals = [_seal_to_dict(seal) for seal in db.query(AuditSegmentSeal).order_by(AuditSegmentSeal.segment_day).all()]
+    broken_chain_day = verify_seal_chain(seals)
+    seals_by_day = {seal["segment_day"]: seal for seal in seals}
+
+    first_timestamp, last_timestamp = db.query(func.min(Audit.event_timestamp), func.max(Audit.event_timestamp)).one()
+    days = set(seals_by_day)
+    if first_timestamp is not None:
+        day, last_day = _utc_day(first_timestamp), _utc_day(last_timestamp)
+        while day <= last_day:
+            days.add(day)
+            day += timedelta(days=1)
+    days = sorted(day for day in days if (not start_day or day >= start_day) and (not end_day or day <= end_day))
+
+    if workers > 1 and database_url and days:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(
+                _check_segment_worker,
+                [database_url] * len(days),
+                days,
+                [seals_by_day.get(day) for day in days],
+                [archive_dir] * len(days),
+                chunksize=max(1, len(days) // (workers * 4))
+            ))
+    else:
+        results = [check_segment(db, day, seals_by_day.get(day), archive_dir) for day in days]
+
+    # Días sin filas ni sello no aportan nada al informe
+    results = [result for result in results if result["rows"] or result["sealed"]]
+    failed = [result for result in results if not result["ok"]]
+    first_failure = failed[0] if failed else None
+    return {
+        "ok": not failed and broken_chain_day is None,
+        "segments_checked": len(results),
+        "rows_checked": sum(result["rows"] for result in results),
+        "legacy_rows": sum(result["legacy_rows"] for result in results),
+        "sealed_segments": len(seals),
+        "broken_chain_day": broken_chain_day,
+        "first_tampered_segment": first_failure["segment_day"] if first_failure else None,
+        "first_tampered_id": first_failure["first_tampered_id"] if first_failure else None,
+        "failed_segments": failed,
+    }
@@ -0,0 +1,200 @@
+"""
+Mantenimiento de las particiones mensuales de auditoría (PostgreSQL)
+
+Las tablas audits (event_timestamp) y db_audit_log (changed_at) están
+particionadas por mes (init-scripts/08-audit-partitioning.sql). Este servicio:
+
+- crea por adelantado las particiones de los próximos meses; si la partición
+  por defecto ya recibió filas de ese mes, las mueve a la partición nueva, y
+- desconecta (DETACH) las particiones más antiguas que el periodo de retención
+  que ya están vacías. Las lecturas por rango y la verificación de integridad
+  solo ven las filas de la tabla y del archivo en frío: una partición con filas
+  se conserva (con un aviso) hasta que el job de archivo
+  (scripts/archive_audit_events.py) las haya movido.
+
+En otros motores (SQLite en tests) o si la tabla aún no está particionada,
+las operaciones no hacen nada.
+"""
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Tabla particionada -> columna de partición
+PARTITIONED_TABLES: Dict[str, str] = {
+    "audits": "event_timestamp",
+    "db_audit_log": "changed_at",
+}
+
+PARTITION_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def add_months(month: date, months: int) -> date:
+    """Primer día del mes desplazado `months` meses"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(parent: str, month: date) -> str:
+    return f"{parent}_p{month.strftime('%Y%m')}"
+
+
+def default_partition_name(parent: str) -> str:
+    return f"{parent}_default"
+
+
+def months_to_create(existing: Iterable[date], current_month: date, months_ahead: int) -> List[date]:
+    """Meses (del actual a `months_ahead` meses después) que aún no tienen partición"""
+    existing = set(existing)
+    months = [add_months(current_month, offset) for offset in range(months_ahead + 1)]
+    return [month for month in months if month not in existing]
+
+
+def partitions_to_detach(partitions: List[Dict[str, object]], oldest_kept: date) -> List[Dict[str, object]]:
+    """Particiones anteriores al primer mes conservado"""
+    return [partition for partition in partitions if partition["month"] < oldest_kept]
+
+
+def create_partition_statements(parent: str, month: date, move_default_rows: bool = True) -> List[str]:
+    """
+    Sentencias para crear la partición del mes
+
+    La partición se crea como tabla independiente, recibe las filas del mes que
+    hubieran caído en la partición por defecto y después se conecta (ATTACH).
+    Crearla directamente con PARTITION OF falla si la partición por defecto ya
+    tiene filas de ese rango, y reinsertarlas a través del padre dispararía otra
+    vez los triggers de audits (copia en db_audit_log, contadores).
+    """
+    column = PARTITIONED_TABLES[parent]
+    name = partition_name(parent, month)
+    start = f"'{month.isoformat()} 00:00:00+00'"
+    end = f"'{add_months(month, 1).isoformat()} 00:00:00+00'"
+    statements = [f'CREATE TABLE IF NOT EXISTS "{name}" (LIKE "{parent}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)']
+    if move_default_rows:
+        statements += [
+            # Que el trigger de audits no registre el borrado en la partición por defecto
+            "SELECT set_config('bytedental.archiving', 'on', true)",
+            f'WITH moved AS (DELETE FROM "{default_partition_name(parent)}" '
+            f'WHERE "{column}" >= {start} AND "{column}" < {end} RETURNING *) '
+            f'INSERT INTO "{name}" SELECT * FROM moved',
+        ]
+    statements.append(f'ALTER TABLE "{parent}" ATTACH PARTITION "{name}" FOR VALUES FROM ({start}) TO ({end})')
+    return statements
+
+
+def _is_postgresql(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _relation_exists(db: Session, name: str) -> bool:
+    return db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+
+
+def is_partitioned(db: Session, parent: str) -> bool:
+    """Indicar si la tabla existe y está particionada"""
+    if not _is_postgresql(db):
+        return False
+    relkind = db.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:parent)"),
+        {"parent": parent}
+    ).scalar()
+    return relkind == "p"
+
+
+def list_partitions(db: Session, parent: str) -> List[Dict[str, object]]:
+    """Particiones mensuales conectadas a la tabla, ordenadas por mes"""
+    if not is_partitioned(db, parent):
+        return []
+    rows = db.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:parent)"
+        ),
+        {"parent": parent}
+    ).scalars().all()
+
+    partitions = []
+    for name in rows:
+        match = PARTITION_SUFFIX.search(name)
+        if match:
+            partitions.append({"name": name, "month": date(int(match.group(1)), int(match.group(2)), 1)})
+    return sorted(partitions, key=lambda partition: partition["month"])
+
+
+def ensure_future_partitions(db: Session, months_ahead: int = 3, today: Optional[date] = None) -> List[str]:
+    """
+    Crear las particiones del mes actual y de los `months_ahead` meses siguientes
+
+    Returns:
+        Nombres de las particiones creadas
+    """
+    created = []
+    current_month = (today or datetime.now(timezone.utc).date()).replace(day=1)
+    for parent in PARTITIONED_TABLES:
+        if not is_partitioned(db, parent):
+            continue
+        existing = [partition["month"] for partition in list_partitions(db, parent)]
+        has_default = _relation_exists(db, default_partition_name(parent))
+        for month in months_to_create(existing, current_month, months_ahead):
+            for statement in create_partition_statements(parent, month, move_default_rows=has_default):
+                db.execute(text(statement))
+            created.append(partition_name(parent, month))
+    db.commit()
+    if created:
+        logger.info(f"Particiones de auditoría creadas: {', '.join(created)}")
+    return created
+
+
+def detach_old_partitions(db: Session, retention_months: int, today: Optional[date] = None) -> List[str]:
+    """
+    Desconectar las particiones anteriores al periodo de retención
+
+    Solo se desconectan particiones vacías: una partición desconectada deja de
+    formar parte de las consultas por rango y de la verificación de integridad,
+    que sí leen el archivo en frío (audit_archive_service). Las que aún tienen
+    filas se conservan y se registra un aviso.
+
+    Args:
+        retention_months: meses completos a conservar además del actual (0 = no desconectar)
+
+    Returns:
+        Nombres de las particiones desconectadas
+    """
+    if retention_months <= 0:
+        return []
+    current_month = (today or datetime.now(timezone.utc).date()).replace(day=1)
+    oldest_kept = add_months(current_month, -retention_months)
+
+    detached, pending = [], []
+    for parent in PARTITIONED_TABLES:
+        for partition in partitions_to_detach(list_partitions(db, parent), oldest_kept):
+            if db.execute(text(f'SELECT EXISTS (SELECT 1 FROM "{partition["name"]}")')).scalar():
+                pending.append(partition["name"])
+                continue
+            db.execute(text(f'ALTER TABLE "{parent}" DETACH PARTITION "{partition["name"]}"'))
+            detached.append(partition["name"])
+    db.commit()
+    if detached:
+        logger.info(f"Particiones de auditoría desconectadas: {', '.join(detached)}")
+    if pending:
+        logger.warning(
+            f"Particiones de auditoría con filas sin archivar, no se desconectan: {', '.join(pending)}. "
+            "Ejecute scripts/archive_audit_events.py"
+        )
+    return detached
+
+
+def maintain_partitions(db: Session, months_ahead: int, retention_months: int) -> Dict[str, List[str]]:
+    """Crear las particiones futuras y desconectar las antiguas"""
+    if not _is_postgresql(db):
+        return {"created": [], "detached": []}
+    return {
+        "created": ensure_future_partitions(db, months_ahead),
+        "detached": detach_old_partitions(db, retention_months),
+    }
@@ -0,0 +1,264 @@
+"""
+Contadores incrementales de la auditoría (tabla audit_event_counters)
+
+Cada evento suma 1 a cuatro contadores del día (UTC) en que ocurrió:
+
+- event_type: tipo de evento
+- record_type: tipo de entidad afectada
+- user: usuario que realizó la acción
+- record: registro concreto ("tipo:id"), para los totales de los historiales por entidad
+
+Las listas y totales de la consola de auditoría se leen de estos contadores
+y no recorren la tabla audits. Los eventos archivados siguen contando.
+
+- AuditoriaService acumula los incrementos en la sesión (``defer_counters``)
+  y los aplica en una transacción corta propia justo después del commit de
+  la petición: las filas de contadores más usadas (p. ej. event_type=UPDATE
+  del día) no quedan bloqueadas durante la transacción de negocio, que
+  serializaría todas las escrituras concurrentes. Si la transacción se
+  revierte no se cuenta nada; si falla la aplicación de los incrementos se
+  registra el error y ``rebuild_counters`` los recalcula desde cero.
+- El escritor en lotes los suma en la misma transacción corta del lote.
+- En modo unificado, el trigger de init-scripts/11-audit-event-counters.sql.
+"""
+import logging
+from collections import Counter
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, insert, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..models.auditoria_models import Audit, AuditEventCounter
+from .audit_archive_service import iter_archived_rows
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ("event_type", "record_type", "user", "record")
+
+# Filas archivadas que se agregan por lote al reconstruir
+REBUILD_BATCH_SIZE = 10000
+
+# Incrementos pendientes de una sesión hasta su commit
+PENDING_KEY = "audit_pending_counters"
+
+
+def record_key(record_type: str, record_id: str) -> str:
+    return f"{record_type}:{record_id}"
+
+
+def _utc_day(value: datetime) -> date:
+    if value.tzinfo is None:
+        return value.date()
+    return value.astimezone(timezone.utc).date()
+
+
+def _event_keys(evento: Dict[str, Any]) -> List[Tuple[str, str]]:
+    return [
+        ("event_type", evento["event_type"]),
+        ("record_type", evento["affected_record_type"]),
+        ("user", evento["user_id"]),
+        ("record", record_key(evento["affected_record_type"], evento["affected_record_id"])),
+    ]
+
+
+def _increments(eventos: Iterable[Dict[str, Any]]) -> Counter:
+    increments = Counter()
+    for evento in eventos:
+        day = _utc_day(evento["event_timestamp"])
+        for dimension, key in _event_keys(evento):
+            increments[(dimension, key, day)] += 1
+    return increments
+
+
+def _apply_increments(db: Session, increments: Counter) -> int:
+    if not increments:
+        return 0
+
+    rows = [
+        {"dimension": dimension, "key": key, "day": day, "count": count}
+        for (dimension, key, day), count in sorted(increments.items())
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        statement = (pg_insert if dialect == "postgresql" else sqlite_insert)(AuditEventCounter)
+        statement = statement.on_conflict_do_update(
+            index_elements=["dimension", "key", "day"],
+            set_={"count": AuditEventCounter.count + statement.excluded["count"]}
+        )
+        db.execute(statement, rows)
+    else:
+        for row in rows:
+            updated = db.query(AuditEventCounter).filter(
+                AuditEventCounter.dimension == row["dimension"],
+                AuditEventCounter.key == row["key"],
+                AuditEventCounter.day == row["day"]
+            ).update({"count": AuditEventCounter.count + row["count"]}, synchronize_session=False)
+            if not updated:
+                db.add(AuditEventCounter(**row))
+    return len(rows)
+
+
+def increment_counters(db: Session, eventos: Iterable[Dict[str, Any]]) -> int:
+    """
+    Sumar los eventos (dicts de columnas de Audit) a los contadores, SIN commit
+
+    Los incrementos se agrupan por (dimensión, clave, día) y se aplican con un
+    solo upsert; las filas van ordenadas para que transacciones concurrentes
+    bloqueen los contadores en el mismo orden.
+
+    Returns:
+        Número de contadores actualizados
+    """
+    return _apply_increments(db, _increments(eventos))
+
+
+def defer_counters(db: Session, eventos: Iterable[Dict[str, Any]]) -> None:
+    """
+    Sumar los eventos a los contadores cuando se confirme la transacción de `db`
+
+    Se aplican en una transacción propia después del commit (ver el docstring
+    del módulo); si la transacción se revierte se descartan.
+    """
+    increments = _increments(eventos)
+    if increments:
+        db.info.setdefault(PENDING_KEY, Counter()).update(increments)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_counters(session):
+    increments = session.info.pop(PENDING_KEY, None)
+    if not increments:
+        return
+    counters_db = Session(bind=session.get_bind())
+    try:
+        _apply_increments(counters_db, increments)
+        counters_db.commit()
+    except Exception as e:
+        counters_db.rollback()
+        logger.error(f"Error actualizando contadores de auditoría ({len(increments)} claves): {e}")
+    finally:
+        counters_db.close()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_counters(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+def _day_expression(db: Session):
+    """Día UTC de event_timestamp en SQL"""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date(func.timezone("UTC", Audit.event_timestamp))
+    return func.date(Audit.event_timestamp)
+
+
+def rebuild_counters(db: Session, archive_dir: Optional[str] = None) -> int:
+    """
+    Recalcular todos los contadores desde audits (y el archivo en frío)
+
+    Conviene ejecutarlo sin escrituras de auditoría en curso: los eventos
+    insertados durante la reconstrucción pueden quedar sin contar.
+
+    Returns:
+        Número de eventos contados
+    """
+    db.query(AuditEventCounter).delete(synchronize_session=False)
+
+    day = _day_expression(db)
+    keys = {
+        "event_type": Audit.event_type,
+        "record_type": Audit.affected_record_type,
+        "user": Audit.user_id,
+        "record": Audit.affected_record_type + ":" + Audit.affected_record_id,
+    }
+    for dimension in DIMENSIONS:
+        select_counts = db.query(literal(dimension), keys[dimension], day, func.count())\
+            .group_by(keys[dimension], day)\
+            .statement
+        db.execute(
+            insert(AuditEventCounter).from_select(["dimension", "key", "day", "count"], select_counts)
+        )
+    total = db.query(func.count(Audit.id)).scalar() or 0
+
+    if archive_dir:
+        batch = []
+        for row in iter_archived_rows(archive_dir, "audits"):
+            batch.append(row)
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                increment_counters(db, batch)
+                total += len(batch)
+                batch = []
+        increment_counters(db, batch)
+        total += len(batch)
+
+    db.commit()
+    logger.info(f"Contadores de auditoría reconstruidos a partir de {total} eventos")
+    return total
+
+
+def ensure_counters(db: Session, archive_dir: Optional[str] = None) -> bool:
+    """
+    Reconstruir los contadores si están vacíos pero hay eventos (primera ejecución)
+
+    Returns:
+        True si se reconstruyeron
+    """
+    if db.query(AuditEventCounter.dimension).first() is not None:
+        return False
+    if db.query(Audit.id).first() is None:
+        return False
+    rebuild_counters(db, archive_dir)
+    return True
+
+
+def distinct_keys(db: Session, dimension: str) -> List[str]:
+    """Valores registrados de una dimensión (p. ej. tipos de evento)"""
+    rows = db.query(AuditEventCounter.key)\
+        .filter(AuditEventCounter.dimension == dimension)\
+        .distinct()\
+        .order_by(AuditEventCounter.key)\
+        .all()
+    return [row[0] for row in rows]
+
+
+def record_total(db: Session, record_type: str, record_id: str) -> int:
+    """Total de eventos de un registro concreto"""
+    return db.query(func.coalesce(func.sum(AuditEventCounter.count), 0)).filter(
+        AuditEventCounter.dimension == "record",
+        AuditEventCounter.key == record_key(record_type, record_id)
+    ).scalar()
+
+
+def totals_by(
+    db: Session,
+    dimension: str,
+    start_day: Optional[date] = None,
+    end_day: Optional[date] = None,
+    limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Totales por clave de una dimensión en un rango de días, de mayor a menor"""
+    total = func.sum(AuditEventCounter.count).label("total")
+    query = db.query(AuditEventCounter.key, total).filter(AuditEventCounter.dimension == dimension)
+    if start_day:
+        query = query.filter(AuditEventCounter.day >= start_day)
+    if end_day:
+        query = query.filter(AuditEventCounter.day <= end_day)
+    query = query.group_by(AuditEventCounter.key).order_by(total.desc(), AuditEventCounter.key)
+    if limit:
+        query = query.limit(limit)
+    return [{"key": key, "count": int(count)} for key, count in query.all()]
+
+
+def daily_totals(db: Session, start_day: Optional[date] = None, end_day: Optional[date] = None) -> List[Dict[str, Any]]:
+    """Eventos por día (suma de los contadores por tipo de evento)"""
+    total = func.sum(AuditEventCounter.count)
+    query = db.query(AuditEventCounter.day, total).filter(AuditEventCounter.dimension == "event_type")
+    if start_day:
+        query = query.filter(AuditEventCounter.day >= start_day)
+    if end_day:
+        query = query.filter(AuditEventCounter.day <= end_day)
+    rows = query.group_by(AuditEventCounter.day).order_by(AuditEventCounter.day).all()
+    return [{"day": day, "count": int(count)} for day, count in rows]
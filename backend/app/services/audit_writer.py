@@ -0,0 +1,325 @@
+"""
+Escritor de auditoría en lotes y en segundo plano
+
+Los eventos encolados se insertan en bloques (INSERT de varias filas) desde un
+hilo propio, en lugar de un commit por evento en la petición:
+
+- Se vacía el buffer al llegar a ``batch_size`` eventos o cada ``flush_interval`` segundos.
+- La cola tiene tamaño máximo (contrapresión): si está llena, el llamador escribe
+  el evento de forma síncrona, así nunca se pierde ni se acumula sin límite.
+- Si un lote no se puede insertar, se guarda en un archivo JSONL de respaldo
+  que se reinserta al arrancar de nuevo.
+- Al apagar la aplicación se vacía la cola antes de terminar.
+
+El respaldo es compartido por todos los workers. Antes de reinsertarlo, un
+worker lo reclama: con el archivo bloqueado (``flock``, que también toman
+los que escriben en él) lo renombra a ``<respaldo>.replay.<pid>.<id>`` y lo
+mantiene bloqueado mientras lo reinserta, así que cada evento lo reinserta
+un solo worker. Un archivo reclamado que nadie tiene bloqueado quedó de una
+reinserción interrumpida: se retoma saltando los eventos ya insertados.
+Los eventos de días ya sellados se registran en el día en curso
+(``move_out_of_sealed_days``) para no invalidar el sello.
+"""
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, IO, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos del respaldo
+    fcntl = None
+
+from sqlalchemy import insert
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.auditoria_models import Audit
+from .audit_integrity_service import move_out_of_sealed_days
+from .audit_stats_service import increment_counters
+
+logger = logging.getLogger(__name__)
+
+# Marca para despertar al hilo de escritura al detenerlo
+_WAKE_UP = object()
+
+
+def _lock_file(file: IO, blocking: bool = True) -> bool:
+    """Bloqueo exclusivo entre procesos del archivo; False si no es bloqueante y otro lo tiene"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _is_current(file: IO, path: str) -> bool:
+    """True si el archivo abierto sigue siendo el que hay en la ruta (no se renombró ni borró)"""
+    try:
+        current = os.stat(path)
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(file.fileno())
+    return (opened.st_dev, opened.st_ino) == (current.st_dev, current.st_ino)
+
+
+class AuditWriter:
+    """Cola de eventos de auditoría con escritura en lotes"""
+
+    def __init__(
+        self,
+        session_factory: Callable,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_queue_size: int = 10000,
+        spool_path: Optional[str] = None
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue_size)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._spool_lock = threading.Lock()
+        self.written = 0
+        self.batches = 0
+        self.sync_fallbacks = 0
+        self.spooled = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, evento: Dict[str, Any]) -> None:
+        """
+        Encolar un evento (diccionario de columnas de Audit)
+
+        Si el escritor no está activo o la cola está llena, el evento se escribe
+        de inmediato en el hilo del llamador.
+        """
+        if self.running:
+            try:
+                self._queue.put_nowait(evento)
+                return
+            except queue.Full:
+                logger.warning("Cola de auditoría llena: escritura síncrona del evento")
+        self.sync_fallbacks += 1
+        self._write_batch([evento])
+
+    def _write_batch(self, eventos: List[Dict[str, Any]], skip_existing: bool = False) -> None:
+        """
+        Insertar un lote en una sola transacción; si falla, guardarlo en el respaldo
+
+        Con skip_existing se omiten los eventos cuyo id ya está en la tabla
+        (reinserción de un respaldo que se interrumpió a medias).
+        """
+        db = self.session_factory()
+        try:
+            if skip_existing:
+                existing = {
+                    audit_id for (audit_id,) in
+                    db.query(Audit.id).filter(Audit.id.in_([evento["id"] for evento in eventos]))
+                }
+                eventos = [evento for evento in eventos if evento["id"] not in existing]
+                if not eventos:
+                    return
+            move_out_of_sealed_days(db, eventos)
+            db.execute(insert(Audit), eventos)
+            increment_counters(db, eventos)
+            db.commit()
+            self.written += len(eventos)
+            self.batches += 1
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error insertando {len(eventos)} eventos de auditoría: {e}")
+            self._spool(eventos)
+        finally:
+            db.close()
+
+    def _spool(self, eventos: List[Dict[str, Any]]) -> None:
+        if not self.spool_path:
+            logger.error(f"Sin archivo de respaldo: se descartan {len(eventos)} eventos de auditoría")
+            return
+        with self._spool_lock:
+            while True:
+                spool = open(self.spool_path, "a", encoding="utf-8")
+                _lock_file(spool)
+                # Otro worker pudo reclamar (renombrar) el respaldo mientras se esperaba el bloqueo
+                if _is_current(spool, self.spool_path):
+                    break
+                spool.close()
+            try:
+                for evento in eventos:
+                    spool.write(json.dumps(evento, default=str) + "\n")
+                spool.flush()
+                os.fsync(spool.fileno())
+            finally:
+                spool.close()
+        self.spooled += len(eventos)
+
+    def _claim_spool(self) -> Optional[Tuple[str, IO]]:
+        """Renombrar el respaldo a un nombre propio; devuelve (ruta, archivo abierto y bloqueado) o None"""
+        with self._spool_lock:
+            try:
+                spool = open(self.spool_path, "r", encoding="utf-8")
+            except FileNotFoundError:
+                return None
+            _lock_file(spool)
+            if not _is_current(spool, self.spool_path):
+                # Lo reclamó otro worker mientras se esperaba el bloqueo
+                spool.close()
+                return None
+            claimed_path = f"{self.spool_path}.replay.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+            os.rename(self.spool_path, claimed_path)
+            return claimed_path, spool
+
+    def _abandoned_claims(self) -> List[Tuple[str, IO]]:
+        """Respaldos reclamados que nadie tiene bloqueados (reinserción interrumpida), abiertos y bloqueados"""
+        if fcntl is None:
+            return []
+        claims = []
+        for path in sorted(glob.glob(f"{glob.escape(self.spool_path)}.replay*")):
+            try:
+                spool = open(path, "r", encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            if _lock_file(spool, blocking=False) and _is_current(spool, path):
+                claims.append((path, spool))
+            else:
+                spool.close()
+        return claims
+
+    def _replay_claimed(self, path: str, spool: IO) -> int:
+        """Reinsertar un respaldo reclamado y borrarlo (se desbloquea al cerrarlo)"""
+        try:
+            eventos = [json.loads(line) for line in spool if line.strip()]
+            for evento in eventos:
+                evento["event_timestamp"] = datetime.fromisoformat(evento["event_timestamp"])
+            for start in range(0, len(eventos), self.batch_size):
+                self._write_batch(eventos[start:start + self.batch_size], skip_existing=True)
+            os.remove(path)
+        finally:
+            spool.close()
+        return len(eventos)
+
+    def replay_spool(self) -> int:
+        """
+        Reinsertar los eventos guardados en el archivo de respaldo
+
+        Retoma también las reinserciones interrumpidas de cualquier worker.
+
+        Returns:
+            Número de eventos leídos del respaldo (los ya insertados se omiten)
+        """
+        if not self.spool_path:
+            return 0
+
+        claims = self._abandoned_claims()
+        claimed = self._claim_spool()
+        if claimed is not None:
+            claims.append(claimed)
+
+        replayed = 0
+        for path, spool in claims:
+            replayed += self._replay_claimed(path, spool)
+        if replayed:
+            logger.info(f"Reinsertados {replayed} eventos de auditoría desde {self.spool_path}")
+        return replayed
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                evento = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if evento is not _WAKE_UP:
+                batch.append(evento)
+        return batch
+
+    def _run(self) -> None:
+        buffer: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stop_event.is_set():
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                evento = self._queue.get(timeout=timeout)
+                if evento is not _WAKE_UP:
+                    buffer.append(evento)
+                buffer.extend(self._drain(self.batch_size - len(buffer)))
+            except queue.Empty:
+                pass
+
+            if len(buffer) >= self.batch_size or (buffer and time.monotonic() >= deadline):
+                self._write_batch(buffer)
+                buffer = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+        # Apagado: escribir lo que quede en el buffer y en la cola
+        buffer.extend(self._drain(self._queue.qsize()))
+        for start in range(0, len(buffer), self.batch_size):
+            self._write_batch(buffer[start:start + self.batch_size])
+
+    def start(self) -> None:
+        """Reinsertar el respaldo pendiente y lanzar el hilo de escritura"""
+        if self.running:
+            return
+        try:
+            self.replay_spool()
+        except Exception as e:
+            logger.error(f"Error reinsertando el respaldo de auditoría: {e}")
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Detener el hilo vaciando antes la cola"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        try:
+            self._queue.put_nowait(_WAKE_UP)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
+        if self._thread.is_alive():
+            # No terminó a tiempo: lo pendiente va al respaldo para no perderlo
+            pending = self._drain(self._queue.qsize())
+            if pending:
+                self._spool(pending)
+        self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "sync_fallbacks": self.sync_fallbacks,
+            "spooled": self.spooled,
+        }
+
+
+def build_audit_writer() -> AuditWriter:
+    """Crear el escritor con la configuración de la aplicación"""
+    return AuditWriter(
+        SessionLocal,
+        batch_size=settings.audit_batch_size,
+        flush_interval=settings.audit_flush_interval,
+        max_queue_size=settings.audit_queue_max_size,
+        spool_path=settings.audit_spool_path or None
+    )
+
+
+# Instancia global (se arranca en el startup de la aplicación si AUDIT_WRITER_ENABLED)
+audit_writer = build_audit_writer()
@@ -1,17 +1,41 @@
 import uuid
-import hashlib
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Iterator, Optional, List, Tuple
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 import pytz  # ✅ Agregar esta importación
 
 from ..models.auditoria_models import Audit
 from ..models.user_models import User
 from ..models.rol_models import Role
+from ..middleware.principal import Principal
+from ..middleware.audit_session import captured_by_trigger, declare_event_type
+from .audit_writer import audit_writer
+from .audit_integrity_service import HASH_VERSION, compute_row_hash
+from .audit_archive_service import iter_archived_rows_desc
+from .audit_stats_service import defer_counters, record_total
+from .user_attribution_cache import UserAttributionCache
+from ..config import settings
 
 # ✅ Zona horaria de Colombia usando pytz (más confiable)
 COLOMBIA_TZ = pytz.timezone('America/Bogota')
 
+# Caché de rol/email de los usuarios (compartida por todo el proceso)
+user_attribution_cache = UserAttributionCache(
+    max_size=settings.user_attribution_cache_max_size,
+    ttl=settings.user_attribution_cache_ttl
+)
+
+def _columnas(auditoria: Audit) -> Dict[str, Any]:
+    """Columnas de un evento usadas por los contadores de auditoría"""
+    return {
+        "event_type": auditoria.event_type,
+        "affected_record_type": auditoria.affected_record_type,
+        "affected_record_id": auditoria.affected_record_id,
+        "user_id": auditoria.user_id,
+        "event_timestamp": auditoria.event_timestamp,
+    }
+
 class AuditoriaService:
     """Servicio para gestionar auditoría de cambios en el sistema"""
     
@@ -46,18 +70,148 @@ class AuditoriaService:
     @staticmethod
     def _obtener_datos_usuario(db: Session, usuario_id: str) -> tuple[Optional[str], Optional[str]]:
         """
-        Obtener rol y email de un usuario
+        Obtener rol y email de un usuario (con caché compartida)
+        
+        Solo se guardan en caché los usuarios encontrados, para que un usuario
+        recién creado se resuelva en la siguiente llamada.
         
         Returns:
             tuple (rol_name, email) o (None, None) si no se encuentra
         """
+        if settings.user_attribution_cache_enabled:
+            datos = user_attribution_cache.get(usuario_id)
+            if datos is not None:
+                return datos
         try:
-            user = db.query(User).join(Role).filter(User.uid == usuario_id).first()
-            if user and user.role:
-                return str(user.role.name), str(user.email)
-            return None, None
+            row = db.query(Role.name, User.email).join(User.role).filter(User.uid == usuario_id).first()
         except Exception:
             return None, None
+        if row is None:
+            return None, None
+        datos = (str(row.name), str(row.email))
+        if settings.user_attribution_cache_enabled:
+            user_attribution_cache.set(usuario_id, datos)
+        return datos
+    
+    @staticmethod
+    def invalidar_datos_usuario(usuario_id: str) -> bool:
+        """
+        Descartar el rol/email en caché de un usuario (al actualizarlo, cambiar su rol o desactivarlo)
+        
+        Returns:
+            True si el usuario estaba en caché
+        """
+        return user_attribution_cache.invalidate(usuario_id)
+    
+    @staticmethod
+    def get_user_attribution_cache_stats() -> dict:
+        """Obtener los contadores de la caché de rol/email de usuarios"""
+        stats = user_attribution_cache.stats()
+        stats["enabled"] = settings.user_attribution_cache_enabled
+        return stats
+    
+    @staticmethod
+    def _obtener_datos_principal(db: Session, usuario_id: str, principal: Optional[Principal] = None) -> tuple[Optional[str], Optional[str]]:
+        """
+        Obtener rol y email del usuario, reutilizando el principal de la petición
+        
+        Solo consulta la base de datos si no hay principal o si corresponde a otro usuario.
+        """
+        if principal and principal.uid == usuario_id:
+            return principal.role, principal.email
+        return AuditoriaService._obtener_datos_usuario(db, usuario_id)
+    
+    @staticmethod
+    def construir_evento(
+        usuario_id: str,
+        tipo_evento: str,
+        registro_afectado_id: str,
+        registro_afectado_tipo: str,
+        descripcion_evento: Optional[str] = None,
+        detalles_cambios: Optional[Dict[str, Any]] = None,
+        ip_origen: Optional[str] = None,
+        usuario_rol: Optional[str] = None,
+        usuario_email: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Construir las columnas de un evento de auditoría (id, hash y timestamp incluidos)
+        
+        Returns:
+            dict con los valores de las columnas de Audit
+        """
+        evento = {
+            "id": str(uuid.uuid4()),
+            "user_id": usuario_id,
+            "user_role": usuario_rol,
+            "user_email": usuario_email,
+            "event_type": tipo_evento,
+            "event_description": descripcion_evento,
+            "affected_record_id": registro_afectado_id,
+            "affected_record_type": registro_afectado_tipo,
+            "change_details": detalles_cambios,
+            "source_ip": ip_origen,
+            # Se guarda en UTC (mismo instante que la hora de Colombia); se muestra convertido
+            "event_timestamp": datetime.now(timezone.utc),
+            "hash_version": HASH_VERSION
+        }
+        # Hash de integridad sobre todo el contenido del evento (incluidos los detalles)
+        evento["integrity_hash"] = compute_row_hash(evento)
+        return evento
+    
+    @staticmethod
+    def _declarar_tipo_evento(db: Session, tipo_evento: str, registro_afectado_tipo: str, registro_afectado_id: str) -> None:
+        """
+        Pasar al trigger el tipo de evento si el cambio aún no se confirmó
+
+        Si la sesión no tiene transacción abierta el cambio ya se confirmó con
+        el tipo de la operación; el servicio debe llamar a declare_event_type
+        antes de su commit.
+        """
+        if db.in_transaction():
+            declare_event_type(db, tipo_evento, registro_afectado_tipo, registro_afectado_id)
+    
+    @staticmethod
+    def registrar_eventos_lote(db: Session, eventos: List[Dict[str, Any]]) -> int:
+        """
+        Insertar varios eventos (de construir_evento) en un solo INSERT de varias filas
+        SIN hacer commit: quedan en la transacción del llamador
+        
+        Returns:
+            Número de eventos insertados
+        """
+        # En modo unificado los cambios de datos ya los registra el trigger
+        capturados = [
+            evento for evento in eventos
+            if captured_by_trigger(evento["event_type"], evento["affected_record_type"])
+        ]
+        for evento in capturados:
+            AuditoriaService._declarar_tipo_evento(
+                db, evento["event_type"], evento["affected_record_type"], evento["affected_record_id"]
+            )
+        eventos = [evento for evento in eventos if evento not in capturados]
+        if eventos:
+            db.execute(insert(Audit), eventos)
+            defer_counters(db, eventos)
+        return len(eventos)
+    
+    @staticmethod
+    def encolar_evento(db: Session, **datos_evento) -> None:
+        """
+        Registrar un evento a través del escritor en segundo plano (sin commit en la petición)
+        
+        Para eventos que no forman parte de una transacción de negocio (consultas,
+        accesos). Si el escritor no está activo, se registra de forma síncrona.
+        """
+        if captured_by_trigger(datos_evento["tipo_evento"], datos_evento["registro_afectado_tipo"]):
+            AuditoriaService._declarar_tipo_evento(
+                db, datos_evento["tipo_evento"], datos_evento["registro_afectado_tipo"],
+                datos_evento["registro_afectado_id"]
+            )
+            return
+        if audit_writer.running:
+            audit_writer.submit(AuditoriaService.construir_evento(**datos_evento))
+        else:
+            AuditoriaService.registrar_evento(db=db, **datos_evento)
     
     @staticmethod
     def registrar_evento(
@@ -88,36 +242,19 @@ class AuditoriaService:
             usuario_email: Email del usuario que realizó la acción
             
         Returns:
-            Objeto Audit creado
+            Objeto Audit creado (sin guardar si en modo unificado lo registra el trigger)
         """
         
-        # Generar UUID para el evento
-        evento_id = str(uuid.uuid4())
-        
-        # Obtener hora actual de Colombia
-        hora_colombia = datetime.now(COLOMBIA_TZ)
-        
-        # Crear hash de integridad usando hora de Colombia
-        datos_hash = f"{usuario_id}:{tipo_evento}:{registro_afectado_id}:{hora_colombia.isoformat()}"
-        hash_integridad = hashlib.sha256(datos_hash.encode()).hexdigest()
-        
-        # Crear registro de auditoría con timestamp explícito de Colombia
-        auditoria = Audit(
-            id=evento_id,
-            user_id=usuario_id,
-            user_role=usuario_rol,
-            user_email=usuario_email,
-            event_type=tipo_evento,
-            event_description=descripcion_evento,
-            affected_record_id=registro_afectado_id,
-            affected_record_type=registro_afectado_tipo,
-            change_details=detalles_cambios,
-            integrity_hash=hash_integridad,
-            source_ip=ip_origen,
-            event_timestamp=hora_colombia
-        )
+        auditoria = Audit(**AuditoriaService.construir_evento(
+            usuario_id, tipo_evento, registro_afectado_id, registro_afectado_tipo,
+            descripcion_evento, detalles_cambios, ip_origen, usuario_rol, usuario_email
+        ))
+        if captured_by_trigger(tipo_evento, registro_afectado_tipo):
+            AuditoriaService._declarar_tipo_evento(db, tipo_evento, registro_afectado_tipo, registro_afectado_id)
+            return auditoria
         
         db.add(auditoria)
+        defer_counters(db, [_columnas(auditoria)])
         db.commit()
         db.refresh(auditoria)
         
@@ -141,33 +278,16 @@ class AuditoriaService:
         El commit será responsabilidad del llamador
         """
         
-        # Generar UUID para el evento
-        evento_id = str(uuid.uuid4())
-        
-        # Obtener hora actual de Colombia
-        hora_colombia = datetime.now(COLOMBIA_TZ)
-        
-        # Crear hash de integridad usando hora de Colombia
-        datos_hash = f"{usuario_id}:{tipo_evento}:{registro_afectado_id}:{hora_colombia.isoformat()}"
-        hash_integridad = hashlib.sha256(datos_hash.encode()).hexdigest()
-        
-        # Crear registro de auditoría con timestamp explícito de Colombia
-        auditoria = Audit(
-            id=evento_id,
-            user_id=usuario_id,
-            user_role=usuario_rol,
-            user_email=usuario_email,
-            event_type=tipo_evento,
-            event_description=descripcion_evento,
-            affected_record_id=registro_afectado_id,
-            affected_record_type=registro_afectado_tipo,
-            change_details=detalles_cambios,
-            integrity_hash=hash_integridad,
-            source_ip=ip_origen,
-            event_timestamp=hora_colombia
-        )
+        auditoria = Audit(**AuditoriaService.construir_evento(
+            usuario_id, tipo_evento, registro_afectado_id, registro_afectado_tipo,
+            descripcion_evento, detalles_cambios, ip_origen, usuario_rol, usuario_email
+        ))
+        if captured_by_trigger(tipo_evento, registro_afectado_tipo):
+            AuditoriaService._declarar_tipo_evento(db, tipo_evento, registro_afectado_tipo, registro_afectado_id)
+            return auditoria
         
         db.add(auditoria)
+        defer_counters(db, [_columnas(auditoria)])
         # NO hacemos commit - responsabilidad del llamador
         
         return auditoria
@@ -178,11 +298,12 @@ class AuditoriaService:
         usuario_admin_id: str,
         usuario_creado_id: str,
         datos_usuario: Dict[str, Any],
-        ip_origen: Optional[str] = None
+        ip_origen: Optional[str] = None,
+        principal: Optional[Principal] = None
     ) -> Audit:
         """Registrar creación de usuario"""
         # Obtener rol y email del usuario admin
-        admin_rol, admin_email = AuditoriaService._obtener_datos_usuario(db, usuario_admin_id)
+        admin_rol, admin_email = AuditoriaService._obtener_datos_principal(db, usuario_admin_id, principal)
         
         return AuditoriaService.registrar_evento(
             db=db,
@@ -207,11 +328,12 @@ class AuditoriaService:
         usuario_actualizado_id: str,
         datos_anteriores: Dict[str, Any],
         datos_nuevos: Dict[str, Any],
-        ip_origen: Optional[str] = None
+        ip_origen: Optional[str] = None,
+        principal: Optional[Principal] = None
     ) -> Audit:
         """Registrar actualización de usuario"""
         # Obtener rol y email del usuario admin
-        admin_rol, admin_email = AuditoriaService._obtener_datos_usuario(db, usuario_admin_id)
+        admin_rol, admin_email = AuditoriaService._obtener_datos_principal(db, usuario_admin_id, principal)
         
         return AuditoriaService.registrar_evento(
             db=db,
@@ -236,11 +358,12 @@ class AuditoriaService:
         usuario_admin_id: str,
         usuario_eliminado_id: str,
         datos_usuario: Dict[str, Any],
-        ip_origen: Optional[str] = None
+        ip_origen: Optional[str] = None,
+        principal: Optional[Principal] = None
     ) -> Audit:
         """Registrar eliminación física de usuario"""
         # Obtener rol y email del usuario admin
-        admin_rol, admin_email = AuditoriaService._obtener_datos_usuario(db, usuario_admin_id)
+        admin_rol, admin_email = AuditoriaService._obtener_datos_principal(db, usuario_admin_id, principal)
         
         return AuditoriaService.registrar_evento(
             db=db,
@@ -264,11 +387,12 @@ class AuditoriaService:
         usuario_admin_id: str,
         usuario_desactivado_id: str,
         datos_usuario: Dict[str, Any],
-        ip_origen: Optional[str] = None
+        ip_origen: Optional[str] = None,
+        principal: Optional[Principal] = None
     ) -> Audit:
         """Registrar desactivación de usuario (soft delete)"""
         # Obtener datos del usuario que realiza la acción
-        role_name, email = AuditoriaService._obtener_datos_usuario(db, usuario_admin_id)
+        role_name, email = AuditoriaService._obtener_datos_principal(db, usuario_admin_id, principal)
         
         return AuditoriaService.registrar_evento(
             db=db,
@@ -396,23 +520,63 @@ class AuditoriaService:
             Número total de eventos de auditoría
         """
         try:
-            return db.query(Audit).filter(
-                Audit.affected_record_id == registro_id,
-                Audit.affected_record_type == tipo_registro
-            ).count()
+            # Desde los contadores incrementales (audit_stats_service), sin recorrer audits
+            return record_total(db, tipo_registro, registro_id)
         except Exception as e:
             print(f"Error al contar eventos de auditoría: {str(e)}")
             return 0
+
+    @staticmethod
+    def obtener_eventos_archivados(
+        fecha_inicio: datetime,
+        fecha_fin: datetime,
+        event_type: Optional[str] = None,
+        user_id: Optional[str] = None,
+        affected_record_type: Optional[str] = None,
+        archive_dir: Optional[str] = None,
+        antes_de: Optional[Tuple[datetime, str]] = None
+    ) -> Iterator[Audit]:
+        """
+        Obtener eventos del archivo en frío en un rango de fechas (UTC)
+
+        Los eventos se generan bajo demanda como objetos Audit sin sesión, del
+        más reciente al más antiguo: solo se descomprimen los bloques que se
+        llegan a recorrer.
+
+        Args:
+            fecha_inicio: Inicio del rango (inclusive)
+            fecha_fin: Fin del rango (inclusive)
+            event_type, user_id, affected_record_type: Filtros opcionales
+            archive_dir: Directorio del archivo (por defecto AUDIT_ARCHIVE_DIR)
+            antes_de: Clave (event_timestamp UTC, id) de un cursor; solo eventos anteriores
+
+        Returns:
+            Iterador de eventos archivados
+        """
+        if antes_de is not None:
+            fecha_fin = min(fecha_fin, antes_de[0])
+        for fila in iter_archived_rows_desc(archive_dir or settings.audit_archive_dir, "audits", fecha_inicio, fecha_fin):
+            if antes_de is not None and (fila["event_timestamp"], fila["id"]) >= antes_de:
+                continue
+            if event_type and fila["event_type"] != event_type:
+                continue
+            if user_id and fila["user_id"] != user_id:
+                continue
+            if affected_record_type and fila["affected_record_type"] != affected_record_type:
+                continue
+            yield Audit(**fila)
+
     @staticmethod
     def registrar_creacion_historia_clinica(
         db: Session,
         usuario_id: str,
         clinical_history_id: int,
-        ip_origen: Optional[str] = None
+        ip_origen: Optional[str] = None,
+        principal: Optional[Principal] = None
     ) -> Audit:
         """Registrar creación de historia clínica"""
         # ✅ Obtener datos del usuario
-        usuario_rol, usuario_email = AuditoriaService._obtener_datos_usuario(db, usuario_id)
+        usuario_rol, usuario_email = AuditoriaService._obtener_datos_principal(db, usuario_id, principal)
         hora_colombia = AuditoriaService.obtener_hora_colombia_actual()
         audit_record = AuditoriaService.registrar_evento(
                 db=db,
@@ -1,6 +1,6 @@
 import hashlib
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import Optional
 from app.models.clinical_history_models import ClinicalHistory
 from app.models.patient_models import Patient
@@ -12,7 +12,12 @@ from app.models.dental_service_models import DentalService
 from app.schemas.clinical_history_schema import ClinicalHistoryCreate
 from fastapi import HTTPException, Request, status
 from app.services.auditoria_service import AuditoriaService
+from app.services.count_cache import count_total
+from app.services.dashboard_rollup_service import record_treatments
+from app.services.monthly_activity_service import record_monthly_activity
 from app.services.firebase_service import FirebaseService  
+from app.middleware.auth_middleware import get_request_principal
+from app.middleware.audit_session import declare_event_type
 
 def get_client_ip(request: Request) -> str:
     """Obtener la IP del cliente"""
@@ -85,6 +90,9 @@ class ClinicalHistoryService:
                 is_active=patient.is_active,  # Heredar el estado del paciente
             )
             self.db.add(clinical_history)
+            self.db.flush()
+            # El evento se registra después del commit: en modo unificado el trigger necesita su tipo antes
+            declare_event_type(self.db, "CREACION_HISTORIA_CLINICA", "clinical_histories", clinical_history.id)
             self.db.commit()
             self.db.refresh(clinical_history)
 
@@ -102,7 +110,8 @@ class ClinicalHistoryService:
                     db=self.db,
                     usuario_id=str(self.current_user.uid),
                     clinical_history_id=clinical_history.id,
-                    ip_origen=ip_cliente
+                    ip_origen=ip_cliente,
+                    principal=get_request_principal(request, self.db)
                 )
             
             history_response = {
@@ -139,6 +148,7 @@ class ClinicalHistoryService:
 
     def create_treatments(self, clinical_history_id: int, treatments_data: list, doctor_id: str):
         treatments_response = []
+        treatments = []
         
         for treatment_data in treatments_data:
             if not treatment_data.dental_service_id or not treatment_data.treatment_date or not treatment_data.reason:
@@ -167,6 +177,7 @@ class ClinicalHistoryService:
                 notes=treatment_data.notes
             )
             self.db.add(treatment)
+            treatments.append(treatment)
             
             # Preparar respuesta
             treatments_response.append({
@@ -177,6 +188,13 @@ class ClinicalHistoryService:
                 "notes": treatment_data.notes
             })
 
+        # Actualizar el agregado del dashboard y el reporte mensual en la misma transacción
+        patient_id = self.db.query(ClinicalHistory.patient_id).filter(
+            ClinicalHistory.id == clinical_history_id
+        ).scalar()
+        record_treatments(self.db, treatments, patient_id)
+        record_monthly_activity(self.db, treatments)
+
         self.db.commit()
         return treatments_response
 
@@ -189,9 +207,13 @@ class ClinicalHistoryService:
         if name:
             query = query.filter(Patient.name.ilike(f"%{name}%"))
 
-        # Paginación
-        total = query.count()
-        results = query.offset((page - 1) * limit).limit(limit).all()
+        # Paginación (total cacheado por filtros, invalidado al escribir)
+        total, total_is_estimate = count_total(
+            self.db, query, ("clinical_histories", "patients"), {"patient_id": patient_id, "name": name}
+        )
+        results = query\
+            .options(selectinload(ClinicalHistory.treatments).joinedload(Treatment.dental_service))\
+            .offset((page - 1) * limit).limit(limit).all()
 
         if not results:
             raise HTTPException(
@@ -224,6 +246,7 @@ class ClinicalHistoryService:
 
         return {
             "total": total,
+            "total_is_estimate": total_is_estimate,
             "page": page,
             "limit": limit,
             "results": formatted_results
@@ -239,7 +262,9 @@ class ClinicalHistoryService:
             )
 
     def build_previous_treatments(self, patient_id: int):
-        treatments = self.db.query(Treatment).join(ClinicalHistory).filter(ClinicalHistory.patient_id == patient_id).all()
+        treatments = self.db.query(Treatment)\
+            .options(joinedload(Treatment.dental_service), joinedload(Treatment.doctor))\
+            .join(ClinicalHistory).filter(ClinicalHistory.patient_id == patient_id).all()
         previous_treatments = []
 
         for treatment in treatments:
@@ -261,10 +286,18 @@ class ClinicalHistoryService:
         Obtener una historia clínica por su ID con toda la información relacionada
         """
         try:
-            # Buscar la historia clínica con joins para obtener toda la información
+            # Cargar en una sola pasada la historia con paciente, persona y guardian (JOIN)
+            # y sus tratamientos con servicio y doctor (una consulta adicional, SELECT IN).
+            # El número de consultas no depende de la cantidad de tratamientos.
             clinical_history = self.db.query(ClinicalHistory)\
-                .join(Patient, ClinicalHistory.patient_id == Patient.id)\
-                .join(Person, Patient.person_id == Person.id)\
+                .options(
+                    joinedload(ClinicalHistory.patient).joinedload(Patient.person),
+                    joinedload(ClinicalHistory.patient).joinedload(Patient.guardian).joinedload(Guardian.person),
+                    selectinload(ClinicalHistory.treatments).options(
+                        joinedload(Treatment.dental_service),
+                        joinedload(Treatment.doctor)
+                    )
+                )\
                 .filter(ClinicalHistory.id == history_id)\
                 .first()
 
@@ -274,31 +307,16 @@ class ClinicalHistoryService:
                     detail="Historia clínica no encontrada"
                 )
 
-            # ✅ Obtener el paciente con información completa incluyendo guardian
-            patient = self.db.query(Patient)\
-                .options(
-                    joinedload(Patient.person),
-                    joinedload(Patient.guardian).joinedload(Guardian.person)
-                )\
-                .filter(Patient.id == clinical_history.patient_id)\
-                .first()
-
+            patient = clinical_history.patient
             if not patient:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Paciente no encontrado"
                 )
 
-            # Obtener los tratamientos asociados
-            treatments = self.db.query(Treatment)\
-                .outerjoin(DentalService, Treatment.dental_service_id == DentalService.id)\
-                .filter(Treatment.clinical_history_id == history_id)\
-                .all()
-
-            # Obtener información del doctor para cada tratamiento
             treatment_list = []
-            for treatment in treatments:
-                doctor = self.db.query(User).filter(User.uid == treatment.doctor_id).first()
+            for treatment in clinical_history.treatments:
+                doctor = treatment.doctor
                 doctor_name = f"{doctor.first_name} {doctor.last_name}" if doctor else "Doctor no especificado"
                 
                 treatment_list.append({
@@ -546,11 +564,11 @@ class ClinicalHistoryService:
                 "closed_at": clinical_history.closed_at,
             }
 
-            # Registrar auditoría
+            # Registrar auditoría (consulta: se encola, sin commit en la petición)
             if self.current_user:
                 ip_cliente = get_client_ip(request) if request else None
                 
-                AuditoriaService.registrar_evento(
+                AuditoriaService.encolar_evento(
                     db=self.db,
                     usuario_id=str(self.current_user.uid),
                     tipo_evento="READ",
@@ -639,6 +657,9 @@ class ClinicalHistoryService:
             )
             
             self.db.add(new_treatment)
+            # Actualizar el agregado del dashboard y el reporte mensual en la misma transacción
+            record_treatments(self.db, [new_treatment], clinical_history.patient_id)
+            record_monthly_activity(self.db, [new_treatment])
             self.db.commit()
             self.db.refresh(new_treatment)
             
@@ -780,6 +801,10 @@ class ClinicalHistoryService:
                 clinical_history.closure_reason = closure_reason
                 clinical_history.closed_at = datetime.now()
             
+            # El evento se registra después del commit: en modo unificado el trigger necesita su tipo antes
+            declare_event_type(
+                self.db, "REACTIVATE" if new_status else "DEACTIVATE", "clinical_histories", clinical_history.id
+            )
             self.db.commit()
             self.db.refresh(clinical_history)
             
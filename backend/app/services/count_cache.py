@@ -0,0 +1,149 @@
+"""
+Totales de los listados paginados (envelope=true)
+
+Contar todos los registros que cumplen los filtros en cada página cuesta tanto
+como recorrerlos. Para que el total sea barato:
+
+- Los totales exactos se guardan en una caché (TTL + LRU) indexada por las
+  tablas del listado y los filtros normalizados. Cada tabla tiene un contador
+  de generación que se incrementa cuando se confirma una transacción que
+  insertó, modificó o eliminó filas suyas por el ORM (invalidation_bus), de
+  modo que las entradas anteriores dejan de usarse sin recorrer la caché.
+- Sin filtros y en tablas grandes (PostgreSQL), el total es la estimación del
+  planificador (``pg_class.reltuples``) y se marca como estimado.
+
+Las escrituras hechas fuera del ORM (``query.update()``, SQL directo, otros
+procesos) solo se reflejan al vencer el TTL.
+"""
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from cachetools import TTLCache
+from sqlalchemy import text
+from sqlalchemy.orm import Query, Session
+
+from ..config import settings
+from .invalidation_bus import invalidation_bus
+
+
+def normalize_filters(filters: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    """Filtros efectivos (sin los None) como clave estable; el texto en minúsculas (las búsquedas no distinguen mayúsculas)"""
+    normalized = []
+    for name, value in filters.items():
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = value.lower()
+        else:
+            value = getattr(value, "value", value)
+        normalized.append((name, repr(value)))
+    return tuple(sorted(normalized))
+
+
+class CountCache:
+    """Caché de totales por (tablas, generaciones, filtros)"""
+
+    def __init__(self, max_size: int = 512, ttl: int = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize=max_size, ttl=ttl, timer=time.time)
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, tables: Tuple[str, ...], filters: Tuple[Tuple[str, str], ...]) -> tuple:
+        """
+        Clave de un total con las generaciones actuales de sus tablas
+
+        Se obtiene antes de contar: si una escritura se confirma mientras tanto,
+        el total queda guardado con la generación anterior y no se vuelve a usar.
+        """
+        with self._lock:
+            return tables, tuple(self._generations.get(table, 0) for table in tables), filters
+
+    def get(self, key: tuple) -> Optional[int]:
+        with self._lock:
+            total = self._cache.get(key)
+            if total is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return total
+
+    def set(self, key: tuple, total: int) -> None:
+        with self._lock:
+            self._cache[key] = total
+
+    def invalidate(self, tables: Iterable[str]) -> None:
+        """Descartar los totales de los listados que usan alguna de las tablas"""
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+
+    def clear(self) -> None:
+        """Vaciar la caché y reiniciar los contadores"""
+        with self._lock:
+            self._cache.clear()
+            self._generations.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché"""
+        with self._lock:
+            self._cache.expire()
+            total = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# Caché compartida por todo el proceso
+count_cache = CountCache(max_size=settings.count_cache_max_size, ttl=settings.count_cache_ttl)
+invalidation_bus.subscribe(count_cache.invalidate)
+
+
+def estimated_rows(db: Session, table: str) -> Optional[int]:
+    """Filas estimadas por el planificador (None fuera de PostgreSQL o sin ANALYZE)"""
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    reltuples = db.execute(
+        text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}
+    ).scalar()
+    if reltuples is None or reltuples < 0:
+        return None
+    return int(reltuples)
+
+
+def count_total(db: Session, query: Query, tables: Tuple[str, ...], filters: Dict[str, Any]) -> Tuple[int, bool]:
+    """
+    Total de registros de un listado
+
+    Args:
+        query: consulta del listado con los filtros aplicados (sin offset/limit)
+        tables: tablas de las que depende el total; la primera es la principal
+        filters: filtros del listado (los None no cuentan)
+
+    Returns:
+        tuple (total, es_estimado)
+    """
+    normalized = normalize_filters(filters)
+    if not normalized:
+        estimate = estimated_rows(db, tables[0])
+        if estimate is not None and estimate >= settings.count_estimate_min_rows:
+            return estimate, True
+
+    key = count_cache.key(tables, normalized)
+    total = count_cache.get(key)
+    if total is None:
+        total = query.order_by(None).count()
+        count_cache.set(key, total)
+    return total, False
+
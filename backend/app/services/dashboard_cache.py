@@ -0,0 +1,338 @@
+"""
+Caché de resultados de DashboardService
+
+Las estadísticas del dashboard se leen mucho más de lo que se escriben
+tratamientos. Cada método de DashboardService decorado con ``cached(...)``
+guarda su resultado indexado por el nombre del método, los filtros
+normalizados (fechas, doctor_id, procedure_id, year...), el día actual y la
+generación de cada tabla de la que depende. Cuando se confirma una escritura
+sobre una de esas tablas (invalidation_bus) su generación sube y las entradas
+anteriores dejan de usarse.
+
+Backends (``DASHBOARD_CACHE_BACKEND``):
+
+- ``memory``: TTL + LRU en el proceso; cada worker de uvicorn tiene la suya.
+  Una escritura solo invalida la caché del worker que la confirmó: los demás
+  pueden servir resultados anteriores hasta que venzan
+  (``DASHBOARD_CACHE_TTL``). Con varios workers y datos que deben verse al
+  momento, usar ``sqlite``.
+- ``sqlite``: archivo SQLite local (``DASHBOARD_CACHE_PATH``) compartido por
+  todos los workers de la máquina, con las generaciones en el mismo archivo,
+  así que una escritura en un worker invalida la caché de todos.
+- ``none``: sin caché.
+
+Con réplica de lectura (``DATABASE_REPLICA_URL``) el dashboard puede leer
+de una réplica que aún no tiene la escritura que subió la generación. Para no
+guardar bajo la generación nueva un resultado anterior a la escritura, no se
+guardan los resultados calculados menos de ``settle_seconds`` después de la
+última invalidación de sus tablas (el retraso máximo admitido de la réplica
+más el intervalo entre mediciones); se sirven sin caché.
+
+Los resultados se guardan serializados en JSON: cada lectura devuelve una
+copia nueva.
+"""
+import functools
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from cachetools import TTLCache
+
+from ..config import settings
+from .invalidation_bus import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_call(func: Callable, args: tuple, kwargs: dict) -> Tuple[Tuple[str, str], ...]:
+    """Filtros de una llamada (sin la sesión) como clave estable, con los valores por defecto aplicados"""
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    return tuple(sorted(
+        (name, repr(getattr(value, "value", value)))
+        for name, value in bound.arguments.items()
+        if name != "db"
+    ))
+
+
+class MemoryBackend:
+    """Entradas y generaciones en memoria del proceso"""
+
+    def __init__(self, max_size: int, ttl: int):
+        self._cache = TTLCache(maxsize=max_size, ttl=ttl, timer=time.time)
+        self._generations: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def generations(self, tables: Tuple[str, ...]) -> Tuple[Tuple[int, ...], float]:
+        """Generación de cada tabla y momento de la última invalidación de cualquiera de ellas"""
+        with self._lock:
+            states = [self._generations.get(table, (0, 0.0)) for table in tables]
+        return tuple(generation for generation, _ in states), max((bumped_at for _, bumped_at in states), default=0.0)
+
+    def bump(self, tables: Iterable[str]) -> None:
+        now = time.time()
+        with self._lock:
+            for table in tables:
+                self._generations[table] = (self._generations.get(table, (0, 0.0))[0] + 1, now)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._cache.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._cache[key] = value
+
+    def size(self) -> int:
+        with self._lock:
+            self._cache.expire()
+            return len(self._cache)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._generations.clear()
+
+
+class SQLiteBackend:
+    """Entradas y generaciones en un archivo SQLite compartido por los workers"""
+
+    def __init__(self, path: str, max_size: int, ttl: int):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS generations ("
+                "table_name TEXT PRIMARY KEY, generation INTEGER NOT NULL, bumped_at REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(generations)")}
+            if "bumped_at" not in columns:
+                # Archivo creado por una versión anterior
+                connection.execute("ALTER TABLE generations ADD COLUMN bumped_at REAL NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Una conexión por operación: sqlite3 no comparte conexiones entre hilos
+        connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def generations(self, tables: Tuple[str, ...]) -> Tuple[Tuple[int, ...], float]:
+        """Generación de cada tabla y momento de la última invalidación de cualquiera de ellas"""
+        with self._connect() as connection:
+            rows = {
+                table_name: (generation, bumped_at)
+                for table_name, generation, bumped_at in connection.execute(
+                    "SELECT table_name, generation, bumped_at FROM generations "
+                    f"WHERE table_name IN ({','.join('?' * len(tables))})",
+                    tables
+                )
+            }
+        states = [rows.get(table, (0, 0.0)) for table in tables]
+        return tuple(generation for generation, _ in states), max((bumped_at for _, bumped_at in states), default=0.0)
+
+    def bump(self, tables: Iterable[str]) -> None:
+        now = time.time()
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT INTO generations (table_name, generation, bumped_at) VALUES (?, 1, ?) "
+                "ON CONFLICT (table_name) DO UPDATE SET generation = generation + 1, bumped_at = excluded.bumped_at",
+                [(table, now) for table in tables]
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)", (key, value, now + self.ttl)
+            )
+            connection.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            # Límite de tamaño: descartar primero las que vencen antes (las más antiguas)
+            connection.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_size,)
+            )
+
+    def size(self) -> int:
+        with self._connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM entries WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+
+    def clear(self) -> None:
+        with self._connect() as connection:
+            connection.execute("DELETE FROM entries")
+            connection.execute("DELETE FROM generations")
+
+
+class DashboardCache:
+    """Caché de resultados por (método, generaciones de sus tablas, filtros)"""
+
+    def __init__(
+        self,
+        backend_name: str = "memory",
+        max_size: int = 256,
+        ttl: int = 60,
+        path: Optional[str] = None,
+        settle_seconds: float = 0.0
+    ):
+        self.backend_name = backend_name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.settle_seconds = settle_seconds
+        self.backend = None
+        if backend_name == "sqlite":
+            try:
+                self.backend = SQLiteBackend(path, max_size, ttl)
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"No se pudo abrir la caché del dashboard en {path}: {e}. Se usa la caché en memoria")
+                self.backend_name = "memory"
+        if self.backend_name == "memory":
+            self.backend = MemoryBackend(max_size, ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.unsettled = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def cached(self, *tables: str) -> Callable:
+        """
+        Decorador para un método de DashboardService que depende de estas tablas
+
+        El resultado debe ser serializable en JSON.
+        """
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                try:
+                    # Generaciones antes de calcular: una escritura confirmada mientras
+                    # tanto deja el resultado guardado con la generación anterior.
+                    # El día forma parte de la clave porque sin fechas los métodos usan
+                    # el mes en curso o los últimos 12 meses.
+                    started_at = time.time()
+                    generations, bumped_at = self.backend.generations(tables)
+                    key = json.dumps([
+                        func.__qualname__, generations, normalize_call(func, args, kwargs), date.today().isoformat()
+                    ])
+                    value = self.backend.get(key)
+                except (sqlite3.Error, OSError) as e:
+                    self._error(e)
+                    return func(*args, **kwargs)
+
+                self._count(value is not None)
+                if value is not None:
+                    return json.loads(value)
+
+                result = func(*args, **kwargs)
+                if started_at - bumped_at < self.settle_seconds:
+                    # La réplica podría no tener aún la última escritura
+                    with self._lock:
+                        self.unsettled += 1
+                    return result
+                try:
+                    self.backend.set(key, json.dumps(result))
+                except (sqlite3.Error, OSError) as e:
+                    self._error(e)
+                return result
+            return wrapper
+        return decorator
+
+    def _error(self, error: Exception) -> None:
+        with self._lock:
+            self.errors += 1
+        logger.warning(f"Caché del dashboard no disponible: {error}")
+
+    def invalidate(self, tables: Set[str]) -> None:
+        """Descartar los resultados que dependen de alguna de las tablas"""
+        if not self.enabled:
+            return
+        try:
+            self.backend.bump(sorted(tables))
+        except (sqlite3.Error, OSError) as e:
+            self._error(e)
+
+    def clear(self) -> None:
+        """Vaciar la caché y reiniciar los contadores"""
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.errors = 0
+            self.unsettled = 0
+        if self.enabled:
+            try:
+                self.backend.clear()
+            except (sqlite3.Error, OSError) as e:
+                self._error(e)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché"""
+        with self._lock:
+            total = self.hits + self.misses
+            stats = {
+                "backend": self.backend_name,
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "unsettled": self.unsettled,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+        stats["size"] = 0
+        if self.enabled:
+            try:
+                stats["size"] = self.backend.size()
+            except (sqlite3.Error, OSError) as e:
+                self._error(e)
+                stats["size"] = None
+                stats["errors"] = self.errors
+        return stats
+
+
+# Caché compartida por todo el proceso
+dashboard_cache = DashboardCache(
+    backend_name=settings.dashboard_cache_backend,
+    max_size=settings.dashboard_cache_max_size,
+    ttl=settings.dashboard_cache_ttl,
+    path=settings.dashboard_cache_path,
+    # Con réplica: retraso máximo admitido más el intervalo entre mediciones
+    settle_seconds=(
+        settings.replica_max_lag_seconds + settings.replica_lag_check_interval
+        if settings.database_replica_url else 0.0
+    )
+)
+invalidation_bus.subscribe(dashboard_cache.invalidate)
@@ -0,0 +1,225 @@
+"""
+Agregado diario de tratamientos para el dashboard (tabla treatment_daily_rollups)
+
+Una fila por (día, doctor, servicio odontológico) con el número de
+tratamientos. Las consultas del dashboard suman estas filas en lugar de
+recorrer treatments con sus joins, así que el coste depende del rango
+consultado y no de los años de historial.
+
+Los pacientes atendidos van normalizados en treatment_daily_patients (una
+fila por día, doctor, servicio y paciente): los pacientes activos distintos
+de un rango se cuentan en la base de datos con ``COUNT(DISTINCT)`` unido a
+``patients.is_active``, sin traer los IDs a la aplicación.
+
+La aplicación actualiza el agregado en la misma transacción que crea los
+tratamientos (``record_treatments``). ``rebuild_rollups`` lo recalcula desde
+treatments (scripts/rebuild_dashboard_rollups.py).
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Type
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..models.clinical_history_models import ClinicalHistory
+from ..models.dashboard_rollup_models import TreatmentDailyPatient, TreatmentDailyRollup
+from ..models.patient_models import Patient
+from ..models.treatment_models import Treatment
+from .invalidation_bus import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+# Clave de los tratamientos sin servicio odontológico (dental_service_id NULL)
+NO_SERVICE = 0
+
+# Filas de treatments leídas por lote al reconstruir
+REBUILD_BATCH_SIZE = 5000
+
+RollupKey = Tuple[date, str, int]
+
+
+def to_day(value) -> date:
+    """Día de una fecha de tratamiento (datetime, date o texto ISO)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def rollup_key(treatment_date, doctor_id: str, dental_service_id: Optional[int]) -> RollupKey:
+    return to_day(treatment_date), doctor_id, dental_service_id or NO_SERVICE
+
+
+def _ensure_rows(db: Session, keys: List[RollupKey]) -> None:
+    """Crear vacías las filas que falten (sin pisar las existentes)"""
+    rows = [
+        {"day": day, "doctor_id": doctor_id, "dental_service_id": service_id, "treatment_count": 0}
+        for day, doctor_id, service_id in keys
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        statement = (pg_insert if dialect == "postgresql" else sqlite_insert)(TreatmentDailyRollup)
+        db.execute(statement.on_conflict_do_nothing(index_elements=["day", "doctor_id", "dental_service_id"]), rows)
+        return
+    for row in rows:
+        if db.get(TreatmentDailyRollup, (row["day"], row["doctor_id"], row["dental_service_id"])) is None:
+            db.add(TreatmentDailyRollup(**row))
+    db.flush()
+
+
+def _add_patients(db: Session, keys: List[RollupKey], patient_id: int) -> None:
+    """Registrar al paciente en los días, doctores y servicios dados (sin duplicar)"""
+    rows = [
+        {"day": day, "doctor_id": doctor_id, "dental_service_id": service_id, "patient_id": patient_id}
+        for day, doctor_id, service_id in keys
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        statement = (pg_insert if dialect == "postgresql" else sqlite_insert)(TreatmentDailyPatient)
+        db.execute(
+            statement.on_conflict_do_nothing(index_elements=["day", "doctor_id", "dental_service_id", "patient_id"]),
+            rows
+        )
+        return
+    for row in rows:
+        key = (row["day"], row["doctor_id"], row["dental_service_id"], row["patient_id"])
+        if db.get(TreatmentDailyPatient, key) is None:
+            db.add(TreatmentDailyPatient(**row))
+    db.flush()
+
+
+def record_treatments(db: Session, treatments: Iterable[Treatment], patient_id: int) -> int:
+    """
+    Sumar tratamientos nuevos de un paciente al agregado, SIN commit
+
+    Las filas se bloquean (FOR UPDATE en PostgreSQL) en orden de clave para
+    que transacciones concurrentes no se pisen el contador; el paciente se
+    añade con INSERT ... ON CONFLICT DO NOTHING.
+
+    Returns:
+        Número de filas del agregado actualizadas
+    """
+    increments: Dict[RollupKey, int] = defaultdict(int)
+    for treatment in treatments:
+        increments[rollup_key(treatment.treatment_date, treatment.doctor_id, treatment.dental_service_id)] += 1
+    if not increments:
+        return 0
+
+    keys = sorted(increments)
+    _ensure_rows(db, keys)
+    for key in keys:
+        day, doctor_id, service_id = key
+        rollup = db.query(TreatmentDailyRollup).filter(
+            TreatmentDailyRollup.day == day,
+            TreatmentDailyRollup.doctor_id == doctor_id,
+            TreatmentDailyRollup.dental_service_id == service_id
+        ).populate_existing().with_for_update().one()
+        rollup.treatment_count += increments[key]
+    db.flush()
+    _add_patients(db, keys, patient_id)
+    return len(keys)
+
+
+def rebuild_rollups(db: Session) -> int:
+    """
+    Recalcular todo el agregado desde treatments
+
+    Conviene ejecutarlo sin tratamientos nuevos en curso.
+
+    Returns:
+        Número de tratamientos agregados
+    """
+    counts: Dict[RollupKey, int] = defaultdict(int)
+    patients: Dict[RollupKey, Set[int]] = defaultdict(set)
+    rows = db.query(
+        Treatment.treatment_date, Treatment.doctor_id, Treatment.dental_service_id, ClinicalHistory.patient_id
+    ).join(ClinicalHistory, ClinicalHistory.id == Treatment.clinical_history_id)\
+        .execution_options(yield_per=REBUILD_BATCH_SIZE)
+
+    total = 0
+    for treatment_date, doctor_id, service_id, patient_id in rows:
+        key = rollup_key(treatment_date, doctor_id, service_id)
+        counts[key] += 1
+        patients[key].add(patient_id)
+        total += 1
+
+    db.query(TreatmentDailyPatient).delete(synchronize_session=False)
+    db.query(TreatmentDailyRollup).delete(synchronize_session=False)
+    if counts:
+        db.bulk_insert_mappings(TreatmentDailyRollup, [
+            {"day": day, "doctor_id": doctor_id, "dental_service_id": service_id, "treatment_count": count}
+            for (day, doctor_id, service_id), count in sorted(counts.items())
+        ])
+        db.bulk_insert_mappings(TreatmentDailyPatient, [
+            {"day": day, "doctor_id": doctor_id, "dental_service_id": service_id, "patient_id": patient_id}
+            for (day, doctor_id, service_id), patient_ids in sorted(patients.items())
+            for patient_id in sorted(patient_ids)
+        ])
+    db.commit()
+    # Borrado e inserción masivos: no pasan por el seguimiento del ORM
+    invalidation_bus.publish([TreatmentDailyRollup.__tablename__, TreatmentDailyPatient.__tablename__])
+    logger.info(f"Agregado del dashboard reconstruido: {total} tratamientos en {len(counts)} filas")
+    return total
+
+
+def ensure_rollups(db: Session) -> bool:
+    """
+    Reconstruir el agregado si está vacío pero hay tratamientos (primera ejecución)
+
+    También si faltan los pacientes (base de datos con el agregado anterior,
+    que los guardaba en una columna de texto).
+
+    Returns:
+        True si se reconstruyó
+    """
+    if db.query(TreatmentDailyRollup.day).first() is not None and db.query(TreatmentDailyPatient.day).first() is not None:
+        return False
+    if db.query(Treatment.id).first() is None:
+        return False
+    rebuild_rollups(db)
+    return True
+
+
+def rollup_filters(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    doctor_id: Optional[str] = None,
+    procedure_id: Optional[int] = None,
+    model: Type = TreatmentDailyRollup
+) -> list:
+    """
+    Condiciones sobre el agregado (o sus pacientes) equivalentes a los filtros de fecha, doctor y procedimiento
+
+    El agregado es diario: end_date incluye el día completo, igual que las
+    consultas directas sobre treatments (``treatment_date < end_date + 1 día``).
+    """
+    conditions = []
+    if start_date:
+        conditions.append(model.day >= to_day(start_date))
+    if end_date:
+        conditions.append(model.day <= to_day(end_date))
+    if doctor_id:
+        conditions.append(model.doctor_id == doctor_id)
+    if procedure_id:
+        conditions.append(model.dental_service_id == procedure_id)
+    return conditions
+
+
+def distinct_active_patients(
+    db: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    doctor_id: Optional[str] = None
+) -> int:
+    """Pacientes activos distintos atendidos en el rango (COUNT DISTINCT en la base de datos)"""
+    return db.query(func.count(func.distinct(TreatmentDailyPatient.patient_id))).join(
+        Patient, Patient.id == TreatmentDailyPatient.patient_id
+    ).filter(
+        Patient.is_active == True,
+        *rollup_filters(start_date, end_date, doctor_id, model=TreatmentDailyPatient)
+    ).scalar() or 0
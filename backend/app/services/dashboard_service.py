@@ -2,10 +2,14 @@
 Servicio para el dashboard del sistema odontológico
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, extract, case
-from datetime import datetime, date
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import func, and_, case
+from datetime import datetime, date, timedelta
+from dateutil.relativedelta import relativedelta
+import asyncio
 import logging
-from typing import List, Dict, Optional
+import time
+from typing import Any, Awaitable, Callable, List, Dict, Optional
 
 from ..models.patient_models import Patient
 from ..models.clinical_history_models import ClinicalHistory
@@ -13,6 +17,11 @@ from ..models.treatment_models import Treatment
 from ..models.user_models import User
 from ..models.rol_models import Role
 from ..models.dental_service_models import DentalService
+from ..models.dashboard_rollup_models import TreatmentDailyRollup
+from .dashboard_rollup_service import distinct_active_patients, rollup_filters
+from .dashboard_cache import dashboard_cache
+from .time_buckets import bucket_label, day_after, month_bucket, month_labels, month_range, range_filter
+from ..config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +30,7 @@ class DashboardService:
     """Servicio para obtener estadísticas del dashboard"""
     
     @staticmethod
+    @dashboard_cache.cached("patients", "clinical_histories", "treatments", "treatment_daily_rollups", "treatment_daily_patients")
     def get_active_patients_stats(
         db: Session,
         start_date: Optional[date] = None,
@@ -39,7 +49,7 @@ class DashboardService:
         Lógica de filtros:
             - start_date solo: Filtra desde start_date hasta hoy
             - end_date solo: Filtra desde el inicio hasta end_date
-            - Ambos: Filtra el rango específico
+            - Ambos: Filtra el rango específico (end_date se incluye completo)
             - Ninguno: Mes actual por defecto
         
         Returns:
@@ -54,6 +64,18 @@ class DashboardService:
                 Patient.is_active == True
             ).scalar()
             
+            if settings.dashboard_use_rollups:
+                if not start_date and not end_date:
+                    # Default: mes actual
+                    today = date.today()
+                    start_date = today.replace(day=1)
+                    end_date = (start_date + relativedelta(months=1)) - timedelta(days=1)
+                active_patients_period = distinct_active_patients(db, start_date, end_date, doctor_id)
+                return {
+                    "total_active_patients": total_active_patients or 0,
+                    "active_patients_period": active_patients_period
+                }
+            
             # Construir query para pacientes activos con atención
             query = db.query(func.count(func.distinct(Patient.id))).join(
                 ClinicalHistory, Patient.id == ClinicalHistory.patient_id
@@ -66,18 +88,13 @@ class DashboardService:
             # Aplicar filtros de fecha con lógica flexible
             if start_date or end_date:
                 # Si se proporciona al menos una fecha, aplicar filtros parciales
-                if start_date:
-                    query = query.filter(Treatment.treatment_date >= start_date)
-                if end_date:
-                    query = query.filter(Treatment.treatment_date <= end_date)
+                # end_date incluye el día completo (igual que el agregado diario)
+                query = query.filter(*range_filter(
+                    Treatment.treatment_date, start_date, day_after(end_date) if end_date else None
+                ))
             else:
-                # Default: mes actual (solo si no se especifica ninguna fecha)
-                current_year = datetime.now().year
-                current_month = datetime.now().month
-                query = query.filter(
-                    extract('year', Treatment.treatment_date) == current_year,
-                    extract('month', Treatment.treatment_date) == current_month
-                )
+                # Default: mes actual (solo si no se especifica ninguna fecha), como rango
+                query = query.filter(*range_filter(Treatment.treatment_date, *month_range(datetime.now())))
             
             # Aplicar filtro de doctor si se proporciona
             if doctor_id:
@@ -97,6 +114,7 @@ class DashboardService:
             raise Exception(f"Error obteniendo estadísticas de pacientes activos: {str(e)}")
     
     @staticmethod
+    @dashboard_cache.cached("users", "roles")
     def get_employees_by_role_stats(
         db: Session,
         role: Optional[str] = None,
@@ -175,6 +193,7 @@ class DashboardService:
             raise Exception(f"Error obteniendo estadísticas de empleados por rol: {str(e)}")
     
     @staticmethod
+    @dashboard_cache.cached("treatments", "dental_service", "treatment_daily_rollups")
     def get_procedures_distribution(
         db: Session,
         start_date: Optional[date] = None,
@@ -195,7 +214,7 @@ class DashboardService:
         Lógica de filtros:
             - start_date solo: Filtra desde start_date en adelante
             - end_date solo: Filtra hasta end_date
-            - Ambos: Filtra el rango específico
+            - Ambos: Filtra el rango específico (end_date se incluye completo)
             - Ninguno: Todos los procedimientos históricos
         
         Usa función de ventana (OVER) para calcular porcentajes en una sola consulta SQL.
@@ -225,16 +244,20 @@ class DashboardService:
             }
         """
         try:
+            if settings.dashboard_use_rollups:
+                return DashboardService._procedures_distribution_from_rollups(
+                    db, start_date, end_date, doctor_id, procedure_id
+                )
+            
             # Construir query base con filtros
             base_query = db.query(Treatment).filter(
                 Treatment.dental_service_id.isnot(None)
             )
             
-            # Aplicar filtros de fecha
-            if start_date:
-                base_query = base_query.filter(Treatment.treatment_date >= start_date)
-            if end_date:
-                base_query = base_query.filter(Treatment.treatment_date <= end_date)
+            # Aplicar filtros de fecha (end_date incluye el día completo)
+            base_query = base_query.filter(*range_filter(
+                Treatment.treatment_date, start_date, day_after(end_date) if end_date else None
+            ))
             
             # Aplicar filtro de doctor
             if doctor_id:
@@ -271,10 +294,9 @@ class DashboardService:
             )
             
             # Aplicar los mismos filtros
-            if start_date:
-                procedures_query = procedures_query.filter(Treatment.treatment_date >= start_date)
-            if end_date:
-                procedures_query = procedures_query.filter(Treatment.treatment_date <= end_date)
+            procedures_query = procedures_query.filter(*range_filter(
+                Treatment.treatment_date, start_date, day_after(end_date) if end_date else None
+            ))
             if doctor_id:
                 procedures_query = procedures_query.filter(Treatment.doctor_id == doctor_id)
             if procedure_id:
@@ -308,6 +330,7 @@ class DashboardService:
             raise Exception(f"Error obteniendo distribución de procedimientos: {str(e)}")
     
     @staticmethod
+    @dashboard_cache.cached("treatments", "users", "roles", "treatment_daily_rollups")
     def get_procedures_by_doctor(
         db: Session,
         start_date: Optional[date] = None,
@@ -326,7 +349,7 @@ class DashboardService:
         Lógica de filtros:
             - start_date solo: Filtra desde start_date en adelante
             - end_date solo: Filtra hasta end_date
-            - Ambos: Filtra el rango específico
+            - Ambos: Filtra el rango específico (end_date se incluye completo)
             - Ninguno: Todos los procedimientos históricos
         
         Usa función de ventana (OVER) para calcular porcentajes en una sola consulta SQL.
@@ -341,7 +364,7 @@ class DashboardService:
         JOIN roles r ON u.role_id = r.id
         WHERE r.name = 'Doctor' AND u.is_active = true
           [AND t.treatment_date >= start_date]
-          [AND t.treatment_date <= end_date]
+          [AND t.treatment_date < end_date + 1 día]
           [AND t.dental_service_id = procedure_id]
         GROUP BY doctor
         ORDER BY total_procedures DESC;
@@ -360,6 +383,11 @@ class DashboardService:
             # Construir el nombre completo del doctor
             doctor_name = func.concat(User.first_name, ' ', User.last_name).label('doctor')
             
+            if settings.dashboard_use_rollups:
+                return DashboardService._procedures_by_doctor_from_rollups(
+                    db, doctor_name, start_date, end_date, procedure_id
+                )
+            
             # Contar tratamientos
             count_treatments = func.count(Treatment.id).label('total_procedures')
             
@@ -389,10 +417,10 @@ class DashboardService:
             if start_date or end_date or procedure_id:
                 # Crear condiciones para el WHERE del LEFT JOIN
                 treatment_conditions = []
-                if start_date:
-                    treatment_conditions.append(Treatment.treatment_date >= start_date)
-                if end_date:
-                    treatment_conditions.append(Treatment.treatment_date <= end_date)
+                # end_date incluye el día completo
+                treatment_conditions.extend(range_filter(
+                    Treatment.treatment_date, start_date, day_after(end_date) if end_date else None
+                ))
                 if procedure_id:
                     treatment_conditions.append(Treatment.dental_service_id == procedure_id)
                 
@@ -439,6 +467,7 @@ class DashboardService:
             raise Exception(f"Error obteniendo procedimientos por doctor: {str(e)}")
     
     @staticmethod
+    @dashboard_cache.cached("treatments", "treatment_daily_rollups")
     def get_treatments_per_month(
         db: Session,
         year: Optional[int] = None,
@@ -456,24 +485,15 @@ class DashboardService:
         
         Genera una serie de los últimos 12 meses e incluye meses sin tratamientos con valor 0.
         
-        SQL equivalente:
-        WITH meses AS (
-            SELECT 
-                TO_CHAR(generate_series(
-                    date_trunc('month', NOW()) - INTERVAL '11 months', 
-                    date_trunc('month', NOW()), 
-                    interval '1 month'
-                ), 'YYYY-MM') AS mes
-        )
+        SQL equivalente (los meses sin datos se completan con 0 en Python):
         SELECT 
-            m.mes,
-            COALESCE(COUNT(t.id), 0) AS total_tratamientos
-        FROM meses m
-        LEFT JOIN treatments t ON TO_CHAR(t.treatment_date, 'YYYY-MM') = m.mes
+            date_trunc('month', t.treatment_date) AS mes,
+            COUNT(*) AS total_tratamientos
+        FROM treatments t
+        WHERE t.treatment_date >= :inicio AND t.treatment_date < :fin
           [AND t.doctor_id = doctor_id]
           [AND t.dental_service_id = procedure_id]
-        GROUP BY m.mes
-        ORDER BY m.mes;
+        GROUP BY 1;
         
         Returns:
             list: [
@@ -501,30 +521,42 @@ class DashboardService:
                 start_month = end_month - relativedelta(months=11)
             
             # Generar lista de meses
-            months_list = []
-            current_month = start_month
-            while current_month <= end_month:
-                months_list.append(current_month.strftime('%Y-%m'))
-                current_month += relativedelta(months=1)
+            months_list = month_labels(start_month, end_month)
             
-            # Construir query base para tratamientos
-            try:
-                # Intentar con PostgreSQL (to_char)
-                treatments_query = db.query(
-                    func.to_char(Treatment.treatment_date, 'YYYY-MM').label('month'),
-                    func.count(Treatment.id).label('total')
-                )
-            except Exception:
-                # Fallback para SQLite (strftime)
-                treatments_query = db.query(
-                    func.strftime('%Y-%m', Treatment.treatment_date).label('month'),
-                    func.count(Treatment.id).label('total')
-                )
+            if settings.dashboard_use_rollups:
+                # Totales por día del agregado; se agrupan por mes aquí
+                daily_query = db.query(
+                    TreatmentDailyRollup.day,
+                    func.sum(TreatmentDailyRollup.treatment_count)
+                ).filter(
+                    TreatmentDailyRollup.day >= start_month.date(),
+                    TreatmentDailyRollup.day < (end_month + relativedelta(months=1)).date(),
+                    *rollup_filters(doctor_id=doctor_id, procedure_id=procedure_id)
+                ).group_by(TreatmentDailyRollup.day)
+                
+                totals_by_month: Dict[str, int] = {}
+                for day, total in daily_query.all():
+                    month = day.strftime('%Y-%m')
+                    totals_by_month[month] = totals_by_month.get(month, 0) + int(total)
+                result = [
+                    {"month": month, "total_treatments": totals_by_month.get(month, 0)}
+                    for month in months_list
+                ]
+                logger.info(f"Tratamientos por mes obtenidos del agregado: {len(result)} meses")
+                return result
+            
+            # Construir query base para tratamientos: date_trunc (PostgreSQL) o strftime (SQLite).
+            # count(*) en lugar de count(id) para que el índice
+            # idx_treatments_date_doctor_service cubra la consulta
+            bucket = month_bucket(db, Treatment.treatment_date)
+            treatments_query = db.query(
+                bucket.label('month'),
+                func.count().label('total')
+            )
             
             # Aplicar filtro de rango de fechas
             treatments_query = treatments_query.filter(
-                Treatment.treatment_date >= start_month,
-                Treatment.treatment_date < end_month + relativedelta(months=1)
+                *range_filter(Treatment.treatment_date, start_month, end_month + relativedelta(months=1))
             )
             
             # Aplicar filtro de doctor si se proporciona
@@ -536,17 +568,10 @@ class DashboardService:
                 treatments_query = treatments_query.filter(Treatment.dental_service_id == procedure_id)
             
             # Agrupar por mes
-            try:
-                treatments_by_month = treatments_query.group_by(
-                    func.to_char(Treatment.treatment_date, 'YYYY-MM')
-                ).all()
-            except Exception:
-                treatments_by_month = treatments_query.group_by(
-                    func.strftime('%Y-%m', Treatment.treatment_date)
-                ).all()
+            treatments_by_month = treatments_query.group_by(bucket).all()
             
             # Convertir a diccionario para búsqueda rápida
-            treatments_dict = {row.month: row.total for row in treatments_by_month}
+            treatments_dict = {bucket_label(row.month): row.total for row in treatments_by_month}
             
             # Construir la respuesta incluyendo todos los meses (con 0 si no hay datos)
             result = [
@@ -564,3 +589,241 @@ class DashboardService:
         except Exception as e:
             logger.error(f"Error obteniendo tratamientos por mes: {e}")
             raise Exception(f"Error obteniendo tratamientos por mes: {str(e)}")
+    
+    # -------------------------------------------------------------------------
+    # Consultas sobre el agregado diario (treatment_daily_rollups)
+    # -------------------------------------------------------------------------
+    
+    @staticmethod
+    def _procedures_distribution_from_rollups(
+        db: Session,
+        start_date: Optional[date],
+        end_date: Optional[date],
+        doctor_id: Optional[str],
+        procedure_id: Optional[int]
+    ) -> dict:
+        """get_procedures_distribution sumando el agregado diario"""
+        quantity = func.sum(TreatmentDailyRollup.treatment_count)
+        percentage_column = func.round(quantity * 100.0 / func.sum(quantity).over(), 2).label('percentage')
+        
+        rows = db.query(
+            DentalService.name.label('procedure'),
+            quantity.label('quantity'),
+            percentage_column
+        ).join(
+            TreatmentDailyRollup, DentalService.id == TreatmentDailyRollup.dental_service_id
+        ).filter(
+            *rollup_filters(start_date, end_date, doctor_id, procedure_id)
+        ).group_by(
+            DentalService.name
+        ).order_by(
+            quantity.desc()
+        ).all()
+        
+        distribution = [
+            {
+                "procedure": row.procedure,
+                "quantity": int(row.quantity),
+                "percentage": float(row.percentage)
+            }
+            for row in rows
+        ]
+        total_procedures = sum(item["quantity"] for item in distribution)
+        
+        logger.info(f"Distribución de procedimientos obtenida del agregado: total={total_procedures}, tipos={len(distribution)}")
+        
+        return {
+            "total_procedures": total_procedures,
+            "distribution": distribution
+        }
+    
+    @staticmethod
+    def _procedures_by_doctor_from_rollups(
+        db: Session,
+        doctor_name,
+        start_date: Optional[date],
+        end_date: Optional[date],
+        procedure_id: Optional[int]
+    ) -> list:
+        """get_procedures_by_doctor sumando el agregado diario (doctores sin tratamientos con 0)"""
+        total = func.coalesce(func.sum(TreatmentDailyRollup.treatment_count), 0)
+        percentage_column = func.round(
+            total * 100.0 / func.nullif(func.sum(total).over(), 0),
+            2
+        ).label('percentage')
+        
+        rows = db.query(
+            doctor_name,
+            total.label('total_procedures'),
+            percentage_column
+        ).outerjoin(
+            TreatmentDailyRollup,
+            and_(
+                TreatmentDailyRollup.doctor_id == User.uid,
+                *rollup_filters(start_date, end_date, procedure_id=procedure_id)
+            )
+        ).join(
+            Role, User.role_id == Role.id
+        ).filter(
+            Role.name == 'Doctor',
+            User.is_active == True
+        ).group_by(
+            doctor_name
+        ).order_by(
+            total.desc()
+        ).all()
+        
+        procedures_by_doctor = [
+            {
+                "doctor": row.doctor,
+                "total_procedures": int(row.total_procedures),
+                "percentage": float(row.percentage) if row.percentage is not None else 0.0
+            }
+            for row in rows
+        ]
+        
+        logger.info(f"Procedimientos por doctor obtenidos del agregado: {len(procedures_by_doctor)} doctores activos")
+        
+        return procedures_by_doctor
+    
+    # -------------------------------------------------------------------------
+    # Versiones asíncronas (AsyncSession / asyncpg)
+    #
+    # Ejecutan exactamente las mismas consultas mediante AsyncSession.run_sync:
+    # la E/S de base de datos se espera en el driver asíncrono, así que una
+    # agregación lenta no bloquea el event loop del worker.
+    # -------------------------------------------------------------------------
+    
+    @staticmethod
+    async def get_active_patients_stats_async(
+        db: AsyncSession,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        doctor_id: Optional[str] = None
+    ) -> dict:
+        """Versión asíncrona de get_active_patients_stats"""
+        return await db.run_sync(
+            DashboardService.get_active_patients_stats,
+            start_date=start_date,
+            end_date=end_date,
+            doctor_id=doctor_id
+        )
+    
+    @staticmethod
+    async def get_employees_by_role_stats_async(
+        db: AsyncSession,
+        role: Optional[str] = None,
+        is_active: Optional[bool] = True
+    ) -> dict:
+        """Versión asíncrona de get_employees_by_role_stats"""
+        return await db.run_sync(
+            DashboardService.get_employees_by_role_stats,
+            role=role,
+            is_active=is_active
+        )
+    
+    @staticmethod
+    async def get_procedures_distribution_async(
+        db: AsyncSession,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        doctor_id: Optional[str] = None,
+        procedure_id: Optional[int] = None
+    ) -> dict:
+        """Versión asíncrona de get_procedures_distribution"""
+        return await db.run_sync(
+            DashboardService.get_procedures_distribution,
+            start_date=start_date,
+            end_date=end_date,
+            doctor_id=doctor_id,
+            procedure_id=procedure_id
+        )
+    
+    @staticmethod
+    async def get_procedures_by_doctor_async(
+        db: AsyncSession,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        procedure_id: Optional[int] = None
+    ) -> list:
+        """Versión asíncrona de get_procedures_by_doctor"""
+        return await db.run_sync(
+            DashboardService.get_procedures_by_doctor,
+            start_date=start_date,
+            end_date=end_date,
+            procedure_id=procedure_id
+        )
+    
+    @staticmethod
+    async def get_treatments_per_month_async(
+        db: AsyncSession,
+        year: Optional[int] = None,
+        doctor_id: Optional[str] = None,
+        procedure_id: Optional[int] = None
+    ) -> list:
+        """Versión asíncrona de get_treatments_per_month"""
+        return await db.run_sync(
+            DashboardService.get_treatments_per_month,
+            year=year,
+            doctor_id=doctor_id,
+            procedure_id=procedure_id
+        )
+    
+    @staticmethod
+    async def get_dashboard_summary_async(
+        session_factory: async_sessionmaker,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        doctor_id: Optional[str] = None,
+        procedure_id: Optional[int] = None,
+        year: Optional[int] = None,
+        role: Optional[str] = None,
+        is_active: Optional[bool] = True
+    ) -> Dict[str, Any]:
+        """
+        Los cinco widgets del dashboard en paralelo, cada uno con su propia sesión
+        (conexión del pool), ya que una AsyncSession no admite consultas concurrentes.
+        
+        Un widget que falla o supera ``dashboard_widget_timeout`` no impide
+        devolver los demás: queda con data=None y el error en su estado.
+        
+        Returns:
+            dict: {
+                "<widget>": {"data": ..., "ok": bool, "error": str | None, "elapsed_ms": float}
+            }
+        """
+        widgets: Dict[str, Callable[[AsyncSession], Awaitable[Any]]] = {
+            "active_patients": lambda db: DashboardService.get_active_patients_stats_async(
+                db, start_date=start_date, end_date=end_date, doctor_id=doctor_id
+            ),
+            "employees": lambda db: DashboardService.get_employees_by_role_stats_async(
+                db, role=role, is_active=is_active
+            ),
+            "procedures_distribution": lambda db: DashboardService.get_procedures_distribution_async(
+                db, start_date=start_date, end_date=end_date, doctor_id=doctor_id, procedure_id=procedure_id
+            ),
+            "procedures_by_doctor": lambda db: DashboardService.get_procedures_by_doctor_async(
+                db, start_date=start_date, end_date=end_date, procedure_id=procedure_id
+            ),
+            "treatments_per_month": lambda db: DashboardService.get_treatments_per_month_async(
+                db, year=year, doctor_id=doctor_id, procedure_id=procedure_id
+            ),
+        }
+        
+        async def run_widget(name: str, query: Callable[[AsyncSession], Awaitable[Any]]) -> Dict[str, Any]:
+            start = time.perf_counter()
+            try:
+                async with session_factory() as db:
+                    data = await asyncio.wait_for(query(db), timeout=settings.dashboard_widget_timeout)
+                return {"data": data, "ok": True, "error": None, "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
+            except asyncio.TimeoutError:
+                error = f"Tiempo de espera agotado ({settings.dashboard_widget_timeout} s)"
+                logger.error(f"Error en el widget '{name}' del resumen del dashboard: {error}")
+            except Exception:
+                # El detalle queda en el log; al cliente solo se le devuelve un mensaje genérico
+                logger.exception(f"Error en el widget '{name}' del resumen del dashboard")
+                error = "Error obteniendo los datos del widget"
+            return {"data": None, "ok": False, "error": error, "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
+        
+        results = await asyncio.gather(*(run_widget(name, query) for name, query in widgets.items()))
+        return dict(zip(widgets, results))
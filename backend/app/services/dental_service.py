@@ -3,7 +3,7 @@ Servicio para manejo de servicios odontológicos
 """
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from fastapi import HTTPException, status
 
 from app.models.dental_service_models import DentalService
@@ -13,23 +13,20 @@ from app.schemas.dental_service_schema import (
     DentalServiceStatusChange
 )
 from app.services.auditoria_service import AuditoriaService
+from app.services.count_cache import count_total
+from app.middleware.principal import Principal
+from app.middleware.audit_session import declare_event_type
 
 
 class DentalServiceService:
     """Servicio para operaciones CRUD de servicios odontológicos"""
     
-    def __init__(self, db: Session, user_id: Optional[str] = None, user_ip: str = "unknown"):
+    def __init__(self, db: Session, user_id: Optional[str] = None, user_ip: str = "unknown", principal: Optional[Principal] = None):
         self.db = db
-        self.user_ip = user_ip
-        
-        # Solo proceder si tenemos un user_id válido
-        if user_id:
-            self.user_id = user_id
-            # Obtener rol y email del usuario para auditoría
-            self.user_role, self.user_email = AuditoriaService._obtener_datos_usuario(db, self.user_id)
-        else:
-            # Si no hay usuario autenticado, no permitir operaciones de auditoría
-            raise ValueError("No se puede realizar operaciones sin usuario autenticado")
+        self.principal = Principal.resolve(db, user_id, principal, user_ip)
+        self.user_id = self.principal.uid
+        self.user_ip = principal.ip if principal else user_ip
+        self.user_role, self.user_email = self.principal.role, self.principal.email
 
     def create_dental_service(self, service_data: DentalServiceCreate) -> DentalService:
         """Crear un nuevo servicio odontológico"""
@@ -102,16 +99,14 @@ class DentalServiceService:
         
         return dental_service
 
-    def get_dental_services(
-        self, 
-        skip: int = 0, 
-        limit: int = 100,
+    def _dental_services_query(
+        self,
         is_active: Optional[bool] = None,
         search: Optional[str] = None,
         min_price: Optional[float] = None,
         max_price: Optional[float] = None
-    ) -> List[DentalService]:
-        """Obtener lista de servicios odontológicos con filtros múltiples"""
+    ):
+        """Consulta de servicios odontológicos con los filtros del listado (sin paginar)"""
         
         query = self.db.query(DentalService)
         
@@ -151,9 +146,32 @@ class DentalServiceService:
             query = query.filter(DentalService.value <= max_price)
         
         # Ordenar por nombre
-        query = query.order_by(DentalService.name)
-        
+        return query.order_by(DentalService.name)
+    
+    def get_dental_services(
+        self, 
+        skip: int = 0, 
+        limit: int = 100,
+        is_active: Optional[bool] = None,
+        search: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None
+    ) -> List[DentalService]:
+        """Obtener lista de servicios odontológicos con filtros múltiples"""
+        query = self._dental_services_query(is_active, search, min_price, max_price)
         return query.offset(skip).limit(limit).all()
+    
+    def count_dental_services(
+        self,
+        is_active: Optional[bool] = None,
+        search: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None
+    ) -> Tuple[int, bool]:
+        """Total de servicios odontológicos con los filtros del listado: (total, es_estimado)"""
+        query = self._dental_services_query(is_active, search, min_price, max_price)
+        filters = {"is_active": is_active, "search": search, "min_price": min_price, "max_price": max_price}
+        return count_total(self.db, query, ("dental_service",), filters)
 
     def update_dental_service(self, service_id: int, service_data: DentalServiceUpdate) -> DentalService:
         """Actualizar un servicio odontológico"""
@@ -310,6 +328,8 @@ class DentalServiceService:
         # Actualizar estado
         dental_service.is_active = status_data.is_active
         
+        # El evento se registra después del commit: en modo unificado el trigger necesita su tipo antes
+        declare_event_type(self.db, "REACTIVATE" if new_status else "DEACTIVATE", "dental_services", dental_service.id)
         self.db.commit()
         self.db.refresh(dental_service)
         
@@ -368,6 +388,6 @@ class DentalServiceService:
 
 
 
-def get_dental_service_service(db: Session, user_id: Optional[str] = None, user_ip: str = "unknown") -> DentalServiceService:
+def get_dental_service_service(db: Session, user_id: Optional[str] = None, user_ip: str = "unknown", principal: Optional[Principal] = None) -> DentalServiceService:
     """Factory function para crear instancia del servicio"""
-    return DentalServiceService(db, user_id, user_ip)
\ No newline at end of file
+    return DentalServiceService(db, user_id, user_ip, principal=principal)
\ No newline at end of file
@@ -5,6 +5,10 @@ import requests
 from typing import Optional
 from dotenv import load_dotenv
 
+from ..config import settings
+from .token_cache import VerifiedTokenCache
+from .local_token_verifier import LocalTokenVerifier
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -36,6 +40,24 @@ if not firebase_admin._apps:
                 print(f"   - {file}")
         print("Firebase no se inicializó. Las funciones de Firebase no estarán disponibles.")
 
+# Verificación local de tokens (sin llamadas de red a Google)
+local_token_verifier: Optional[LocalTokenVerifier] = None
+if settings.firebase_verification_mode == "local":
+    local_token_verifier = LocalTokenVerifier(
+        keys_path=settings.firebase_signing_keys_path,
+        project_id=settings.firebase_project_id,
+        issuer=settings.firebase_token_issuer or None,
+        refresh_interval=settings.firebase_signing_keys_refresh
+    )
+    local_token_verifier.start()
+    print(f"🔑 Verificación local de tokens activa (claves en {settings.firebase_signing_keys_path})")
+
+# Caché de tokens ya verificados (compartida por todo el proceso)
+token_cache = VerifiedTokenCache(
+    max_size=settings.token_cache_max_size,
+    max_ttl=settings.token_cache_max_ttl
+)
+
 class FirebaseService:
     """Servicio para gestionar usuarios en Firebase Authentication"""
     
@@ -117,6 +139,10 @@ class FirebaseService:
         """
         Verificar un token de Firebase
         
+        Los tokens ya verificados se sirven desde la caché hasta su expiración.
+        Con FIREBASE_VERIFICATION_MODE=local la firma se verifica en el proceso
+        con las claves locales, sin acceso a red.
+        
         Args:
             id_token: Token JWT de Firebase
             
@@ -124,16 +150,44 @@ class FirebaseService:
             Datos del token decodificado o None si hay error
         """
         try:
-            if not firebase_admin._apps:
-                print("Firebase no está inicializado.")
-                return None
+            if settings.token_cache_enabled:
+                cached_token = token_cache.get(id_token)
+                if cached_token is not None:
+                    return cached_token
+            
+            if local_token_verifier is not None:
+                decoded_token = local_token_verifier.verify(id_token)
+            else:
+                if not firebase_admin._apps:
+                    print("Firebase no está inicializado.")
+                    return None
                 
-            decoded_token = auth.verify_id_token(id_token)
+                decoded_token = auth.verify_id_token(id_token)
+            
+            if settings.token_cache_enabled and decoded_token:
+                token_cache.set(id_token, decoded_token)
             return decoded_token
         except Exception as e:
             print(f"Error verificando token de Firebase: {e}")
             return None
     
+    @staticmethod
+    def revoke_cached_tokens(uid: str) -> int:
+        """
+        Invalidar los tokens en caché de un usuario (p. ej. al desactivarlo)
+        
+        Returns:
+            Número de tokens eliminados de la caché
+        """
+        return token_cache.revoke_uid(uid)
+    
+    @staticmethod
+    def get_token_cache_stats() -> dict:
+        """Obtener los contadores de la caché de tokens"""
+        stats = token_cache.stats()
+        stats["enabled"] = settings.token_cache_enabled
+        return stats
+    
     @staticmethod
     def verify_password(email: str, password: str) -> bool:
         """
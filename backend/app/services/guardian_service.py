@@ -1,30 +1,27 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_
-from typing import Optional, List
+from sqlalchemy import and_
+from typing import Optional, List, Tuple
 from app.models.person_models import Person
 from app.models.patient_models import Patient
 from app.models.guardian_models import Guardian, PatientRelationshipEnum
 from app.schemas.guardian_schema import GuardianCreate, GuardianUpdate
 from app.services.person_service import PersonService, serialize_for_audit
 from app.services.auditoria_service import AuditoriaService
+from app.services.person_search import apply_person_search
+from app.services.count_cache import count_total
+from app.middleware.principal import Principal
 
 class GuardianService:
     
-    def __init__(self, db: Session, user_id: Optional[str] = None, user_ip: Optional[str] = None):
+    def __init__(self, db: Session, user_id: Optional[str] = None, user_ip: Optional[str] = None, principal: Optional[Principal] = None):
         self.db = db
-        self.user_ip = user_ip
         self.auditoria_service = AuditoriaService()
-        
-        # Solo proceder si tenemos un user_id válido
-        if user_id:
-            self.user_id = user_id
-            # Obtener rol y email del usuario para auditoría
-            self.user_role, self.user_email = AuditoriaService._obtener_datos_usuario(db, self.user_id)
-        else:
-            # Si no hay usuario autenticado, no permitir operaciones de auditoría
-            raise ValueError("No se puede realizar operaciones sin usuario autenticado")
+        self.principal = Principal.resolve(db, user_id, principal, user_ip)
+        self.user_id = self.principal.uid
+        self.user_ip = principal.ip if principal else user_ip
+        self.user_role, self.user_email = self.principal.role, self.principal.email
             
-        self.person_service = PersonService(db, user_id, user_ip)
+        self.person_service = PersonService(db, principal=self.principal)
     
     def create_guardian(self, guardian_data: GuardianCreate, allow_duplicate_contact: bool = False) -> Guardian:
         """
@@ -127,15 +124,13 @@ class GuardianService:
         
         return query.filter(Guardian.id == guardian_id).first()
     
-    def get_guardians(
+    def _guardians_query(
         self,
-        skip: int = 0,
-        limit: int = 100,
         active_only: bool = True,
         search: Optional[str] = None,
         relationship: Optional[PatientRelationshipEnum] = None
-    ) -> List[Guardian]:
-        """Obtener lista de guardianes con filtros"""
+    ):
+        """Consulta de guardianes con los filtros del listado (sin paginar)"""
         query = self.db.query(Guardian).join(Person).options(
             joinedload(Guardian.person),
             joinedload(Guardian.patients).joinedload(Patient.person)
@@ -148,16 +143,31 @@ class GuardianService:
             query = query.filter(Guardian.relationship_type == relationship)
         
         if search:
-            search_filter = or_(
-                Person.first_name.ilike(f"%{search}%"),
-                Person.first_surname.ilike(f"%{search}%"),
-                Person.second_surname.ilike(f"%{search}%"),
-                Person.document_number.ilike(f"%{search}%"),
-                Person.email.ilike(f"%{search}%")
-            )
-            query = query.filter(search_filter)
+            query = apply_person_search(query, search)
         
-        return query.offset(skip).limit(limit).all()
+        return query
+    
+    def get_guardians(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        active_only: bool = True,
+        search: Optional[str] = None,
+        relationship: Optional[PatientRelationshipEnum] = None
+    ) -> List[Guardian]:
+        """Obtener lista de guardianes con filtros"""
+        return self._guardians_query(active_only, search, relationship).offset(skip).limit(limit).all()
+    
+    def count_guardians(
+        self,
+        active_only: bool = True,
+        search: Optional[str] = None,
+        relationship: Optional[PatientRelationshipEnum] = None
+    ) -> Tuple[int, bool]:
+        """Total de guardianes con los filtros del listado: (total, es_estimado)"""
+        query = self._guardians_query(active_only, search, relationship)
+        filters = {"active_only": True if active_only else None, "search": search, "relationship": relationship}
+        return count_total(self.db, query, ("guardians", "persons"), filters)
     
     def update_guardian(self, guardian_id: int, guardian_data: GuardianUpdate, allow_duplicate_contact: bool = False) -> Optional[Guardian]:
         """
@@ -339,6 +349,6 @@ class GuardianService:
         
         return True
     
-def get_guardian_service(db: Session, user_id: Optional[str] = None, user_ip: Optional[str] = None) -> GuardianService:
+def get_guardian_service(db: Session, user_id: Optional[str] = None, user_ip: Optional[str] = None, principal: Optional[Principal] = None) -> GuardianService:
     """Factory para obtener instancia del servicio"""
-    return GuardianService(db, user_id, user_ip)
\ No newline at end of file
+    return GuardianService(db, user_id, user_ip, principal=principal)
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+Bus de invalidación de cachés por tabla
+
+Las cachés de resultados (totales de listados, dashboard) se suscriben con
+``invalidation_bus.subscribe(callback)`` y reciben el conjunto de tablas
+modificadas cada vez que se confirma una transacción que insertó, modificó o
+eliminó filas suyas por el ORM (eventos de Session). Si la transacción se
+revierte no se publica nada.
+
+Las escrituras hechas fuera del ORM (``query.delete()``, inserciones masivas,
+SQL directo) deben publicarse a mano con ``invalidation_bus.publish(...)``.
+"""
+import logging
+import threading
+from typing import Callable, Iterable, List, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+TABLES_KEY = "invalidation_bus_tables"
+
+Subscriber = Callable[[Set[str]], None]
+
+
+class InvalidationBus:
+    """Publica las tablas modificadas a las cachés suscritas"""
+
+    def __init__(self):
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Subscriber) -> Subscriber:
+        """Registrar una caché; recibe el conjunto de tablas modificadas"""
+        with self._lock:
+            self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback: Subscriber) -> None:
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def publish(self, tables: Iterable[str]) -> None:
+        """Avisar a las cachés de que cambiaron filas de estas tablas"""
+        tables = set(tables)
+        if not tables:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(tables)
+            except Exception as e:
+                # Una caché que falla no debe romper el commit ya confirmado
+                logger.error(f"Error invalidando caché para {sorted(tables)}: {e}")
+
+
+# Bus compartido por todo el proceso
+invalidation_bus = InvalidationBus()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_written_tables(session, flush_context):
+    tables = session.info.setdefault(TABLES_KEY, set())
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(type(instance), "__tablename__", None)
+        if table:
+            tables.add(table)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_written_tables(session):
+    tables = session.info.pop(TABLES_KEY, None)
+    if tables:
+        invalidation_bus.publish(tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_written_tables(session):
+    session.info.pop(TABLES_KEY, None)
@@ -0,0 +1,159 @@
+"""
+Verificación local (sin red) de ID tokens de Firebase
+
+Carga las claves públicas de firma desde un archivo o directorio local y
+verifica los tokens RS256 en el propio proceso con PyJWT. Las claves se
+recargan en segundo plano cuando cambian los archivos, de modo que ninguna
+petición espera por la descarga de certificados.
+
+Formatos admitidos:
+- Archivo JSON ``{"<kid>": "<PEM>"}`` (mismo formato que publica Google en
+  ``https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com``).
+- Archivo ``.pem``/``.crt`` con un certificado X.509 o una clave pública;
+  el ``kid`` es el nombre del archivo sin extensión.
+- Directorio con cualquier combinación de los anteriores.
+"""
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import jwt
+from cryptography import x509
+from cryptography.hazmat.primitives.serialization import load_pem_public_key
+
+logger = logging.getLogger(__name__)
+
+KEY_FILE_EXTENSIONS = (".json", ".pem", ".crt")
+
+
+def load_public_key(pem: str):
+    """Cargar una clave pública desde un certificado X.509 o una clave PEM"""
+    data = pem.encode("utf-8")
+    if b"BEGIN CERTIFICATE" in data:
+        return x509.load_pem_x509_certificate(data).public_key()
+    return load_pem_public_key(data)
+
+
+class LocalTokenVerifier:
+    """Verificador de ID tokens con claves de firma en disco"""
+
+    def __init__(
+        self,
+        keys_path: str,
+        project_id: str,
+        issuer: Optional[str] = None,
+        refresh_interval: int = 300,
+        leeway: int = 0
+    ):
+        self.keys_path = keys_path
+        self.project_id = project_id
+        self.issuer = issuer or f"https://securetoken.google.com/{project_id}"
+        self.refresh_interval = refresh_interval
+        self.leeway = leeway
+        self._keys: Dict[str, Any] = {}
+        self._fingerprint: Optional[tuple] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _key_files(self) -> list:
+        if os.path.isdir(self.keys_path):
+            return sorted(
+                os.path.join(self.keys_path, name)
+                for name in os.listdir(self.keys_path)
+                if name.endswith(KEY_FILE_EXTENSIONS)
+            )
+        return [self.keys_path] if os.path.isfile(self.keys_path) else []
+
+    def load_keys(self, force: bool = False) -> int:
+        """
+        Cargar (o recargar) las claves públicas
+
+        Solo vuelve a leer los archivos si cambió su fecha de modificación.
+        Si la lectura falla se conservan las claves anteriores.
+
+        Returns:
+            Número de claves disponibles
+        """
+        files = self._key_files()
+        fingerprint = tuple((path, os.path.getmtime(path)) for path in files)
+        if not force and fingerprint == self._fingerprint:
+            return len(self._keys)
+
+        keys: Dict[str, Any] = {}
+        try:
+            for path in files:
+                with open(path, "r", encoding="utf-8") as key_file:
+                    content = key_file.read()
+                if path.endswith(".json"):
+                    for kid, pem in json.loads(content).items():
+                        keys[kid] = load_public_key(pem)
+                elif "PRIVATE KEY" in content:
+                    # La clave privada de firma puede convivir en el directorio; no se usa
+                    continue
+                else:
+                    kid = os.path.splitext(os.path.basename(path))[0]
+                    keys[kid] = load_public_key(content)
+        except Exception as e:
+            logger.error(f"Error cargando claves de firma desde {self.keys_path}: {e}")
+            return len(self._keys)
+
+        # Reemplazo atómico del diccionario: las verificaciones en curso no se ven afectadas
+        self._keys = keys
+        self._fingerprint = fingerprint
+        logger.info(f"Claves de firma cargadas: {len(keys)} desde {self.keys_path}")
+        return len(keys)
+
+    def verify(self, id_token: str) -> Dict[str, Any]:
+        """
+        Verificar un ID token
+
+        Returns:
+            Claims del token, con ``uid`` igual al ``sub`` (como Firebase Admin)
+
+        Raises:
+            jwt.InvalidTokenError: si el token no es válido
+        """
+        header = jwt.get_unverified_header(id_token)
+        kid = header.get("kid")
+        key = self._keys.get(kid) if kid else None
+        if key is None:
+            raise jwt.InvalidTokenError(f"Clave de firma desconocida: {kid}")
+
+        decoded_token = jwt.decode(
+            id_token,
+            key,
+            algorithms=["RS256"],
+            audience=self.project_id,
+            issuer=self.issuer,
+            leeway=self.leeway,
+            options={"require": ["exp", "iat", "sub"]}
+        )
+        if not decoded_token.get("sub"):
+            raise jwt.InvalidTokenError("El token no tiene sub")
+
+        decoded_token["uid"] = decoded_token["sub"]
+        return decoded_token
+
+    def _refresh_loop(self) -> None:
+        while not self._stop_event.wait(self.refresh_interval):
+            self.load_keys()
+
+    def start(self) -> None:
+        """Cargar las claves y lanzar el refresco en segundo plano"""
+        self.load_keys(force=True)
+        if self._thread is None and self.refresh_interval > 0:
+            self._thread = threading.Thread(
+                target=self._refresh_loop,
+                name="firebase-keys-refresh",
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Detener el refresco en segundo plano"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
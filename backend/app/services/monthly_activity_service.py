@@ -0,0 +1,396 @@
+"""
+Instantáneas mensuales de actividad (tabla monthly_activity_reports)
+
+El reporte mensual y el anual leen una fila por mes en lugar de agrupar
+treatments en cada petición:
+
+- Las instantáneas se crean y se cierran en el mantenimiento
+  (``ensure_snapshots``: al arrancar, periódicamente con
+  ``monthly_snapshot_maintainer`` y desde
+  ``scripts/rebuild_monthly_reports.py``), nunca en una consulta: los
+  reportes no escriben. Un mes sin instantánea, o que terminó y sigue
+  abierta, se calcula al vuelo desde treatments sin guardarlo.
+- Un mes cerrado se calcula una última vez al cerrarse, lo que corrige
+  cualquier desviación acumulada, y queda congelado.
+- El mes en curso, una vez creada su instantánea, lo actualiza la aplicación
+  con los tratamientos que crea (``record_monthly_activity``). Como los
+  contadores de auditoría, los incrementos se acumulan en la sesión y se
+  aplican en una transacción corta propia después del commit: la fila del
+  mes en curso no queda bloqueada durante la transacción de negocio, que
+  serializaría todas las altas de tratamientos.
+
+En PostgreSQL el recálculo toma un advisory lock exclusivo del mes antes de
+contar y ``record_monthly_activity`` lo toma compartido (los compartidos no
+se bloquean entre sí): el recálculo espera a que terminen las transacciones
+que están creando tratamientos, así que su conteo los incluye. Cada
+incremento recuerda el ``refreshed_at`` de la instantánea que leyó su
+transacción y se descarta si al aplicarlo la instantánea ya se recalculó
+(ese recálculo ya lo contó); las transacciones que llegan después leen la
+instantánea nueva y sus incrementos sí se aplican.
+
+Los ingresos se toman de ``DentalService.value`` en el momento de registrar
+(o calcular) la actividad. Los tratamientos cargados con fecha de un mes ya
+cerrado no cambian su instantánea; ``scripts/rebuild_monthly_reports.py`` la
+recalcula.
+"""
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, event, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.dental_service_models import DentalService
+from ..models.report_models import MonthlyActivityReport
+from ..models.treatment_models import Treatment
+from .dashboard_rollup_service import to_day
+
+logger = logging.getLogger(__name__)
+
+# Meses hacia atrás (además del en curso) cuyas instantáneas crea el mantenimiento
+MAINTAINED_MONTHS = 12
+
+# Incrementos pendientes de una sesión hasta su commit
+PENDING_KEY = "monthly_activity_pending"
+
+
+def month_label(month: int) -> str:
+    """Valor de la columna month ("03")"""
+    return f"{month:02d}"
+
+
+def month_bounds(year: int, month: int) -> Tuple[datetime, datetime]:
+    """Primer y último instante del mes (mismo criterio que el reporte mensual)"""
+    start_date = datetime(year, month, 1)
+    next_month = (start_date.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start_date, next_month - timedelta(seconds=1)
+
+
+def is_closed_month(year: int, month: int, today: Optional[datetime] = None) -> bool:
+    """True si el mes ya terminó"""
+    today = today or datetime.now()
+    return (year, month) < (today.year, today.month)
+
+
+def _procedures_totals(procedures: List[dict]) -> Tuple[int, Decimal]:
+    total_activities = sum(procedure["patient_count"] for procedure in procedures)
+    total_revenue = sum((Decimal(procedure["revenue"]) for procedure in procedures), Decimal("0"))
+    return total_activities, total_revenue
+
+
+def compute_month(db: Session, year: int, month: int) -> List[dict]:
+    """Resumen por procedimiento del mes calculado desde treatments"""
+    start_date, end_date = month_bounds(year, month)
+    rows = db.query(
+        DentalService.name.label("procedure_name"),
+        func.count(Treatment.id).label("patient_count"),
+        func.coalesce(func.sum(DentalService.value), 0).label("revenue")
+    ).join(
+        Treatment, Treatment.dental_service_id == DentalService.id
+    ).filter(
+        and_(
+            Treatment.treatment_date >= start_date,
+            Treatment.treatment_date <= end_date
+        )
+    ).group_by(DentalService.name).order_by(DentalService.name).all()
+
+    return [
+        {"procedure_name": row.procedure_name, "patient_count": row.patient_count, "revenue": str(Decimal(row.revenue))}
+        for row in rows
+    ]
+
+
+def _get_snapshot(db: Session, year: int, month: int, for_update: bool = False) -> Optional[MonthlyActivityReport]:
+    query = db.query(MonthlyActivityReport).filter(
+        MonthlyActivityReport.year == year,
+        MonthlyActivityReport.month == month_label(month)
+    )
+    if for_update:
+        query = query.populate_existing().with_for_update()
+    return query.first()
+
+
+def _lock_month(db: Session, year: int, month: int, shared: bool) -> None:
+    """Advisory lock del mes hasta el fin de la transacción (solo PostgreSQL)"""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    function = "pg_advisory_xact_lock_shared" if shared else "pg_advisory_xact_lock"
+    db.execute(
+        text(f"SELECT {function}(hashtext('monthly_activity_reports'), :month_key)"),
+        {"month_key": year * 100 + month}
+    )
+
+
+def _store_snapshot(db: Session, year: int, month: int, procedures: List[dict], closed: bool) -> None:
+    """Guardar (o reemplazar) la instantánea del mes, SIN commit"""
+    total_activities, total_revenue = _procedures_totals(procedures)
+    values = {
+        "total_activities": total_activities,
+        "total_revenue": total_revenue,
+        "procedures": procedures,
+        "is_closed": closed,
+        "refreshed_at": datetime.now(),
+    }
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        statement = (pg_insert if dialect == "postgresql" else sqlite_insert)(MonthlyActivityReport).values(
+            year=year, month=month_label(month), **values
+        )
+        db.execute(statement.on_conflict_do_update(index_elements=["year", "month"], set_=values))
+        return
+    snapshot = _get_snapshot(db, year, month, for_update=True)
+    if snapshot is None:
+        snapshot = MonthlyActivityReport(year=year, month=month_label(month))
+        db.add(snapshot)
+    for name, value in values.items():
+        setattr(snapshot, name, value)
+    db.flush()
+
+
+def _is_stale(snapshot: Optional[MonthlyActivityReport], year: int, month: int, today: Optional[datetime] = None) -> bool:
+    """True si el mes no tiene instantánea o terminó y la suya sigue abierta"""
+    return snapshot is None or (not snapshot.is_closed and is_closed_month(year, month, today))
+
+
+def _computed_snapshot(db: Session, year: int, month: int) -> MonthlyActivityReport:
+    """Instantánea calculada desde treatments sin guardarla (no se añade a la sesión)"""
+    procedures = compute_month(db, year, month)
+    total_activities, total_revenue = _procedures_totals(procedures)
+    return MonthlyActivityReport(
+        year=year, month=month_label(month), total_activities=total_activities, total_revenue=total_revenue,
+        procedures=procedures, is_closed=is_closed_month(year, month), refreshed_at=datetime.now()
+    )
+
+
+def get_month_snapshot(db: Session, year: int, month: int) -> MonthlyActivityReport:
+    """
+    Instantánea del mes, sin escribir
+
+    Si el mes no tiene instantánea o terminó y la suya sigue abierta, se
+    calcula desde treatments y se devuelve sin guardar.
+    """
+    snapshot = _get_snapshot(db, year, month)
+    if _is_stale(snapshot, year, month):
+        return _computed_snapshot(db, year, month)
+    return snapshot
+
+
+def get_year_snapshots(db: Session, year: int) -> List[MonthlyActivityReport]:
+    """Instantáneas de los meses del año hasta el mes en curso, en orden y sin escribir"""
+    today = datetime.now()
+    last_month = 12 if year < today.year else today.month if year == today.year else 0
+    snapshots = {
+        snapshot.month: snapshot
+        for snapshot in db.query(MonthlyActivityReport).filter(MonthlyActivityReport.year == year)
+    }
+    result = []
+    for month in range(1, last_month + 1):
+        snapshot = snapshots.get(month_label(month))
+        if _is_stale(snapshot, year, month, today):
+            snapshot = _computed_snapshot(db, year, month)
+        result.append(snapshot)
+    return result
+
+
+def _refresh_month(db: Session, year: int, month: int, today: Optional[datetime] = None) -> List[dict]:
+    """Recalcular y guardar la instantánea del mes con el lock del mes tomado, SIN commit"""
+    _lock_month(db, year, month, shared=False)
+    procedures = compute_month(db, year, month)
+    closed = is_closed_month(year, month, today)
+    _store_snapshot(db, year, month, procedures, closed)
+    logger.info(
+        f"Instantánea mensual {year}-{month_label(month)} calculada: "
+        f"{len(procedures)} procedimientos{' (cerrada)' if closed else ''}"
+    )
+    return procedures
+
+
+def refresh_month(db: Session, year: int, month: int) -> MonthlyActivityReport:
+    """Recalcular la instantánea del mes desde treatments (se congela si el mes ya terminó)"""
+    _refresh_month(db, year, month)
+    db.commit()
+    return _get_snapshot(db, year, month)
+
+
+def ensure_snapshots(db: Session, today: Optional[datetime] = None) -> int:
+    """
+    Crear las instantáneas que faltan y cerrar las de los meses terminados
+
+    Revisa el mes en curso y los MAINTAINED_MONTHS anteriores, más cualquier
+    instantánea que siga abierta. Un solo commit al final.
+
+    Returns:
+        Número de instantáneas calculadas
+    """
+    today = today or datetime.now()
+    months = set()
+    year, month = today.year, today.month
+    for _ in range(MAINTAINED_MONTHS + 1):
+        months.add((year, month))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    existing = {
+        (snapshot_year, int(snapshot_month)): is_closed
+        for snapshot_year, snapshot_month, is_closed in db.query(
+            MonthlyActivityReport.year, MonthlyActivityReport.month, MonthlyActivityReport.is_closed
+        )
+    }
+    months.update(key for key, is_closed in existing.items() if not is_closed)
+
+    refreshed = 0
+    for year, month in sorted(months):
+        if (year, month) in existing and (existing[(year, month)] or not is_closed_month(year, month, today)):
+            continue
+        _refresh_month(db, year, month, today)
+        refreshed += 1
+    db.commit()
+    if refreshed:
+        logger.info(f"Instantáneas mensuales al día: {refreshed} calculadas")
+    return refreshed
+
+
+def record_monthly_activity(db: Session, treatments: Iterable[Treatment]) -> int:
+    """
+    Sumar tratamientos nuevos a las instantáneas de los meses abiertos cuando se confirme la transacción de `db`
+
+    Solo actualiza meses en curso que ya tienen instantánea: los que no la
+    tienen se calculan completos en el mantenimiento y los cerrados están
+    congelados. Toma el lock compartido del mes para que un recálculo en
+    curso espere a esta transacción; la instantánea se actualiza después del
+    commit (ver el docstring del módulo) y si la transacción se revierte no
+    se suma nada.
+
+    Returns:
+        Número de instantáneas que se actualizarán
+    """
+    increments: Dict[Tuple[int, int], Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    for treatment in treatments:
+        if not treatment.dental_service_id:
+            continue
+        day = to_day(treatment.treatment_date)
+        if not is_closed_month(day.year, day.month):
+            increments[(day.year, day.month)][treatment.dental_service_id] += 1
+    if not increments:
+        return 0
+
+    service_ids = {service_id for counts in increments.values() for service_id in counts}
+    services = {
+        service_id: (name, value)
+        for service_id, name, value in db.query(DentalService.id, DentalService.name, DentalService.value)
+        .filter(DentalService.id.in_(service_ids))
+    }
+
+    pending = db.info.setdefault(PENDING_KEY, {})
+    recorded = 0
+    for (year, month) in sorted(increments):
+        _lock_month(db, year, month, shared=True)
+        snapshot = db.query(MonthlyActivityReport.refreshed_at, MonthlyActivityReport.is_closed).filter(
+            MonthlyActivityReport.year == year,
+            MonthlyActivityReport.month == month_label(month)
+        ).first()
+        if snapshot is None or snapshot.is_closed:
+            continue
+        month_pending = pending.setdefault((year, month), {"refreshed_at": snapshot.refreshed_at, "procedures": {}})
+        for service_id, count in increments[(year, month)].items():
+            if service_id not in services:
+                continue
+            name, value = services[service_id]
+            total_count, total_revenue = month_pending["procedures"].get(name, (0, Decimal("0")))
+            month_pending["procedures"][name] = (total_count + count, total_revenue + Decimal(value) * count)
+        recorded += 1
+    return recorded
+
+
+def _apply_pending(db: Session, pending: Dict[Tuple[int, int], dict]) -> int:
+    """Sumar los incrementos a las instantáneas que no se recalcularon desde que se leyeron, SIN commit"""
+    updated = 0
+    for (year, month) in sorted(pending):
+        month_pending = pending[(year, month)]
+        snapshot = _get_snapshot(db, year, month, for_update=True)
+        if snapshot is None or snapshot.is_closed or snapshot.refreshed_at != month_pending["refreshed_at"]:
+            # Recalculada (o cerrada) después de leerla: el recálculo ya incluye estos tratamientos
+            continue
+        procedures = {procedure["procedure_name"]: dict(procedure) for procedure in snapshot.procedures or []}
+        for name, (count, revenue) in month_pending["procedures"].items():
+            procedure = procedures.setdefault(name, {"procedure_name": name, "patient_count": 0, "revenue": "0"})
+            procedure["patient_count"] += count
+            procedure["revenue"] = str(Decimal(procedure["revenue"]) + revenue)
+        snapshot.procedures = [procedures[name] for name in sorted(procedures)]
+        snapshot.total_activities, snapshot.total_revenue = _procedures_totals(snapshot.procedures)
+        updated += 1
+    db.flush()
+    return updated
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_activity(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+    snapshots_db = Session(bind=session.get_bind())
+    try:
+        _apply_pending(snapshots_db, pending)
+        snapshots_db.commit()
+    except Exception as e:
+        snapshots_db.rollback()
+        logger.error(
+            f"Error actualizando instantáneas mensuales ({len(pending)} meses): {e}; "
+            f"se corrigen con scripts/rebuild_monthly_reports.py"
+        )
+    finally:
+        snapshots_db.close()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_activity(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+class MonthlySnapshotMaintainer:
+    """Hilo que ejecuta ensure_snapshots periódicamente (crea el mes nuevo y cierra el anterior)"""
+
+    def __init__(self, session_factory, interval: float):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        db = self.session_factory()
+        try:
+            return ensure_snapshots(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error en el mantenimiento de las instantáneas mensuales: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.run_once()
+
+    def start(self) -> None:
+        """Poner al día las instantáneas y lanzar el mantenimiento periódico"""
+        self.run_once()
+        if self._thread is None and self.interval > 0:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="monthly-snapshots", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Detener el mantenimiento periódico"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# Instancia global (se arranca en el startup de la aplicación)
+monthly_snapshot_maintainer = MonthlySnapshotMaintainer(SessionLocal, settings.monthly_snapshot_check_seconds)
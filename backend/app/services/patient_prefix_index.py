@@ -0,0 +1,271 @@
+"""
+Índice en memoria de prefijos para el autocompletado de pacientes
+
+Recepción busca pacientes por los primeros caracteres del documento o de un
+apellido. En lugar de una consulta por pulsación, el proceso mantiene una
+lista ordenada de claves (documento sin separadores y apellidos normalizados,
+sin tildes y en minúsculas) y resuelve cada prefijo con búsqueda binaria
+(``bisect``).
+
+El índice se construye con una sola consulta la primera vez que se usa y se
+actualiza de forma incremental con los eventos de PersonService
+(crear/actualizar persona) y PatientService (crear paciente, cambiar estado).
+Como cada worker tiene su propio índice, se reconstruye por completo cada
+``patient_autocomplete_rebuild_seconds`` para recoger los cambios hechos en
+otros procesos. Solo una petición reconstruye a la vez; las demás siguen
+usando el índice anterior (o esperan si aún no hay ninguno), y los cambios
+incrementales recibidos durante la reconstrucción se vuelven a aplicar sobre
+el índice nuevo para no perderlos.
+"""
+import bisect
+import logging
+import re
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.patient_models import Patient
+from ..models.person_models import Person
+from .person_search import normalize_search
+
+logger = logging.getLogger(__name__)
+
+
+class PrefixEntry(NamedTuple):
+    patient_id: int
+    person_id: int
+    document_type: Optional[str]
+    document_number: str
+    display_name: str
+    is_active: bool
+
+
+def document_key(value: str) -> str:
+    """Documento normalizado: solo letras y dígitos ("1.020.345" -> "1020345")"""
+    return re.sub(r"[^0-9a-z]", "", normalize_search(value))
+
+
+def _display_name(first_name, middle_name, first_surname, second_surname) -> str:
+    return " ".join(part for part in (first_name, middle_name, first_surname, second_surname) if part)
+
+
+class PersonValues(NamedTuple):
+    """Datos de una persona copiados al recibir el cambio (la instancia ORM puede expirar)"""
+    person_id: int
+    document_type: Optional[str]
+    document_number: str
+    first_name: Optional[str]
+    middle_name: Optional[str]
+    first_surname: Optional[str]
+    second_surname: Optional[str]
+
+
+def _person_values(person: Person) -> PersonValues:
+    return PersonValues(
+        person.id, getattr(person.document_type, "value", person.document_type), person.document_number,
+        person.first_name, person.middle_name, person.first_surname, person.second_surname
+    )
+
+
+# Cambio incremental: (patient_id, is_active, persona) de upsert_patient o persona de upsert_person
+PendingChange = Union[Tuple[int, bool, PersonValues], PersonValues]
+
+
+def _entry_keys(entry: PrefixEntry, first_surname: Optional[str], second_surname: Optional[str]) -> Set[str]:
+    keys = {document_key(entry.document_number)}
+    surnames = [normalize_search(surname) for surname in (first_surname, second_surname) if surname]
+    keys.update(surnames)
+    if len(surnames) == 2:
+        keys.add(" ".join(surnames))
+    keys.discard("")
+    return keys
+
+
+class PatientPrefixIndex:
+    """Claves ordenadas (clave, patient_id) con búsqueda por prefijo"""
+
+    def __init__(self, rebuild_seconds: int = 300):
+        self.rebuild_seconds = rebuild_seconds
+        self._lock = threading.Lock()
+        self._build_finished = threading.Condition(self._lock)
+        self._building = False
+        # Cambios recibidos durante una construcción (None si no hay ninguna en curso)
+        self._pending: Optional[List[PendingChange]] = None
+        self._keys: List[Tuple[str, int]] = []
+        self._entries: Dict[int, PrefixEntry] = {}
+        self._entry_keys: Dict[int, Set[str]] = {}
+        self._patient_by_person: Dict[int, int] = {}
+        self._built_at: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._built_at is not None
+
+    def build(self, db: Session) -> int:
+        """
+        Construir el índice completo con una consulta
+
+        Los cambios incrementales que llegan mientras tanto se aplican también
+        sobre el índice nuevo antes de publicarlo.
+
+        Returns:
+            Número de pacientes indexados
+        """
+        with self._lock:
+            self._pending = []
+        try:
+            rows = db.query(
+                Patient.id, Patient.is_active, Person.id, Person.document_type, Person.document_number,
+                Person.first_name, Person.middle_name, Person.first_surname, Person.second_surname
+            ).join(Person, Person.id == Patient.person_id).all()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+        keys: List[Tuple[str, int]] = []
+        entries: Dict[int, PrefixEntry] = {}
+        entry_keys: Dict[int, Set[str]] = {}
+        patient_by_person: Dict[int, int] = {}
+        for (patient_id, is_active, person_id, document_type, document_number,
+             first_name, middle_name, first_surname, second_surname) in rows:
+            entry = PrefixEntry(
+                patient_id, person_id, getattr(document_type, "value", document_type), document_number,
+                _display_name(first_name, middle_name, first_surname, second_surname), bool(is_active)
+            )
+            entries[patient_id] = entry
+            entry_keys[patient_id] = _entry_keys(entry, first_surname, second_surname)
+            patient_by_person[person_id] = patient_id
+            keys.extend((key, patient_id) for key in entry_keys[patient_id])
+        keys.sort()
+
+        with self._lock:
+            self._keys = keys
+            self._entries = entries
+            self._entry_keys = entry_keys
+            self._patient_by_person = patient_by_person
+            self._built_at = time.monotonic()
+            for change in self._pending or ():
+                self._apply(change)
+            self._pending = None
+        logger.info(f"Índice de autocompletado de pacientes construido: {len(entries)} pacientes")
+        return len(entries)
+
+    def _is_stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at >= self.rebuild_seconds
+
+    def ensure_fresh(self, db: Session) -> None:
+        """
+        Construir el índice si no existe o si superó el intervalo de reconstrucción
+
+        Solo un llamador construye; mientras tanto los demás usan el índice
+        anterior, o esperan a que termine si todavía no hay índice.
+        """
+        with self._lock:
+            if not self._is_stale():
+                return
+            if self._building:
+                if self._built_at is None:
+                    self._build_finished.wait_for(lambda: not self._building)
+                return
+            self._building = True
+        try:
+            self.build(db)
+        finally:
+            with self._lock:
+                self._building = False
+                self._build_finished.notify_all()
+
+    def invalidate(self) -> None:
+        """Forzar la reconstrucción en el próximo uso"""
+        with self._lock:
+            self._built_at = None
+
+    def _remove(self, patient_id: int) -> None:
+        for key in self._entry_keys.pop(patient_id, ()):
+            position = bisect.bisect_left(self._keys, (key, patient_id))
+            if position < len(self._keys) and self._keys[position] == (key, patient_id):
+                del self._keys[position]
+        entry = self._entries.pop(patient_id, None)
+        if entry is not None:
+            self._patient_by_person.pop(entry.person_id, None)
+
+    def _put(self, patient_id: int, is_active: bool, person: PersonValues) -> None:
+        entry = PrefixEntry(
+            patient_id, person.person_id, person.document_type, person.document_number,
+            _display_name(person.first_name, person.middle_name, person.first_surname, person.second_surname),
+            bool(is_active)
+        )
+        self._remove(patient_id)
+        keys = _entry_keys(entry, person.first_surname, person.second_surname)
+        for key in keys:
+            bisect.insort(self._keys, (key, patient_id))
+        self._entries[patient_id] = entry
+        self._entry_keys[patient_id] = keys
+        self._patient_by_person[person.person_id] = patient_id
+
+    def _apply(self, change: PendingChange) -> None:
+        """Aplicar un cambio incremental (con el lock tomado)"""
+        if isinstance(change, PersonValues):
+            patient_id = self._patient_by_person.get(change.person_id)
+            if patient_id is not None:
+                self._put(patient_id, self._entries[patient_id].is_active, change)
+        else:
+            self._put(*change)
+
+    def _record(self, change: PendingChange) -> None:
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(change)
+            if self._built_at is not None:
+                self._apply(change)
+
+    def upsert_patient(self, patient: Patient) -> None:
+        """Agregar o actualizar un paciente (con su persona cargada) tras el commit"""
+        if patient is None or patient.person is None or not (self.loaded or self._pending is not None):
+            return
+        self._record((patient.id, bool(patient.is_active), _person_values(patient.person)))
+
+    def upsert_person(self, person: Person) -> None:
+        """Actualizar los datos de una persona si corresponde a un paciente indexado"""
+        if person is None or not (self.loaded or self._pending is not None):
+            return
+        self._record(_person_values(person))
+
+    def search(self, text: str, limit: int = 10, active_only: bool = True) -> List[PrefixEntry]:
+        """Pacientes cuyo documento o apellido empieza por el texto, en orden de clave"""
+        prefixes = {normalize_search(text), document_key(text)}
+        prefixes.discard("")
+        results: List[PrefixEntry] = []
+        seen: Set[int] = set()
+        with self._lock:
+            for prefix in sorted(prefixes):
+                position = bisect.bisect_left(self._keys, (prefix, -1))
+                while position < len(self._keys) and len(results) < limit:
+                    key, patient_id = self._keys[position]
+                    if not key.startswith(prefix):
+                        break
+                    position += 1
+                    entry = self._entries[patient_id]
+                    if patient_id in seen or (active_only and not entry.is_active):
+                        continue
+                    seen.add(patient_id)
+                    results.append(entry)
+        return results
+
+    def stats(self) -> Dict[str, object]:
+        """Tamaño y antigüedad del índice"""
+        with self._lock:
+            return {
+                "patients": len(self._entries),
+                "keys": len(self._keys),
+                "age_seconds": round(time.monotonic() - self._built_at, 1) if self._built_at is not None else None,
+                "rebuild_seconds": self.rebuild_seconds,
+            }
+
+
+# Índice compartido por todo el proceso
+patient_prefix_index = PatientPrefixIndex(rebuild_seconds=settings.patient_autocomplete_rebuild_seconds)
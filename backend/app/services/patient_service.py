@@ -1,30 +1,29 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_
-from typing import Optional, List
+from sqlalchemy import and_
+from typing import Optional, List, Tuple
 from app.models.person_models import Person
 from app.models.patient_models import Patient
 from app.models.guardian_models import Guardian
 from app.schemas.patient_schema import PatientCreate, PatientUpdate
 from app.services.person_service import PersonService, serialize_for_audit
 from app.services.auditoria_service import AuditoriaService
+from app.services.person_search import apply_person_search
+from app.services.patient_prefix_index import patient_prefix_index
+from app.services.count_cache import count_total
+from app.middleware.principal import Principal
+from app.middleware.audit_session import declare_event_type
 
 class PatientService:
     
-    def __init__(self, db: Session, user_id: Optional[str] = None, user_ip: Optional[str] = None):
+    def __init__(self, db: Session, user_id: Optional[str] = None, user_ip: Optional[str] = None, principal: Optional[Principal] = None):
         self.db = db
-        self.user_ip = user_ip
         self.auditoria_service = AuditoriaService()
-        
-        # Solo proceder si tenemos un user_id válido
-        if user_id:
-            self.user_id = user_id
-            # Obtener rol y email del usuario para auditoría
-            self.user_role, self.user_email = AuditoriaService._obtener_datos_usuario(db, self.user_id)
-        else:
-            # Si no hay usuario autenticado, no permitir operaciones de auditoría
-            raise ValueError("No se puede realizar operaciones sin usuario autenticado")
+        self.principal = Principal.resolve(db, user_id, principal, user_ip)
+        self.user_id = self.principal.uid
+        self.user_ip = principal.ip if principal else user_ip
+        self.user_role, self.user_email = self.principal.role, self.principal.email
             
-        self.person_service = PersonService(db, user_id, user_ip)
+        self.person_service = PersonService(db, principal=self.principal)
     
     def create_patient(self, patient_data: PatientCreate) -> Patient:
         """Crear un nuevo paciente (incluye crear la persona)"""
@@ -76,7 +75,7 @@ class PatientService:
             elif hasattr(patient_data, 'guardian') and patient_data.guardian:
                 # Crear un guardian nuevo
                 from app.services.guardian_service import GuardianService
-                guardian_service = GuardianService(self.db, self.user_id, self.user_ip)
+                guardian_service = GuardianService(self.db, principal=self.principal)
                 
                 # Verificar que no exista otra persona con el mismo documento del guardian
                 existing_guardian_person = self.person_service.get_person_by_document(
@@ -168,6 +167,7 @@ class PatientService:
             
             # Cargar la relación con person y guardian
             patient = self.get_patient_by_id(getattr(patient, 'id'), include_person=True, include_guardian=True)
+            patient_prefix_index.upsert_patient(patient)
             return patient
             
         except Exception as e:
@@ -208,16 +208,14 @@ class PatientService:
             
         return patient
     
-    def get_patients(
-        self, 
-        skip: int = 0, 
-        limit: int = 100,
+    def _patients_query(
+        self,
         active_only: bool = True,
         search: Optional[str] = None,
         requires_guardian: Optional[bool] = None,
         has_guardian: Optional[bool] = None
-    ) -> List[Patient]:
-        """Obtener lista de pacientes con filtros"""
+    ):
+        """Consulta de pacientes con los filtros del listado (sin paginar)"""
         query = self.db.query(Patient).join(Person).options(
             joinedload(Patient.person),
             joinedload(Patient.guardian, innerjoin=False).joinedload(Guardian.person, innerjoin=False)
@@ -236,17 +234,40 @@ class PatientService:
                 query = query.filter(Patient.guardian_id.is_(None))
         
         if search:
-            search_filter = or_(
-                Person.first_name.ilike(f"%{search}%"),
-                Person.first_surname.ilike(f"%{search}%"),
-                Person.second_surname.ilike(f"%{search}%"),
-                Person.document_number.ilike(f"%{search}%"),
-                Person.email.ilike(f"%{search}%")
-            )
-            query = query.filter(search_filter)
+            query = apply_person_search(query, search)
         
+        return query
+    
+    def get_patients(
+        self, 
+        skip: int = 0, 
+        limit: int = 100,
+        active_only: bool = True,
+        search: Optional[str] = None,
+        requires_guardian: Optional[bool] = None,
+        has_guardian: Optional[bool] = None
+    ) -> List[Patient]:
+        """Obtener lista de pacientes con filtros"""
+        query = self._patients_query(active_only, search, requires_guardian, has_guardian)
         return query.offset(skip).limit(limit).all()
     
+    def count_patients(
+        self,
+        active_only: bool = True,
+        search: Optional[str] = None,
+        requires_guardian: Optional[bool] = None,
+        has_guardian: Optional[bool] = None
+    ) -> Tuple[int, bool]:
+        """Total de pacientes con los filtros del listado: (total, es_estimado)"""
+        query = self._patients_query(active_only, search, requires_guardian, has_guardian)
+        filters = {
+            "active_only": True if active_only else None,
+            "search": search,
+            "requires_guardian": requires_guardian,
+            "has_guardian": has_guardian
+        }
+        return count_total(self.db, query, ("patients", "persons"), filters)
+    
     def update_patient(self, patient_id: int, patient_data: PatientUpdate) -> Optional[Patient]:
         """Actualizar paciente (puede incluir datos de persona)"""
         patient = self.get_patient_by_id(patient_id, include_person=True)
@@ -321,7 +342,7 @@ class PatientService:
             # Manejar guardian si se proporciona
             if hasattr(patient_data, 'guardian') and patient_data.guardian:
                 from app.services.guardian_service import GuardianService
-                guardian_service = GuardianService(self.db, self.user_id, self.user_ip)
+                guardian_service = GuardianService(self.db, principal=self.principal)
                 
                 current_guardian_id = getattr(patient, 'guardian_id')
                 
@@ -553,7 +574,9 @@ class PatientService:
             self.db.commit()
             self.db.refresh(patient)
             
-            return self.get_patient_by_id(getattr(patient, 'id'), include_person=True, include_guardian=True)
+            patient = self.get_patient_by_id(getattr(patient, 'id'), include_person=True, include_guardian=True)
+            patient_prefix_index.upsert_patient(patient)
+            return patient
             
         except Exception as e:
             self.db.rollback()
@@ -566,6 +589,8 @@ class PatientService:
         """
         updated_patients = []
         unassigned_guardians = []
+        # Los eventos se insertan juntos, en la misma transacción que los cambios
+        eventos_auditoria = []
         
         patients = self.db.query(Patient).join(Person).options(
             joinedload(Patient.person),
@@ -599,8 +624,7 @@ class PatientService:
                 })
                 
                 # Registrar evento de auditoría para cambio de requirements
-                self.auditoria_service.registrar_evento(
-                    db=self.db,
+                eventos_auditoria.append(self.auditoria_service.construir_evento(
                     usuario_id=self.user_id,
                     tipo_evento="AUTO_UPDATE",
                     registro_afectado_id=str(patient.id),
@@ -617,7 +641,7 @@ class PatientService:
                     ip_origen=self.user_ip,
                     usuario_rol=self.user_role,
                     usuario_email=self.user_email
-                )
+                ))
             
             # 2. Desasignar guardián automáticamente si ya no es necesario
             if not should_require_guardian and current_guardian_id is not None:
@@ -638,8 +662,7 @@ class PatientService:
                 })
                 
                 # Registrar evento de auditoría para desasignación automática
-                self.auditoria_service.registrar_evento(
-                    db=self.db,
+                eventos_auditoria.append(self.auditoria_service.construir_evento(
                     usuario_id=self.user_id,
                     tipo_evento="AUTO_UNASSIGN_GUARDIAN",
                     registro_afectado_id=str(patient.id),
@@ -658,10 +681,11 @@ class PatientService:
                     ip_origen=self.user_ip,
                     usuario_rol=self.user_role,
                     usuario_email=self.user_email
-                )
+                ))
         
-        # Confirmar cambios en la base de datos
+        # Confirmar cambios y auditoría en una sola transacción
         if updated_patients or unassigned_guardians:
+            self.auditoria_service.registrar_eventos_lote(self.db, eventos_auditoria)
             self.db.commit()
         
         return {
@@ -738,7 +762,10 @@ class PatientService:
                     patient.guardian_id, new_status, deactivation_reason, patient_id
                 )
             
+            # El evento se registra después del commit: en modo unificado el trigger necesita su tipo antes
+            declare_event_type(self.db, "REACTIVATE" if new_status else "DEACTIVATE", "patients", patient.id)
             self.db.commit()
+            patient_prefix_index.upsert_patient(patient)
             
             # Preparar detalles para auditoría
             change_details: dict = {
@@ -1107,6 +1134,6 @@ class PatientService:
         
         return changes
 
-def get_patient_service(db: Session, user_id: Optional[str] = None, user_ip: Optional[str] = None) -> PatientService:
+def get_patient_service(db: Session, user_id: Optional[str] = None, user_ip: Optional[str] = None, principal: Optional[Principal] = None) -> PatientService:
     """Factory para obtener instancia del servicio"""
-    return PatientService(db, user_id, user_ip)
+    return PatientService(db, user_id, user_ip, principal=principal)
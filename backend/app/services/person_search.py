@@ -0,0 +1,117 @@
+"""
+Búsqueda de personas por texto (pacientes, personas y acudientes)
+
+Con init-scripts/12-person-search.sql aplicado (PostgreSQL), la búsqueda usa
+las columnas generadas de persons:
+
+- search_text: nombres, documento y email en minúsculas y sin tildes, con
+  índice de trigramas; sirve la búsqueda por subcadena ("per" -> "PÉREZ").
+- search_vector: tsvector de los nombres y el documento; sirve las búsquedas
+  de varias palabras en cualquier orden ("ana perez") por prefijo.
+
+Los resultados se ordenan por relevancia (ts_rank + similitud de trigramas).
+Sin esas columnas (SQLite en los tests, o el script sin aplicar) se mantiene
+la cadena de ILIKE sobre las columnas de Person, sin ranking.
+"""
+import logging
+import re
+import unicodedata
+from typing import List
+
+from sqlalchemy import Text, func, literal_column, or_, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from ..config import settings
+from ..models.person_models import Person
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TEXT = literal_column("persons.search_text", Text)
+SEARCH_VECTOR = literal_column("persons.search_vector", TSVECTOR)
+
+# Columnas de la búsqueda sin índice (modo ILIKE)
+FALLBACK_COLUMNS = (
+    Person.first_name,
+    Person.middle_name,
+    Person.first_surname,
+    Person.second_surname,
+    Person.document_number,
+    Person.email,
+)
+
+# Modo efectivo tras comprobar la base de datos en el arranque (ver configure_person_search)
+_index_active = False
+
+
+def person_search_index_active() -> bool:
+    """Indicar si la búsqueda usa los índices de texto de persons"""
+    return _index_active
+
+
+def configure_person_search(engine: Engine) -> str:
+    """
+    Resolver el modo de búsqueda de personas al arrancar
+
+    Returns:
+        "index" si persons tiene las columnas de búsqueda (PostgreSQL), "ilike" en otro caso
+    """
+    global _index_active
+    _index_active = False
+    if not settings.person_search_index_enabled or engine.dialect.name != "postgresql":
+        return "ilike"
+
+    with engine.connect() as connection:
+        columns = connection.execute(text(
+            "SELECT COUNT(*) FROM information_schema.columns "
+            "WHERE table_name = 'persons' AND column_name IN ('search_text', 'search_vector') "
+            "AND table_schema = ANY (current_schemas(false))"
+        )).scalar()
+    if columns != 2:
+        logger.warning("Búsqueda de personas sin índice: falta init-scripts/12-person-search.sql")
+        return "ilike"
+
+    _index_active = True
+    logger.info("Búsqueda de personas con índices de trigramas y texto completo")
+    return "index"
+
+
+def normalize_search(value: str) -> str:
+    """Texto de búsqueda en minúsculas, sin tildes y con espacios simples (como search_text)"""
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.lower().split())
+
+
+def _prefix_tsquery(tokens: List[str]) -> str:
+    """Consulta de texto completo: todas las palabras, cada una como prefijo"""
+    return " & ".join(f"{token}:*" for token in tokens)
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def apply_person_search(query: Query, search: str) -> Query:
+    """
+    Filtrar (y ordenar por relevancia) una consulta que incluye Person por el texto buscado
+
+    La consulta debe tener persons en el FROM (Person o un join con Person sin alias).
+    """
+    if not _index_active:
+        pattern = f"%{search}%"
+        return query.filter(or_(*(column.ilike(pattern) for column in FALLBACK_COLUMNS)))
+
+    term = normalize_search(search)
+    tokens = re.findall(r"\w+", term)
+    if not tokens:
+        return query.filter(SEARCH_TEXT.like(_like_pattern(term), escape="\\"))
+
+    tsquery = func.to_tsquery("simple", _prefix_tsquery(tokens))
+    rank = func.ts_rank(SEARCH_VECTOR, tsquery) + func.similarity(SEARCH_TEXT, term)
+    return query.filter(or_(
+        SEARCH_VECTOR.op("@@")(tsquery),
+        SEARCH_TEXT.like(_like_pattern(term), escape="\\")
+    )).order_by(rank.desc(), Person.id)
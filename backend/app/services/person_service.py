@@ -1,10 +1,13 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import date, datetime
 from app.models.person_models import Person, DocumentTypeEnum
 from app.schemas.person_schema import PersonCreate, PersonUpdate
 from app.services.auditoria_service import AuditoriaService
+from app.services.person_search import apply_person_search
+from app.services.patient_prefix_index import patient_prefix_index
+from app.services.count_cache import count_total
+from app.middleware.principal import Principal
 
 
 def serialize_for_audit(data):
@@ -31,19 +34,13 @@ def serialize_for_audit(data):
 
 class PersonService:
     
-    def __init__(self, db: Session, user_id: Optional[str] = None, user_ip: Optional[str] = None):
+    def __init__(self, db: Session, user_id: Optional[str] = None, user_ip: Optional[str] = None, principal: Optional[Principal] = None):
         self.db = db
-        self.user_ip = user_ip
         self.auditoria_service = AuditoriaService()
-        
-        # Solo proceder si tenemos un user_id válido
-        if user_id:
-            self.user_id = user_id
-            # Obtener rol y email del usuario para auditoría
-            self.user_role, self.user_email = AuditoriaService._obtener_datos_usuario(db, self.user_id)
-        else:
-            # Si no hay usuario autenticado, no permitir operaciones de auditoría
-            raise ValueError("No se puede realizar operaciones sin usuario autenticado")
+        self.principal = Principal.resolve(db, user_id, principal, user_ip)
+        self.user_id = self.principal.uid
+        self.user_ip = principal.ip if principal else user_ip
+        self.user_role, self.user_email = self.principal.role, self.principal.email
     
     def create_person(self, person_data: PersonCreate, allow_duplicate_email: bool = False, allow_duplicate_phone: bool = False) -> Person:
         """
@@ -79,6 +76,7 @@ class PersonService:
             self.db.add(person)
             self.db.commit()
             self.db.refresh(person)
+            patient_prefix_index.upsert_person(person)
             
             # Registrar evento de auditoría
             # try:
@@ -122,16 +120,14 @@ class PersonService:
         """Obtener persona por teléfono"""
         return self.db.query(Person).filter(Person.phone == phone).first()
     
-    def get_persons(
-        self, 
-        skip: int = 0, 
-        limit: int = 100,
+    def _persons_query(
+        self,
         search: Optional[str] = None,
         document_type: Optional[DocumentTypeEnum] = None,
         min_age: Optional[int] = None,
         max_age: Optional[int] = None
-    ) -> List[Person]:
-        """Obtener lista de personas con filtros"""
+    ):
+        """Consulta de personas con los filtros del listado (sin paginar)"""
         query = self.db.query(Person)
         
         # Filtro por tipo de documento
@@ -153,17 +149,33 @@ class PersonService:
         
         # Filtro de búsqueda por texto
         if search:
-            search_filter = or_(
-                Person.first_name.ilike(f"%{search}%"),
-                Person.first_surname.ilike(f"%{search}%"),
-                Person.second_surname.ilike(f"%{search}%"),
-                Person.middle_name.ilike(f"%{search}%"),
-                Person.document_number.ilike(f"%{search}%"),
-                Person.email.ilike(f"%{search}%")
-            )
-            query = query.filter(search_filter)
+            query = apply_person_search(query, search)
         
-        return query.offset(skip).limit(limit).all()
+        return query
+    
+    def get_persons(
+        self, 
+        skip: int = 0, 
+        limit: int = 100,
+        search: Optional[str] = None,
+        document_type: Optional[DocumentTypeEnum] = None,
+        min_age: Optional[int] = None,
+        max_age: Optional[int] = None
+    ) -> List[Person]:
+        """Obtener lista de personas con filtros"""
+        return self._persons_query(search, document_type, min_age, max_age).offset(skip).limit(limit).all()
+    
+    def count_persons(
+        self,
+        search: Optional[str] = None,
+        document_type: Optional[DocumentTypeEnum] = None,
+        min_age: Optional[int] = None,
+        max_age: Optional[int] = None
+    ) -> Tuple[int, bool]:
+        """Total de personas con los filtros del listado: (total, es_estimado)"""
+        query = self._persons_query(search, document_type, min_age, max_age)
+        filters = {"search": search, "document_type": document_type, "min_age": min_age, "max_age": max_age}
+        return count_total(self.db, query, ("persons",), filters)
     
     def update_person(self, person_id: int, person_data: PersonUpdate, allow_duplicate_email: bool = False, allow_duplicate_phone: bool = False) -> Optional[Person]:
         """
@@ -226,6 +238,7 @@ class PersonService:
             
             self.db.commit()
             self.db.refresh(person)
+            patient_prefix_index.upsert_person(person)
             
             # Registrar evento de auditoría
             # self.auditoria_service.registrar_evento(
@@ -282,6 +295,6 @@ class PersonService:
                 "El RC es solo para menores de 7 años. Use TI para menores de 18 años o CC para mayores de 18 años."
             )
 
-def get_person_service(db: Session, user_id: Optional[str] = None, user_ip: Optional[str] = None) -> PersonService:
+def get_person_service(db: Session, user_id: Optional[str] = None, user_ip: Optional[str] = None, principal: Optional[Principal] = None) -> PersonService:
     """Factory para obtener instancia del servicio"""
-    return PersonService(db, user_id, user_ip)
\ No newline at end of file
+    return PersonService(db, user_id, user_ip, principal=principal)
\ No newline at end of file
@@ -1,17 +1,19 @@
-from datetime import datetime, timedelta
+from datetime import datetime
+from decimal import Decimal
 from fastapi import HTTPException, status
-from sqlalchemy import func, and_
+from sqlalchemy import and_
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
 from app.models.treatment_models import Treatment
 from app.models.dental_service_models import DentalService
-from app.schemas.report_schema import MonthlyReport
+from app.services.monthly_activity_service import get_month_snapshot, get_year_snapshots, month_bounds
 
 from app.models.clinical_history_models import ClinicalHistory
 from app.models.patient_models import Patient
 from app.models.person_models import Person
 from app.models.user_models import User
-from app.schemas.report_schema import ActivityReport, MonthlyReport
+from app.schemas.report_schema import ActivityReport, MonthlyReport, YearlyReport
 
 logger = logging.getLogger(__name__)
 
@@ -21,18 +23,58 @@ class ReportService:
     def __init__(self, db):
         self.db = db
 
+    @classmethod
+    async def generate_monthly_report_async(
+        cls,
+        db: AsyncSession,
+        report_date: datetime,
+        generated_by: str = "Administrador"
+    ) -> MonthlyReport:
+        """
+        Versión asíncrona de generate_monthly_report.
+        Ejecuta la misma consulta sobre la conexión asíncrona (AsyncSession.run_sync)
+        para no bloquear el event loop.
+        """
+        return await db.run_sync(
+            lambda session: cls(session).generate_monthly_report(report_date, generated_by=generated_by)
+        )
+
+    @classmethod
+    async def generate_yearly_report_async(
+        cls,
+        db: AsyncSession,
+        year: int,
+        generated_by: str = "Administrador"
+    ) -> YearlyReport:
+        """Versión asíncrona de generate_yearly_report."""
+        return await db.run_sync(
+            lambda session: cls(session).generate_yearly_report(year, generated_by=generated_by)
+        )
+
+    @classmethod
+    async def generate_activity_report_async(
+        cls,
+        db: AsyncSession,
+        start_date: datetime,
+        end_date: datetime,
+        generated_by: str = "Administrador"
+    ) -> ActivityReport:
+        """Versión asíncrona de generate_activity_report."""
+        return await db.run_sync(
+            lambda session: cls(session).generate_activity_report(start_date, end_date, generated_by=generated_by)
+        )
+
     def generate_monthly_report(self, report_date: datetime, generated_by: str = "Administrador") -> MonthlyReport:
         """
         Genera un reporte mensual agrupado por tipo de procedimiento.
         Incluye todos los tratamientos realizados entre el primer y último día del mes.
+        Se lee de la instantánea mensual (monthly_activity_reports).
         """
         try:
             if not report_date:
                 report_date = datetime.now()
 
-            start_date = report_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            next_month = (start_date.replace(day=28) + timedelta(days=4)).replace(day=1)
-            end_date = next_month - timedelta(seconds=1)
+            start_date, end_date = month_bounds(report_date.year, report_date.month)
 
             logger.info(
                 f"[ReportService] Generando reporte mensual del "
@@ -40,24 +82,9 @@ class ReportService:
                 f"por {generated_by}"
             )
 
-            query = (
-                self.db.query(
-                    DentalService.name.label("procedure_name"),
-                    func.count(Treatment.id).label("patient_count")
-                )
-                .join(Treatment, Treatment.dental_service_id == DentalService.id)
-                .filter(
-                    and_(
-                        Treatment.treatment_date >= start_date,
-                        Treatment.treatment_date <= end_date
-                    )
-                )
-                .group_by(DentalService.name)
-            )
+            snapshot = get_month_snapshot(self.db, start_date.year, start_date.month)
 
-            results = query.all()
-
-            if not results:
+            if not snapshot.procedures:
                 logger.warning(
                     f"[ReportService] No se encontraron tratamientos en el periodo "
                     f"{start_date.strftime('%Y-%m-%d')} a {end_date.strftime('%Y-%m-%d')}"
@@ -67,11 +94,8 @@ class ReportService:
                     detail="No se encontraron actividades en el período especificado"
                 )
 
-            procedures = [
-                {"procedure_name": r.procedure_name, "patient_count": r.patient_count}
-                for r in results
-            ]
-            total_patients = sum(p["patient_count"] for p in procedures)
+            procedures = snapshot.procedures
+            total_patients = snapshot.total_activities
 
             logger.info(
                 f"[ReportService] Reporte mensual generado con {len(procedures)} procedimientos "
@@ -85,7 +109,8 @@ class ReportService:
                 start_date=start_date,
                 end_date=end_date,
                 procedures=procedures,
-                total_patients=total_patients
+                total_patients=total_patients,
+                total_revenue=snapshot.total_revenue
             )
 
         except HTTPException:
@@ -97,6 +122,49 @@ class ReportService:
                 detail="Error interno al generar el reporte mensual"
             )
         
+    def generate_yearly_report(self, year: int, generated_by: str = "Administrador") -> YearlyReport:
+        """
+        Genera el resumen anual (actividades e ingresos por mes) a partir de las
+        instantáneas mensuales, hasta el mes en curso.
+        """
+        try:
+            snapshots = get_year_snapshots(self.db, year)
+
+            if not snapshots:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="No se encontraron actividades en el período especificado"
+                )
+
+            months = [
+                {
+                    "month": int(snapshot.month),
+                    "total_activities": snapshot.total_activities,
+                    "total_revenue": snapshot.total_revenue,
+                    "is_closed": snapshot.is_closed
+                }
+                for snapshot in snapshots
+            ]
+
+            logger.info(f"[ReportService] Reporte anual {year} generado con {len(months)} meses por {generated_by}")
+
+            return YearlyReport(
+                generated_by=generated_by,
+                year=year,
+                months=months,
+                total_activities=sum(m["total_activities"] for m in months),
+                total_revenue=sum((m["total_revenue"] for m in months), Decimal("0"))
+            )
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"[ReportService] Error al generar el reporte anual: {str(e)}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error interno al generar el reporte anual"
+            )
+
     def generate_activity_report(
         self,
         start_date: datetime,
@@ -0,0 +1,85 @@
+"""
+Agrupación por periodos y rangos de fechas independientes del motor
+
+Las consultas del dashboard agrupan y filtran por mes. Aplicar una función a
+la columna en el WHERE (``extract('month', ...)``, ``to_char(...)``) impide
+usar el índice de treatment_date; en su lugar:
+
+- los filtros son rangos semiabiertos sobre la columna sin transformar
+  (``>= inicio AND < fin``), que el índice resuelve directamente;
+- la agrupación usa ``date_trunc('month', ...)`` en PostgreSQL y
+  ``strftime('%Y-%m-01', ...)`` en SQLite, y ``bucket_label`` convierte el
+  resultado (timestamp o texto según el motor) en la clave "YYYY-MM".
+"""
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple, Union
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import func, literal_column
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+DateLike = Union[date, datetime]
+
+
+def start_of_day(value: DateLike) -> datetime:
+    """Primer instante del día (acepta date o datetime)"""
+    if isinstance(value, datetime):
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return datetime(value.year, value.month, value.day)
+
+
+def day_after(value: DateLike) -> datetime:
+    """Primer instante del día siguiente: límite exclusivo para incluir el día completo"""
+    return start_of_day(value) + timedelta(days=1)
+
+
+def _as_datetime(value: DateLike) -> datetime:
+    return value if isinstance(value, datetime) else start_of_day(value)
+
+
+def month_start(value: DateLike) -> datetime:
+    """Primer instante del mes"""
+    return start_of_day(value).replace(day=1)
+
+
+def month_range(value: DateLike) -> Tuple[datetime, datetime]:
+    """Rango semiabierto [inicio del mes, inicio del mes siguiente)"""
+    start = month_start(value)
+    return start, start + relativedelta(months=1)
+
+
+def range_filter(column, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> List[ColumnElement]:
+    """Condiciones ``column >= start AND column < end`` sobre la columna sin transformar (date = medianoche)"""
+    conditions = []
+    if start is not None:
+        conditions.append(column >= _as_datetime(start))
+    if end is not None:
+        conditions.append(column < _as_datetime(end))
+    return conditions
+
+
+def month_bucket(db: Session, column) -> ColumnElement:
+    """Expresión que agrupa la columna por mes según el motor de la sesión"""
+    if db.get_bind().dialect.name == "sqlite":
+        return func.strftime("%Y-%m-01", column)
+    # 'month' como literal y no como parámetro: con parámetros del servidor (asyncpg)
+    # el SELECT y el GROUP BY deben ser la misma expresión
+    return func.date_trunc(literal_column("'month'"), column)
+
+
+def bucket_label(value) -> str:
+    """Clave "YYYY-MM" de un valor devuelto por month_bucket (timestamp o texto)"""
+    if isinstance(value, str):
+        return value[:7]
+    return value.strftime("%Y-%m")
+
+
+def month_labels(start: DateLike, end: DateLike) -> List[str]:
+    """Claves "YYYY-MM" de todos los meses entre start y end (ambos incluidos)"""
+    labels = []
+    current, last = month_start(start), month_start(end)
+    while current <= last:
+        labels.append(current.strftime("%Y-%m"))
+        current += relativedelta(months=1)
+    return labels
@@ -0,0 +1,95 @@
+"""
+Caché de tokens de Firebase ya verificados
+
+Evita repetir la verificación criptográfica del ID token en cada petición.
+Las entradas se indexan por el SHA-256 del token (nunca se guarda el token
+en claro), expiran con el claim ``exp`` del propio token (acotado por un TTL
+máximo) y se desalojan por LRU cuando se alcanza el tamaño máximo.
+"""
+import hashlib
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from cachetools import TLRUCache
+
+
+class VerifiedTokenCache:
+    """Caché acotada (LRU + TTL por entrada) de tokens decodificados"""
+
+    def __init__(self, max_size: int = 1024, max_ttl: int = 300):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._cache = TLRUCache(maxsize=max_size, ttu=self._expiracion, timer=time.time)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revocations = 0
+
+    def _expiracion(self, _key: str, decoded_token: Dict[str, Any], now: float) -> float:
+        """Instante de expiración: el ``exp`` del token, sin superar el TTL máximo"""
+        exp = decoded_token.get("exp")
+        if not isinstance(exp, (int, float)):
+            return now
+        return min(float(exp), now + self.max_ttl)
+
+    @staticmethod
+    def digest(token: str) -> str:
+        """Huella del token usada como clave de la caché"""
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Obtener el token decodificado si está en caché y no ha expirado"""
+        key = self.digest(token)
+        with self._lock:
+            decoded_token = self._cache.get(key)
+            if decoded_token is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return decoded_token
+
+    def set(self, token: str, decoded_token: Dict[str, Any]) -> None:
+        """Guardar un token ya verificado"""
+        key = self.digest(token)
+        with self._lock:
+            self._cache[key] = decoded_token
+            # Un token sin exp (o ya vencido) expira en el acto; se descarta aquí
+            self._cache.expire()
+
+    def revoke_uid(self, uid: str) -> int:
+        """
+        Eliminar de la caché todos los tokens de un usuario
+
+        Returns:
+            Número de entradas eliminadas
+        """
+        with self._lock:
+            keys = [key for key, decoded in self._cache.items() if decoded.get("uid") == uid]
+            for key in keys:
+                self._cache.pop(key, None)
+            self.revocations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        """Vaciar la caché y reiniciar los contadores"""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+            self.revocations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché"""
+        with self._lock:
+            self._cache.expire()
+            total = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "max_ttl_seconds": self.max_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "revocations": self.revocations,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,81 @@
+"""
+Caché del rol y email de los usuarios para la atribución de auditoría
+
+Cada servicio (personas, pacientes, servicios odontológicos, acudientes) y
+cada helper ``registrar_*`` de AuditoriaService necesita el rol y el email del
+usuario que actúa; sin caché eso es un ``User JOIN Role`` por instancia. Las
+entradas expiran por TTL, se desalojan por LRU al alcanzar el tamaño máximo y
+se invalidan al actualizar, cambiar de rol, desactivar o reactivar un usuario
+(routers/users.py).
+"""
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from cachetools import TTLCache
+
+UserAttribution = Tuple[Optional[str], Optional[str]]
+
+
+class UserAttributionCache:
+    """Caché acotada (LRU + TTL) de (rol, email) por uid"""
+
+    def __init__(self, max_size: int = 1024, ttl: int = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize=max_size, ttl=ttl, timer=time.time)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, uid: str) -> Optional[UserAttribution]:
+        """Obtener (rol, email) del usuario si está en caché y no ha expirado"""
+        with self._lock:
+            datos = self._cache.get(uid)
+            if datos is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return datos
+
+    def set(self, uid: str, datos: UserAttribution) -> None:
+        """Guardar (rol, email) de un usuario encontrado"""
+        with self._lock:
+            self._cache[uid] = datos
+
+    def invalidate(self, uid: str) -> bool:
+        """
+        Eliminar de la caché los datos de un usuario
+
+        Returns:
+            True si había una entrada para el usuario
+        """
+        with self._lock:
+            removed = self._cache.pop(uid, None) is not None
+            if removed:
+                self.invalidations += 1
+            return removed
+
+    def clear(self) -> None:
+        """Vaciar la caché y reiniciar los contadores"""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché"""
+        with self._lock:
+            self._cache.expire()
+            total = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
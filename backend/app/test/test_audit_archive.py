@@ -0,0 +1,143 @@
+import sys
+import os
+from functools import partial
+from datetime import datetime, timedelta, timezone
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from fastapi import Response
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.auditoria_models import Audit, AuditEventCounter, AuditSegmentSeal
+from app.routers.auditoria import paginar_eventos
+from app.services import audit_archive_service
+from app.services.audit_archive_service import archive_old_events, load_manifests
+from app.services.audit_integrity_service import compute_row_hash, seal_pending_segments, verify_audit_integrity
+from app.services.auditoria_service import AuditoriaService
+
+NOW = datetime(2025, 6, 15, tzinfo=timezone.utc)
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[Audit.__table__, AuditSegmentSeal.__table__, AuditEventCounter.__table__])
+    return sessionmaker(bind=engine)()
+
+
+def add_events(db, start, count, step=timedelta(days=3)):
+    for index in range(count):
+        evento = AuditoriaService.construir_evento(
+            "user-1", "UPDATE" if index % 2 else "READ", str(index), "patients", detalles_cambios={"campo": index}
+        )
+        evento["event_timestamp"] = start + step * index
+        evento["integrity_hash"] = compute_row_hash(evento)
+        AuditoriaService.registrar_eventos_lote(db, [evento])
+    db.commit()
+
+
+class TestAuditArchive:
+    """Tests del archivo en frío de la auditoría"""
+
+    def test_archives_old_events_by_month(self, tmp_path):
+        db = make_session()
+        add_events(db, datetime(2025, 1, 1, 12, tzinfo=timezone.utc), 40)
+
+        manifests = archive_old_events(db, older_than_days=60, archive_dir=str(tmp_path), block_rows=4, now=NOW)
+
+        cutoff = NOW - timedelta(days=60)
+        assert sum(manifest["rows"] for manifest in manifests) == 35
+        assert {manifest["month"] for manifest in manifests} == {"2025-01", "2025-02", "2025-03", "2025-04"}
+        assert len(load_manifests(str(tmp_path), "audits")) == len(manifests)
+        assert db.query(Audit).count() == 5
+        assert all(
+            evento.event_timestamp.replace(tzinfo=timezone.utc) >= cutoff for evento in db.query(Audit).all()
+        )
+
+    def test_range_query_merges_archived_events(self, tmp_path):
+        db = make_session()
+        add_events(db, datetime(2025, 1, 1, 12, tzinfo=timezone.utc), 40)
+        inicio, fin = datetime(2025, 3, 1, tzinfo=timezone.utc), datetime(2025, 5, 31, tzinfo=timezone.utc)
+        query = lambda: db.query(Audit).filter(Audit.event_timestamp >= inicio, Audit.event_timestamp <= fin)
+        esperados = [evento.id for evento in query().order_by(Audit.event_timestamp.desc(), Audit.id.desc())]
+
+        archive_old_events(db, older_than_days=60, archive_dir=str(tmp_path), block_rows=4, now=NOW)
+        archivados = partial(AuditoriaService.obtener_eventos_archivados, inicio, fin, archive_dir=str(tmp_path))
+
+        offset = paginar_eventos(query(), Response(), 5, 10, "offset", None, archivados)
+        assert [evento.id for evento in offset] == esperados[5:15]
+
+        vistos, cursor = [], None
+        while True:
+            response = Response()
+            pagina = paginar_eventos(query(), response, 0, 7, "cursor", cursor, archivados)
+            vistos.extend(evento.id for evento in pagina)
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        assert vistos == esperados
+
+    def test_pages_skip_archived_events_still_in_table(self, tmp_path, monkeypatch):
+        db = make_session()
+        add_events(db, datetime(2025, 1, 1, 12, tzinfo=timezone.utc), 40)
+        inicio, fin = datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 5, 31, tzinfo=timezone.utc)
+        query = lambda: db.query(Audit).filter(Audit.event_timestamp >= inicio, Audit.event_timestamp <= fin)
+        esperados = [evento.id for evento in query().order_by(Audit.event_timestamp.desc(), Audit.id.desc())]
+
+        # Archivo escrito pero filas aún sin borrar de la tabla
+        monkeypatch.setattr(
+            audit_archive_service, "_delete_rows",
+            lambda db, table, start, end: len(audit_archive_service._table_rows(db, table, start, end))
+        )
+        archive_old_events(db, older_than_days=60, archive_dir=str(tmp_path), block_rows=4, now=NOW)
+        assert db.query(Audit).count() == 40
+        archivados = partial(AuditoriaService.obtener_eventos_archivados, inicio, fin, archive_dir=str(tmp_path))
+
+        vistos, cursor = [], None
+        while True:
+            response = Response()
+            pagina = paginar_eventos(query(), response, 0, 7, "cursor", cursor, archivados)
+            vistos.extend(evento.id for evento in pagina)
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        assert vistos == esperados
+
+        offset = paginar_eventos(query(), Response(), 5, 10, "offset", None, archivados)
+        assert [evento.id for evento in offset] == esperados[5:15]
+
+    def test_archive_pages_read_only_needed_blocks(self, tmp_path, monkeypatch):
+        db = make_session()
+        add_events(db, datetime(2025, 1, 1, 12, tzinfo=timezone.utc), 40)
+        archive_old_events(db, older_than_days=60, archive_dir=str(tmp_path), block_rows=4, now=NOW)
+        inicio, fin = datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 5, 31, tzinfo=timezone.utc)
+        query = db.query(Audit).filter(Audit.event_timestamp >= inicio, Audit.event_timestamp <= fin)
+
+        leidos = []
+        read_block = audit_archive_service._read_block
+        monkeypatch.setattr(audit_archive_service, "_read_block", lambda *args: leidos.append(1) or read_block(*args))
+        manifest_reads = []
+        json_load = audit_archive_service.json.load
+        monkeypatch.setattr(audit_archive_service.json, "load", lambda *args: manifest_reads.append(1) or json_load(*args))
+
+        archivados = partial(AuditoriaService.obtener_eventos_archivados, inicio, fin, archive_dir=str(tmp_path))
+        for _ in range(2):
+            pagina = paginar_eventos(query, Response(), 0, 3, "offset", None, archivados)
+            assert len(pagina) == 3
+        # Cada página solo descomprime los dos bloques más recientes del archivo
+        bloques = sum(len(manifest["blocks"]) for manifest in load_manifests(str(tmp_path), "audits"))
+        assert bloques == 11 and len(leidos) == 4
+        # Los manifiestos se leen una vez y se reutilizan mientras no cambie el archivo
+        assert len(manifest_reads) == 4
+
+    def test_integrity_verifies_archived_days(self, tmp_path):
+        db = make_session()
+        add_events(db, datetime(2025, 1, 1, 12, tzinfo=timezone.utc), 20)
+        seal_pending_segments(db, until_day=NOW.date())
+
+        archive_old_events(db, older_than_days=60, archive_dir=str(tmp_path), now=NOW)
+        report = verify_audit_integrity(db, archive_dir=str(tmp_path))
+        assert report["ok"]
+        assert report["rows_checked"] == 20
@@ -0,0 +1,81 @@
+import sys
+import os
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.auditoria_models import Audit, AuditEventCounter
+from app.services.audit_archive_service import archive_old_events
+from app.services.audit_export_service import stream_audit_export
+from app.services.auditoria_service import AuditoriaService
+
+
+def make_session_factory(count):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[Audit.__table__, AuditEventCounter.__table__])
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    eventos = []
+    for index in range(count):
+        evento = AuditoriaService.construir_evento(
+            "user-1", "UPDATE" if index % 2 else "READ", str(index), "patients", detalles_cambios={"campo": index}
+        )
+        evento["event_timestamp"] = datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(days=index)
+        eventos.append(evento)
+    AuditoriaService.registrar_eventos_lote(db, eventos)
+    db.commit()
+    db.close()
+    return session_factory
+
+
+class TestAuditExport:
+    """Tests de la exportación de auditoría en streaming"""
+
+    def test_ndjson_gzip_and_csv(self):
+        session_factory = make_session_factory(50)
+
+        contenido = b"".join(stream_audit_export(session_factory, {"event_type": "UPDATE"}, "ndjson", comprimir=True))
+        filas = [json.loads(line) for line in gzip.decompress(contenido).decode("utf-8").splitlines()]
+        assert len(filas) == 25
+        assert filas[0]["event_timestamp"] == "2025-01-02T00:00:00+00:00"
+        assert filas[0]["change_details"] == {"campo": 1}
+
+        contenido = b"".join(stream_audit_export(session_factory, {"user_id": "otro"}, "csv"))
+        assert list(csv.reader(io.StringIO(contenido.decode("utf-8"))))[0][0] == "id"
+
+    def test_includes_archived_events_in_order(self, tmp_path):
+        session_factory = make_session_factory(50)
+        db = session_factory()
+        archive_old_events(db, older_than_days=0, archive_dir=str(tmp_path), now=datetime(2025, 2, 1, tzinfo=timezone.utc))
+        db.close()
+
+        contenido = b"".join(stream_audit_export(session_factory, {}, "ndjson", archive_dir=str(tmp_path)))
+        registros = [json.loads(line)["affected_record_id"] for line in contenido.decode("utf-8").splitlines()]
+        assert registros == [str(index) for index in range(50)]
+
+    def test_archived_events_from_overlapping_runs_stay_in_order(self, tmp_path):
+        session_factory = make_session_factory(50)
+        db = session_factory()
+        archive_old_events(db, older_than_days=0, archive_dir=str(tmp_path), now=datetime(2025, 1, 20, tzinfo=timezone.utc))
+        # Evento tardío de un día ya archivado: la segunda ejecución del mes genera un
+        # archivo cuyo rango se solapa con el de la primera
+        tardio = AuditoriaService.construir_evento("user-1", "READ", "tardio", "patients")
+        tardio["event_timestamp"] = datetime(2025, 1, 5, 12, tzinfo=timezone.utc)
+        AuditoriaService.registrar_eventos_lote(db, [tardio])
+        db.commit()
+        archive_old_events(db, older_than_days=0, archive_dir=str(tmp_path), now=datetime(2025, 2, 1, tzinfo=timezone.utc))
+        db.close()
+
+        contenido = b"".join(stream_audit_export(session_factory, {}, "ndjson", archive_dir=str(tmp_path)))
+        registros = [json.loads(line)["affected_record_id"] for line in contenido.decode("utf-8").splitlines()]
+        assert registros == [str(index) for index in range(5)] + ["tardio"] + [str(index) for index in range(5, 50)]
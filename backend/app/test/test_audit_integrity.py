@@ -0,0 +1,81 @@
+import sys
+import os
+from datetime import date, datetime, timezone
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.auditoria_models import Audit, AuditEventCounter, AuditSegmentSeal
+from app.services.auditoria_service import AuditoriaService
+from app.services.audit_integrity_service import (
+    compute_row_hash, seal_pending_segments, verify_audit_integrity
+)
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[Audit.__table__, AuditSegmentSeal.__table__, AuditEventCounter.__table__])
+    return sessionmaker(bind=engine)()
+
+
+def add_events(db, day, count):
+    """Insertar `count` eventos del día `day` con hash versión 2"""
+    ids = []
+    for index in range(count):
+        evento = AuditoriaService.construir_evento(
+            "user-1", "UPDATE", str(index), "patients", detalles_cambios={"campo": index}
+        )
+        evento["event_timestamp"] = datetime(day.year, day.month, day.day, 12, index, tzinfo=timezone.utc)
+        evento["integrity_hash"] = compute_row_hash(evento)
+        AuditoriaService.registrar_eventos_lote(db, [evento])
+        ids.append(evento["id"])
+    db.commit()
+    return ids
+
+
+class TestAuditIntegrity:
+    """Tests de sellos y verificación de la auditoría"""
+
+    def test_sealed_log_verifies(self):
+        db = make_session()
+        add_events(db, date(2025, 1, 1), 3)
+        add_events(db, date(2025, 1, 2), 5)
+
+        assert len(seal_pending_segments(db, until_day=date(2025, 1, 2))) == 2
+        report = verify_audit_integrity(db)
+        assert report["ok"]
+        assert report["rows_checked"] == 8
+
+    def test_reports_first_tampered_row(self):
+        db = make_session()
+        add_events(db, date(2025, 1, 1), 3)
+        ids = add_events(db, date(2025, 1, 2), 5)
+        seal_pending_segments(db, until_day=date(2025, 1, 2))
+
+        db.query(Audit).filter(Audit.id == ids[2]).update({"change_details": {"campo": "alterado"}})
+        db.commit()
+
+        report = verify_audit_integrity(db)
+        assert not report["ok"]
+        assert report["first_tampered_segment"] == "2025-01-02"
+        assert report["first_tampered_id"] == ids[2]
+
+    def test_detects_deleted_row_and_broken_chain(self):
+        db = make_session()
+        ids = add_events(db, date(2025, 1, 1), 3)
+        add_events(db, date(2025, 1, 2), 2)
+        seal_pending_segments(db, until_day=date(2025, 1, 2))
+
+        db.query(Audit).filter(Audit.id == ids[0]).delete()
+        db.query(AuditSegmentSeal).filter(AuditSegmentSeal.segment_day == date(2025, 1, 1)).update(
+            {"merkle_root": "0" * 64}
+        )
+        db.commit()
+
+        report = verify_audit_integrity(db)
+        assert report["broken_chain_day"] == "2025-01-01"
+        assert report["first_tampered_segment"] == "2025-01-01"
@@ -0,0 +1,48 @@
+import sys
+import os
+from datetime import date
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.services.audit_partition_service import (
+    add_months, create_partition_statements, maintain_partitions, months_to_create, partition_name,
+    partitions_to_detach
+)
+
+
+class TestAuditPartitions:
+    """Tests del mantenimiento de particiones mensuales de auditoría"""
+
+    def test_months_to_create_skips_existing(self):
+        assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+        assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+        existing = [date(2025, 11, 1), date(2026, 1, 1)]
+        assert months_to_create(existing, date(2025, 11, 1), 3) == [date(2025, 12, 1), date(2026, 2, 1)]
+        assert partition_name("audits", date(2026, 2, 1)) == "audits_p202602"
+
+    def test_partitions_to_detach_before_retention(self):
+        partitions = [{"name": partition_name("audits", month), "month": month} for month in (
+            date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1)
+        )]
+        assert [partition["name"] for partition in partitions_to_detach(partitions, date(2025, 2, 1))] == [
+            "audits_p202412", "audits_p202501"
+        ]
+
+    def test_create_moves_default_rows_before_attach(self):
+        statements = create_partition_statements("db_audit_log", date(2025, 12, 1))
+        assert statements[0].startswith('CREATE TABLE IF NOT EXISTS "db_audit_log_p202512" (LIKE "db_audit_log"')
+        assert 'DELETE FROM "db_audit_log_default" WHERE "changed_at" >= \'2025-12-01 00:00:00+00\'' in statements[2]
+        assert '"changed_at" < \'2026-01-01 00:00:00+00\'' in statements[2]
+        assert statements[-1] == (
+            'ALTER TABLE "db_audit_log" ATTACH PARTITION "db_audit_log_p202512" '
+            "FOR VALUES FROM ('2025-12-01 00:00:00+00') TO ('2026-01-01 00:00:00+00')"
+        )
+        assert len(create_partition_statements("audits", date(2025, 12, 1), move_default_rows=False)) == 2
+
+    def test_maintenance_is_noop_outside_postgresql(self):
+        db = sessionmaker(bind=create_engine("sqlite://"))()
+        assert maintain_partitions(db, months_ahead=3, retention_months=12) == {"created": [], "detached": []}
@@ -0,0 +1,152 @@
+import sys
+import os
+import ast
+import logging
+from pathlib import Path
+from types import SimpleNamespace
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.middleware import audit_session
+from app.models.auditoria_models import Audit, AuditEventCounter
+from app.services.auditoria_service import AuditoriaService
+
+
+APP_DIR = Path(__file__).resolve().parents[1]
+INIT_SCRIPTS_DIR = APP_DIR.parent / "init-scripts"
+
+# Eventos que no corresponden a un INSERT/UPDATE/DELETE de la fila afectada (o que
+# registran algo que el trigger no ve, como el cambio de contraseña en Firebase)
+NON_DATA_CHANGE_EVENT_TYPES = {
+    "READ", "LOGIN_SUCCESS", "LOGIN_FAILED", "LOGIN_FAILED_DETAILED", "LOGOUT", "ACCOUNT_LOCKED",
+    "PASSWORD_CHANGE", "FORCE_PASSWORD_CHANGE",
+}
+
+# Posición de tipo_evento en las llamadas posicionales
+EVENT_TYPE_POSITION = {"registrar_evento": 2, "registrar_evento_sin_commit": 2, "construir_evento": 1}
+
+
+def _string_constants(node):
+    return {child.value for child in ast.walk(node) if isinstance(child, ast.Constant) and isinstance(child.value, str)}
+
+
+def event_type_literals():
+    """Tipos de evento literales que la aplicación pasa a registrar_*, encolar_evento y construir_evento"""
+    literals = set()
+    for path in APP_DIR.rglob("*.py"):
+        if "test" in path.relative_to(APP_DIR).parts:
+            continue
+        tree = ast.parse(path.read_text(encoding="utf-8"))
+        for function in ast.walk(tree):
+            if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            assigned = {}
+            for node in ast.walk(function):
+                if isinstance(node, ast.Assign):
+                    for target in node.targets:
+                        if isinstance(target, ast.Name):
+                            assigned.setdefault(target.id, set()).update(_string_constants(node.value))
+            for call in ast.walk(function):
+                if not isinstance(call, ast.Call) or not isinstance(call.func, ast.Attribute):
+                    continue
+                name = call.func.attr
+                if not (name.startswith("registrar_") or name in ("construir_evento", "encolar_evento")):
+                    continue
+                values = [keyword.value for keyword in call.keywords if keyword.arg == "tipo_evento"]
+                position = EVENT_TYPE_POSITION.get(name)
+                if position is not None and len(call.args) > position:
+                    values.append(call.args[position])
+                for value in values:
+                    if isinstance(value, ast.Name):
+                        literals.update(assigned.get(value.id, set()))
+                    else:
+                        literals.update(_string_constants(value))
+    return literals
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[Audit.__table__, AuditEventCounter.__table__])
+    return sessionmaker(bind=engine)()
+
+
+class TestUnifiedAuditMode:
+    """Tests del modo de auditoría unificado"""
+
+    def test_every_event_type_is_classified(self):
+        literals = event_type_literals()
+        assert {"REACTIVATE", "CREACION_HISTORIA_CLINICA", "LOGIN_SUCCESS", "READ"} <= literals
+        assert literals - NON_DATA_CHANGE_EVENT_TYPES <= audit_session.DATA_CHANGE_EVENT_TYPES
+        assert not NON_DATA_CHANGE_EVENT_TYPES & audit_session.DATA_CHANGE_EVENT_TYPES
+
+    def test_sqlite_stays_in_dual_mode(self, monkeypatch):
+        monkeypatch.setattr(audit_session.settings, "audit_mode", "unified")
+        assert audit_session.configure_audit_mode(create_engine("sqlite://")) == "dual"
+        assert not audit_session.unified_audit_active()
+
+    def test_unified_mode_skips_data_change_events(self, monkeypatch):
+        monkeypatch.setattr(audit_session, "_unified_active", True)
+        db = make_session()
+
+        AuditoriaService.registrar_evento(db, "user-1", "UPDATE", "1", "patients")
+        AuditoriaService.registrar_evento(db, "user-1", "READ", "1", "clinical_histories")
+        AuditoriaService.registrar_evento(db, "user-1", "LOGIN", "user-1", "users")
+        insertados = AuditoriaService.registrar_eventos_lote(db, [
+            AuditoriaService.construir_evento("user-1", "AUTO_UPDATE", "2", "patients"),
+            AuditoriaService.construir_evento("user-1", "UPDATE", "3", "reports"),
+        ])
+        db.commit()
+
+        assert insertados == 1
+        assert sorted(evento.event_type for evento in db.query(Audit).all()) == ["LOGIN", "READ", "UPDATE"]
+
+    def test_event_types_are_declared_until_commit(self, monkeypatch):
+        monkeypatch.setattr(audit_session, "_unified_active", True)
+        db = make_session()
+        db.query(Audit).count()
+
+        audit_session.declare_event_type(db, "DEACTIVATE", "patients", 7)
+        AuditoriaService.registrar_evento_sin_commit(db, "user-1", "CREACION_HISTORIA_CLINICA", "3", "clinical_histories")
+        audit_session.declare_event_type(db, "READ", "patients", 8)
+        assert db.info[audit_session.EVENT_TYPES_KEY] == {
+            "patients:7": "DEACTIVATE", "clinical_histories:3": "CREACION_HISTORIA_CLINICA"
+        }
+        db.commit()
+        assert audit_session.EVENT_TYPES_KEY not in db.info
+
+        # Después del commit el cambio ya se registró: no se declara para la transacción siguiente
+        AuditoriaService.registrar_evento(db, "user-1", "REACTIVATE", "7", "patients")
+        assert audit_session.EVENT_TYPES_KEY not in db.info
+
+    def test_configure_audit_mode_checks_database_state(self, monkeypatch, caplog):
+        monkeypatch.setattr(audit_session, "_unified_active", False)
+        engine = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+        cases = [
+            ("dual", (True, 8, "unified"), "dual", "dos veces"),
+            ("dual", (True, 8, ""), "dual", "db_audit_log"),
+            ("dual", (False, 0, ""), "dual", None),
+            ("unified", (True, 8, ""), "dual", "bytedental.audit_mode"),
+            ("unified", (True, 0, ""), "dual", "10-unified-audit.sql"),
+            ("unified", (True, 8, "unified"), "unified", None),
+        ]
+        for mode, state, expected, message in cases:
+            caplog.clear()
+            monkeypatch.setattr(audit_session.settings, "audit_mode", mode)
+            monkeypatch.setattr(audit_session, "_database_audit_state", lambda engine, state=state: state)
+            with caplog.at_level(logging.WARNING, logger=audit_session.logger.name):
+                assert audit_session.configure_audit_mode(engine) == expected
+            assert audit_session.unified_audit_active() == (expected == "unified")
+            warnings = " ".join(record.getMessage() for record in caplog.records)
+            assert (message in warnings) if message else not warnings
+
+    def test_unified_script_is_opt_in_and_guarded(self):
+        assert not (INIT_SCRIPTS_DIR / "10-unified-audit.sql").exists()
+        script = (INIT_SCRIPTS_DIR / "optional" / "10-unified-audit.sql").read_text(encoding="utf-8")
+        assert "current_setting('bytedental.audit_mode', true) IS DISTINCT FROM 'unified'" in script
+        assert "bytedental.event_types" in script
+        assert "CREATE TRIGGER audit_" not in script
@@ -0,0 +1,72 @@
+import sys
+import os
+from datetime import date, datetime, timezone
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.auditoria_models import Audit, AuditEventCounter
+from app.services import audit_stats_service
+from app.services.auditoria_service import AuditoriaService
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[Audit.__table__, AuditEventCounter.__table__])
+    return sessionmaker(bind=engine)()
+
+
+def counters(db):
+    return sorted((c.dimension, c.key, c.day, c.count) for c in db.query(AuditEventCounter).all())
+
+
+class TestAuditStats:
+    """Tests de los contadores incrementales de auditoría"""
+
+    def test_counters_follow_writes_and_match_rebuild(self):
+        db = make_session()
+        AuditoriaService.registrar_evento(db, "user-1", "UPDATE", "7", "patients")
+        AuditoriaService.registrar_evento_sin_commit(db, "user-2", "READ", "7", "patients")
+        eventos = [AuditoriaService.construir_evento("user-1", "CREATE", str(i), "guardians") for i in range(3)]
+        eventos[0]["event_timestamp"] = datetime(2025, 1, 1, 23, 30, tzinfo=timezone.utc)
+        AuditoriaService.registrar_eventos_lote(db, eventos)
+        db.commit()
+
+        assert AuditoriaService.obtener_conteo_eventos_por_registro(db, "7", "patients") == 2
+        assert audit_stats_service.distinct_keys(db, "event_type") == ["CREATE", "READ", "UPDATE"]
+        usuarios = audit_stats_service.totals_by(db, "user")
+        assert usuarios == [{"key": "user-1", "count": 4}, {"key": "user-2", "count": 1}]
+        assert audit_stats_service.daily_totals(db, end_day=date(2025, 1, 1)) == [{"day": date(2025, 1, 1), "count": 1}]
+
+        incrementales = counters(db)
+        assert audit_stats_service.rebuild_counters(db) == 5
+        assert counters(db) == incrementales
+
+    def test_counters_applied_after_commit(self):
+        db = make_session()
+        AuditoriaService.registrar_evento_sin_commit(db, "user-1", "UPDATE", "7", "patients")
+        # Dentro de la transacción de negocio no se toca ningún contador
+        assert counters(db) == []
+        db.rollback()
+        db.commit()
+        assert counters(db) == []
+
+        AuditoriaService.registrar_evento_sin_commit(db, "user-1", "UPDATE", "7", "patients")
+        db.commit()
+        assert [(dimension, count) for dimension, _, _, count in counters(db)] == [
+            ("event_type", 1), ("record", 1), ("record_type", 1), ("user", 1)
+        ]
+
+    def test_ensure_counters_backfills_existing_events(self):
+        db = make_session()
+        AuditoriaService.registrar_evento(db, "user-1", "LOGIN", "user-1", "users")
+        db.query(AuditEventCounter).delete()
+        db.commit()
+
+        assert audit_stats_service.ensure_counters(db)
+        assert not audit_stats_service.ensure_counters(db)
+        assert audit_stats_service.distinct_keys(db, "record_type") == ["users"]
@@ -0,0 +1,114 @@
+import sys
+import os
+import json
+from datetime import date, datetime, timezone
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.auditoria_models import Audit, AuditEventCounter, AuditSegmentSeal
+from app.services.audit_integrity_service import compute_row_hash, seal_pending_segments, verify_audit_integrity
+from app.services.audit_writer import AuditWriter
+from app.services.auditoria_service import AuditoriaService
+
+
+def make_session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(
+        bind=engine, tables=[Audit.__table__, AuditEventCounter.__table__, AuditSegmentSeal.__table__]
+    )
+    return sessionmaker(bind=engine)
+
+
+def make_event(record_id, event_timestamp=None):
+    evento = AuditoriaService.construir_evento("user-1", "READ", str(record_id), "patients")
+    if event_timestamp is not None:
+        evento["event_timestamp"] = event_timestamp
+        evento["integrity_hash"] = compute_row_hash(evento)
+    return evento
+
+
+class TestAuditWriter:
+    """Tests del escritor de auditoría en lotes"""
+
+    def test_stop_drains_queue_in_batches(self):
+        session_factory = make_session_factory()
+        writer = AuditWriter(session_factory, batch_size=10, flush_interval=60)
+        writer.start()
+        for record_id in range(25):
+            writer.submit(make_event(record_id))
+        writer.stop()
+
+        assert session_factory().query(Audit).count() == 25
+        assert writer.stats()["batches"] == 3
+
+    def test_failed_batch_is_spooled_and_replayed(self, tmp_path):
+        spool_path = str(tmp_path / "audit_spool.jsonl")
+
+        failing = AuditWriter(_FailingSession, spool_path=spool_path)
+        failing.submit(make_event(1))
+        assert failing.stats()["spooled"] == 1
+
+        session_factory = make_session_factory()
+        writer = AuditWriter(session_factory, spool_path=spool_path)
+        assert writer.replay_spool() == 1
+        assert session_factory().query(Audit).count() == 1
+        assert not os.path.exists(spool_path)
+
+    def test_spool_is_replayed_by_one_writer_and_resumed_after_interruption(self, tmp_path):
+        spool_path = str(tmp_path / "audit_spool.jsonl")
+        session_factory = make_session_factory()
+        first, second = AuditWriter(session_factory, spool_path=spool_path), AuditWriter(session_factory, spool_path=spool_path)
+        first._spool([make_event(1), make_event(2)])
+
+        # El primero lo reclama: el segundo ya no lo encuentra
+        claimed = first._claim_spool()
+        assert claimed is not None and not os.path.exists(spool_path)
+        assert second.replay_spool() == 0
+        assert first._replay_claimed(*claimed) == 2
+        assert second.replay_spool() == 0
+        assert session_factory().query(Audit).count() == 2
+
+        # Reinserción interrumpida: el archivo reclamado quedó sin bloqueo y con un evento ya insertado
+        inserted = session_factory().query(Audit).first()
+        abandoned = f"{spool_path}.replay.99999.deadbeef"
+        with open(abandoned, "w", encoding="utf-8") as spool:
+            for evento in (make_event(inserted.affected_record_id) | {"id": inserted.id}, make_event(3)):
+                spool.write(json.dumps(evento, default=str) + "\n")
+        assert second.replay_spool() == 2
+        assert session_factory().query(Audit).count() == 3
+        assert not os.path.exists(abandoned)
+
+    def test_late_event_moves_out_of_sealed_day(self):
+        session_factory = make_session_factory()
+        writer = AuditWriter(session_factory)
+        late = make_event(1, datetime(2025, 1, 1, 10, tzinfo=timezone.utc))
+        writer._write_batch([make_event(2, datetime(2025, 1, 1, 9, tzinfo=timezone.utc))])
+        db = session_factory()
+        seal_pending_segments(db, until_day=date(2025, 1, 1))
+
+        writer._write_batch([late])
+        row = db.query(Audit).filter(Audit.affected_record_id == "1").one()
+        assert row.event_timestamp.date() > date(2025, 1, 1)
+        assert row.change_details["registro_tardio"]["event_timestamp_original"] == "2025-01-01T10:00:00.000000Z"
+        assert verify_audit_integrity(db)["ok"]
+
+
+class _FailingSession:
+    """Sesión que falla al insertar"""
+
+    def execute(self, *args, **kwargs):
+        raise RuntimeError("base de datos no disponible")
+
+    query = execute
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
@@ -202,3 +202,61 @@ def test_create_clinical_history_forbidden_for_non_doctor(client, test_db, assis
     )
     assert response.status_code == 403
     assert "No tienes permisos para realizar esta acción" in response.json()["detail"]
+
+
+def _create_history_with_treatments(db, treatment_count, suffix):
+    """Crear una historia clínica con `treatment_count` tratamientos de doctores distintos"""
+    from datetime import date, datetime
+    from app.models.rol_models import Role
+    from app.models.user_models import User
+    from app.models.person_models import Person, DocumentTypeEnum
+    from app.models.patient_models import Patient
+    from app.models.dental_service_models import DentalService
+    from app.models.clinical_history_models import ClinicalHistory
+    from app.models.treatment_models import Treatment
+
+    role = Role(name=f"Doctor-{suffix}")
+    service = DentalService(name=f"Limpieza-{suffix}", value=50000)
+    person = Person(
+        document_type=DocumentTypeEnum.CC, document_number=f"900{suffix}",
+        first_name="Ana", first_surname="Gómez", birthdate=date(1990, 1, 1)
+    )
+    db.add_all([role, service, person])
+    db.flush()
+    patient = Patient(person_id=person.id)
+    db.add(patient)
+    db.flush()
+    history = ClinicalHistory(patient_id=patient.id, reason="Control", symptoms="Ninguno", doctor_signature="firma")
+    db.add(history)
+    db.flush()
+    for index in range(treatment_count):
+        doctor = User(
+            uid=f"doctor-{suffix}-{index}", document_number=f"{suffix}{index}", document_type="CC",
+            first_name="Doc", last_name=str(index), email=f"doc{suffix}{index}@test.com", role_id=role.id
+        )
+        db.add(doctor)
+        db.add(Treatment(
+            clinical_history_id=history.id, dental_service_id=service.id, doctor_id=doctor.uid,
+            treatment_date=datetime(2025, 1, 1), reason="Control"
+        ))
+    db.commit()
+    db.expire_all()
+    return history.id
+
+
+def test_get_clinical_history_by_id_constant_queries(test_db):
+    """Prueba: El detalle de la historia clínica usa las mismas consultas sin importar el número de tratamientos"""
+    from app.services.clinical_history_service import ClinicalHistoryService
+    from app.middleware.query_metrics import track_queries
+
+    service = ClinicalHistoryService(test_db, current_user=None)
+    counts = []
+    for suffix, treatment_count in (("1", 2), ("2", 12)):
+        history_id = _create_history_with_treatments(test_db, treatment_count, suffix)
+        with track_queries() as stats:
+            detail = service.get_clinical_history_by_id(history_id)
+        assert len(detail["treatments"]) == treatment_count
+        assert detail["treatments"][0]["doctor_name"] == "DOC 0"
+        counts.append(stats.count)
+
+    assert counts[0] == counts[1]
@@ -0,0 +1,50 @@
+import sys
+import os
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.rol_models import Role
+from app.services.count_cache import count_cache, count_total, normalize_filters
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[Role.__table__])
+    db = sessionmaker(bind=engine)()
+    db.add_all([Role(name=f"Rol {index}", is_active=index % 2 == 0) for index in range(5)])
+    db.commit()
+    return db
+
+
+class TestCountCache:
+    """Tests de la caché de totales de los listados"""
+
+    def test_normalize_filters(self):
+        assert normalize_filters({"search": "Pérez", "active": None, "limit": 10}) == (
+            ("limit", "10"), ("search", "'pérez'")
+        )
+
+    def test_cached_total_invalidated_on_commit(self):
+        count_cache.clear()
+        db = make_session()
+        query = db.query(Role).filter(Role.is_active == True)
+
+        assert count_total(db, query, ("roles",), {"is_active": True}) == (3, False)
+        assert count_total(db, query, ("roles",), {"is_active": True}) == (3, False)
+        assert count_cache.stats()["hits"] == 1
+
+        db.add(Role(name="Rol nuevo", is_active=True))
+        db.commit()
+        assert count_total(db, query, ("roles",), {"is_active": True}) == (4, False)
+
+        # Una transacción revertida no descarta los totales
+        db.add(Role(name="Rol revertido", is_active=True))
+        db.flush()
+        db.rollback()
+        assert count_total(db, query, ("roles",), {"is_active": True}) == (4, False)
+        assert count_cache.stats()["hits"] == 2
@@ -0,0 +1,98 @@
+import sys
+import os
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  (registra todos los modelos para las relaciones)
+from app.database import Base
+from app.models.rol_models import Role
+from app.services.dashboard_cache import DashboardCache
+from app.services.invalidation_bus import invalidation_bus
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[Role.__table__])
+    return sessionmaker(bind=engine)()
+
+
+def make_counter(cache):
+    calls = []
+
+    @cache.cached("roles")
+    def count_roles(db, is_active=True):
+        calls.append(is_active)
+        return {"total": db.query(Role).filter(Role.is_active == is_active).count()}
+
+    return count_roles, calls
+
+
+class TestDashboardCache:
+    """Tests de la caché de resultados del dashboard"""
+
+    def test_memory_cache_invalidated_on_commit(self):
+        cache = DashboardCache("memory")
+        invalidation_bus.subscribe(cache.invalidate)
+        try:
+            count_roles, calls = make_counter(cache)
+            db = make_session()
+
+            assert count_roles(db) == {"total": 0}
+            assert count_roles(db, is_active=True) == {"total": 0}
+            assert count_roles(db, False) == {"total": 0}
+            assert calls == [True, False]
+
+            db.add(Role(name="Doctor", is_active=True))
+            db.commit()
+            assert count_roles(db) == {"total": 1}
+            assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3
+        finally:
+            invalidation_bus.unsubscribe(cache.invalidate)
+
+    def test_sqlite_store_shared_between_workers(self, tmp_path):
+        path = str(tmp_path / "dashboard_cache.sqlite3")
+        worker_a, worker_b = DashboardCache("sqlite", path=path), DashboardCache("sqlite", path=path)
+        count_a, calls_a = make_counter(worker_a)
+        count_b, calls_b = make_counter(worker_b)
+        db = make_session()
+
+        assert count_a(db) == {"total": 0}
+        assert count_b(db) == {"total": 0}
+        assert calls_b == []
+
+        # Una escritura publicada en un worker invalida la caché del otro
+        worker_a.invalidate({"roles"})
+        count_b(db)
+        assert calls_b == [True]
+        assert worker_b.stats()["size"] == 2
+
+    def test_results_right_after_write_are_not_stored(self):
+        # Con réplica: lo calculado justo después de una escritura puede venir de una réplica atrasada
+        cache = DashboardCache("memory", settle_seconds=30)
+        count_roles, calls = make_counter(cache)
+        db = make_session()
+
+        count_roles(db)
+        count_roles(db)
+        assert calls == [True]
+
+        cache.invalidate({"roles"})
+        count_roles(db)
+        count_roles(db)
+        assert calls == [True, True, True]
+        assert cache.stats()["unsettled"] == 2
+
+    def test_unavailable_store_counts_errors(self, tmp_path):
+        path = str(tmp_path / "dashboard_cache.sqlite3")
+        cache = DashboardCache("sqlite", path=path)
+        os.remove(path)
+        os.mkdir(path)
+
+        stats = cache.stats()
+        assert stats["size"] is None and stats["errors"] == 1
+        cache.clear()
+        assert cache.stats()["errors"] == 2
@@ -0,0 +1,144 @@
+import sys
+import os
+from datetime import date, datetime
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  (registra todos los modelos para las relaciones)
+from app.database import Base
+from app.models.clinical_history_models import ClinicalHistory
+from app.models.dashboard_rollup_models import TreatmentDailyPatient, TreatmentDailyRollup
+from app.models.dental_service_models import DentalService
+from app.models.patient_models import Patient
+from app.models.person_models import DocumentTypeEnum, Person
+from app.models.treatment_models import Treatment
+from app.services import dashboard_service
+from app.services.dashboard_cache import dashboard_cache
+from app.services.dashboard_rollup_service import distinct_active_patients, rebuild_rollups, record_treatments
+from app.services.dashboard_service import DashboardService
+
+TABLES = [Person, Patient, ClinicalHistory, DentalService, Treatment, TreatmentDailyRollup, TreatmentDailyPatient]
+
+
+def add_history(db, document_number, is_active=True):
+    person = Person(
+        document_type=DocumentTypeEnum.CC, document_number=document_number, first_name="Ana",
+        first_surname="Pérez", birthdate=date(1990, 1, 1)
+    )
+    db.add(person)
+    db.flush()
+    patient = Patient(person_id=person.id, is_active=is_active)
+    db.add(patient)
+    db.flush()
+    history = ClinicalHistory(patient_id=patient.id, reason="Control", symptoms="Ninguno", doctor_signature="firma")
+    db.add(history)
+    db.flush()
+    return history
+
+
+def add_treatments(db, history, *rows):
+    treatments = [
+        Treatment(
+            clinical_history_id=history.id, dental_service_id=service_id, doctor_id=doctor_id,
+            treatment_date=treatment_date, reason="Control"
+        )
+        for treatment_date, doctor_id, service_id in rows
+    ]
+    db.add_all(treatments)
+    record_treatments(db, treatments, history.patient_id)
+    db.commit()
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[model.__table__ for model in TABLES])
+    db = sessionmaker(bind=engine)()
+    db.add_all([DentalService(id=1, name="Limpieza", value=50), DentalService(id=2, name="Resina", value=80)])
+    first = add_history(db, "1001")
+    second = add_history(db, "1002")
+    inactive = add_history(db, "1003", is_active=False)
+    add_treatments(db, first, (datetime(2025, 3, 3, 9), "doc-a", 1), (datetime(2025, 3, 3, 15), "doc-a", 1))
+    add_treatments(db, second, (datetime(2025, 3, 20, 10), "doc-a", 2), (datetime(2025, 4, 2, 11), "doc-b", 1))
+    add_treatments(db, inactive, (datetime(2025, 3, 21, 8), "doc-b", 1))
+    return db
+
+
+def rollup_rows(db):
+    return [
+        (row.day, row.doctor_id, row.dental_service_id, row.treatment_count)
+        for row in db.query(TreatmentDailyRollup).order_by(
+            TreatmentDailyRollup.day, TreatmentDailyRollup.doctor_id, TreatmentDailyRollup.dental_service_id
+        )
+    ], [
+        (row.day, row.doctor_id, row.dental_service_id, row.patient_id)
+        for row in db.query(TreatmentDailyPatient).order_by(
+            TreatmentDailyPatient.day, TreatmentDailyPatient.doctor_id, TreatmentDailyPatient.dental_service_id,
+            TreatmentDailyPatient.patient_id
+        )
+    ]
+
+
+class TestDashboardRollups:
+    """Tests del agregado diario de tratamientos del dashboard"""
+
+    def test_incremental_matches_rebuild(self):
+        db = make_session()
+        incremental = rollup_rows(db)
+        rollups, patients = incremental
+        assert rollups[0] == (date(2025, 3, 3), "doc-a", 1, 2)
+        assert patients[0] == (date(2025, 3, 3), "doc-a", 1, 1) and len(patients) == 4
+
+        assert rebuild_rollups(db) == 5
+        assert rollup_rows(db) == incremental
+
+    def test_dashboard_statistics_from_rollups(self, monkeypatch):
+        dashboard_cache.clear()
+        db = make_session()
+        monkeypatch.setattr(dashboard_service.settings, "dashboard_use_rollups", True)
+
+        stats = DashboardService.get_active_patients_stats(db, date(2025, 3, 1), date(2025, 3, 31))
+        assert stats == {"total_active_patients": 2, "active_patients_period": 2}
+        assert DashboardService.get_active_patients_stats(db, date(2025, 3, 1), date(2025, 3, 31), "doc-b")[
+            "active_patients_period"
+        ] == 0
+
+        distribution = DashboardService.get_procedures_distribution(db, date(2025, 3, 1), date(2025, 4, 30))
+        assert distribution["total_procedures"] == 5
+        assert [(item["procedure"], item["quantity"]) for item in distribution["distribution"]] == [
+            ("Limpieza", 4), ("Resina", 1)
+        ]
+
+        months = DashboardService.get_treatments_per_month(db, year=2025, doctor_id="doc-a")
+        totals = {item["month"]: item["total_treatments"] for item in months}
+        assert totals["2025-03"] == 3 and totals["2025-04"] == 0 and len(months) == 12
+
+    def test_end_date_includes_whole_day_in_both_paths(self, monkeypatch):
+        db = make_session()
+        for use_rollups in (True, False):
+            dashboard_cache.clear()
+            monkeypatch.setattr(dashboard_service.settings, "dashboard_use_rollups", use_rollups)
+            # El tratamiento del 20 de marzo a las 10:00 cuenta con end_date=2025-03-20
+            distribution = DashboardService.get_procedures_distribution(db, date(2025, 3, 1), date(2025, 3, 20))
+            assert distribution["total_procedures"] == 3
+            stats = DashboardService.get_active_patients_stats(db, date(2025, 3, 1), date(2025, 3, 20))
+            assert stats["active_patients_period"] == 2
+            stats = DashboardService.get_active_patients_stats(db, date(2025, 3, 1), date(2025, 3, 19))
+            assert stats["active_patients_period"] == 1
+
+    def test_active_patients_counted_in_one_query(self, monkeypatch):
+        dashboard_cache.clear()
+        db = make_session()
+        monkeypatch.setattr(dashboard_service.settings, "dashboard_use_rollups", True)
+        # Mismo paciente en dos días y dos doctores: cuenta una vez
+        add_treatments(db, db.get(ClinicalHistory, 1), (datetime(2025, 5, 2, 9), "doc-b", 2))
+
+        statements = []
+        event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+        assert distinct_active_patients(db, date(2025, 3, 1)) == 2
+        assert len(statements) == 1
+        assert "count(distinct(treatment_daily_patients.patient_id))" in statements[0]
+        assert "patients.is_active" in statements[0]
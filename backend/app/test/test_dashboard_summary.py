@@ -0,0 +1,69 @@
+import sys
+import os
+import asyncio
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import app.models  # noqa: F401  (registra todos los modelos para las relaciones)
+from app.database import Base
+from app.models.clinical_history_models import ClinicalHistory
+from app.models.dashboard_rollup_models import TreatmentDailyPatient, TreatmentDailyRollup
+from app.models.dental_service_models import DentalService
+from app.models.patient_models import Patient
+from app.models.person_models import Person
+from app.models.rol_models import Role
+from app.models.treatment_models import Treatment
+from app.models.user_models import User
+from app.services.dashboard_cache import dashboard_cache
+from app.services.dashboard_service import DashboardService
+
+TABLES = [Person, Patient, ClinicalHistory, DentalService, Treatment, TreatmentDailyRollup, TreatmentDailyPatient, Role, User]
+
+
+def make_session_factory(tmp_path):
+    # Archivo y no memoria: cada widget abre su propia conexión
+    database = tmp_path / "dashboard.db"
+    engine = create_engine(f"sqlite:///{database}")
+    Base.metadata.create_all(bind=engine, tables=[model.__table__ for model in TABLES])
+    engine.dispose()
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{database}")
+    return async_engine, async_sessionmaker(async_engine, expire_on_commit=False)
+
+
+class TestDashboardSummary:
+    """Tests del resumen combinado del dashboard"""
+
+    def test_summary_reports_failures_per_widget(self, tmp_path, monkeypatch, caplog):
+        dashboard_cache.clear()
+        async_engine, session_factory = make_session_factory(tmp_path)
+
+        async def failing_widget(db, **filters):
+            raise RuntimeError("consulta fallida")
+
+        monkeypatch.setattr(DashboardService, "get_procedures_by_doctor_async", failing_widget)
+
+        async def run():
+            try:
+                return await DashboardService.get_dashboard_summary_async(session_factory, year=2025)
+            finally:
+                await async_engine.dispose()
+
+        summary = asyncio.run(run())
+
+        assert set(summary) == {
+            "active_patients", "employees", "procedures_distribution", "procedures_by_doctor", "treatments_per_month"
+        }
+        assert summary["procedures_by_doctor"]["ok"] is False
+        # El detalle de la excepción se registra en el log, no en la respuesta
+        assert summary["procedures_by_doctor"]["error"] == "Error obteniendo los datos del widget"
+        assert "consulta fallida" in caplog.text
+        assert summary["procedures_by_doctor"]["data"] is None
+
+        assert summary["active_patients"]["data"] == {"total_active_patients": 0, "active_patients_period": 0}
+        assert summary["procedures_distribution"]["data"]["total_procedures"] == 0
+        assert len(summary["treatments_per_month"]["data"]) == 12
+        assert all(summary[name]["ok"] for name in summary if name != "procedures_by_doctor")
@@ -0,0 +1,79 @@
+import json
+import time
+import sys
+import os
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from app.services.local_token_verifier import LocalTokenVerifier
+
+PROJECT_ID = "bytedental-test"
+
+
+def make_key_pair():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode("utf-8")
+    return private_key, public_pem
+
+
+def make_token(private_key, kid, uid="doctor-uid", audience=PROJECT_ID, expires_in=3600):
+    now = int(time.time())
+    claims = {
+        "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+        "aud": audience,
+        "sub": uid,
+        "iat": now,
+        "exp": now + expires_in,
+    }
+    return jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.fixture
+def key_setup(tmp_path):
+    """Directorio con un archivo public_keys.json y su clave privada"""
+    private_key, public_pem = make_key_pair()
+    (tmp_path / "public_keys.json").write_text(json.dumps({"kid-1": public_pem}))
+    verifier = LocalTokenVerifier(str(tmp_path), PROJECT_ID, refresh_interval=0)
+    verifier.load_keys(force=True)
+    return verifier, private_key, tmp_path
+
+
+class TestLocalTokenVerifier:
+    """Tests de la verificación local de ID tokens"""
+
+    def test_valid_token_returns_uid(self, key_setup):
+        verifier, private_key, _ = key_setup
+        decoded = verifier.verify(make_token(private_key, "kid-1"))
+        assert decoded["uid"] == "doctor-uid"
+
+    def test_unknown_kid_is_rejected(self, key_setup):
+        verifier, private_key, _ = key_setup
+        with pytest.raises(jwt.InvalidTokenError):
+            verifier.verify(make_token(private_key, "kid-unknown"))
+
+    def test_wrong_audience_is_rejected(self, key_setup):
+        verifier, private_key, _ = key_setup
+        with pytest.raises(jwt.InvalidTokenError):
+            verifier.verify(make_token(private_key, "kid-1", audience="other-project"))
+
+    def test_expired_token_is_rejected(self, key_setup):
+        verifier, private_key, _ = key_setup
+        with pytest.raises(jwt.ExpiredSignatureError):
+            verifier.verify(make_token(private_key, "kid-1", expires_in=-10))
+
+    def test_pem_file_in_directory_is_loaded(self, key_setup):
+        verifier, _, keys_dir = key_setup
+        other_private_key, other_public_pem = make_key_pair()
+        (keys_dir / "kid-2.pem").write_text(other_public_pem)
+
+        assert verifier.load_keys(force=True) == 2
+        assert verifier.verify(make_token(other_private_key, "kid-2"))["uid"] == "doctor-uid"
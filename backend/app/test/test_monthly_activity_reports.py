@@ -0,0 +1,175 @@
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  (registra todos los modelos para las relaciones)
+from app.database import Base
+from app.models.dental_service_models import DentalService
+from app.models.report_models import MonthlyActivityReport
+from app.models.treatment_models import Treatment
+from app.services import monthly_activity_service
+from app.services.monthly_activity_service import (
+    ensure_snapshots, get_month_snapshot, get_year_snapshots, record_monthly_activity
+)
+
+TABLES = [DentalService, Treatment, MonthlyActivityReport]
+
+
+def add_treatment(db, treatment_date, service_id):
+    treatment = Treatment(
+        clinical_history_id=1, dental_service_id=service_id, doctor_id="doc-a",
+        treatment_date=treatment_date, reason="Control"
+    )
+    db.add(treatment)
+    record_monthly_activity(db, [treatment])
+    db.commit()
+    return treatment
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[model.__table__ for model in TABLES])
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        DentalService(id=1, name="Limpieza", value=Decimal("50000.00")),
+        DentalService(id=2, name="Resina", value=Decimal("80000.50"))
+    ])
+    db.commit()
+    return db
+
+
+class TestMonthlyActivityReports:
+    """Tests de las instantáneas mensuales de actividad"""
+
+    def test_closed_month_is_frozen(self):
+        db = make_session()
+        add_treatment(db, datetime(2024, 3, 3, 9), 1)
+        add_treatment(db, datetime(2024, 3, 20, 23, 30), 2)
+
+        # Sin instantánea guardada la consulta calcula al vuelo y no escribe
+        snapshot = get_month_snapshot(db, 2024, 3)
+        assert snapshot.is_closed
+        assert snapshot.total_activities == 2
+        assert snapshot.total_revenue == Decimal("130000.50")
+        months = get_year_snapshots(db, 2024)
+        assert [snapshot.total_activities for snapshot in months][:4] == [0, 0, 2, 0]
+        assert db.query(MonthlyActivityReport).count() == 0
+
+        assert ensure_snapshots(db, today=datetime(2025, 2, 10)) == 13
+        assert ensure_snapshots(db, today=datetime(2025, 2, 10)) == 0
+
+        # Un tratamiento con fecha de un mes cerrado no cambia la instantánea
+        add_treatment(db, datetime(2024, 3, 21, 10), 1)
+        assert get_month_snapshot(db, 2024, 3).total_activities == 2
+        assert get_year_snapshots(db, 2024)[2].total_activities == 2
+
+    def test_current_month_is_incremental(self):
+        db = make_session()
+        now = datetime.now()
+        add_treatment(db, now, 1)
+        ensure_snapshots(db)
+
+        snapshot = get_month_snapshot(db, now.year, now.month)
+        assert not snapshot.is_closed and snapshot.total_activities == 1
+
+        add_treatment(db, now, 2)
+        add_treatment(db, now, 2)
+        snapshot = get_month_snapshot(db, now.year, now.month)
+        assert snapshot.procedures == [
+            {"procedure_name": "Limpieza", "patient_count": 1, "revenue": "50000.00"},
+            {"procedure_name": "Resina", "patient_count": 2, "revenue": "160001.00"}
+        ]
+        assert snapshot.total_revenue == Decimal("210001.00")
+
+    def test_reads_do_not_write_and_maintenance_closes_months(self):
+        db = make_session()
+        add_treatment(db, datetime(2024, 3, 3, 9), 1)
+        # Instantánea creada mientras marzo estaba en curso
+        ensure_snapshots(db, today=datetime(2024, 3, 20))
+        snapshot = db.query(MonthlyActivityReport).filter_by(year=2024, month="03").one()
+        assert not snapshot.is_closed
+
+        # Marzo ya terminó: la consulta lo recalcula sin guardarlo
+        add_treatment(db, datetime(2024, 3, 4, 9), 2)
+
+        statements = []
+        event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+        assert get_year_snapshots(db, 2024)[2].total_activities == 2
+        assert not any(statement.lstrip().upper().startswith(("INSERT", "UPDATE")) for statement in statements)
+        assert not db.new and not db.dirty
+
+        assert ensure_snapshots(db) >= 1
+        snapshot = db.query(MonthlyActivityReport).filter_by(year=2024, month="03").one()
+        assert snapshot.is_closed and snapshot.total_activities == 2
+
+    def test_refresh_takes_month_lock_before_counting(self, monkeypatch):
+        db = make_session()
+        calls = []
+        monkeypatch.setattr(
+            monthly_activity_service, "_lock_month",
+            lambda db, year, month, shared: calls.append(("lock", year, month, shared))
+        )
+        original_compute = monthly_activity_service.compute_month
+        monkeypatch.setattr(
+            monthly_activity_service, "compute_month",
+            lambda db, year, month: calls.append(("count", year, month)) or original_compute(db, year, month)
+        )
+        monthly_activity_service.refresh_month(db, 2024, 3)
+        assert calls == [("lock", 2024, 3, False), ("count", 2024, 3)]
+
+        now = datetime.now()
+        ensure_snapshots(db)
+        calls.clear()
+        add_treatment(db, now, 1)
+        assert calls == [("lock", now.year, now.month, True)]
+
+    def test_increments_apply_after_commit_unless_refreshed(self):
+        db = make_session()
+        now = datetime.now()
+        ensure_snapshots(db)
+        snapshot = get_month_snapshot(db, now.year, now.month)
+        refreshed_at = snapshot.refreshed_at
+
+        # Dentro de la transacción de negocio la instantánea no se toca
+        treatment = Treatment(
+            clinical_history_id=1, dental_service_id=1, doctor_id="doc-a", treatment_date=now, reason="Control"
+        )
+        db.add(treatment)
+        assert record_monthly_activity(db, [treatment]) == 1
+        assert get_month_snapshot(db, now.year, now.month).total_activities == 0
+        db.rollback()
+        assert get_month_snapshot(db, now.year, now.month).total_activities == 0
+
+        add_treatment(db, now, 1)
+        assert get_month_snapshot(db, now.year, now.month).total_activities == 1
+
+        # Un incremento leído antes de un recálculo se descarta (el recálculo ya lo contó)
+        stale = {(now.year, now.month): {"refreshed_at": refreshed_at, "procedures": {"Resina": (5, Decimal("5"))}}}
+        monthly_activity_service.refresh_month(db, now.year, now.month)
+        assert monthly_activity_service._apply_pending(db, stale) == 0
+        current = get_month_snapshot(db, now.year, now.month)
+        stale[(now.year, now.month)]["refreshed_at"] = current.refreshed_at
+        assert monthly_activity_service._apply_pending(db, stale) == 1
+        db.commit()
+        assert get_month_snapshot(db, now.year, now.month).total_activities == 6
+
+    def test_maintainer_runs_periodically(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(monthly_activity_service, "ensure_snapshots", lambda db: calls.append(db) or 0)
+        maintainer = monthly_activity_service.MonthlySnapshotMaintainer(make_session, interval=0.01)
+        maintainer.start()
+        try:
+            deadline = datetime.now() + timedelta(seconds=2)
+            while len(calls) < 3 and datetime.now() < deadline:
+                time.sleep(0.01)
+        finally:
+            maintainer.stop()
+        assert len(calls) >= 3
@@ -0,0 +1,111 @@
+import sys
+import os
+import threading
+from datetime import date
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.models  # noqa: F401  (registra todos los modelos para las relaciones)
+from app.database import Base
+from app.models.patient_models import Patient
+from app.models.person_models import DocumentTypeEnum, Person
+from app.services.patient_prefix_index import PatientPrefixIndex
+
+
+def add_patient(db, document_number, first_name, first_surname, second_surname=None, is_active=True):
+    person = Person(
+        document_type=DocumentTypeEnum.CC, document_number=document_number, first_name=first_name,
+        first_surname=first_surname, second_surname=second_surname, birthdate=date(1990, 1, 1)
+    )
+    db.add(person)
+    db.flush()
+    patient = Patient(person_id=person.id, is_active=is_active)
+    db.add(patient)
+    db.commit()
+    return patient
+
+
+def make_session(engine=None):
+    engine = engine or create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[Person.__table__, Patient.__table__])
+    db = sessionmaker(bind=engine)()
+    add_patient(db, "1.020.345", "Ana", "Pérez", "Gómez")
+    add_patient(db, "1020999", "Luis", "Peralta")
+    add_patient(db, "5550001", "José", "Muñoz", is_active=False)
+    return db
+
+
+class TestPatientPrefixIndex:
+    """Tests del índice de prefijos del autocompletado de pacientes"""
+
+    def test_prefix_search_by_document_and_surname(self):
+        db = make_session()
+        index = PatientPrefixIndex()
+        assert index.build(db) == 3
+
+        assert [entry.document_number for entry in index.search("1020")] == ["1.020.345", "1020999"]
+        assert [entry.display_name for entry in index.search("pe")] == ["LUIS PERALTA", "ANA PÉREZ GÓMEZ"]
+        assert [entry.display_name for entry in index.search("perez gom")] == ["ANA PÉREZ GÓMEZ"]
+        assert index.search("muñ") == []
+        assert [entry.display_name for entry in index.search("MUN", active_only=False)] == ["JOSÉ MUÑOZ"]
+        assert len(index.search("1", limit=1)) == 1
+
+    def test_incremental_updates(self):
+        db = make_session()
+        index = PatientPrefixIndex()
+        index.build(db)
+
+        patient = add_patient(db, "7770001", "Sofía", "Ospina")
+        index.upsert_patient(patient)
+        assert [entry.patient_id for entry in index.search("osp")] == [patient.id]
+
+        patient.person.first_surname = "Castaño"
+        db.commit()
+        index.upsert_person(patient.person)
+        assert index.search("osp") == []
+        assert [entry.patient_id for entry in index.search("castano")] == [patient.id]
+        assert index.stats()["patients"] == 4
+
+    def test_single_rebuild_keeps_changes_received_meanwhile(self):
+        # Una conexión compartida entre hilos para que ambos vean la misma base en memoria
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        db = make_session(engine)
+        index = PatientPrefixIndex(rebuild_seconds=0)
+        index.build(db)
+
+        # La consulta de la reconstrucción toma sus filas y se detiene hasta que el test la libere
+        builder_db = sessionmaker(bind=engine)()
+        started, release = threading.Event(), threading.Event()
+
+        @event.listens_for(builder_db, "do_orm_execute")
+        def pause(state):
+            frozen = state.invoke_statement().freeze()
+            started.set()
+            release.wait(5)
+            return frozen()
+
+        builder = threading.Thread(target=index.ensure_fresh, args=(builder_db,))
+        builder.start()
+        assert started.wait(5)
+
+        # Otro llamador no reconstruye: sigue con el índice anterior
+        queries = []
+        event.listen(db, "do_orm_execute", lambda state: queries.append(state))
+        index.ensure_fresh(db)
+        assert queries == []
+        assert len(index.search("pe")) == 2
+
+        patient = add_patient(db, "7770001", "Sofía", "Ospina")
+        index.upsert_patient(patient)
+        assert [entry.patient_id for entry in index.search("osp")] == [patient.id]
+
+        release.set()
+        builder.join(5)
+        # La reconstrucción no vio al paciente nuevo, pero el cambio se volvió a aplicar
+        assert [entry.patient_id for entry in index.search("osp")] == [patient.id]
+        assert index.stats()["patients"] == 4
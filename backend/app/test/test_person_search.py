@@ -0,0 +1,53 @@
+import sys
+import os
+from datetime import date
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.person_models import DocumentTypeEnum, Person
+from app.services import person_search
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[Person.__table__])
+    db = sessionmaker(bind=engine)()
+    for index, (nombre, apellido) in enumerate([("José", "Pérez"), ("Ana", "Gómez"), ("Luisa", "Peralta")]):
+        db.add(Person(
+            document_type=DocumentTypeEnum.CC, document_number=f"100{index}", first_name=nombre,
+            first_surname=apellido, email=f"{nombre.lower()}@correo.com", birthdate=date(1990, 1, 1)
+        ))
+    db.commit()
+    return db
+
+
+class TestPersonSearch:
+    """Tests de la búsqueda de personas"""
+
+    def test_normalize_search(self):
+        assert person_search.normalize_search("  José   MUÑOZ ") == "jose munoz"
+
+    def test_ilike_fallback(self):
+        db = make_session()
+        query = person_search.apply_person_search(db.query(Person.document_number), "per")
+        # Sin índice la búsqueda no ignora tildes: "PÉREZ" no coincide
+        assert [row[0] for row in query.all()] == ["1002"]
+
+    def test_index_mode_sql(self, monkeypatch):
+        monkeypatch.setattr(person_search, "_index_active", True)
+        db = make_session()
+        query = person_search.apply_person_search(db.query(Person.id), "Pérez 50%")
+        compiled = query.statement.compile(dialect=postgresql.dialect())
+
+        sql = str(compiled)
+        assert "persons.search_vector @@ to_tsquery" in sql
+        assert "persons.search_text LIKE" in sql
+        assert "ORDER BY ts_rank" in sql
+        assert "perez:* & 50:*" in compiled.params.values()
+        assert "%perez 50\\%%" in compiled.params.values()
@@ -0,0 +1,35 @@
+import sys
+import os
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from app.middleware.query_metrics import track_queries
+
+
+class TestQueryMetrics:
+    """Tests del contador de consultas SQL"""
+
+    def test_counts_statements_inside_block(self):
+        engine = create_engine("sqlite:///:memory:")
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))  # fuera del bloque: no se cuenta
+            with track_queries() as stats:
+                connection.execute(text("SELECT 1"))
+                connection.execute(text("SELECT 2"))
+
+        assert stats.count == 2
+        assert stats.total_time >= 0
+
+    def test_detects_repeated_statements(self):
+        engine = create_engine("sqlite:///:memory:")
+        with engine.connect() as connection, track_queries() as stats:
+            for value in range(5):
+                connection.execute(text("SELECT :value"), {"value": value})
+            connection.execute(text("SELECT 'otra'"))
+
+        repeated = stats.repeated(threshold=5)
+        assert len(repeated) == 1
+        assert repeated[0][1] == 5
@@ -0,0 +1,61 @@
+import sys
+import os
+from datetime import date, datetime
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  (registra todos los modelos para las relaciones)
+from app.database import Base
+from app.models.treatment_models import Treatment
+from app.services import dashboard_service
+from app.services.dashboard_cache import dashboard_cache
+from app.services.dashboard_service import DashboardService
+from app.services.time_buckets import bucket_label, month_labels, month_range, range_filter
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[Treatment.__table__])
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        Treatment(clinical_history_id=1, dental_service_id=1, doctor_id=doctor_id, treatment_date=treatment_date, reason="Control")
+        for treatment_date, doctor_id in [
+            (datetime(2024, 12, 31, 23, 59), "doc-a"),
+            (datetime(2025, 1, 1, 0, 0), "doc-a"),
+            (datetime(2025, 1, 31, 18, 30), "doc-b"),
+            (datetime(2025, 12, 15, 9, 0), "doc-a"),
+        ]
+    ])
+    db.commit()
+    return db
+
+
+class TestTimeBuckets:
+    """Tests de la agrupación por mes con rangos de fechas"""
+
+    def test_helpers(self):
+        assert month_range(date(2025, 12, 10)) == (datetime(2025, 12, 1), datetime(2026, 1, 1))
+        assert month_labels(date(2024, 11, 5), datetime(2025, 2, 1)) == ["2024-11", "2024-12", "2025-01", "2025-02"]
+        assert bucket_label("2025-03-01") == bucket_label(datetime(2025, 3, 1)) == "2025-03"
+
+        condition = range_filter(Treatment.treatment_date, *month_range(date(2025, 3, 9)))
+        sql = str(condition[0].compile(dialect=postgresql.dialect())) + str(condition[1].compile(dialect=postgresql.dialect()))
+        assert "extract" not in sql and "treatments.treatment_date >=" in sql and "treatments.treatment_date <" in sql
+
+    def test_treatments_per_month_without_rollups(self, monkeypatch):
+        dashboard_cache.clear()
+        monkeypatch.setattr(dashboard_service.settings, "dashboard_use_rollups", False)
+        db = make_session()
+
+        months = DashboardService.get_treatments_per_month(db, year=2025)
+        totals = {item["month"]: item["total_treatments"] for item in months}
+        assert len(months) == 12
+        assert totals["2025-01"] == 2 and totals["2025-12"] == 1 and sum(totals.values()) == 3
+
+        months = DashboardService.get_treatments_per_month(db, year=2025, doctor_id="doc-b")
+        assert sum(item["total_treatments"] for item in months) == 1
@@ -0,0 +1,67 @@
+import time
+import sys
+import os
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from app.services.token_cache import VerifiedTokenCache
+
+
+def make_token(uid, seconds=3600):
+    """Crear un token decodificado con expiración relativa"""
+    return {"uid": uid, "exp": int(time.time()) + seconds}
+
+
+class TestVerifiedTokenCache:
+    """Tests de la caché de tokens verificados"""
+
+    def test_hit_and_miss_counters(self):
+        cache = VerifiedTokenCache(max_size=10, max_ttl=300)
+        assert cache.get("token-a") is None
+
+        cache.set("token-a", make_token("user-a"))
+        assert cache.get("token-a")["uid"] == "user-a"
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["size"] == 1
+
+    def test_expired_token_is_not_cached(self):
+        cache = VerifiedTokenCache(max_size=10, max_ttl=300)
+        cache.set("token-a", make_token("user-a", seconds=-1))
+        cache.set("token-b", {"uid": "user-b"})
+
+        assert cache.get("token-a") is None
+        assert cache.get("token-b") is None
+
+    def test_lru_eviction(self):
+        cache = VerifiedTokenCache(max_size=2, max_ttl=300)
+        cache.set("token-a", make_token("user-a"))
+        cache.set("token-b", make_token("user-b"))
+        # Usar token-a para que token-b sea el menos reciente
+        cache.get("token-a")
+        cache.set("token-c", make_token("user-c"))
+
+        assert cache.get("token-b") is None
+        assert cache.get("token-a") is not None
+        assert cache.get("token-c") is not None
+
+    def test_revoke_uid(self):
+        cache = VerifiedTokenCache(max_size=10, max_ttl=300)
+        cache.set("token-a1", make_token("user-a"))
+        cache.set("token-a2", make_token("user-a"))
+        cache.set("token-b", make_token("user-b"))
+
+        assert cache.revoke_uid("user-a") == 2
+        assert cache.get("token-a1") is None
+        assert cache.get("token-b") is not None
+        assert cache.stats()["revocations"] == 2
+
+    def test_tokens_are_keyed_by_digest(self):
+        cache = VerifiedTokenCache(max_size=10, max_ttl=300)
+        cache.set("secret-token", make_token("user-a"))
+
+        assert "secret-token" not in cache._cache
+        assert VerifiedTokenCache.digest("secret-token") in cache._cache
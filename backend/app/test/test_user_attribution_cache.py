@@ -0,0 +1,85 @@
+import sys
+import os
+
+# Añadir el directorio backend al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import pytest
+
+from app.database import Base
+from app.middleware.principal import Principal
+from app.models.rol_models import Role
+from app.models.user_models import User
+from app.services.auditoria_service import AuditoriaService, user_attribution_cache
+from app.services.user_attribution_cache import UserAttributionCache
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[Role.__table__, User.__table__])
+    db = sessionmaker(bind=engine)()
+    db.add_all([Role(id=1, name="Administrador"), Role(id=2, name="Asistente")])
+    db.add(User(
+        uid="user-1", document_number="1", document_type="CC", first_name="Ana",
+        last_name="Pérez", email="ana@bytedental.local", role_id=1
+    ))
+    db.commit()
+    return db
+
+
+class TestUserAttributionCache:
+    """Tests de la caché de rol/email para la atribución de auditoría"""
+
+    def test_lookup_is_cached_until_invalidated(self):
+        user_attribution_cache.clear()
+        db = make_session()
+
+        assert AuditoriaService._obtener_datos_usuario(db, "user-1") == ("Administrador", "ana@bytedental.local")
+
+        # Cambio de rol sin invalidar: se sigue sirviendo la entrada en caché
+        db.query(User).filter(User.uid == "user-1").update({"role_id": 2})
+        db.commit()
+        assert AuditoriaService._obtener_datos_usuario(db, "user-1") == ("Administrador", "ana@bytedental.local")
+
+        assert AuditoriaService.invalidar_datos_usuario("user-1") is True
+        assert AuditoriaService._obtener_datos_usuario(db, "user-1") == ("Asistente", "ana@bytedental.local")
+
+        stats = user_attribution_cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+        assert stats["invalidations"] == 1
+
+    def test_unknown_user_is_not_cached(self):
+        user_attribution_cache.clear()
+        db = make_session()
+
+        assert AuditoriaService._obtener_datos_usuario(db, "nadie") == (None, None)
+        assert user_attribution_cache.stats()["size"] == 0
+
+    def test_principal_resolve(self):
+        user_attribution_cache.clear()
+        db = make_session()
+
+        # El principal de la petición se reutiliza sin consultar
+        principal = Principal(uid="user-1", role="Asistente", email=None, ip="10.0.0.1")
+        assert Principal.resolve(db, "user-1", principal) is principal
+
+        resuelto = Principal.resolve(db, "user-1", ip="10.0.0.2")
+        assert resuelto == Principal(uid="user-1", role="Administrador", email="ana@bytedental.local", ip="10.0.0.2")
+        assert Principal.resolve(db, "user-1").ip == "unknown"
+
+        with pytest.raises(ValueError):
+            Principal.resolve(db, None)
+
+    def test_lru_eviction(self):
+        cache = UserAttributionCache(max_size=2, ttl=300)
+        cache.set("a", ("Administrador", "a@x"))
+        cache.set("b", ("Asistente", "b@x"))
+        cache.get("a")
+        cache.set("c", ("Doctor", "c@x"))
+
+        assert cache.get("b") is None
+        assert cache.get("a") == ("Administrador", "a@x")
@@ -1,4 +1,4 @@
 # Utils package for ByteDental
-from .audit_context import get_user_context, get_audit_context
+from .audit_context import get_user_context, get_audit_context, get_principal
 
-__all__ = ["get_user_context", "get_audit_context"]
\ No newline at end of file
+__all__ = ["get_user_context", "get_audit_context", "get_principal"]
\ No newline at end of file
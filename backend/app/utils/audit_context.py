@@ -2,9 +2,10 @@ from fastapi import Request, Depends
 from sqlalchemy.orm import Session
 from typing import Optional, Tuple
 from app.database import get_db
-from app.middleware.auth_middleware import get_current_user_from_header
+from app.middleware.auth_middleware import get_request_principal
+from app.middleware.principal import Principal, get_request_ip
 
-def get_user_context(request: Request, db: Session = Depends(get_db)) -> Tuple[Optional[int], str]:
+def get_user_context(request: Request, db: Session = Depends(get_db)) -> Tuple[Optional[str], str]:
     """
     Extraer información del usuario para auditoría desde la request
     
@@ -15,33 +16,23 @@ def get_user_context(request: Request, db: Session = Depends(get_db)) -> Tuple[O
     Returns:
         Tuple (user_id, user_ip)
     """
-    # Intentar obtener usuario autenticado
-    user_id = None
+    principal = get_principal(request, db)
+    if principal:
+        return principal.uid, principal.ip
+    return None, get_request_ip(request)
+
+def get_principal(request: Request, db: Session = Depends(get_db)) -> Optional[Principal]:
+    """
+    Obtener el principal de la petición (resuelto una sola vez por request)
+    
+    Returns:
+        Principal con uid, rol, email e IP, o None si no hay usuario autenticado
+    """
     try:
-        user = get_current_user_from_header(request, db)
-        # Usar uid si existe, sino id, sino None
-        user_id = getattr(user, 'uid', None) if user else None
-        if not user_id and user:
-            user_id = getattr(user, 'id', None)
+        return get_request_principal(request, db)
     except Exception:
-        # Si no se puede obtener el usuario, continuar con None
-        pass
-    
-    # Extraer IP del cliente
-    user_ip = None
-    if hasattr(request, 'client') and request.client:
-        user_ip = request.client.host
-    
-    # Alternativamente, verificar headers de proxy
-    if not user_ip and hasattr(request, 'headers'):
-        user_ip = (
-            request.headers.get('X-Forwarded-For', '').split(',')[0].strip() or
-            request.headers.get('X-Real-IP') or
-            request.headers.get('CF-Connecting-IP') or
-            'unknown'
-        )
-    
-    return user_id, user_ip or "unknown"
+        # Si no se puede obtener el usuario, continuar sin principal
+        return None
 
 def get_audit_context(request: Request, db: Session = Depends(get_db)) -> dict:
     """
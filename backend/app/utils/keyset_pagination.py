@@ -0,0 +1,72 @@
+"""
+Paginación por cursor (keyset) para listados ordenados por (timestamp desc, id desc)
+
+En lugar de OFFSET, cada página continúa desde la última fila de la anterior,
+así que el costo no crece con la profundidad de la página. El cursor es opaco
+para el cliente: JSON con el timestamp y el id codificado en base64 URL-safe.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+
+
+def encode_cursor(timestamp: datetime, record_id: Any) -> str:
+    """Codificar la posición (timestamp, id) de la última fila de la página"""
+    payload = json.dumps({"ts": timestamp.isoformat(), "id": record_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, Any]:
+    """
+    Decodificar un cursor generado por encode_cursor
+
+    Raises:
+        HTTPException 400: si el cursor no es válido
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["ts"]), payload["id"]
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginación inválido"
+        )
+
+
+def paginate_keyset(query, timestamp_column, id_column, limit: int, cursor: Optional[str] = None) -> Tuple[List, Optional[str]]:
+    """
+    Obtener una página ordenada por (timestamp desc, id desc) a partir de un cursor
+
+    Args:
+        query: consulta ya filtrada (sin order_by/offset/limit)
+        timestamp_column: columna de fecha del orden
+        id_column: columna de desempate (única)
+        limit: tamaño de la página
+        cursor: cursor devuelto por la página anterior (None = primera página)
+
+    Returns:
+        Tupla (filas, cursor de la siguiente página o None si no hay más)
+    """
+    if cursor:
+        last_timestamp, last_id = decode_cursor(cursor)
+        # El límite simple sobre el timestamp es redundante con la comparación de
+        # tuplas, pero permite a PostgreSQL descartar particiones posteriores
+        query = query.filter(
+            timestamp_column <= last_timestamp,
+            tuple_(timestamp_column, id_column) < tuple_(last_timestamp, last_id)
+        )
+
+    # Se pide una fila extra para saber si existe una página siguiente
+    rows = query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
@@ -1,6 +1,17 @@
+import argparse
+import json
+import os
+import time
+import uuid
+
 import firebase_admin
 from firebase_admin import credentials, auth
 
+# Directorio por defecto para las claves locales (coincide con FIREBASE_SIGNING_KEYS_PATH)
+LOCAL_KEYS_DIR = "firebase_local_keys"
+LOCAL_PRIVATE_KEY = "signing_private_key.pem"
+LOCAL_PUBLIC_KEYS = "public_keys.json"
+
 def init_firebase():
     """Inicializar Firebase Admin SDK"""
     cred_path = "bytedental-6701e-firebase-adminsdk-fbsvc-1aa4de4cff.json"  # Ruta al archivo de credenciales
@@ -22,13 +33,91 @@ def generate_token(uid):
     except Exception as e:
         print(f"❌ Error generando token: {e}")
 
+def ensure_local_key_pair(keys_dir):
+    """
+    Crear (si no existe) un par de claves RSA para firmar tokens localmente
+
+    La clave pública se guarda en public_keys.json ({kid: PEM}), el formato que
+    lee la verificación local (FIREBASE_VERIFICATION_MODE=local).
+
+    Returns:
+        Tupla (kid, clave privada PEM)
+    """
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    private_path = os.path.join(keys_dir, LOCAL_PRIVATE_KEY)
+    public_path = os.path.join(keys_dir, LOCAL_PUBLIC_KEYS)
+
+    if os.path.exists(private_path) and os.path.exists(public_path):
+        with open(private_path, "rb") as f:
+            private_pem = f.read()
+        with open(public_path, "r", encoding="utf-8") as f:
+            kid = next(iter(json.load(f)))
+        return kid, private_pem
+
+    os.makedirs(keys_dir, exist_ok=True)
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    kid = uuid.uuid4().hex
+
+    with open(private_path, "wb") as f:
+        f.write(private_pem)
+    with open(public_path, "w", encoding="utf-8") as f:
+        json.dump({kid: public_pem.decode("utf-8")}, f, indent=2)
+
+    print(f"🔑 Par de claves local creado en {keys_dir}/ (kid={kid})")
+    return kid, private_pem
+
+def generate_local_id_token(uid, project_id, keys_dir, email=None, expires_in=3600):
+    """Generar un ID token RS256 firmado con la clave local (sin Firebase)"""
+    import jwt
+
+    kid, private_pem = ensure_local_key_pair(keys_dir)
+    now = int(time.time())
+    claims = {
+        "iss": f"https://securetoken.google.com/{project_id}",
+        "aud": project_id,
+        "sub": uid,
+        "user_id": uid,
+        "auth_time": now,
+        "iat": now,
+        "exp": now + expires_in,
+    }
+    if email:
+        claims["email"] = email
+
+    id_token = jwt.encode(claims, private_pem, algorithm="RS256", headers={"kid": kid})
+    print(f"🎫 ID token local generado para UID {uid} (expira en {expires_in}s):")
+    print(f"Bearer {id_token}")
+    return id_token
+
 def main():
+    parser = argparse.ArgumentParser(description="Generar tokens de prueba para ByteDental")
+    parser.add_argument("uid", nargs="?", default="oYEj3T71MhRgtYbvbcDfYR9AFnB2", help="UID del usuario (por defecto, el doctor de pruebas)")
+    parser.add_argument("--local", action="store_true", help="Firmar un ID token con un par de claves local en lugar de usar Firebase")
+    parser.add_argument("--keys-dir", default=os.getenv("FIREBASE_SIGNING_KEYS_PATH", LOCAL_KEYS_DIR), help="Directorio de las claves locales")
+    parser.add_argument("--project-id", default=os.getenv("FIREBASE_PROJECT_ID", "bytedental-6701e"), help="Proyecto de Firebase (audiencia del token)")
+    parser.add_argument("--email", default=None, help="Email a incluir en el token local")
+    parser.add_argument("--expires-in", type=int, default=3600, help="Vigencia del token local en segundos")
+    args = parser.parse_args()
+
+    if args.local:
+        generate_local_id_token(args.uid, args.project_id, args.keys_dir, args.email, args.expires_in)
+        return
+
     if not init_firebase():
         return
 
-    # UID del usuario con rol de doctor
-    doctor_uid = "oYEj3T71MhRgtYbvbcDfYR9AFnB2"  # Reemplaza con el UID del doctor
-    generate_token(doctor_uid)
+    generate_token(args.uid)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
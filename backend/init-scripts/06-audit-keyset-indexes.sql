@@ -0,0 +1,17 @@
+-- Índices compuestos para la paginación por cursor de la auditoría
+-- Descripción: los listados de /auditoria ordenan por (event_timestamp DESC, id DESC) y
+-- continúan desde la última fila de la página anterior; estos índices permiten
+-- recorrer cada página sin ordenar ni descartar filas.
+-- CONCURRENTLY evita bloquear las escrituras de auditoría (ejecutar fuera de una transacción)
+
+-- Listado general y rango de fechas
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audits_timestamp_id
+    ON audits (event_timestamp DESC, id DESC);
+
+-- Eventos por usuario
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audits_user_timestamp_id
+    ON audits (user_id, event_timestamp DESC, id DESC);
+
+-- Eventos por registro afectado
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audits_record_timestamp_id
+    ON audits (affected_record_id, event_timestamp DESC, id DESC);
@@ -0,0 +1,18 @@
+-- Integridad de la auditoría: versión del hash por fila y sellos diarios encadenados
+-- Descripción: hash_version = 2 indica que integrity_hash cubre todo el contenido del
+-- evento (incluidos change_details y el timestamp en UTC); NULL = hash antiguo.
+-- Cada sello guarda la raíz Merkle de un día (UTC) y el hash encadenado con el sello anterior.
+
+ALTER TABLE audits ADD COLUMN IF NOT EXISTS hash_version SMALLINT;
+
+CREATE TABLE IF NOT EXISTS audit_segment_seals (
+    segment_day DATE PRIMARY KEY,
+    row_count INTEGER NOT NULL,
+    merkle_root VARCHAR(64) NOT NULL,
+    previous_chain_hash VARCHAR(64) NOT NULL,
+    chain_hash VARCHAR(64) NOT NULL,
+    sealed_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+COMMENT ON COLUMN audits.hash_version IS '2 = hash SHA-256 del contenido completo del evento; NULL = hash antiguo (usuario, evento, registro y fecha)';
+COMMENT ON TABLE audit_segment_seals IS 'Raíz Merkle diaria de la auditoría, encadenada con el sello anterior';
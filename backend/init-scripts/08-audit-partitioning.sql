@@ -0,0 +1,149 @@
+-- =============================================================================
+-- PARTICIONADO MENSUAL DE LAS TABLAS DE AUDITORÍA
+-- Sistema: ByteDental
+-- Propósito: convertir audits (por event_timestamp) y db_audit_log (por changed_at)
+-- en tablas particionadas por rango mensual, para que las consultas por fechas
+-- solo lean los meses implicados y el mantenimiento de índices sea por mes.
+--
+-- Migración para bases existentes: ejecutar en una ventana de mantenimiento
+-- (copia todas las filas). Las particiones futuras y la desconexión de meses
+-- antiguos las gestiona app/services/audit_partition_service.py
+-- (scripts/manage_audit_partitions.py y el arranque de la aplicación).
+-- =============================================================================
+
+-- Crear particiones mensuales [desde, hasta) para una tabla particionada
+CREATE OR REPLACE FUNCTION bytedental_create_monthly_partitions(
+    parent_table TEXT,
+    from_month DATE,
+    to_month DATE
+) RETURNS VOID AS $$
+DECLARE
+    month_start DATE := date_trunc('month', from_month)::DATE;
+BEGIN
+    WHILE month_start <= to_month LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+            parent_table || '_p' || to_char(month_start, 'YYYYMM'),
+            parent_table,
+            month_start::TIMESTAMP AT TIME ZONE 'UTC',
+            (month_start + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC'
+        );
+        month_start := (month_start + INTERVAL '1 month')::DATE;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+BEGIN;
+
+-- -----------------------------------------------------------------------------
+-- 1. AUDITS
+-- -----------------------------------------------------------------------------
+ALTER TABLE audits RENAME TO audits_unpartitioned;
+DROP TRIGGER IF EXISTS audit_audits_trigger ON audits_unpartitioned;
+-- Los índices y la clave primaria conservan su nombre al renombrar la tabla
+-- (06-audit-keyset-indexes.sql / modelo Audit): liberarlos para la tabla nueva
+DROP INDEX IF EXISTS idx_audits_timestamp_id;
+DROP INDEX IF EXISTS idx_audits_user_timestamp_id;
+DROP INDEX IF EXISTS idx_audits_record_timestamp_id;
+ALTER INDEX IF EXISTS audits_pkey RENAME TO audits_unpartitioned_pkey;
+
+-- La clave primaria de una tabla particionada debe incluir la columna de partición
+CREATE TABLE audits (
+    id VARCHAR(36) NOT NULL,
+    user_id VARCHAR(128) NOT NULL,
+    user_role VARCHAR(100),
+    user_email VARCHAR(255),
+    event_type VARCHAR(100) NOT NULL,
+    event_description TEXT,
+    affected_record_id VARCHAR(36) NOT NULL,
+    affected_record_type VARCHAR(50) NOT NULL,
+    change_details JSON,
+    integrity_hash VARCHAR(64) NOT NULL,
+    hash_version SMALLINT,
+    event_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    source_ip VARCHAR(45),
+    PRIMARY KEY (id, event_timestamp)
+) PARTITION BY RANGE (event_timestamp);
+
+-- Los índices del padre se crean en cada partición
+CREATE INDEX idx_audits_timestamp_id ON audits (event_timestamp DESC, id DESC);
+CREATE INDEX idx_audits_user_timestamp_id ON audits (user_id, event_timestamp DESC, id DESC);
+CREATE INDEX idx_audits_record_timestamp_id ON audits (affected_record_id, event_timestamp DESC, id DESC);
+
+-- Partición por defecto: recoge filas fuera de los meses creados (no debería tener datos)
+CREATE TABLE audits_default PARTITION OF audits DEFAULT;
+
+SELECT bytedental_create_monthly_partitions(
+    'audits',
+    COALESCE((SELECT MIN(event_timestamp AT TIME ZONE 'UTC')::DATE FROM audits_unpartitioned), CURRENT_DATE),
+    (CURRENT_DATE + INTERVAL '3 months')::DATE
+);
+
+INSERT INTO audits (
+    id, user_id, user_role, user_email, event_type, event_description, affected_record_id,
+    affected_record_type, change_details, integrity_hash, hash_version, event_timestamp, source_ip
+)
+SELECT
+    id, user_id, user_role, user_email, event_type, event_description, affected_record_id,
+    affected_record_type, change_details, integrity_hash, hash_version, event_timestamp, source_ip
+FROM audits_unpartitioned;
+
+DROP TABLE audits_unpartitioned;
+
+-- -----------------------------------------------------------------------------
+-- 2. DB_AUDIT_LOG
+-- -----------------------------------------------------------------------------
+ALTER TABLE db_audit_log RENAME TO db_audit_log_unpartitioned;
+DROP INDEX IF EXISTS idx_db_audit_log_table_name;
+DROP INDEX IF EXISTS idx_db_audit_log_operation;
+DROP INDEX IF EXISTS idx_db_audit_log_changed_at;
+DROP INDEX IF EXISTS idx_db_audit_log_record_id;
+ALTER INDEX IF EXISTS db_audit_log_pkey RENAME TO db_audit_log_unpartitioned_pkey;
+ALTER SEQUENCE IF EXISTS db_audit_log_id_seq RENAME TO db_audit_log_unpartitioned_id_seq;
+
+CREATE TABLE db_audit_log (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    table_name VARCHAR(100) NOT NULL,
+    operation VARCHAR(10) NOT NULL,
+    record_id VARCHAR(100),
+    old_values JSONB,
+    new_values JSONB,
+    changed_by VARCHAR(100),
+    changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    session_info JSONB,
+    PRIMARY KEY (id, changed_at)
+) PARTITION BY RANGE (changed_at);
+
+CREATE INDEX idx_db_audit_log_table_name ON db_audit_log (table_name);
+CREATE INDEX idx_db_audit_log_operation ON db_audit_log (operation);
+CREATE INDEX idx_db_audit_log_changed_at ON db_audit_log (changed_at);
+CREATE INDEX idx_db_audit_log_record_id ON db_audit_log (record_id);
+
+CREATE TABLE db_audit_log_default PARTITION OF db_audit_log DEFAULT;
+
+SELECT bytedental_create_monthly_partitions(
+    'db_audit_log',
+    COALESCE((SELECT MIN(changed_at AT TIME ZONE 'UTC')::DATE FROM db_audit_log_unpartitioned), CURRENT_DATE),
+    (CURRENT_DATE + INTERVAL '3 months')::DATE
+);
+
+INSERT INTO db_audit_log (id, table_name, operation, record_id, old_values, new_values, changed_by, changed_at, session_info)
+SELECT id, table_name, operation, record_id, old_values, new_values, changed_by, COALESCE(changed_at, NOW()), session_info
+FROM db_audit_log_unpartitioned;
+
+-- Continuar la identidad después del último id copiado
+SELECT setval(
+    pg_get_serial_sequence('db_audit_log', 'id'),
+    COALESCE((SELECT MAX(id) FROM db_audit_log), 0) + 1,
+    false
+);
+
+DROP TABLE db_audit_log_unpartitioned;
+
+-- Volver a crear el trigger de la propia tabla de auditoría (PostgreSQL 13+ admite
+-- triggers por fila en tablas particionadas)
+CREATE TRIGGER audit_audits_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON audits
+    FOR EACH ROW EXECUTE FUNCTION audit_trigger_function();
+
+COMMIT;
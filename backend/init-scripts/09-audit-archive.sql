@@ -0,0 +1,15 @@
+-- =============================================================================
+-- ARCHIVO EN FRÍO DE LA AUDITORÍA
+-- Sistema: ByteDental
+-- Propósito: que el borrado de eventos ya archivados (scripts/archive_audit_events.py)
+-- no genere una copia de cada fila en db_audit_log a través del trigger de audits.
+-- El job marca su transacción con set_config('bytedental.archiving', 'on', true).
+-- =============================================================================
+
+DROP TRIGGER IF EXISTS audit_audits_trigger ON audits;
+
+CREATE TRIGGER audit_audits_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON audits
+    FOR EACH ROW
+    WHEN (COALESCE(current_setting('bytedental.archiving', true), '') <> 'on')
+    EXECUTE FUNCTION audit_trigger_function();
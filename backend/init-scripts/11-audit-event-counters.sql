@@ -0,0 +1,45 @@
+-- =============================================================================
+-- CONTADORES INCREMENTALES DE AUDITORÍA
+-- Sistema: ByteDental
+-- Propósito: totales por tipo de evento, entidad, usuario y registro por día
+-- (UTC) para la consola de auditoría, sin DISTINCT/COUNT sobre audits.
+-- La aplicación los actualiza en una transacción corta después del commit que
+-- inserta los eventos (app/services/audit_stats_service.py). Los eventos que escribe el trigger
+-- unificado (optional/10-unified-audit.sql, hash_version NULL) los cuenta el trigger de
+-- este script. Para rellenar el histórico: python scripts/rebuild_audit_counters.py
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS audit_event_counters (
+    dimension VARCHAR(20) NOT NULL,   -- event_type, record_type, user, record
+    key VARCHAR(200) NOT NULL,        -- valor de la dimensión (record = 'tipo:id')
+    day DATE NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, key, day)
+);
+
+CREATE OR REPLACE FUNCTION audit_counters_trigger_function()
+RETURNS TRIGGER AS $$
+DECLARE
+    event_day DATE := (NEW.event_timestamp AT TIME ZONE 'UTC')::DATE;
+BEGIN
+    -- Mismo orden de claves que la aplicación para bloquear los contadores en el mismo orden
+    INSERT INTO audit_event_counters (dimension, key, day, count)
+    SELECT dimension, key, event_day, 1
+    FROM (VALUES
+        ('event_type', NEW.event_type),
+        ('record', NEW.affected_record_type || ':' || NEW.affected_record_id),
+        ('record_type', NEW.affected_record_type),
+        ('user', NEW.user_id)
+    ) AS counters(dimension, key)
+    ORDER BY dimension, key
+    ON CONFLICT (dimension, key, day) DO UPDATE SET count = audit_event_counters.count + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS audit_counters_trigger ON audits;
+CREATE TRIGGER audit_counters_trigger
+    AFTER INSERT ON audits
+    FOR EACH ROW
+    WHEN (NEW.hash_version IS NULL)
+    EXECUTE FUNCTION audit_counters_trigger_function();
@@ -0,0 +1,51 @@
+-- =============================================================================
+-- BÚSQUEDA DE PERSONAS (pacientes, personas y acudientes)
+-- Sistema: ByteDental
+-- Propósito: que la búsqueda de recepción (nombre, apellidos, documento o email)
+-- no recorra toda la tabla persons en cada pulsación. Las cadenas de
+-- ILIKE '%texto%' no pueden usar los índices b-tree de persons; en su lugar:
+--
+--   search_text   texto normalizado (minúsculas, sin tildes) de nombres,
+--                 documento y email, con índice de trigramas (pg_trgm) que
+--                 sirve LIKE '%texto%' y similarity()
+--   search_vector tsvector de los nombres (diccionario simple, sin tildes)
+--                 para búsquedas por varias palabras en cualquier orden
+--                 ("ana perez") y ranking con ts_rank
+--
+-- Ambas columnas son generadas: las mantiene PostgreSQL en cada INSERT/UPDATE.
+-- La aplicación (app/services/person_search.py) usa este modo si detecta la
+-- columna search_text al arrancar; si no, sigue con ILIKE.
+-- =============================================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() es STABLE (depende del search_path); las columnas generadas y los
+-- índices necesitan una función IMMUTABLE con el diccionario explícito
+CREATE OR REPLACE FUNCTION bytedental_unaccent(value TEXT)
+RETURNS TEXT AS $$
+    SELECT public.unaccent('public.unaccent'::regdictionary, value)
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
+ALTER TABLE persons ADD COLUMN IF NOT EXISTS search_text TEXT
+    GENERATED ALWAYS AS (
+        lower(bytedental_unaccent(concat_ws(' ',
+            first_name, middle_name, first_surname, second_surname, document_number, email
+        )))
+    ) STORED;
+
+ALTER TABLE persons ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', bytedental_unaccent(coalesce(first_surname, '') || ' ' || coalesce(second_surname, ''))), 'A') ||
+        setweight(to_tsvector('simple', bytedental_unaccent(coalesce(first_name, '') || ' ' || coalesce(middle_name, ''))), 'B') ||
+        setweight(to_tsvector('simple', coalesce(document_number, '')), 'A')
+    ) STORED;
+
+-- CONCURRENTLY evita bloquear las escrituras (ejecutar fuera de una transacción)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_person_search_trgm
+    ON persons USING GIN (search_text gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_person_search_vector
+    ON persons USING GIN (search_vector);
+
+ANALYZE persons;
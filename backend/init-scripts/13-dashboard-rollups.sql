@@ -0,0 +1,38 @@
+-- =============================================================================
+-- AGREGADO DIARIO DE TRATAMIENTOS PARA EL DASHBOARD
+-- Sistema: ByteDental
+-- Propósito: tratamientos y pacientes atendidos por día, doctor y servicio
+-- odontológico, para que las estadísticas del dashboard no recorran treatments
+-- con sus joins. Los pacientes van en una fila cada uno para contar los
+-- activos distintos con COUNT(DISTINCT) unido a patients. La aplicación lo actualiza en la misma transacción que crea
+-- los tratamientos (app/services/dashboard_rollup_service.py).
+-- Para rellenar el histórico: python scripts/rebuild_dashboard_rollups.py
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS treatment_daily_rollups (
+    day DATE NOT NULL,
+    doctor_id VARCHAR(128) NOT NULL,
+    dental_service_id INTEGER NOT NULL,         -- 0 = tratamiento sin servicio
+    treatment_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, doctor_id, dental_service_id)
+);
+
+-- Versión anterior: los pacientes iban en una columna de texto separados por
+-- comas (la aplicación rellena treatment_daily_patients al arrancar)
+ALTER TABLE treatment_daily_rollups DROP COLUMN IF EXISTS patient_ids;
+
+CREATE TABLE IF NOT EXISTS treatment_daily_patients (
+    day DATE NOT NULL,
+    doctor_id VARCHAR(128) NOT NULL,
+    dental_service_id INTEGER NOT NULL,         -- 0 = tratamiento sin servicio
+    patient_id INTEGER NOT NULL,
+    PRIMARY KEY (day, doctor_id, dental_service_id, patient_id)
+);
+
+-- Filtros por doctor o procedimiento sin el día como prefijo
+CREATE INDEX IF NOT EXISTS idx_treatment_daily_rollups_doctor
+    ON treatment_daily_rollups (doctor_id, day);
+CREATE INDEX IF NOT EXISTS idx_treatment_daily_rollups_service
+    ON treatment_daily_rollups (dental_service_id, day);
+CREATE INDEX IF NOT EXISTS idx_treatment_daily_patients_doctor
+    ON treatment_daily_patients (doctor_id, day);
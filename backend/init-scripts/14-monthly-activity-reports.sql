@@ -0,0 +1,27 @@
+-- =============================================================================
+-- INSTANTÁNEAS MENSUALES DE ACTIVIDAD
+-- Sistema: ByteDental
+-- Propósito: una fila por mes con las actividades e ingresos por procedimiento
+-- para los reportes mensual y anual. Los meses cerrados se calculan una vez y
+-- quedan congelados; el mes en curso lo actualiza la aplicación al crear
+-- tratamientos (app/services/monthly_activity_service.py).
+-- Para recalcular un mes: python scripts/rebuild_monthly_reports.py --year 2025 --month 3
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS monthly_activity_reports (
+    id SERIAL PRIMARY KEY,
+    month VARCHAR(20) NOT NULL,
+    year INTEGER NOT NULL,
+    total_activities INTEGER NOT NULL,
+    total_revenue INTEGER NOT NULL
+);
+
+-- Columnas de la instantánea sobre la tabla existente
+ALTER TABLE monthly_activity_reports ALTER COLUMN total_revenue TYPE NUMERIC(14, 2);
+ALTER TABLE monthly_activity_reports ADD COLUMN IF NOT EXISTS procedures JSON NOT NULL DEFAULT '[]';
+ALTER TABLE monthly_activity_reports ADD COLUMN IF NOT EXISTS is_closed BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE monthly_activity_reports ADD COLUMN IF NOT EXISTS refreshed_at TIMESTAMP DEFAULT NOW();
+
+-- Búsqueda por clave (año, mes)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_monthly_activity_reports_year_month
+    ON monthly_activity_reports (year, month);
@@ -0,0 +1,15 @@
+-- Índice de cobertura para las estadísticas del dashboard por fecha de tratamiento
+-- Descripción: tratamientos por mes, pacientes activos del mes y distribución de
+-- procedimientos filtran treatments por rango de treatment_date (>= inicio AND < fin)
+-- y opcionalmente por doctor y procedimiento. Con estas columnas (y
+-- clinical_history_id para el join con historias clínicas) las consultas se
+-- resuelven con un index-only scan del rango, sin leer la tabla.
+-- CONCURRENTLY evita bloquear el registro de tratamientos (ejecutar fuera de una transacción)
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_treatments_date_doctor_service
+    ON treatments (treatment_date, doctor_id, dental_service_id)
+    INCLUDE (clinical_history_id);
+
+-- Estadísticas y mapa de visibilidad al día: el planificador elige el índice y
+-- el index-only scan no tiene que visitar la tabla
+VACUUM (ANALYZE) treatments;
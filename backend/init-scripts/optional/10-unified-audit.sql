@@ -0,0 +1,167 @@
+-- =============================================================================
+-- AUDITORÍA UNIFICADA (AUDIT_MODE=unified)
+-- Sistema: ByteDental
+-- Propósito: un solo registro por cambio. En lugar de que la aplicación escriba
+-- en audits y el trigger copie la fila completa en db_audit_log, el trigger
+-- escribe directamente en audits el evento enriquecido con el contexto que la
+-- aplicación deja en la transacción (app/middleware/audit_session.py):
+--
+--   bytedental.user_id, bytedental.user_role, bytedental.user_email,
+--   bytedental.source_ip, application_name = 'bytedental:<uid>' y
+--   bytedental.event_types = {"<tipo>:<id>": "<tipo de evento>"}
+--
+-- bytedental.event_types conserva los tipos de evento de la aplicación
+-- (DEACTIVATE, REACTIVATE, CREACION_HISTORIA_CLINICA...); sin entrada para el
+-- registro se usa CREATE/UPDATE/DELETE según la operación. Los triggers son
+-- CONSTRAINT TRIGGER diferidos: se ejecutan en el commit, cuando la aplicación
+-- ya registró el tipo de evento de todos los cambios de la transacción.
+--
+-- En UPDATE solo se guardan las columnas modificadas ({"columna": {"old", "new"}}).
+-- db_audit_log deja de recibir filas nuevas (el histórico se conserva).
+--
+-- NO forma parte de la inicialización por defecto (está en init-scripts/optional,
+-- que docker-entrypoint-initdb.d no ejecuta). Aplicarlo a mano junto con
+-- AUDIT_MODE=unified en la aplicación:
+--
+--   psql -d bytedental_db -f init-scripts/optional/10-unified-audit.sql
+--
+-- El script fija bytedental.audit_mode = 'unified' en la base de datos; sin ese
+-- valor la función no escribe nada y la aplicación no activa el modo
+-- unificado. Con AUDIT_MODE=dual la aplicación avisa al arrancar si encuentra
+-- estos triggers.
+--
+-- Para volver al modo dual: AUDIT_MODE=dual en la aplicación, ejecutar de nuevo
+-- 02-audit-triggers.sql y
+--   ALTER DATABASE bytedental_db RESET bytedental.audit_mode;
+-- =============================================================================
+
+CREATE OR REPLACE FUNCTION audit_unified_trigger_function()
+RETURNS TRIGGER AS $$
+DECLARE
+    old_data JSONB;
+    new_data JSONB;
+    row_data JSONB;
+    details JSONB;
+    record_type TEXT := COALESCE(TG_ARGV[0], TG_TABLE_NAME);
+    record_id TEXT;
+    user_uid TEXT := NULLIF(current_setting('bytedental.user_id', true), '');
+    event_id TEXT := gen_random_uuid()::TEXT;
+    event_type TEXT;
+    event_time TIMESTAMP WITH TIME ZONE := clock_timestamp();
+BEGIN
+    -- Solo con la base de datos en modo unificado (en modo dual escribe la aplicación)
+    IF current_setting('bytedental.audit_mode', true) IS DISTINCT FROM 'unified' THEN
+        RETURN NULL;
+    END IF;
+
+    old_data := CASE WHEN TG_OP IN ('UPDATE', 'DELETE') THEN to_jsonb(OLD) END;
+    new_data := CASE WHEN TG_OP IN ('INSERT', 'UPDATE') THEN to_jsonb(NEW) END;
+    row_data := COALESCE(new_data, old_data);
+    record_id := COALESCE(row_data->>'id', row_data->>'uid', row_data->>'uuid', '');
+
+    -- Tipo de evento de la aplicación para este registro, o el de la operación
+    event_type := COALESCE(
+        NULLIF(current_setting('bytedental.event_types', true), '')::JSONB ->> (record_type || ':' || record_id),
+        CASE TG_OP WHEN 'INSERT' THEN 'CREATE' ELSE TG_OP END
+    );
+
+    IF TG_OP = 'UPDATE' THEN
+        SELECT jsonb_object_agg(n.key, jsonb_build_object('old', o.value, 'new', n.value))
+        INTO details
+        FROM jsonb_each(new_data) n
+        JOIN jsonb_each(old_data) o ON o.key = n.key
+        WHERE n.value IS DISTINCT FROM o.value;
+
+        -- UPDATE sin cambios reales: no se audita
+        IF details IS NULL THEN
+            RETURN NULL;
+        END IF;
+    ELSE
+        details := row_data;
+    END IF;
+
+    INSERT INTO audits (
+        id, user_id, user_role, user_email, event_type, event_description,
+        affected_record_id, affected_record_type, change_details,
+        integrity_hash, hash_version, event_timestamp, source_ip
+    ) VALUES (
+        event_id,
+        COALESCE(user_uid, session_user),
+        NULLIF(current_setting('bytedental.user_role', true), ''),
+        NULLIF(current_setting('bytedental.user_email', true), ''),
+        event_type,
+        format('%s en %s (trigger)', event_type, record_type),
+        record_id,
+        record_type,
+        details::JSON,
+        -- Hash del contenido tal como lo serializa PostgreSQL; la fila queda
+        -- cubierta por el sello diario (hash_version NULL = sin verificación por fila)
+        encode(sha256(convert_to(event_id || '|' || event_time::TEXT || '|' || details::TEXT, 'UTF8')), 'hex'),
+        NULL,
+        event_time,
+        NULLIF(current_setting('bytedental.source_ip', true), '')
+    );
+
+    -- AFTER ... FOR EACH ROW: el valor de retorno se ignora
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- La propia tabla de auditoría ya no se copia a db_audit_log
+DROP TRIGGER IF EXISTS audit_audits_trigger ON audits;
+
+-- Tablas auditadas por el trigger, diferido hasta el commit (argumento = tipo de registro que usa la aplicación)
+DROP TRIGGER IF EXISTS audit_users_trigger ON users;
+CREATE CONSTRAINT TRIGGER audit_users_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON users
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION audit_unified_trigger_function('users');
+
+DROP TRIGGER IF EXISTS audit_roles_trigger ON roles;
+CREATE CONSTRAINT TRIGGER audit_roles_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON roles
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION audit_unified_trigger_function('roles');
+
+DROP TRIGGER IF EXISTS audit_persons_trigger ON persons;
+CREATE CONSTRAINT TRIGGER audit_persons_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON persons
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION audit_unified_trigger_function('persons');
+
+DROP TRIGGER IF EXISTS audit_patients_trigger ON patients;
+CREATE CONSTRAINT TRIGGER audit_patients_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON patients
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION audit_unified_trigger_function('patients');
+
+DROP TRIGGER IF EXISTS audit_guardians_trigger ON guardians;
+CREATE CONSTRAINT TRIGGER audit_guardians_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON guardians
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION audit_unified_trigger_function('guardians');
+
+DROP TRIGGER IF EXISTS audit_dental_service_trigger ON dental_service;
+CREATE CONSTRAINT TRIGGER audit_dental_service_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON dental_service
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION audit_unified_trigger_function('dental_services');
+
+DROP TRIGGER IF EXISTS audit_clinical_histories_trigger ON clinical_histories;
+CREATE CONSTRAINT TRIGGER audit_clinical_histories_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON clinical_histories
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION audit_unified_trigger_function('clinical_histories');
+
+DROP TRIGGER IF EXISTS audit_treatments_trigger ON treatments;
+CREATE CONSTRAINT TRIGGER audit_treatments_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON treatments
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION audit_unified_trigger_function('treatments');
+
+-- Activar el modo unificado en la base de datos (aplica a las conexiones nuevas)
+DO $$
+BEGIN
+    EXECUTE format('ALTER DATABASE %I SET bytedental.audit_mode = %L', current_database(), 'unified');
+END;
+$$;
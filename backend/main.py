@@ -2,8 +2,16 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import email_router, otp_router, users, auditoria, auth, patients, guardians, persons, dental_services, clinical_histories, dashboard_router, reports
 from app.config import settings
-from app.database import engine, Base  # Asegúrate de importar Base y engine
+from app.database import engine, Base, SessionLocal, log_pool_configuration, dispose_async_engine  # Asegúrate de importar Base y engine
 from app.routers import reports
+from app.middleware.query_metrics import QueryMetricsMiddleware
+from app.middleware.audit_session import configure_audit_mode
+from app.services.person_search import configure_person_search
+from app.services.audit_writer import audit_writer
+from app.services.audit_partition_service import maintain_partitions
+from app.services.audit_stats_service import ensure_counters
+from app.services.dashboard_rollup_service import ensure_rollups
+from app.services.monthly_activity_service import monthly_snapshot_maintainer
 import logging
 
 # Configurar logging
@@ -32,8 +40,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Conteo de consultas SQL y tiempo en base de datos por petición
+if settings.query_metrics_enabled:
+    app.add_middleware(QueryMetricsMiddleware)
+
 # Incluir routers
 app.include_router(email_router.router, prefix="/api")
 app.include_router(otp_router.router, prefix="/api")
@@ -51,6 +64,90 @@ app.include_router(dashboard_router.router, prefix="/api")
 # Crear tablas si no existen
 Base.metadata.create_all(bind=engine)
 
+@app.on_event("startup")
+def report_database_pool():
+    """Mostrar la configuración efectiva del pool de conexiones al arrancar"""
+    log_pool_configuration()
+
+@app.on_event("startup")
+def resolve_audit_mode():
+    """Activar la auditoría unificada si está configurada y el trigger está instalado"""
+    try:
+        configure_audit_mode(engine)
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Error al comprobar el modo de auditoría, se usa el modo dual: {e}")
+
+@app.on_event("startup")
+def resolve_person_search():
+    """Usar los índices de búsqueda de personas si están instalados"""
+    try:
+        configure_person_search(engine)
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Error al comprobar los índices de búsqueda de personas, se usa ILIKE: {e}")
+
+@app.on_event("startup")
+def maintain_audit_partitions():
+    """Crear las particiones de auditoría de los próximos meses y desconectar las antiguas"""
+    db = SessionLocal()
+    try:
+        maintain_partitions(db, settings.audit_partition_months_ahead, settings.audit_partition_retention_months)
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Error en el mantenimiento de particiones de auditoría: {e}")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def initialize_audit_counters():
+    """Rellenar los contadores de auditoría la primera vez (tabla vacía con eventos existentes)"""
+    db = SessionLocal()
+    try:
+        ensure_counters(db, settings.audit_archive_dir)
+    except Exception as e:
+        db.rollback()
+        logging.getLogger(__name__).error(f"Error al inicializar los contadores de auditoría: {e}")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def initialize_dashboard_rollups():
+    """Rellenar el agregado diario del dashboard la primera vez (tabla vacía con tratamientos existentes)"""
+    if not settings.dashboard_use_rollups:
+        return
+    db = SessionLocal()
+    try:
+        ensure_rollups(db)
+    except Exception as e:
+        db.rollback()
+        logging.getLogger(__name__).error(f"Error al inicializar el agregado del dashboard: {e}")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def start_monthly_snapshot_maintainer():
+    """Crear las instantáneas mensuales que faltan, cerrar las terminadas y repetirlo periódicamente"""
+    monthly_snapshot_maintainer.start()
+
+@app.on_event("shutdown")
+def stop_monthly_snapshot_maintainer():
+    """Detener el mantenimiento periódico de las instantáneas mensuales"""
+    monthly_snapshot_maintainer.stop()
+
+@app.on_event("startup")
+def start_audit_writer():
+    """Arrancar el escritor de auditoría en lotes"""
+    if settings.audit_writer_enabled:
+        audit_writer.start()
+
+@app.on_event("shutdown")
+def stop_audit_writer():
+    """Vaciar la cola de auditoría antes de terminar"""
+    audit_writer.stop()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    """Cerrar las conexiones del engine asíncrono al apagar"""
+    await dispose_async_engine()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,45 @@
+"""
+Script para mover la auditoría antigua al archivo en frío
+
+Uso:
+    python scripts/archive_audit_events.py                 # eventos con más de AUDIT_ARCHIVE_AFTER_DAYS días
+    python scripts/archive_audit_events.py --dias 365 --directorio /srv/audit_archive
+
+Los archivos (.jsonl.gz) y sus manifiestos se escriben en el directorio indicado
+y las filas archivadas se borran de audits y db_audit_log.
+"""
+import sys
+import os
+import argparse
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.audit_archive_service import archive_old_events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mover la auditoría antigua a archivos comprimidos")
+    parser.add_argument("--dias", type=int, default=settings.audit_archive_after_days, help="Antigüedad mínima en días")
+    parser.add_argument("--directorio", default=settings.audit_archive_dir, help="Directorio del archivo")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        manifests = archive_old_events(db, older_than_days=args.dias, archive_dir=args.directorio)
+    except Exception as e:
+        print(f"❌ Error al archivar la auditoría: {e}")
+        return 1
+    finally:
+        db.close()
+
+    for manifest in manifests:
+        print(f"  {manifest['file']}: {manifest['rows']} filas en {len(manifest['blocks'])} bloques")
+    print(f"✅ {sum(manifest['rows'] for manifest in manifests)} filas archivadas en {len(manifests)} archivos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Script para comparar el rendimiento de escritura de los modos de auditoría
+
+Ejecuta N actualizaciones de una tabla de prueba en cada modo:
+
+- dual: UPDATE (trigger clásico -> db_audit_log), commit, y después el evento
+  de la aplicación en audits (que a su vez el trigger de audits copia a
+  db_audit_log), commit; como hacen hoy los servicios.
+- unified: contexto de la petición con set_config + UPDATE (trigger unificado
+  -> audits), un solo commit.
+
+Todo se hace en un esquema temporal (bench_audit) que se elimina al terminar;
+no toca las tablas reales. Solo PostgreSQL, con 02-audit-triggers.sql y
+optional/10-unified-audit.sql aplicados (se usan sus funciones).
+
+Uso:
+    python scripts/bench_audit_modes.py --operations 2000
+"""
+import sys
+import os
+import argparse
+import time
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, text
+
+from app.database import engine
+from app.middleware.audit_session import SET_AUDIT_CONTEXT
+from app.models.auditoria_models import Audit
+from app.services.auditoria_service import AuditoriaService
+
+SCHEMA = "bench_audit"
+CONTEXT = {
+    "uid": "bench-user",
+    "role": "Asistente",
+    "email": "bench@bytedental.local",
+    "ip": "127.0.0.1",
+    "application_name": "bytedental:bench-user",
+}
+
+
+def setup(connection, rows):
+    connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    connection.execute(text(f"CREATE TABLE {SCHEMA}.audits (LIKE public.audits INCLUDING DEFAULTS)"))
+    connection.execute(text(
+        f"CREATE TABLE {SCHEMA}.db_audit_log ("
+        "id BIGSERIAL PRIMARY KEY, table_name VARCHAR(100) NOT NULL, operation VARCHAR(10) NOT NULL, "
+        "record_id VARCHAR(100), old_values JSONB, new_values JSONB, changed_by VARCHAR(100), "
+        "changed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(), session_info JSONB)"
+    ))
+    connection.execute(text(
+        f"CREATE TABLE {SCHEMA}.items ("
+        "id SERIAL PRIMARY KEY, name VARCHAR(100), notes TEXT, value INTEGER, "
+        "updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW())"
+    ))
+    connection.execute(text(
+        f"INSERT INTO {SCHEMA}.items (name, notes, value) "
+        "SELECT 'item ' || g, repeat('x', 200), 0 FROM generate_series(1, :rows) g"
+    ), {"rows": rows})
+    # Las funciones de trigger escriben en audits/db_audit_log sin esquema: que resuelvan al de prueba
+    connection.execute(text(f"SET search_path TO {SCHEMA}, public"))
+    connection.commit()
+
+
+def install_triggers(connection, mode):
+    connection.execute(text(f"DROP TRIGGER IF EXISTS bench_items_trigger ON {SCHEMA}.items"))
+    connection.execute(text(f"DROP TRIGGER IF EXISTS bench_audits_trigger ON {SCHEMA}.audits"))
+    if mode == "dual":
+        connection.execute(text(
+            f"CREATE TRIGGER bench_items_trigger AFTER INSERT OR UPDATE OR DELETE ON {SCHEMA}.items "
+            "FOR EACH ROW EXECUTE FUNCTION public.audit_trigger_function()"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER bench_audits_trigger AFTER INSERT OR UPDATE OR DELETE ON {SCHEMA}.audits "
+            "FOR EACH ROW EXECUTE FUNCTION public.audit_trigger_function()"
+        ))
+    else:
+        connection.execute(text(
+            f"CREATE TRIGGER bench_items_trigger AFTER INSERT OR UPDATE OR DELETE ON {SCHEMA}.items "
+            "FOR EACH ROW EXECUTE FUNCTION public.audit_unified_trigger_function('items')"
+        ))
+    # La función unificada solo escribe con bytedental.audit_mode = 'unified' (aquí, solo en esta conexión)
+    connection.execute(
+        text("SELECT set_config('bytedental.audit_mode', :mode, false)"),
+        {"mode": "unified" if mode == "unified" else ""}
+    )
+    connection.execute(text(f"TRUNCATE {SCHEMA}.audits, {SCHEMA}.db_audit_log"))
+    connection.commit()
+
+
+def update_item(connection, item_id, value):
+    connection.execute(
+        text(f"UPDATE {SCHEMA}.items SET value = :value, notes = :notes, updated_at = NOW() WHERE id = :id"),
+        {"id": item_id, "value": value, "notes": f"nota {value}"}
+    )
+
+
+def run_mode(connection, mode, operations, rows):
+    install_triggers(connection, mode)
+    start = time.perf_counter()
+    for operation in range(operations):
+        item_id = operation % rows + 1
+        if mode == "dual":
+            update_item(connection, item_id, operation)
+            connection.commit()
+            evento = AuditoriaService.construir_evento(
+                CONTEXT["uid"], "UPDATE", str(item_id), "items",
+                descripcion_evento="Ítem actualizado", detalles_cambios={"value": operation},
+                ip_origen=CONTEXT["ip"], usuario_rol=CONTEXT["role"], usuario_email=CONTEXT["email"]
+            )
+            # "audits" sin esquema resuelve a bench_audit.audits por el search_path
+            connection.execute(insert(Audit), [evento])
+            connection.commit()
+        else:
+            connection.execute(SET_AUDIT_CONTEXT, CONTEXT)
+            update_item(connection, item_id, operation)
+            connection.commit()
+    elapsed = time.perf_counter() - start
+
+    audit_rows, log_rows, audit_bytes = connection.execute(text(
+        f"SELECT (SELECT COUNT(*) FROM {SCHEMA}.audits), (SELECT COUNT(*) FROM {SCHEMA}.db_audit_log), "
+        f"pg_total_relation_size('{SCHEMA}.audits') + pg_total_relation_size('{SCHEMA}.db_audit_log')"
+    )).one()
+    connection.commit()
+    return {
+        "mode": mode,
+        "ops_per_second": operations / elapsed,
+        "ms_per_op": elapsed / operations * 1000,
+        "audit_rows_per_op": (audit_rows + log_rows) / operations,
+        "audit_bytes_per_op": audit_bytes / operations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparar los modos de auditoría dual y unificado")
+    parser.add_argument("--operations", type=int, default=2000, help="Actualizaciones por modo")
+    parser.add_argument("--rows", type=int, default=500, help="Filas de la tabla de prueba")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("⚠️ El benchmark requiere PostgreSQL (DATABASE_URL)")
+        return 1
+
+    with engine.connect() as connection:
+        missing = [
+            name for name in ("audit_trigger_function", "audit_unified_trigger_function")
+            if connection.execute(text("SELECT to_regproc(:name)"), {"name": name}).scalar() is None
+        ]
+        if missing:
+            print(f"⚠️ Faltan funciones de auditoría: {', '.join(missing)} (ver init-scripts 02 y 10)")
+            return 1
+
+        setup(connection, args.rows)
+        try:
+            results = [run_mode(connection, mode, args.operations, args.rows) for mode in ("dual", "unified")]
+        finally:
+            connection.rollback()
+            connection.execute(text("RESET search_path"))
+            connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            connection.commit()
+
+    print(f"{'modo':<10}{'ops/s':>10}{'ms/op':>10}{'filas/op':>10}{'bytes/op':>12}")
+    for result in results:
+        print(
+            f"{result['mode']:<10}{result['ops_per_second']:>10.1f}{result['ms_per_op']:>10.2f}"
+            f"{result['audit_rows_per_op']:>10.1f}{result['audit_bytes_per_op']:>12.0f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
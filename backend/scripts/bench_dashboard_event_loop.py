@@ -0,0 +1,99 @@
+"""
+Script para medir el bloqueo del event loop en las consultas del dashboard
+
+Ejecuta N consultas concurrentes del dashboard con la sesión síncrona
+(llamada directa desde una corrutina, como hacían las rutas antes) y con la
+sesión asíncrona (asyncpg), mientras un latido cada 10 ms registra cuánto
+se retrasa el event loop. Con la sesión síncrona el retraso crece con la
+duración de la consulta; con la asíncrona se mantiene cerca de cero.
+
+Uso:
+    python scripts/bench_dashboard_event_loop.py --concurrency 20
+    python scripts/bench_dashboard_event_loop.py --simulate-ms 200   # solo PostgreSQL
+"""
+import sys
+import os
+import argparse
+import asyncio
+import statistics
+import time
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import SessionLocal, engine, get_async_sessionmaker, dispose_async_engine
+from app.services.dashboard_service import DashboardService
+
+HEARTBEAT_INTERVAL = 0.01
+
+
+async def heartbeat(lags, stop):
+    """Registrar el retraso de cada latido respecto a lo esperado"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + HEARTBEAT_INTERVAL
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append(max(0.0, loop.time() - expected) * 1000)
+
+
+def sync_query(simulate_ms):
+    db = SessionLocal()
+    try:
+        if simulate_ms:
+            db.execute(text("SELECT pg_sleep(:s)"), {"s": simulate_ms / 1000})
+        return DashboardService.get_active_patients_stats(db)
+    finally:
+        db.close()
+
+
+async def async_query(simulate_ms):
+    async with get_async_sessionmaker()() as db:
+        if simulate_ms:
+            await db.execute(text("SELECT pg_sleep(:s)"), {"s": simulate_ms / 1000})
+        return await DashboardService.get_active_patients_stats_async(db)
+
+
+async def run_case(name, make_call, concurrency):
+    lags = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(make_call() for _ in range(concurrency)))
+    elapsed = (time.perf_counter() - start) * 1000
+    stop.set()
+    await beat
+
+    lags = lags or [0.0]
+    print(
+        f"{name:<7} total={elapsed:8.1f} ms  "
+        f"lag máx={max(lags):8.1f} ms  lag p50={statistics.median(lags):6.1f} ms  latidos={len(lags)}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Medir el retraso del event loop con sesión síncrona vs asíncrona")
+    parser.add_argument("--concurrency", type=int, default=10, help="Consultas concurrentes por caso")
+    parser.add_argument("--simulate-ms", type=int, default=0, help="Añadir pg_sleep a cada consulta (solo PostgreSQL)")
+    args = parser.parse_args()
+
+    if args.simulate_ms and engine.url.get_backend_name() != "postgresql":
+        print("❌ --simulate-ms requiere PostgreSQL (pg_sleep)")
+        return
+
+    print(f"🔎 {args.concurrency} consultas concurrentes, backend={engine.url.get_backend_name()}")
+
+    async def sync_call():
+        # Mismo patrón que las rutas anteriores: consulta bloqueante dentro de una corrutina
+        return sync_query(args.simulate_ms)
+
+    async def async_call():
+        return await async_query(args.simulate_ms)
+
+    await run_case("sync", sync_call, args.concurrency)
+    await run_case("async", async_call, args.concurrency)
+    await dispose_async_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
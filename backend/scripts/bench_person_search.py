@@ -0,0 +1,132 @@
+"""
+Script para comparar la búsqueda de personas con ILIKE y con los índices de texto
+
+Crea un esquema temporal (bench_search) con una copia vacía de persons
+(columnas generadas e índices incluidos), la llena con N personas sintéticas
+con nombres en español y mide la misma búsqueda de recepción en los dos modos
+de app/services/person_search.py:
+
+- ilike: cadena de ILIKE '%texto%' sobre nombres, documento y email
+- index: trigramas (search_text) + texto completo (search_vector), con ranking
+
+El esquema se elimina al terminar; no toca las tablas reales. Solo PostgreSQL,
+con init-scripts/12-person-search.sql aplicado.
+
+Uso:
+    python scripts/bench_person_search.py --rows 1000000 --repeat 5
+"""
+import sys
+import os
+import argparse
+import statistics
+import time
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.models.person_models import Person
+from app.services import person_search
+
+SCHEMA = "bench_search"
+FIRST_NAMES = [
+    "JOSÉ", "MARÍA", "ANA", "JUAN", "LUISA", "ANDRÉS", "SOFÍA", "CAMILO", "VALENTINA", "SEBASTIÁN",
+    "DANIELA", "MATEO", "ISABELLA", "NICOLÁS", "MARTÍN", "LAURA", "JULIÁN", "CATALINA", "TOMÁS", "MÓNICA",
+]
+SURNAMES = [
+    "GÓMEZ", "RODRÍGUEZ", "PÉREZ", "MARTÍNEZ", "LÓPEZ", "GARCÍA", "HERNÁNDEZ", "GONZÁLEZ", "SÁNCHEZ", "RAMÍREZ",
+    "DÍAZ", "TORRES", "VÁSQUEZ", "ROJAS", "MUÑOZ", "CASTAÑO", "OSPINA", "QUIÑONES", "ÁLVAREZ", "JIMÉNEZ",
+]
+# Búsquedas típicas de recepción: prefijos, nombre completo sin tildes, documento y email
+TERMS = ["per", "jose gomez", "Muñoz", "quinones sofia", "1000123", "ana.rojas", "xyz"]
+
+
+def _array(values):
+    return "ARRAY[" + ", ".join(f"'{value}'" for value in values) + "]"
+
+
+def setup(connection, rows):
+    connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    connection.execute(text(f"CREATE TABLE {SCHEMA}.persons (LIKE public.persons INCLUDING ALL)"))
+    connection.execute(text(
+        f"INSERT INTO {SCHEMA}.persons (document_type, document_number, first_name, middle_name, "
+        "first_surname, second_surname, email, phone, birthdate) "
+        "SELECT 'CC', (1000000 + g)::TEXT, "
+        f"({_array(FIRST_NAMES)})[1 + g % {len(FIRST_NAMES)}], "
+        f"CASE WHEN g % 3 = 0 THEN ({_array(FIRST_NAMES)})[1 + (g / 7) % {len(FIRST_NAMES)}] END, "
+        f"({_array(SURNAMES)})[1 + (g / 3) % {len(SURNAMES)}], "
+        f"({_array(SURNAMES)})[1 + (g / 11) % {len(SURNAMES)}], "
+        "CASE WHEN g % 2 = 0 THEN 'persona' || g || '@correo.com' END, "
+        "'3' || lpad(g::TEXT, 9, '0'), DATE '1950-01-01' + (g % 25000) "
+        "FROM generate_series(1, :rows) g"
+    ), {"rows": rows})
+    connection.execute(text(f"ANALYZE {SCHEMA}.persons"))
+    # "persons" sin esquema en las consultas resuelve a la copia de prueba
+    connection.execute(text(f"SET search_path TO {SCHEMA}, public"))
+    connection.commit()
+
+
+def run_search(session, term, limit):
+    query = person_search.apply_person_search(session.query(Person.id), term)
+    return query.limit(limit).all()
+
+
+def measure(session, index_mode, repeat, limit):
+    person_search._index_active = index_mode
+    results = []
+    for term in TERMS:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            found = run_search(session, term, limit)
+            timings.append((time.perf_counter() - start) * 1000)
+        results.append((term, len(found), statistics.median(timings)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparar la búsqueda de personas con ILIKE y con índices")
+    parser.add_argument("--rows", type=int, default=1000000, help="Personas sintéticas")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por búsqueda (se usa la mediana)")
+    parser.add_argument("--limit", type=int, default=20, help="Resultados por búsqueda")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("⚠️ El benchmark requiere PostgreSQL (DATABASE_URL)")
+        return 1
+
+    with engine.connect() as connection:
+        installed = connection.execute(text(
+            "SELECT COUNT(*) FROM information_schema.columns "
+            "WHERE table_schema = 'public' AND table_name = 'persons' AND column_name = 'search_vector'"
+        )).scalar()
+        if not installed:
+            print("⚠️ Falta init-scripts/12-person-search.sql")
+            return 1
+
+        print(f"⏳ Generando {args.rows} personas en {SCHEMA}...")
+        setup(connection, args.rows)
+        session = Session(bind=connection)
+        try:
+            ilike_results = measure(session, False, args.repeat, args.limit)
+            index_results = measure(session, True, args.repeat, args.limit)
+        finally:
+            session.close()
+            person_search._index_active = False
+            connection.rollback()
+            connection.execute(text("RESET search_path"))
+            connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            connection.commit()
+
+    print(f"{'búsqueda':<18}{'ilike ms':>10}{'filas':>7}{'index ms':>10}{'filas':>7}")
+    for (term, ilike_rows, ilike_ms), (_, index_rows, index_ms) in zip(ilike_results, index_results):
+        print(f"{term:<18}{ilike_ms:>10.1f}{ilike_rows:>7}{index_ms:>10.1f}{index_rows:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Script para comparar la agrupación por mes de tratamientos (to_char/extract vs rangos)
+
+Crea un esquema temporal (bench_buckets) con una copia vacía de treatments, la
+llena con N tratamientos sintéticos repartidos en los últimos 5 años y mide
+las consultas del dashboard de app/services/dashboard_service.py:
+
+- legacy: to_char(treatment_date, 'YYYY-MM') en el GROUP BY y
+  extract('year'/'month') en el WHERE del mes actual
+- ranges: date_trunc('month', ...) y rangos semiabiertos sobre la columna
+  (app/services/time_buckets.py), antes y después de crear el índice
+  idx_treatments_date_doctor_service (init-scripts/15-treatment-date-index.sql)
+
+El esquema se elimina al terminar; no toca las tablas reales. Solo PostgreSQL.
+
+Uso:
+    python scripts/bench_treatments_per_month.py --rows 10000000 --repeat 5
+"""
+import sys
+import os
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import extract, func, text
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.models.treatment_models import Treatment
+from app.services.time_buckets import month_bucket, month_range, month_start, range_filter
+
+SCHEMA = "bench_buckets"
+DOCTORS = 20
+SERVICES = 15
+MINUTES_OF_HISTORY = 5 * 365 * 24 * 60
+
+
+def setup(connection, rows):
+    connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    # Sin índices ni claves foráneas: el índice de cobertura se crea durante la medición
+    connection.execute(text(f"CREATE TABLE {SCHEMA}.treatments (LIKE public.treatments INCLUDING DEFAULTS)"))
+    connection.execute(text(
+        f"INSERT INTO {SCHEMA}.treatments (clinical_history_id, dental_service_id, doctor_id, treatment_date, reason) "
+        "SELECT 1 + g % 100000, 1 + g % :services, 'doc-' || (g % :doctors), "
+        "date_trunc('minute', now()) - (g % :minutes) * interval '1 minute', 'Control' "
+        "FROM generate_series(1, :rows) g"
+    ), {"rows": rows, "services": SERVICES, "doctors": DOCTORS, "minutes": MINUTES_OF_HISTORY})
+    connection.execute(text(f"ANALYZE {SCHEMA}.treatments"))
+    # "treatments" sin esquema en las consultas resuelve a la copia de prueba
+    connection.execute(text(f"SET search_path TO {SCHEMA}, public"))
+    connection.commit()
+
+
+def create_index(connection):
+    connection.execute(text(
+        "CREATE INDEX idx_bench_treatments_date_doctor_service "
+        "ON treatments (treatment_date, doctor_id, dental_service_id) INCLUDE (clinical_history_id)"
+    ))
+    connection.commit()
+    # VACUUM no admite transacción: mapa de visibilidad para el index-only scan
+    connection.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM (ANALYZE) treatments"))
+
+
+def legacy_queries(session, start_month, end_month):
+    """Formas anteriores: función sobre la columna en el GROUP BY y en el WHERE"""
+    label = func.to_char(Treatment.treatment_date, 'YYYY-MM')
+    now = datetime.now()
+    return {
+        "por mes": lambda: session.query(label, func.count(Treatment.id)).filter(
+            Treatment.treatment_date >= start_month, Treatment.treatment_date < end_month
+        ).group_by(label).all(),
+        "por mes + doctor": lambda: session.query(label, func.count(Treatment.id)).filter(
+            Treatment.treatment_date >= start_month, Treatment.treatment_date < end_month,
+            Treatment.doctor_id == "doc-3"
+        ).group_by(label).all(),
+        "mes actual": lambda: session.query(func.count(Treatment.id)).filter(
+            extract('year', Treatment.treatment_date) == now.year,
+            extract('month', Treatment.treatment_date) == now.month
+        ).all(),
+    }
+
+
+def range_queries(session, start_month, end_month):
+    """Formas nuevas: date_trunc para agrupar y rangos sobre la columna"""
+    bucket = month_bucket(session, Treatment.treatment_date)
+    return {
+        "por mes": lambda: session.query(bucket, func.count()).filter(
+            *range_filter(Treatment.treatment_date, start_month, end_month)
+        ).group_by(bucket).all(),
+        "por mes + doctor": lambda: session.query(bucket, func.count()).filter(
+            *range_filter(Treatment.treatment_date, start_month, end_month),
+            Treatment.doctor_id == "doc-3"
+        ).group_by(bucket).all(),
+        "mes actual": lambda: session.query(func.count()).filter(
+            *range_filter(Treatment.treatment_date, *month_range(datetime.now()))
+        ).all(),
+    }
+
+
+def measure(queries, repeat):
+    results = {}
+    for name, run in queries.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = statistics.median(timings)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparar la agrupación por mes de tratamientos")
+    parser.add_argument("--rows", type=int, default=10000000, help="Tratamientos sintéticos")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por consulta (se usa la mediana)")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("⚠️ El benchmark requiere PostgreSQL (DATABASE_URL)")
+        return 1
+
+    # Últimos 12 meses, como get_treatments_per_month sin año
+    end_month = month_start(datetime.now()) + relativedelta(months=1)
+    start_month = end_month - relativedelta(months=12)
+
+    with engine.connect() as connection:
+        print(f"⏳ Generando {args.rows} tratamientos en {SCHEMA}...")
+        setup(connection, args.rows)
+        session = Session(bind=connection)
+        try:
+            legacy = measure(legacy_queries(session, start_month, end_month), args.repeat)
+            ranges = measure(range_queries(session, start_month, end_month), args.repeat)
+            session.commit()
+            print("⏳ Creando el índice de cobertura...")
+            create_index(connection)
+            indexed = measure(range_queries(session, start_month, end_month), args.repeat)
+        finally:
+            session.close()
+            connection.rollback()
+            connection.execute(text("RESET search_path"))
+            connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            connection.commit()
+
+    print(f"{'consulta':<20}{'legacy ms':>12}{'rangos ms':>12}{'+ índice ms':>14}")
+    for name in legacy:
+        print(f"{name:<20}{legacy[name]:>12.1f}{ranges[name]:>12.1f}{indexed[name]:>14.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
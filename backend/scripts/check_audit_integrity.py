@@ -0,0 +1,72 @@
+"""
+Script para sellar y verificar la integridad de la auditoría
+
+Uso:
+    python scripts/check_audit_integrity.py seal                 # sellar los días cerrados pendientes
+    python scripts/check_audit_integrity.py verify --workers 8   # verificar todo en paralelo
+    python scripts/check_audit_integrity.py verify --desde 2025-01-01 --hasta 2025-03-31
+
+Sale con código 1 si encuentra filas o sellos alterados.
+"""
+import sys
+import os
+import argparse
+import json
+from datetime import date
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.audit_integrity_service import seal_pending_segments, verify_audit_integrity
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sellar y verificar la integridad de la auditoría")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    seal_parser = subparsers.add_parser("seal", help="Sellar los días (UTC) cerrados que no tienen sello")
+    seal_parser.add_argument("--hasta", type=date.fromisoformat, default=None, help="Último día a sellar (por defecto ayer)")
+
+    verify_parser = subparsers.add_parser("verify", help="Verificar filas, sellos y cadena")
+    verify_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos en paralelo")
+    verify_parser.add_argument("--desde", type=date.fromisoformat, default=None, help="Primer día a verificar")
+    verify_parser.add_argument("--hasta", type=date.fromisoformat, default=None, help="Último día a verificar")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "seal":
+            sellos = seal_pending_segments(db, until_day=args.hasta, archive_dir=settings.audit_archive_dir)
+            print(f"✅ {len(sellos)} segmentos sellados")
+            return 0
+
+        report = verify_audit_integrity(
+            db,
+            database_url=settings.database_url,
+            workers=args.workers,
+            start_day=args.desde,
+            end_day=args.hasta,
+            archive_dir=settings.audit_archive_dir
+        )
+    finally:
+        db.close()
+
+    print(json.dumps({key: value for key, value in report.items() if key != "failed_segments"}, indent=2, default=str))
+    if report["ok"]:
+        print(f"✅ Auditoría íntegra: {report['rows_checked']} filas en {report['segments_checked']} segmentos")
+        return 0
+
+    if report["broken_chain_day"]:
+        print(f"❌ Cadena de sellos rota en {report['broken_chain_day']}")
+    for segment in report["failed_segments"]:
+        print(
+            f"❌ {segment['segment_day']}: {segment['tampered_rows']} filas alteradas "
+            f"(primera: {segment['first_tampered_id']}), sello coincide: {segment['seal_matches']}"
+        )
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Script para gestionar las particiones mensuales de auditoría (PostgreSQL)
+
+Uso:
+    python scripts/manage_audit_partitions.py ensure --meses 6     # crear el mes actual y los 6 siguientes
+    python scripts/manage_audit_partitions.py detach --retener 24  # desconectar meses anteriores a 24 meses
+    python scripts/manage_audit_partitions.py list
+
+Requiere haber ejecutado init-scripts/08-audit-partitioning.sql.
+"""
+import sys
+import os
+import argparse
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.audit_partition_service import (
+    PARTITIONED_TABLES, detach_old_partitions, ensure_future_partitions, is_partitioned, list_partitions
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gestionar las particiones mensuales de auditoría")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ensure_parser = subparsers.add_parser("ensure", help="Crear las particiones futuras")
+    ensure_parser.add_argument("--meses", type=int, default=settings.audit_partition_months_ahead, help="Meses futuros a crear")
+
+    detach_parser = subparsers.add_parser("detach", help="Desconectar las particiones antiguas")
+    detach_parser.add_argument("--retener", type=int, default=settings.audit_partition_retention_months, help="Meses a conservar")
+
+    subparsers.add_parser("list", help="Listar las particiones")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if not any(is_partitioned(db, parent) for parent in PARTITIONED_TABLES):
+            print("⚠️ Las tablas de auditoría no están particionadas (ver init-scripts/08-audit-partitioning.sql)")
+            return 1
+
+        if args.command == "ensure":
+            created = ensure_future_partitions(db, args.meses)
+            print(f"✅ {len(created)} particiones creadas: {', '.join(created) or '-'}")
+        elif args.command == "detach":
+            if args.retener <= 0:
+                print("⚠️ Indique --retener mayor que 0")
+                return 1
+            detached = detach_old_partitions(db, args.retener)
+            print(f"✅ {len(detached)} particiones desconectadas: {', '.join(detached) or '-'}")
+        else:
+            for parent in PARTITIONED_TABLES:
+                partitions = list_partitions(db, parent)
+                print(f"{parent}: {len(partitions)} particiones")
+                for partition in partitions:
+                    print(f"  {partition['name']}  {partition['month'].strftime('%Y-%m')}")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
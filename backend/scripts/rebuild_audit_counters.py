@@ -0,0 +1,44 @@
+"""
+Script para reconstruir los contadores incrementales de auditoría
+
+Recalcula audit_event_counters a partir de la tabla audits y del archivo en
+frío. Usarlo para rellenar el histórico o corregir desviaciones; conviene
+ejecutarlo sin escrituras de auditoría en curso.
+
+Uso:
+    python scripts/rebuild_audit_counters.py
+    python scripts/rebuild_audit_counters.py --sin-archivo   # solo la tabla audits
+"""
+import sys
+import os
+import argparse
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.audit_stats_service import rebuild_counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruir los contadores de auditoría")
+    parser.add_argument("--sin-archivo", action="store_true", help="No contar los eventos del archivo en frío")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        total = rebuild_counters(db, archive_dir=None if args.sin_archivo else settings.audit_archive_dir)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al reconstruir los contadores: {e}")
+        return 1
+    finally:
+        db.close()
+
+    print(f"✅ Contadores reconstruidos a partir de {total} eventos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""
+Script para reconstruir el agregado diario de tratamientos del dashboard
+
+Recalcula treatment_daily_rollups a partir de treatments. Usarlo para rellenar
+el histórico o corregir desviaciones (tratamientos cargados fuera de la
+aplicación); conviene ejecutarlo sin tratamientos nuevos en curso.
+
+Uso:
+    python scripts/rebuild_dashboard_rollups.py
+"""
+import sys
+import os
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.dashboard_rollup_service import rebuild_rollups
+
+
+def main():
+    db = SessionLocal()
+    try:
+        total = rebuild_rollups(db)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al reconstruir el agregado del dashboard: {e}")
+        return 1
+    finally:
+        db.close()
+
+    print(f"✅ Agregado del dashboard reconstruido a partir de {total} tratamientos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
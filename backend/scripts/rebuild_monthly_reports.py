@@ -0,0 +1,72 @@
+"""
+Script para recalcular las instantáneas mensuales de actividad
+
+Recalcula monthly_activity_reports a partir de treatments. Usarlo tras cargar
+tratamientos con fecha de meses ya cerrados (sus instantáneas están
+congeladas) o para rellenar el histórico de un año. Sin --year hace el mismo
+mantenimiento que la aplicación repite cada MONTHLY_SNAPSHOT_CHECK_SECONDS
+(crear las que faltan y cerrar las de los meses terminados).
+
+Uso:
+    python scripts/rebuild_monthly_reports.py                          # mantenimiento
+    python scripts/rebuild_monthly_reports.py --year 2025              # todos los meses del año
+    python scripts/rebuild_monthly_reports.py --year 2025 --month 3    # solo marzo
+"""
+import sys
+import os
+import argparse
+from datetime import datetime
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.monthly_activity_service import ensure_snapshots, refresh_month
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcular las instantáneas mensuales de actividad")
+    parser.add_argument("--year", type=int, help="Año a recalcular (sin él, solo el mantenimiento)")
+    parser.add_argument("--month", type=int, choices=range(1, 13), help="Mes a recalcular (por defecto todo el año)")
+    args = parser.parse_args()
+
+    if args.year is None:
+        db = SessionLocal()
+        try:
+            refreshed = ensure_snapshots(db)
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Error en el mantenimiento de las instantáneas mensuales: {e}")
+            return 1
+        finally:
+            db.close()
+        print(f"✅ Instantáneas mensuales al día: {refreshed} calculadas")
+        return 0
+
+    today = datetime.now()
+    if args.month:
+        months = [args.month]
+    else:
+        last_month = 12 if args.year < today.year else today.month if args.year == today.year else 0
+        months = list(range(1, last_month + 1))
+
+    db = SessionLocal()
+    try:
+        for month in months:
+            snapshot = refresh_month(db, args.year, month)
+            estado = "cerrado" if snapshot.is_closed else "en curso"
+            print(f"✅ {args.year}-{month:02d}: {snapshot.total_activities} actividades, ingresos {snapshot.total_revenue} ({estado})")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al recalcular las instantáneas mensuales: {e}")
+        return 1
+    finally:
+        db.close()
+
+    if not months:
+        print("⚠️ No hay meses que recalcular para ese año")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())